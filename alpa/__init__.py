@@ -14,7 +14,8 @@ from alpa.pipeline_parallel.layer_construction import (
     manual_remat, automatic_remat, automatic_layer_construction,
     manual_layer_construction)
 from alpa.shard_parallel.auto_sharding import AutoShardingOption
-from alpa.serialization import save_checkpoint, restore_checkpoint
+from alpa.serialization import (save_checkpoint, restore_checkpoint,
+                                wait_all_checkpoints)
 from alpa.timer import timers
 
 from . import api
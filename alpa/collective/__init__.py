@@ -4,7 +4,8 @@ from alpa.collective.collective import (
     get_collective_group_size, allreduce, allreduce_multigpu, barrier, reduce,
     reduce_multigpu, broadcast, broadcast_partialgpu, broadcast_multigpu, allgather,
     allgather_multigpu, reducescatter, reducescatter_multigpu, send,
-    send_multigpu, recv, recv_multigpu, check_and_get_group)
+    send_multigpu, recv, recv_multigpu, send_chunked, recv_chunked,
+    get_chunk_ranges, check_and_get_group)
 
 __all__ = [
     "nccl_available", "gloo_available", "is_group_initialized",
@@ -13,5 +14,6 @@ __all__ = [
     "allreduce", "allreduce_multigpu", "barrier", "reduce", "reduce_multigpu",
     "broadcast", "broadcast_multigpu", "allgather", "allgather_multigpu",
     "reducescatter", "reducescatter_multigpu", "send", "send_multigpu", "recv",
-    "recv_multigpu", "check_and_get_group"
+    "recv_multigpu", "send_chunked", "recv_chunked", "get_chunk_ranges",
+    "check_and_get_group"
 ]
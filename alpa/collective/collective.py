@@ -673,6 +673,87 @@ def recv_multigpu(tensor,
     g.recv([tensor], opts)
 
 
+def get_chunk_ranges(n_elements: int, itemsize: int, chunk_size: int):
+    """Split n_elements into back-to-back chunks of at most chunk_size bytes.
+
+    Both peers of a chunked send/recv compute the same ranges from the
+    number of elements and the dtype of the tensor.
+
+    Args:
+        n_elements (int): the number of elements to transfer.
+        itemsize (int): the bytes of an element.
+        chunk_size (int): the maximal bytes of a chunk. If it is None or 0,
+            or the tensor fits in one chunk, the tensor is not split.
+
+    Returns:
+        A list of [start, stop) element ranges.
+    """
+    if not chunk_size or n_elements * itemsize <= chunk_size:
+        return [(0, n_elements)]
+    chunk_elements = max(chunk_size // itemsize, 1)
+    return [(start, min(start + chunk_elements, n_elements))
+            for start in range(0, n_elements, chunk_elements)]
+
+
+def send_chunked(tensor,
+                 dst_rank: int,
+                 group_name: str = "default",
+                 chunk_size: int = 0,
+                 dst_gpu_index: int = None):
+    """Send a tensor to a remote process as back-to-back chunks.
+
+    Args:
+        tensor: the 1-D contiguous tensor to send.
+        dst_rank (int): the rank of the destination process.
+        group_name (str): the name of the collective group.
+        chunk_size (int): the maximal bytes of a chunk.
+        dst_gpu_index (int): the destination gpu index. If None, use send
+            (e.g., for CPU tensors with GLOO), otherwise use send_multigpu.
+
+    Returns:
+        None
+    """
+    if len(tensor.shape) != 1:
+        raise RuntimeError("send_chunked requires a 1-D tensor.")
+    for start, stop in get_chunk_ranges(tensor.shape[0],
+                                        tensor.dtype.itemsize, chunk_size):
+        if dst_gpu_index is None:
+            send(tensor[start:stop], dst_rank, group_name)
+        else:
+            send_multigpu(tensor[start:stop], dst_rank, dst_gpu_index,
+                          group_name)
+
+
+def recv_chunked(tensor,
+                 src_rank: int,
+                 group_name: str = "default",
+                 chunk_size: int = 0,
+                 src_gpu_index: int = None):
+    """Receive a tensor sent by send_chunked from a remote process.
+
+    Args:
+        tensor: the 1-D contiguous tensor to receive into.
+        src_rank (int): the rank of the source process.
+        group_name (str): the name of the collective group.
+        chunk_size (int): the maximal bytes of a chunk. It must be the same
+            as the one of the sender.
+        src_gpu_index (int): the source gpu index. If None, use recv
+            (e.g., for CPU tensors with GLOO), otherwise use recv_multigpu.
+
+    Returns:
+        None
+    """
+    if len(tensor.shape) != 1:
+        raise RuntimeError("recv_chunked requires a 1-D tensor.")
+    for start, stop in get_chunk_ranges(tensor.shape[0],
+                                        tensor.dtype.itemsize, chunk_size):
+        if src_gpu_index is None:
+            recv(tensor[start:stop], src_rank, group_name)
+        else:
+            recv_multigpu(tensor[start:stop], src_rank, src_gpu_index,
+                          group_name)
+
+
 def synchronize(gpu_id: int):
     """Synchronize the current process to a give device.
 
@@ -1,6 +1,9 @@
 """"Distributed data loaders for loading data into device meshes."""
 import collections
 import itertools
+import queue
+import threading
+import time
 
 import jax
 from jax.interpreters import pxla, xla
@@ -11,6 +14,97 @@ from alpa.device_mesh import LocalPhysicalDeviceMesh, DistributedArray
 from alpa.mesh_executable import create_remote_buffer_refs
 
 
+PrefetchMetrics = collections.namedtuple(
+    "PrefetchMetrics", ["queue_depth", "stall_time", "num_batches"])
+
+
+class _ProducerError:
+    """Wrap an exception raised in the producer thread."""
+
+    def __init__(self, exception):
+        self.exception = exception
+
+
+class BackgroundPrefetcher:
+    """Run an input iterator in a background thread.
+
+    The thread keeps at most `prefetch_size` ready batches in a bounded
+    queue, so that input preprocessing overlaps with the training step.
+
+    Args:
+        input_iter: The input iterator.
+        prefetch_size: The maximal number of ready batches.
+        transform: An optional function applied to each batch in the
+          background thread.
+    """
+
+    _end_of_input = object()
+
+    def __init__(self, input_iter, prefetch_size, transform=None):
+        assert prefetch_size > 0
+        self.queue = queue.Queue(maxsize=prefetch_size)
+        self.stop_event = threading.Event()
+        self.finished = False
+
+        # Metrics
+        self.stall_time = 0.0
+        self.num_batches = 0
+
+        self.thread = threading.Thread(target=self._produce,
+                                       args=(input_iter, transform),
+                                       daemon=True)
+        self.thread.start()
+
+    def _produce(self, input_iter, transform):
+        try:
+            for batch in input_iter:
+                if transform is not None:
+                    batch = transform(batch)
+                if not self._put(batch):
+                    return
+        except Exception as e:  # pylint: disable=broad-except
+            self._put(_ProducerError(e))
+            return
+        self._put(self._end_of_input)
+
+    def _put(self, item):
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.finished:
+            raise StopIteration
+        tic = time.time()
+        item = self.queue.get()
+        self.stall_time += time.time() - tic
+        if item is self._end_of_input:
+            self.finished = True
+            raise StopIteration
+        if isinstance(item, _ProducerError):
+            self.finished = True
+            raise item.exception
+        self.num_batches += 1
+        return item
+
+    def get_metrics(self):
+        """Return the number of ready batches, the total time spent waiting
+        for the producer, and the number of consumed batches."""
+        return PrefetchMetrics(self.queue.qsize(), self.stall_time,
+                               self.num_batches)
+
+    def close(self):
+        """Stop the producer thread."""
+        self.stop_event.set()
+
+
 class DataLoader:
     """A driver-only dataloader that loads data on the driver process and
     sends the data to all workers."""
@@ -20,7 +114,12 @@ class DataLoader:
                  sharding_specs,
                  physical_mesh=None,
                  prefetch_size=1):
-        self.input_iter = input_iter
+        if prefetch_size:
+            self.prefetcher = BackgroundPrefetcher(input_iter, prefetch_size)
+            self.input_iter = self.prefetcher
+        else:
+            self.prefetcher = None
+            self.input_iter = input_iter
         self.sharding_specs = sharding_specs
         self.prefetch_size = prefetch_size
 
@@ -65,6 +164,16 @@ class DataLoader:
                 else:
                     break
 
+    def get_metrics(self):
+        """Return the PrefetchMetrics of the background prefetcher."""
+        if self.prefetcher is None:
+            return None
+        return self.prefetcher.get_metrics()
+
+    def __del__(self):
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+
 
 # The global executable and buffer counter.
 mesh_data_loader_counter = 0
@@ -196,6 +305,13 @@ class MeshDriverDataLoader:
                 a.flush()
             yield self.output_arrays
 
+    def get_metrics(self):
+        """Return the PrefetchMetrics of the data loader on each host."""
+        return ray.get([
+            w.get_data_loader_metrics.remote(self.uuid)
+            for w in self.physical_mesh.workers
+        ])
+
     def __del__(self):
         physical_mesh = self.physical_mesh
         if physical_mesh.workers is None or not ray.is_initialized():
@@ -211,7 +327,6 @@ class MeshWorkerDataLoader:
 
     def __init__(self, mesh_host_worker, input_iter_func, input_iter_args,
                  output_uuids, shard_indices, prefetch_size):
-        self.input_iter = input_iter_func(*input_iter_args)
         self.output_uuids = output_uuids
         self.shard_indices = shard_indices
         self.prefetch_size = prefetch_size
@@ -219,40 +334,44 @@ class MeshWorkerDataLoader:
         self.devices = mesh_host_worker.local_devices
         self.buffers = mesh_host_worker.buffers
 
-        # A queue for prefetching
-        self.queue = collections.deque()
-
-    def enqueue(self, num_batches):
-        for args in itertools.islice(self.input_iter, num_batches):
-            batch = []
-            for i in range(len(args)):
-                shards = [
-                    args[i][self.shard_indices[i][k]]
-                    for k in range(len(self.devices))
-                ]
-                buffers = [
-                    jax.device_put(x, d) for x, d in zip(shards, self.devices)
-                ]
-                batch.append(buffers)
-
-            self.queue.append(batch)
-
-    def pop_left(self):
-        batch = self.queue.popleft()
+        # Load and put batches on devices in a background thread
+        input_iter = input_iter_func(*input_iter_args)
+        if prefetch_size:
+            self.prefetcher = BackgroundPrefetcher(input_iter, prefetch_size,
+                                                   self.put_on_devices)
+            self.input_iter = self.prefetcher
+        else:
+            self.prefetcher = None
+            self.input_iter = map(self.put_on_devices, input_iter)
+
+    def put_on_devices(self, args):
+        batch = []
+        for i in range(len(args)):
+            shards = [
+                args[i][self.shard_indices[i][k]]
+                for k in range(len(self.devices))
+            ]
+            buffers = [
+                jax.device_put(x, d) for x, d in zip(shards, self.devices)
+            ]
+            batch.append(buffers)
+        return batch
+
+    def set_output_buffers(self, batch):
         for i, shards in enumerate(batch):
             for uuid, shard in zip(self.output_uuids[i], shards):
                 self.buffers[uuid] = shard
 
     def __iter__(self):
-        if self.prefetch_size:
-            self.enqueue(self.prefetch_size)
-            while self.queue:
-                yield self.pop_left()
-                self.enqueue(1)
-        else:
-            while True:
-                self.enqueue(1)
-                if self.queue:
-                    yield self.pop_left()
-                else:
-                    break
+        for batch in self.input_iter:
+            yield self.set_output_buffers(batch)
+
+    def get_metrics(self):
+        """Return the PrefetchMetrics of the background prefetcher."""
+        if self.prefetcher is None:
+            return None
+        return self.prefetcher.get_metrics()
+
+    def close(self):
+        if self.prefetcher is not None:
+            self.prefetcher.close()
@@ -17,6 +17,7 @@ allocating real resources during compilation time.
 from abc import ABC, abstractmethod
 from collections import defaultdict, namedtuple
 from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
 from itertools import chain
 import logging
 from operator import attrgetter
@@ -24,7 +25,7 @@ import os
 import re
 import threading
 import time
-from typing import Any, List, Union, Sequence, Tuple, Optional
+from typing import Any, Dict, List, Union, Sequence, Tuple, Optional
 
 import jax
 from jax import core, xla, device_put
@@ -65,11 +66,11 @@ logger.setLevel(logging.INFO)
 ReshardingTileSpec = namedtuple("ReshardingSendSpec",
                                 ["offset", "rank", "gpu_idx"])
 ReshardingSendTask = namedtuple("ReshardingSendTask",
-                                ["tile_specs", "group_name"])
+                                ["tile_specs", "group_name", "chunk_size"])
 ReshardingRecvSpec = namedtuple("ReshardingRecvSpec",
                                 ["device_id", "shape", "dtype", "tile_specs"])
 ReshardingRecvTask = namedtuple("ReshardingRecvTask",
-                                ["recv_specs", "group_name"])
+                                ["recv_specs", "group_name", "chunk_size"])
 ReshardingAllGatherSpec = namedtuple(
     "ReshardingAllGatherSpec", ["device_ids", "tensor_slices", "output_slice"])
 ReshardingAllGatherTask = namedtuple("ReshardingAllGatherTask",
@@ -111,10 +112,17 @@ class MeshHostWorker:
         self.broadcast_tasks = {}  # Dict[uuid -> BroadcastTask]
         self.allgather_communicators = {}
         self.broadcast_communicators = {}
+        # The number of chunks sent and received by chunked send/recv
+        self.num_sent_chunks = 0
+        self.num_recv_chunks = 0
 
         self.data_loaders = {}  # Dict[uuid -> MeshWorkerDataLoader]
         self.data_loader_iters = {}  # Dict[uuid -> iterator]
 
+        # A background thread for asynchronous checkpointing
+        self.async_save_executor = ThreadPoolExecutor(max_workers=1)
+        self.async_save_futures = {}  # Dict[save_uuid -> Future]
+
         if global_config.pipeline_use_signal_send_recv:
             print("Use signal send recv.")
             self.signal_tensors = []
@@ -151,6 +159,21 @@ class MeshHostWorker:
             self.buffers[uuid] = (self.backend.buffer_from_pyval(
                 data, self.local_devices[device_id]))
 
+    def put_buffers_from_slab(self, uuids: Sequence[int],
+                              device_ids: Sequence[int], slab: np.ndarray,
+                              shard_specs: Sequence[Tuple]):
+        """Put buffers whose data are packed in one contiguous slab.
+
+        The slab is a read-only array in the ray object store, so slicing it
+        with np.frombuffer does not copy.
+        """
+        for uuid, device_id, spec in zip(uuids, device_ids, shard_specs):
+            data = _unpack_array(slab, spec)
+            if data.dtype == np.int64:
+                data = data.astype(np.int32)
+            self.buffers[uuid] = (self.backend.buffer_from_pyval(
+                data, self.local_devices[device_id]))
+
     def put_non_zero_buffer(self,
                             uuid: int,
                             device_id: int,
@@ -183,6 +206,10 @@ class MeshHostWorker:
             return [self.buffers[uuid] for uuid in uuids]
         return self.buffers[uuids]
 
+    def get_buffers_packed(self, uuids: Sequence[int]):
+        """Copy buffers to the host and pack them into one contiguous slab."""
+        return _pack_arrays([np.asarray(self.buffers[uuid]) for uuid in uuids])
+
     def delete_buffers(self, uuids: Union[Sequence[int], int]):
         if isinstance(uuids, Iterable):
             for uuid in uuids:
@@ -234,6 +261,9 @@ class MeshHostWorker:
     def get_exec_grad_sync_channel_ids(self, uuid: int):
         return self.executables[uuid].grad_sync_channel_ids
 
+    def get_exec_trace_records(self, uuid: int):
+        return self.executables[uuid].get_trace_records()
+
     ##### TensorStore Related Functions #####
     def get_ts_spec(self, ckpt_path: str):
         spec = {
@@ -269,38 +299,105 @@ class MeshHostWorker:
             data = t[index].read().result()
             self.put_buffer(uuid, device_id, data)
 
-    def save_buffers_to_ts(self, ckpt_dir: str, uuids: Sequence[int],
+    def save_buffers_to_ts(self,
+                           ckpt_dir: str,
+                           uuids: Sequence[int],
                            shard_indices: Sequence[Index],
-                           global_shape: Sequence[int]):
-        assert len(uuids) > 0
-        for uuid in uuids:
-            assert uuid in self.buffers
+                           global_shape: Sequence[int],
+                           compressor: Optional[str] = "gzip",
+                           max_chunk_bytes: Optional[int] = None):
+        self.save_arrays_to_ts([(ckpt_dir, uuids, shard_indices, global_shape)
+                               ], compressor, max_chunk_bytes)
 
-        ts_spec = self.get_ts_spec(ckpt_dir)
-        dtype = self.buffers[uuids[0]].dtype
-        if dtype == jnp.bfloat16:
-            # Tensorstore uses 'bfloat16', not '<V2'.
-            dtype = 'bfloat16'
-        else:
-            dtype = np.dtype(dtype).str
-        metadata = {
-            'compressor': {
-                'id': 'gzip'
-            },
-            'shape': global_shape,
-            'chunks': self.buffers[uuids[0]].shape,
-            'dtype': dtype,
-        }
-        ts_spec['metadata'] = metadata
-        t = ts.open(ts.Spec(ts_spec),
-                    create=True,
-                    open=True,
-                    context=ts.Context({'file_io_concurrency': {
-                        'limit': 128
-                    }})).result()
+    def save_arrays_to_ts(self,
+                          save_infos: Sequence[Tuple],
+                          compressor: Optional[str] = "gzip",
+                          max_chunk_bytes: Optional[int] = None):
+        """Save the shards of multiple arrays with tensorstore.
+
+        All tensorstores are opened and all shards are written concurrently,
+        and the writes are awaited together.
+
+        Args:
+            save_infos: A list of (ckpt_dir, uuids, shard_indices,
+              global_shape) for each array.
+            compressor: The zarr compressor. Possible choices:
+              {None, "gzip", "zstd", "blosc"}.
+            max_chunk_bytes: The maximal size of a zarr chunk. The chunk
+              shape is the shard shape if it is None. Otherwise, the shard
+              shape is split evenly so that chunks never cross shards.
+        """
+        for _, uuids, _, _ in save_infos:
+            assert len(uuids) > 0
+            for uuid in uuids:
+                assert uuid in self.buffers
+        self._write_arrays_to_ts(save_infos, self.buffers, compressor,
+                                 max_chunk_bytes)
+
+    def async_save_arrays_to_ts(self,
+                                save_uuid: str,
+                                save_infos: Sequence[Tuple],
+                                compressor: Optional[str] = "gzip",
+                                max_chunk_bytes: Optional[int] = None):
+        """Save the shards of multiple arrays in a background thread.
+
+        The buffers are copied to host memory before this function returns,
+        so later computations can safely donate or overwrite them. Use
+        get_async_save_status to query whether the write is finished.
+        """
+        host_buffers = {}
+        for _, uuids, _, _ in save_infos:
+            for uuid in uuids:
+                host_buffers[uuid] = np.asarray(self.buffers[uuid])
+        self.async_save_futures[save_uuid] = self.async_save_executor.submit(
+            self._write_arrays_to_ts, save_infos, host_buffers, compressor,
+            max_chunk_bytes)
+
+    def get_async_save_status(self, save_uuid: str):
+        """Return whether an asynchronous save is finished. Raise the error
+        of the background write if it failed."""
+        future = self.async_save_futures[save_uuid]
+        if not future.done():
+            return False
+        del self.async_save_futures[save_uuid]
+        future.result()
+        return True
 
-        for index, uuid in zip(shard_indices, uuids):
-            t[index].write(self.buffers[uuid]).result()
+    def _write_arrays_to_ts(self, save_infos: Sequence[Tuple], buffers: Dict,
+                            compressor: Optional[str],
+                            max_chunk_bytes: Optional[int]):
+        context = ts.Context({'file_io_concurrency': {'limit': 128}})
+        open_futures = []
+        for ckpt_dir, uuids, _, global_shape in save_infos:
+            buf = buffers[uuids[0]]
+            if buf.dtype == jnp.bfloat16:
+                # Tensorstore uses 'bfloat16', not '<V2'.
+                dtype = 'bfloat16'
+            else:
+                dtype = np.dtype(buf.dtype).str
+            ts_spec = self.get_ts_spec(ckpt_dir)
+            ts_spec['metadata'] = {
+                'compressor': get_ts_compressor(compressor),
+                'shape': global_shape,
+                'chunks': get_ts_chunk_shape(buf.shape,
+                                             np.dtype(buf.dtype).itemsize,
+                                             max_chunk_bytes),
+                'dtype': dtype,
+            }
+            open_futures.append(
+                ts.open(ts.Spec(ts_spec),
+                        create=True,
+                        open=True,
+                        context=context))
+
+        write_futures = []
+        for future, (_, uuids, shard_indices, _) in zip(open_futures,
+                                                       save_infos):
+            t = future.result()
+            for index, uuid in zip(shard_indices, uuids):
+                write_futures.append(t[index].write(buffers[uuid]))
+        for future in write_futures:
+            future.result()
 
     ##### Data loader Related Functions #####
     def put_data_loader(self, uuid: int, *args):
@@ -314,6 +411,9 @@ class MeshHostWorker:
     def data_loader_next(self, uuid: int):
         next(self.data_loader_iters[uuid])
 
+    def get_data_loader_metrics(self, uuid: int):
+        return self.data_loaders[uuid].get_metrics()
+
     ##### Cross Mesh Resharding Related Functions #####
     @staticmethod
     def init_collective_group(world_size, rank, backend, group_name):
@@ -334,8 +434,13 @@ class MeshHostWorker:
     # (1) JAX high-level _DeviceArray, which is index-able, has __cuda_array__ interface
     # (2) XLA low-level PyLocalBuffer, which is not index-able
     # (3) cupy array, which is an intermediate format for ray collective
-    def send_tile(self, uuid: int, offset: Sequence[slice], dst_rank: int,
-                  dst_gpu_idx: int, group_name: str):
+    def send_tile(self,
+                  uuid: int,
+                  offset: Sequence[slice],
+                  dst_rank: int,
+                  dst_gpu_idx: int,
+                  group_name: str,
+                  chunk_size: Optional[int] = None):
         """
         Send a slice of a source buffer to a target GPU.
 
@@ -345,6 +450,8 @@ class MeshHostWorker:
             dst_rank: destination rank to send.
             dst_gpu_idx: the gpu index on the destination rank.
             group_name: collective group name
+            chunk_size: the maximal number of bytes of a chunk. None sends
+                the slice at once. It must match the one of the receiver.
         """
         if global_config.pipeline_use_signal_send_recv:
             signal = self.signal_tensors[uuid % len(self.local_devices)]
@@ -356,7 +463,13 @@ class MeshHostWorker:
             # fast path, two cases: (1) same shape, (2) continuous subset.
             slice_shape = tuple(ind.stop - ind.start for ind in offset)
             to_send = xla_buffer_to_cupy(self.buffers[uuid])
-            if slice_shape == tensor_shape:
+            if _is_chunked_transfer(slice_shape, to_send.dtype, chunk_size):
+                start, n_elements = _flat_start_and_n_elements(
+                    offset, tensor_shape)
+                self._send_chunked(
+                    to_send.reshape(-1)[start:start + n_elements], dst_rank,
+                    group_name, chunk_size, dst_gpu_idx)
+            elif slice_shape == tensor_shape:
                 col.send_multigpu(to_send, dst_rank, dst_gpu_idx, group_name)
             else:
                 ind, n_elements = infer_offset_and_n_elements(offset)
@@ -377,11 +490,20 @@ class MeshHostWorker:
                 xla_buffer_to_jax_tensor(self.buffers[uuid]), start_indices,
                 slice_sizes)
             to_send = jax_tensor_to_cupy(src_buffer)
-            col.send_multigpu(to_send, dst_rank, dst_gpu_idx, group_name)
+            if _is_chunked_transfer(slice_sizes, to_send.dtype, chunk_size):
+                self._send_chunked(to_send.reshape(-1), dst_rank, group_name,
+                                   chunk_size, dst_gpu_idx)
+            else:
+                col.send_multigpu(to_send, dst_rank, dst_gpu_idx, group_name)
 
-    def recv_tile(self, uuid: int, device_id: int,
-                  indices_in_dst_tile: Sequence[slice], src_rank: int,
-                  src_gpu_idx: int, group_name: str):
+    def recv_tile(self,
+                  uuid: int,
+                  device_id: int,
+                  indices_in_dst_tile: Sequence[slice],
+                  src_rank: int,
+                  src_gpu_idx: int,
+                  group_name: str,
+                  chunk_size: Optional[int] = None):
         """
         Receive a slice from a source GPU and in-place write it on the target buffer.
 
@@ -392,6 +514,8 @@ class MeshHostWorker:
             src_rank: source rank to receive from.
             src_gpu_idx: the sender gpu index on the source rank.
             group_name: collective group name.
+            chunk_size: the maximal number of bytes of a chunk. None receives
+                the slice at once. It must match the one of the sender.
         """
         if uuid not in self.buffers:
             raise RuntimeError("Buffer has not been created.")
@@ -407,7 +531,13 @@ class MeshHostWorker:
         if is_continuous_subset(indices_in_dst_tile, tensor_shape):
             to_recv = xla_buffer_to_cupy(self.buffers[uuid],
                                          take_ownership=True)
-            if slice_shape == tensor_shape:
+            if _is_chunked_transfer(slice_shape, to_recv.dtype, chunk_size):
+                start, n_elements = _flat_start_and_n_elements(
+                    indices_in_dst_tile, tensor_shape)
+                self._recv_chunked(
+                    to_recv.reshape(-1)[start:start + n_elements], src_rank,
+                    group_name, chunk_size, src_gpu_idx)
+            elif slice_shape == tensor_shape:
                 col.recv_multigpu(to_recv, src_rank, src_gpu_idx, group_name)
             else:
                 ind, n_elements = infer_offset_and_n_elements(
@@ -429,7 +559,11 @@ class MeshHostWorker:
                 jnp.ones(slice_shape, dtype=self.buffers[uuid].dtype),
                 self.local_devices[device_id])
             to_recv = jax_tensor_to_cupy(tmp_buffer, take_ownership=True)
-            col.recv_multigpu(to_recv, src_rank, src_gpu_idx, group_name)
+            if _is_chunked_transfer(slice_shape, to_recv.dtype, chunk_size):
+                self._recv_chunked(to_recv.reshape(-1), src_rank, group_name,
+                                   chunk_size, src_gpu_idx)
+            else:
+                col.recv_multigpu(to_recv, src_rank, src_gpu_idx, group_name)
             recv_tensor = cupy_to_jax_tensor(to_recv)
             start_indices = tuple(
                 ind_in_dst.start for ind_in_dst in indices_in_dst_tile)
@@ -446,6 +580,25 @@ class MeshHostWorker:
         if is_bool:
             self.buffers[uuid] = _uint8_to_bool(self.buffers[uuid])
 
+    def _send_chunked(self, tensor, dst_rank, group_name, chunk_size,
+                      dst_gpu_idx):
+        self.num_sent_chunks += len(
+            col.get_chunk_ranges(tensor.shape[0], tensor.dtype.itemsize,
+                                 chunk_size))
+        col.send_chunked(tensor, dst_rank, group_name, chunk_size, dst_gpu_idx)
+
+    def _recv_chunked(self, tensor, src_rank, group_name, chunk_size,
+                      src_gpu_idx):
+        self.num_recv_chunks += len(
+            col.get_chunk_ranges(tensor.shape[0], tensor.dtype.itemsize,
+                                 chunk_size))
+        col.recv_chunked(tensor, src_rank, group_name, chunk_size, src_gpu_idx)
+
+    def get_num_chunks(self):
+        """Return the number of (sent, received) chunks of chunked
+        send/recv."""
+        return self.num_sent_chunks, self.num_recv_chunks
+
     @staticmethod
     def init_p2p_communicator(group_name, my_rank, my_gpu_idx, peer_rank,
                               peer_gpu_idx, nccl_uid):
@@ -462,23 +615,38 @@ class MeshHostWorker:
         uid = g.generate_nccl_uid()
         return uid
 
-    def put_resharding_send_task(self, uuid, tasks, group_name):
+    def put_resharding_send_task(self, uuid, tasks, group_name,
+                                 chunk_size=None):
         self.send_tasks[uuid] = ReshardingSendTask(tile_specs=tasks,
-                                                   group_name=group_name)
+                                                   group_name=group_name,
+                                                   chunk_size=chunk_size)
 
-    def put_resharding_recv_task(self, uuid, tasks, group_name):
+    def put_resharding_recv_task(self, uuid, tasks, group_name,
+                                 chunk_size=None):
         self.recv_tasks[uuid] = ReshardingRecvTask(recv_specs=tasks,
-                                                   group_name=group_name)
+                                                   group_name=group_name,
+                                                   chunk_size=chunk_size)
 
     def run_resharding_send_task(self, uuid, buf_uuids):
         task: ReshardingSendTask = self.send_tasks[uuid]
         for send_tile_spec, buf_uuid in zip(task.tile_specs, buf_uuids):
             send_tile_spec: ReshardingTileSpec
             self.send_tile(buf_uuid, send_tile_spec.offset, send_tile_spec.rank,
-                           send_tile_spec.gpu_idx, task.group_name)
-
-    def run_resharding_recv_task(self, uuid, buf_uuids, set_empty_buffer=True):
+                           send_tile_spec.gpu_idx, task.group_name,
+                           task.chunk_size)
+
+    def run_resharding_recv_task(self,
+                                 uuid,
+                                 buf_uuids,
+                                 set_empty_buffer=True,
+                                 allgather_uuid=None):
         task: ReshardingRecvTask = self.recv_tasks[uuid]
+        # An allgather starts as soon as the buffers of all its devices
+        # have landed, instead of after the whole recv task.
+        allgather_specs = (self.allgather_tasks[allgather_uuid].allgather_specs
+                           if allgather_uuid is not None else [])
+        num_done_allgathers = 0
+        landed_device_ids = set()
         for recv_spec, buf_uuid in zip(task.recv_specs, buf_uuids):
             recv_spec: ReshardingRecvSpec
             if set_empty_buffer:
@@ -488,7 +656,19 @@ class MeshHostWorker:
                 recv_tile_spec: ReshardingTileSpec
                 self.recv_tile(buf_uuid, recv_spec.device_id,
                                recv_tile_spec.offset, recv_tile_spec.rank,
-                               recv_tile_spec.gpu_idx, task.group_name)
+                               recv_tile_spec.gpu_idx, task.group_name,
+                               task.chunk_size)
+            landed_device_ids.add(recv_spec.device_id)
+            # Allgathers of later tensor dims read the results of earlier
+            # ones, so they are started in order.
+            while (num_done_allgathers < len(allgather_specs) and
+                   landed_device_ids.issuperset(
+                       allgather_specs[num_done_allgathers].device_ids)):
+                self._run_allgather_spec(
+                    buf_uuids, allgather_specs[num_done_allgathers])
+                num_done_allgathers += 1
+        for allgather_spec in allgather_specs[num_done_allgathers:]:
+            self._run_allgather_spec(buf_uuids, allgather_spec)
 
     def put_resharding_allgather_task(self, uuid, tasks):
         all_gather_task = ReshardingAllGatherTask(tasks)
@@ -504,9 +684,13 @@ class MeshHostWorker:
         task: ReshardingAllGatherTask = self.allgather_tasks[uuid]
         allgather_specs = task.allgather_specs
         for allgather_spec in allgather_specs:
-            self.allgather(buffer_uuids, allgather_spec.device_ids,
-                           allgather_spec.tensor_slices,
-                           allgather_spec.output_slice)
+            self._run_allgather_spec(buffer_uuids, allgather_spec)
+
+    def _run_allgather_spec(self, buffer_uuids,
+                            allgather_spec: ReshardingAllGatherSpec):
+        self.allgather(buffer_uuids, allgather_spec.device_ids,
+                       allgather_spec.tensor_slices,
+                       allgather_spec.output_slice)
 
     def allgather(self, uuids: Sequence[int], device_ids: Sequence[int],
                   tensor_slices: Sequence[slice], output_slice):
@@ -629,6 +813,7 @@ class MeshHostWorker:
 
     ##### Data Loader Related Functions #####
     def delete_data_loader(self, uuid: int):
+        self.data_loaders[uuid].close()
         del self.data_loaders[uuid]
 
     ##### Profiling and Debugging Related Functions #####
@@ -1145,6 +1330,24 @@ class DistributedPhysicalDeviceMesh(PhysicalDeviceMesh):
                 self.to_delete_remote_buffers_ct,
                 len(self.to_delete_remote_buffers[buf_ref.host_id]))
 
+        self._flush_delete_remote_buffers()
+
+    def delete_remote_buffer_uuids(self, host_ids: np.ndarray,
+                                   uuids: np.ndarray):
+        """Delete remote buffers given the host id and uuid of each buffer."""
+        if self.workers is None or not ray.is_initialized():
+            return
+
+        # Put delete requests into per-host buffers
+        for host_id, uuid in zip(host_ids.tolist(), uuids.tolist()):
+            self.to_delete_remote_buffers[host_id].append(uuid)
+        self.to_delete_remote_buffers_ct = max(
+            self.to_delete_remote_buffers_ct,
+            *map(len, self.to_delete_remote_buffers))
+
+        self._flush_delete_remote_buffers()
+
+    def _flush_delete_remote_buffers(self):
         # Execute the delete requests if there are enough requests
         if self.to_delete_remote_buffers_ct > global_config.delete_remote_buffers_threshold:
             for host_id in range(self.num_hosts):
@@ -1345,7 +1548,6 @@ class DistributedArray:
         self.dtype = self.aval.dtype
         self._npy_value = None
         self._one_replica_buffer_indices = None
-        self._fetched_np_buffers = None
 
     def block_until_ready(self):
         """Block until all remote buffers of this array are ready."""
@@ -1361,30 +1563,14 @@ class DistributedArray:
         self._npy_value = None
 
     ##### distributed save/load #####
-    def save(self, path: str):
+    def save(self,
+             path: str,
+             compressor: Optional[str] = "gzip",
+             max_chunk_bytes: Optional[int] = None):
         """Save one replica of the array to `path` distributedly."""
-        one_replica_buffers = [
-            self.remote_buffers[i] for i in self.one_replica_buffer_indices
-        ]
-        one_replica_indices = [
-            self.indices[i] for i in self.one_replica_buffer_indices
-        ]
-        buf_refs_per_host = {}
-        indices_per_host = {}
-        for buf_ref, indice in zip(one_replica_buffers, one_replica_indices):
-            if buf_refs_per_host.get(buf_ref.host_id) is None:
-                buf_refs_per_host[buf_ref.host_id] = [buf_ref.uuid]
-                indices_per_host[buf_ref.host_id] = [indice]
-            else:
-                buf_refs_per_host[buf_ref.host_id].append(buf_ref.uuid)
-                indices_per_host[buf_ref.host_id].append(indice)
-        obj_refs = []
-        for host_id, uuids in buf_refs_per_host.items():
-            if len(uuids) > 0:
-                obj_refs.append(
-                    self.device_mesh.workers[host_id].save_buffers_to_ts.remote(
-                        path, uuids, indices_per_host[host_id], self.shape))
-        return ray.get(obj_refs)
+        return ray.get(
+            save_distributed_arrays([self], [path], compressor,
+                                    max_chunk_bytes))
 
     @classmethod
     def load(cls, path: str, aval: ShapedArray, device_mesh: PhysicalDeviceMesh,
@@ -1435,17 +1621,7 @@ class DistributedArray:
     @property
     def _value(self):
         if self._npy_value is None:
-            npy_value = np.empty(self.aval.shape, self.aval.dtype)
-            if not self._fetched_np_buffers:
-                fetched_np_buffers = self.device_mesh.get_remote_buffers([
-                    self.remote_buffers[i]
-                    for i in self.one_replica_buffer_indices
-                ])
-            else:
-                fetched_np_buffers = self._fetched_np_buffers
-            for ct, i in enumerate(self.one_replica_buffer_indices):
-                npy_value[self.indices[i]] = fetched_np_buffers[ct]
-            self._npy_value = npy_value
+            fetch([self])
         return self._npy_value
 
     def __array__(self, dtype=None, context=None):
@@ -1461,22 +1637,43 @@ class DistributedArray:
 
 
 def fetch(distributed_arrays: Any):
-    """Fetch a pytree of DistributedArray in a batch."""
-    buf_refs = []
-    device_mesh = distributed_arrays[0].device_mesh
+    """Fetch a pytree of DistributedArray in a batch.
 
+    The shards of all arrays are grouped by host, possibly across different
+    meshes. Each host returns one contiguous slab, which is scattered into
+    preallocated numpy arrays. For a ReplicatedDistributedArray, only its
+    first replica is fetched.
+    """
+    arrays = {}  # Dict[id -> DistributedArray]
     for array in tree_leaves(distributed_arrays):
-        assert array.device_mesh == device_mesh, "Only support fetching from the same mesh."
-        for index in array.one_replica_buffer_indices:
-            buf_refs.append(array.remote_buffers[index])
-
-    np_arrays = device_mesh.get_remote_buffers(buf_refs, batching=True)
-
-    pt = 0
-    for array in distributed_arrays:
-        length = len(array.one_replica_buffer_indices)
-        array._fetched_np_buffers = np_arrays[pt:pt + length]
-        pt += length
+        if isinstance(array, ReplicatedDistributedArray):
+            array = array.replica
+        if array._npy_value is None:
+            arrays[id(array)] = array
+    arrays = list(arrays.values())
+
+    # Group all shard requests by (mesh, host)
+    requests = defaultdict(list)  # Dict[(mesh, host_id) -> [(array, index)]]
+    for array in arrays:
+        for i in array.one_replica_buffer_indices:
+            buf_ref = array.remote_buffers[i]
+            requests[(array.device_mesh, buf_ref.host_id)].append((array, i))
+
+    obj_refs = []
+    for (device_mesh, host_id), shards in requests.items():
+        obj_refs.append(device_mesh.workers[host_id].get_buffers_packed.remote(
+            [array.remote_buffers[i].uuid for array, i in shards]))
+
+    npy_values = {
+        id(array): np.empty(array.aval.shape, array.aval.dtype)
+        for array in arrays
+    }
+    for shards, (slab, specs) in zip(requests.values(), ray.get(obj_refs)):
+        for (array, i), spec in zip(shards, specs):
+            npy_values[id(array)][array.indices[i]] = _unpack_array(slab, spec)
+
+    for array in arrays:
+        array._npy_value = npy_values[id(array)]
 
 
 core.pytype_aval_mappings[DistributedArray] = attrgetter('aval')
@@ -1603,6 +1800,21 @@ class VirtualPhysicalMesh:
         """Return the number of hosts in the mesh."""
         return len(self.host_ids)
 
+    def get_signature(self) -> str:
+        """Return a signature string that contains the mesh shape and the GPU
+        model of each host, which ray detects as accelerator_type resources."""
+        gpu_names = []
+        for info in self.host_info:
+            names = sorted(
+                key[len("accelerator_type:"):]
+                for key in info.get("Resources", {})
+                if key.startswith("accelerator_type:"))
+            gpu_names.append("+".join(names) or "unknown")
+        ret = (f"{self.num_hosts},{self.num_devices_per_host},"
+               f"{','.join(gpu_names)}")
+        ret = ret.replace(" ", "-")
+        return ret
+
     def slice_1d(self, dim: int, indices: Sequence[int]):
         """
         Slice a mesh given the slicing config.
@@ -1991,6 +2203,100 @@ def get_global_virtual_physical_mesh():
     return global_virtual_physical_mesh
 
 
+def get_ts_compressor(name: Optional[str]):
+    """Get the zarr compressor spec of tensorstore."""
+    if name is None:
+        return None
+    if name == "gzip":
+        return {"id": "gzip"}
+    if name == "zstd":
+        return {"id": "zstd", "level": 3}
+    if name == "blosc":
+        return {"id": "blosc", "cname": "lz4", "clevel": 5, "shuffle": -1}
+    raise ValueError(f"Invalid compressor: {name}")
+
+
+def get_ts_chunk_shape(shard_shape: Sequence[int], itemsize: int,
+                       max_chunk_bytes: Optional[int]):
+    """Split the shard shape evenly until a chunk fits in max_chunk_bytes.
+
+    Because the chunk shape divides the shard shape, a chunk is never
+    written by two shards (possibly on different hosts).
+    """
+    chunk_shape = list(shard_shape)
+    if max_chunk_bytes is None or not chunk_shape:
+        return chunk_shape
+    while np.prod(chunk_shape) * itemsize > max_chunk_bytes:
+        dim = int(np.argmax(chunk_shape))
+        size = chunk_shape[dim]
+        if size <= 1:
+            break
+        factor = next(f for f in range(2, size + 1) if size % f == 0)
+        chunk_shape[dim] = size // factor
+    return chunk_shape
+
+
+def _get_save_infos_per_host(arrays: Sequence[DistributedArray],
+                             paths: Sequence[str]):
+    """Group the shards of one replica of all arrays by (mesh, host)."""
+    save_infos = defaultdict(list)  # Dict[(mesh, host_id) -> [save_info]]
+    for array, path in zip(arrays, paths):
+        uuids_per_host = defaultdict(list)
+        indices_per_host = defaultdict(list)
+        for i in array.one_replica_buffer_indices:
+            buf_ref = array.remote_buffers[i]
+            uuids_per_host[buf_ref.host_id].append(buf_ref.uuid)
+            indices_per_host[buf_ref.host_id].append(array.indices[i])
+        for host_id, uuids in uuids_per_host.items():
+            save_infos[(array.device_mesh, host_id)].append(
+                (path, uuids, indices_per_host[host_id], array.shape))
+    return save_infos
+
+
+def save_distributed_arrays(arrays: Sequence[DistributedArray],
+                            paths: Sequence[str],
+                            compressor: Optional[str] = "gzip",
+                            max_chunk_bytes: Optional[int] = None):
+    """Save one replica of multiple arrays with tensorstore.
+
+    The shards of all arrays are grouped by (mesh, host), so each host
+    writes all its shards concurrently in one remote call.
+
+    Returns:
+        A list of ray object refs to wait on.
+    """
+    obj_refs = []
+    for (device_mesh, host_id), infos in _get_save_infos_per_host(
+            arrays, paths).items():
+        obj_refs.append(device_mesh.workers[host_id].save_arrays_to_ts.remote(
+            infos, compressor, max_chunk_bytes))
+    return obj_refs
+
+
+def async_save_distributed_arrays(save_uuid: str,
+                                  arrays: Sequence[DistributedArray],
+                                  paths: Sequence[str],
+                                  compressor: Optional[str] = "gzip",
+                                  max_chunk_bytes: Optional[int] = None):
+    """Save one replica of multiple arrays in the background of workers.
+
+    Each worker copies its shards to host memory in order with other remote
+    calls, and writes them in a background thread.
+
+    Returns:
+        The workers that are saving the arrays. Query them with
+        `get_async_save_status.remote(save_uuid)`.
+    """
+    workers = []
+    for (device_mesh, host_id), infos in _get_save_infos_per_host(
+            arrays, paths).items():
+        worker = device_mesh.workers[host_id]
+        worker.async_save_arrays_to_ts.remote(save_uuid, infos, compressor,
+                                              max_chunk_bytes)
+        workers.append(worker)
+    return workers
+
+
 ########################################
 # Register ShardArg Handler
 ########################################
@@ -2009,6 +2315,56 @@ def _device_mesh_put(device_mesh, shards, num_batch, batch_dim):
     return buf_refs
 
 
+def _pack_arrays(arrays, alignment=64):
+    """Copy numpy arrays into one contiguous uint8 slab.
+
+    Returns the slab and the (offset, shape, dtype) of each array.
+    """
+    specs = []
+    offset = 0
+    for array in arrays:
+        specs.append((offset, array.shape, array.dtype))
+        offset += (array.nbytes + alignment - 1) // alignment * alignment
+    slab = np.empty(offset, dtype=np.uint8)
+    for array, (offset, shape, dtype) in zip(arrays, specs):
+        np.copyto(slab[offset:offset + array.nbytes].view(dtype).reshape(shape),
+                  array)
+    return slab, specs
+
+
+def _unpack_array(slab, spec):
+    """Return a zero-copy view of an array packed by _pack_arrays."""
+    offset, shape, dtype = spec
+    return np.frombuffer(slab,
+                         dtype=dtype,
+                         count=int(np.prod(shape)),
+                         offset=offset).reshape(shape)
+
+
+def _device_mesh_put_slab(device_mesh, array, indices, num_batch):
+    """Put the shards of an array on a mesh with one object per host.
+
+    The shards of each host are packed into a contiguous slab, which is put
+    into the ray object store once. Workers slice the slab without copying.
+    """
+    # pylint: disable=import-outside-toplevel
+    from alpa.mesh_executable import create_remote_buffer_refs
+    buf_refs, buf_uuids = create_remote_buffer_refs(device_mesh, num_batch)
+    device_ids = list(
+        chain(*[[x] * num_batch
+                for x in range(device_mesh.num_devices_per_host)]))
+    step = device_mesh.num_devices_per_host * num_batch
+    for host_id in range(device_mesh.num_hosts):
+        slab, shard_specs = _pack_arrays([
+            np.asarray(array[idx])
+            for idx in indices[host_id * step:(host_id + 1) * step]
+        ])
+        device_mesh.workers[host_id].put_buffers_from_slab.remote(
+            buf_uuids[host_id * step:(host_id + 1) * step], device_ids,
+            ray.put(slab), shard_specs)
+    return buf_refs
+
+
 def _device_mesh_put_dummy(array, device_mesh, indices, num_batch):
     # pylint: disable=import-outside-toplevel
     from alpa.mesh_executable import create_remote_buffer_refs
@@ -2034,6 +2390,8 @@ def _shard_abstract_array(array,
 def _shard_array(array, device_mesh, indices, num_batch=1, batch_dim=0):
     if global_config.use_dummy_value_for_benchmarking:
         return _device_mesh_put_dummy(array, device_mesh, indices, num_batch)
+    elif global_config.use_object_store_for_device_put:
+        return _device_mesh_put_slab(device_mesh, array, indices, num_batch)
     else:
         # Create shards according to indices for a numpy array
         if array.shape == ():
@@ -2067,6 +2425,25 @@ def _shard_distributed_array(array,
                                                   indices, num_batch, batch_dim)
 
 
+def _is_chunked_transfer(slice_shape, dtype, chunk_size):
+    """Whether a tile slice is sent in chunks of chunk_size bytes."""
+    return bool(chunk_size) and (np.prod(slice_shape, dtype=np.int64) *
+                                 np.dtype(dtype).itemsize > chunk_size)
+
+
+def _flat_start_and_n_elements(tensor_slice, tensor_shape):
+    """Return the flat start index and the number of elements of a
+    continuous subset of a row-major tensor."""
+    slice_shape = tuple(ind.stop - ind.start for ind in tensor_slice)
+    n_elements = int(np.prod(slice_shape, dtype=np.int64))
+    if slice_shape == tuple(tensor_shape):
+        return 0, n_elements
+    start = int(
+        np.ravel_multi_index(tuple(ind.start for ind in tensor_slice),
+                             tensor_shape))
+    return start, n_elements
+
+
 # in XLA pred(bool) and uint8 are different, but xla->dlpack->xla
 # turns a bool into uint8. This implementation is slow.
 def _uint8_to_bool(xla_buffer):
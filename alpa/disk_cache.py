@@ -0,0 +1,185 @@
+"""A size-bounded LRU cache of files in a directory.
+
+It is the common base of the persistent caches (e.g., ILP solutions,
+compilation results and resharding plans), which can be shared by
+concurrent processes through a directory.
+"""
+import logging
+import os
+import pickle
+import tempfile
+from typing import Any, Callable, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def write_file_atomic(path: str, write_func: Callable):
+    """Write a file via a temporary file and a rename, so that concurrent
+    readers never see a partially written file at `path`.
+
+    Args:
+      path: The path of the file.
+      write_func: A function that writes the contents to a binary file
+        object.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".",
+                                    suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fout:
+            write_func(fout)
+            fout.flush()
+            os.fsync(fout.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class DiskLRUCache:
+    """A LRU cache that stores each value as a ``<key><suffix>`` file.
+
+    The modification time of a file is refreshed on every hit and used as the
+    LRU order for eviction. Subclasses customize the file format by
+    overriding `suffix`, `load_value` and `dump_value`.
+
+    Args:
+      cache_dir: The directory to store the values. None disables the disk,
+        so that every `get` misses and `put` is a no-op.
+      max_size: The maximum total size of the files in bytes.
+      max_entries: The maximum number of files.
+    """
+
+    suffix = ".pkl"
+    # The exceptions that indicate a missing or corrupted file
+    load_errors = (OSError, EOFError, pickle.UnpicklingError, AttributeError,
+                   ImportError, KeyError, ValueError)
+
+    def __init__(self,
+                 cache_dir: Optional[str],
+                 max_size: Optional[int] = None,
+                 max_entries: Optional[int] = None):
+        self.cache_dir = os.path.expanduser(cache_dir) if cache_dir else None
+        self.max_size = max_size
+        self.max_entries = max_entries
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.num_hits = 0
+        self.num_misses = 0
+        self.num_evictions = 0
+
+    def load_value(self, fin) -> Any:
+        """Read a value from a binary file object."""
+        return pickle.load(fin)
+
+    def dump_value(self, value: Any, fout):
+        """Write a value to a binary file object."""
+        pickle.dump(value, fout)
+
+    def _get_path(self, key: str):
+        return os.path.join(self.cache_dir, key + self.suffix)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the stored value or None on a miss."""
+        if not self.cache_dir:
+            self.num_misses += 1
+            return None
+
+        path = self._get_path(key)
+        try:
+            with open(path, "rb") as fin:
+                ret = self.load_value(fin)
+            os.utime(path)
+        except self.load_errors:
+            self.num_misses += 1
+            return None
+
+        self.num_hits += 1
+        return ret
+
+    def touch(self, key: str):
+        """Mark a value as recently used."""
+        if not self.cache_dir:
+            return
+        try:
+            os.utime(self._get_path(key))
+        except OSError:
+            pass
+
+    def put(self, key: str, value: Any):
+        """Store a value and evict old values if the cache is full."""
+        if not self.cache_dir:
+            return
+        try:
+            write_file_atomic(self._get_path(key),
+                              lambda fout: self.dump_value(value, fout))
+        except (OSError, pickle.PicklingError):
+            logger.warning("Failed to write the %s to %s",
+                           type(self).__name__, self.cache_dir)
+            return
+
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used files until the limits are met."""
+        entries = []
+        total_size = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(self.suffix):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+            total_size += stat.st_size
+
+        entries.sort()
+        num_entries = len(entries)
+        for _, size, name in entries:
+            if ((self.max_size is None or total_size <= self.max_size) and
+                (self.max_entries is None or
+                 num_entries <= self.max_entries)):
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            total_size -= size
+            num_entries -= 1
+            self.num_evictions += 1
+
+    def clear(self):
+        """Remove all stored values."""
+        if not self.cache_dir:
+            return
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(self.suffix):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def stats(self) -> Sequence[int]:
+        """Return the (#hits, #misses, #evictions) counters."""
+        return self.num_hits, self.num_misses, self.num_evictions
+
+
+# Dict[cache class -> the global instance of the class]
+_global_caches = {}
+
+
+def get_global_cache(cache_cls: type, cache_dir: Optional[str], **limits):
+    """Get the global instance of a cache class.
+
+    The instance is recreated if the directory changes, and its limits
+    (e.g., max_size) are refreshed from the arguments, so that changes of
+    global_config take effect.
+    """
+    cache_dir = os.path.expanduser(cache_dir) if cache_dir else None
+    cache = _global_caches.get(cache_cls, None)
+    if cache is None or cache.cache_dir != cache_dir:
+        cache = cache_cls(cache_dir, **limits)
+        _global_caches[cache_cls] = cache
+    for name, value in limits.items():
+        setattr(cache, name, value)
+    return cache
@@ -0,0 +1,106 @@
+"""A persistent on-disk cache of the compilation results of parallelized
+functions.
+
+Compiling a parallelized function runs the auto-sharding ILP and, for
+pipeshard parallelism, the auto stage construction, which can take tens of
+minutes for large models. The results of these passes only depend on the
+traced jaxpr, the mesh and the parallel method options. This cache stores
+them so that other processes (e.g., after a restart) can rebuild the driver
+executable without solving them again. The XLA backend compilation on
+workers still runs on a hit.
+"""
+import hashlib
+import os
+from typing import Optional, Sequence
+
+import jax
+from jax._src.lib import xla_client as xc
+from jax.core import ClosedJaxpr
+
+from alpa.disk_cache import DiskLRUCache, get_global_cache
+from alpa.global_env import global_config
+from alpa.jaxpr_fingerprint import get_jaxpr_fingerprint
+
+EXECUTABLE_CACHE_VERSION = "v0.1"
+
+
+def compute_executable_key(closed_jaxpr: ClosedJaxpr, avals: Sequence,
+                           donated_invars: Sequence[bool], *options) -> str:
+    """Compute the key of the compilation results of a traced function.
+
+    The structural fingerprint of the jaxpr does not depend on the tracing
+    process. The constants are embedded into the compiled HLO, so their
+    values are part of the key. The options (e.g., the mesh shape and the
+    parallel method options) must have a deterministic repr.
+    """
+    h = hashlib.sha256()
+    for x in [
+            EXECUTABLE_CACHE_VERSION, jax.__version__, xc._version,  # pylint: disable=protected-access
+            global_config.build_random_seed,
+            get_jaxpr_fingerprint(closed_jaxpr, include_const_values=True),
+            [aval.str_short() for aval in avals],
+            tuple(donated_invars), *options
+    ]:
+        h.update(repr(x).encode())
+        h.update(b";")
+    return h.hexdigest()
+
+
+def get_profiling_result_key(prof_result) -> Optional[str]:
+    """Compute a key of the profiling result of a mesh, which changes the
+    auto-sharding result when it is used to choose the logical mesh."""
+    if prof_result is None:
+        return None
+    items = []
+    for name, value in sorted(vars(prof_result).items()):
+        if isinstance(value, dict):
+            value = sorted(value.items())
+        items.append((name, value))
+    return hashlib.sha256(repr(items).encode()).hexdigest()
+
+
+def extend_executable_key(key: str, *options) -> str:
+    """Add more options to a key computed by compute_executable_key, without
+    fingerprinting the jaxpr again."""
+    h = hashlib.sha256()
+    for x in [key, *options]:
+        h.update(repr(x).encode())
+        h.update(b";")
+    return h.hexdigest()
+
+
+def get_file_contents_key(*filenames) -> str:
+    """Compute a key of the contents of files. None and missing files are
+    hashed as None."""
+    h = hashlib.sha256()
+    for filename in filenames:
+        if filename is None or not os.path.isfile(filename):
+            h.update(b"None")
+        else:
+            with open(filename, "rb") as fin:
+                for block in iter(lambda: fin.read(1 << 20), b""):
+                    h.update(block)
+        h.update(b";")
+    return h.hexdigest()
+
+
+class ExecutableCache(DiskLRUCache):
+    """A size-bounded LRU cache of compilation results stored in a directory.
+
+    Each result is a dict of picklable artifacts (e.g., HLO protos, strategy
+    configs and stage construction results) stored as a ``<key>.pkl`` file.
+
+    Args:
+      cache_dir: The directory to store the results.
+      max_size: The maximum total size of the cache directory in bytes.
+    """
+
+
+def get_executable_cache() -> Optional[ExecutableCache]:
+    """Get the global executable cache. Return None if it is disabled."""
+    cache_dir = global_config.executable_cache_dir
+    if not cache_dir:
+        return None
+    return get_global_cache(ExecutableCache,
+                            cache_dir,
+                            max_size=global_config.executable_cache_size)
@@ -11,6 +11,10 @@ class GlobalConfig:
             os.environ.get("XLA_PYTHON_CLIENT_MEM_FRACTION", 0.9))
         self.xla_gpu_autotune_level = 4
         self.delete_remote_buffers_threshold = 200
+        # Whether to send the shards of a host array to each host as one
+        # contiguous slab in the ray object store, instead of pickling the
+        # shards in every put_buffers call.
+        self.use_object_store_for_device_put = True
         # use AWS EFA network interface
         self.use_aws_efa = os.environ.get("ALPA_USE_AWS_EFA", "").lower() in [
             "true", "1"
@@ -18,6 +22,15 @@ class GlobalConfig:
 
         ########## Options of shard_parallel ##########
         self.shard_parallel_sync_for_timer = False
+        # The directory of the on-disk cache of auto-sharding ILP solutions.
+        # Set it to None to disable the cache.
+        self.auto_sharding_solution_cache_dir = os.environ.get(
+            "ALPA_AUTO_SHARDING_SOLUTION_CACHE_DIR", None)
+        # The maximum total size of the ILP solution cache in bytes.
+        self.auto_sharding_solution_cache_size = 1 << 30
+        # Whether to warm-start the ILP solver from the solution of the
+        # most similar graph solved before.
+        self.auto_sharding_warm_start = True
 
         ########## Options of pipeline_parallel ##########
         self.profile_with_whole_ray_cluster = True
@@ -30,6 +43,10 @@ class GlobalConfig:
         self.pipeline_check_alive = True
         # Whether to sync before and after the executable for accurate internal timer
         self.pipeline_sync_for_timer = False
+        # The number of instruction records each worker keeps for the
+        # pipeline timeline trace (see PipeshardDriverExecutable.
+        # dump_pipeline_trace). 0 disables tracing.
+        self.pipeline_trace_buffer_size = 0
         # Whether to use distributed compilation in pipeline parallel for
         # each stage. Disabling it helps debug.
         self.pipeline_distributed_compile = True
@@ -40,12 +57,46 @@ class GlobalConfig:
         self.use_memzero_for_gradient_accumulation = False
         # Cross mesh resharding mode. Possible choices: {"send_recv", "broadcast"}
         self.resharding_mode = "send_recv"
+        # How to choose the sender replica of each cross mesh transfer.
+        # Possible choices: {"lpt", "greedy"}. "lpt" plans all transfers
+        # between a mesh pair together with a host-aware bandwidth model.
+        # "greedy" picks the least loaded sender one transfer at a time.
+        self.resharding_sender_assignment = "lpt"
+        # The bandwidth (bytes/s) used by the "lpt" sender assignment.
+        self.resharding_intra_host_bandwidth = 100e9
+        self.resharding_inter_host_bandwidth = 12.5e9
+        # Tile slices larger than this number of bytes are sent between meshes
+        # as back-to-back chunks of at most this size. None disables it.
+        self.resharding_chunk_size = None
+        # The maximum number of cached cross mesh resharding plans. The plans
+        # are shared by all executables. Set it to 0 to disable the cache.
+        self.resharding_plan_cache_size = 4096
+        # The directory to persist the resharding plans. None keeps them
+        # only in memory.
+        self.resharding_plan_cache_dir = os.environ.get(
+            "ALPA_RESHARDING_PLAN_CACHE_DIR", None)
+        # The per-device bytes available for activations used by the
+        # "1f1b_memory_budgeted" schedule. If None, it is estimated from the
+        # available memory of each mesh.
+        self.pipeline_activation_memory_budget = None
 
         ########## Options of XLA compilation ##########
         self.build_random_seed = 42
+        # The directory of the on-disk cache of the auto-sharding and stage
+        # construction results of parallelized functions, which is shared
+        # across processes. Set it to None to disable the cache.
+        self.executable_cache_dir = os.environ.get(
+            "ALPA_EXECUTABLE_CACHE_DIR", None)
+        # The maximum total size of the executable cache in bytes.
+        self.executable_cache_size = 4 << 30
         # Whether to use xla while instruction for preventing CSE in rematerialization
         self.remat_using_while = False
 
+        ########## Options of checkpointing ##########
+        # The maximal number of asynchronous checkpoints being written.
+        # Saving one more checkpoint waits for the oldest one.
+        self.async_checkpoint_max_inflight = 2
+
         ########## Options of benchmark ##########
         # If true, the system is allowed to use dummy values during
         # tensor creation and copy to reduce the initialization and copy time.
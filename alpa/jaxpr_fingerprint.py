@@ -0,0 +1,124 @@
+"""Structural fingerprints of jaxprs.
+
+A fingerprint identifies the computation of a jaxpr independent of the
+process that traced it. Variables are renamed by their order of appearance,
+equation parameters are normalized (e.g., sub-jaxprs are fingerprinted
+recursively and functions are identified by their qualified names instead of
+their addresses), and constants are hashed by their shapes and dtypes. So
+semantically identical code traced in different processes or from different
+source files gets the same fingerprint, while closures that capture
+constants of different shapes get different ones.
+"""
+from collections.abc import Mapping
+import enum
+import hashlib
+import re
+from typing import Union
+
+from jax import linear_util as lu
+from jax.core import ClosedJaxpr, DropVar, Jaxpr, Literal
+import numpy as np
+
+# The memory address in the repr of an object, e.g., "<function f at 0x7f..>"
+_address_pattern = re.compile(r" at 0x[0-9a-fA-F]+")
+
+
+def get_jaxpr_fingerprint(jaxpr: Union[Jaxpr, ClosedJaxpr],
+                          include_const_values: bool = False) -> str:
+    """Return the structural fingerprint of a jaxpr as a hex string.
+
+    Args:
+      jaxpr: The jaxpr or closed jaxpr.
+      include_const_values: Whether to hash the values of the constants of
+        closed jaxprs in addition to their shapes and dtypes. This is
+        required if the values are compiled into the computation.
+    """
+    return _JaxprFingerprinter(include_const_values).fingerprint(jaxpr)
+
+
+class _JaxprFingerprinter:
+    """Serialize jaxprs into a canonical string form and hash them."""
+
+    def __init__(self, include_const_values: bool):
+        self.include_const_values = include_const_values
+        # Dict[id(jaxpr) -> (jaxpr, fingerprint)] of fingerprinted
+        # sub-jaxprs. The jaxpr is kept alive so that its id is not reused.
+        self.sub_jaxpr_fingerprints = {}
+
+    def fingerprint(self, jaxpr: Union[Jaxpr, ClosedJaxpr]) -> str:
+        key = id(jaxpr)
+        if key in self.sub_jaxpr_fingerprints:
+            return self.sub_jaxpr_fingerprints[key][1]
+
+        if isinstance(jaxpr, ClosedJaxpr):
+            h = hashlib.sha256(self.fingerprint(jaxpr.jaxpr).encode())
+            for const in jaxpr.consts:
+                const = np.asarray(const)
+                h.update(f"const:{const.dtype.str}{const.shape};".encode())
+                if self.include_const_values:
+                    h.update(np.ascontiguousarray(const).tobytes())
+        else:
+            h = self._hash_jaxpr(jaxpr)
+        ret = h.hexdigest()
+        self.sub_jaxpr_fingerprints[key] = (jaxpr, ret)
+        return ret
+
+    def _hash_jaxpr(self, jaxpr: Jaxpr):
+        var_ids = {}
+
+        def define(var):
+            if isinstance(var, DropVar):
+                return "_"
+            var_ids[var] = len(var_ids)
+            return f"{var_ids[var]}:{var.aval.str_short()}"
+
+        def use(atom):
+            if isinstance(atom, Literal):
+                return f"{atom.val!r}:{atom.aval.str_short()}"
+            return str(var_ids[atom])
+
+        h = hashlib.sha256()
+        h.update(("constvars:" + ",".join(map(define, jaxpr.constvars)) +
+                  ";invars:" + ",".join(map(define, jaxpr.invars)) +
+                  ";").encode())
+        for eqn in jaxpr.eqns:
+            params = ",".join(
+                f"{k}={self._normalize_param(v)}"
+                for k, v in sorted(eqn.params.items()))
+            # Define outvars after the invars are used, since a variable
+            # can not be used by the equation defining it
+            invars = ",".join(map(use, eqn.invars))
+            outvars = ",".join(map(define, eqn.outvars))
+            h.update(f"{eqn.primitive.name}[{params}]({invars})->"
+                     f"({outvars});".encode())
+        h.update(("outvars:" + ",".join(map(use, jaxpr.outvars))).encode())
+        return h
+
+    def _normalize_param(self, value) -> str:
+        # pylint: disable=too-many-return-statements
+        if isinstance(value, (Jaxpr, ClosedJaxpr)):
+            return "{" + self.fingerprint(value) + "}"
+        if isinstance(value, (str, int, float, bool, type(None), enum.Enum,
+                              np.dtype)):
+            return repr(value)
+        if isinstance(value, tuple):
+            # Include the type name of named tuples such as
+            # ConvDimensionNumbers
+            return (type(value).__name__ + "(" +
+                    ",".join(map(self._normalize_param, value)) + ")")
+        if isinstance(value, list):
+            return "[" + ",".join(map(self._normalize_param, value)) + "]"
+        if isinstance(value, Mapping):
+            return "{" + ",".join(
+                f"{self._normalize_param(k)}:{self._normalize_param(v)}"
+                for k, v in sorted(value.items(), key=lambda x: repr(x[0]))
+            ) + "}"
+        if isinstance(value, np.ndarray):
+            return (f"array({value.dtype.str},{value.shape},"
+                    f"{hashlib.sha256(value.tobytes()).hexdigest()})")
+        if isinstance(value, lu.WrappedFun):
+            return "fun:" + self._normalize_param(value.f)
+        if callable(value):
+            return "fun:" + getattr(value, "__qualname__",
+                                    type(value).__qualname__)
+        return _address_pattern.sub("", repr(value))
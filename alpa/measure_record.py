@@ -133,10 +133,10 @@ def load_from_file(filename, protocol="json"):
             (task_jsonable, config_jsonable, time_costs, estimated_cost, error_no,
              timestamp, _) = obj
 
-        inp = MeasureInput(SearchTask.from_jsonable(task_jsonable),
-                           StrategyConfig.from_jsonable(config_jsonable))
-        res = MeasureResult(time_costs, estimated_cost, error_no, timestamp)
-        yield inp, res
+            inp = MeasureInput(SearchTask.from_jsonable(task_jsonable),
+                               StrategyConfig.from_jsonable(config_jsonable))
+            res = MeasureResult(time_costs, estimated_cost, error_no, timestamp)
+            yield inp, res
 
 
 def load_best_record(search_task, filename):
@@ -143,6 +143,63 @@ class RemoteBufferRef:
             self.device_mesh.delete_remote_buffers((self,))
 
 
+class RemoteArrayRef:
+    """
+    References to all remote device buffers of a distributed array.
+
+    It replaces a list of RemoteBufferRef on the hot path of executables.
+    The uuids, host ids and device ids of the buffers are stored in numpy
+    arrays, and all buffers are deleted with one batched request when the
+    reference is garbage collected. Indexing or iterating it gives a
+    RemoteBufferRef-like view of each buffer.
+    """
+
+    def __init__(self, device_mesh, uuids: np.ndarray, host_ids: np.ndarray,
+                 device_ids: np.ndarray):
+        self.device_mesh = device_mesh
+        self.uuids = uuids
+        self.host_ids = host_ids
+        self.device_ids = device_ids
+        self.is_deleted_on_workers = False
+
+    def set_deleted_on_workers(self):
+        """Set all buffers as deleted on workers."""
+        self.is_deleted_on_workers = True
+
+    def __len__(self):
+        return len(self.uuids)
+
+    def __getitem__(self, index: int):
+        return RemoteArrayBufferView(self, index)
+
+    def __iter__(self):
+        for i in range(len(self.uuids)):
+            yield RemoteArrayBufferView(self, i)
+
+    def __repr__(self):
+        return f"RemoteArrayRef(uuids = {self.uuids})"
+
+    def __del__(self):
+        if not self.is_deleted_on_workers:
+            self.device_mesh.delete_remote_buffer_uuids(
+                self.host_ids, self.uuids)
+
+
+class RemoteArrayBufferView:
+    """A view of one buffer of a RemoteArrayRef, which keeps it alive."""
+
+    def __init__(self, array_ref: RemoteArrayRef, index: int):
+        self.array_ref = array_ref
+        self.device_mesh = array_ref.device_mesh
+        self.host_id = int(array_ref.host_ids[index])
+        self.device_id = int(array_ref.device_ids[index])
+        self.uuid = int(array_ref.uuids[index])
+
+    def __repr__(self):
+        return (f"RemoteArrayBufferView(uuid = {self.uuid}, "
+                f"loc = ({self.host_id}, {self.device_id}))")
+
+
 def next_mesh_executable_uuid():
     """Return the next uuid of a mesh executable."""
     global mesh_executable_counter
@@ -185,6 +242,37 @@ def create_remote_buffer_refs(device_mesh,
     return refs, uuids
 
 
+def create_remote_array_refs(device_mesh, uuids: np.ndarray):
+    """
+    Create a RemoteArrayRef for each array on a device mesh.
+
+    Args:
+        device_mesh: The device mesh.
+        uuids: The buffer uuids with shape
+            (num_arrays, num_hosts, num_devices_per_host).
+    """
+    num_hosts = device_mesh.num_hosts
+    num_devices_per_host = device_mesh.num_devices_per_host
+    # All arrays share the same host and device ids
+    host_ids = np.repeat(np.arange(num_hosts), num_devices_per_host)
+    device_ids = np.tile(np.arange(num_devices_per_host), num_hosts)
+    uuids = uuids.reshape(len(uuids), num_hosts * num_devices_per_host)
+    return [
+        RemoteArrayRef(device_mesh, array_uuids, host_ids, device_ids)
+        for array_uuids in uuids
+    ]
+
+
+def set_buffers_deleted_on_workers(bufs):
+    """Set a RemoteArrayRef or a list of RemoteBufferRef as deleted on
+    workers."""
+    if isinstance(bufs, RemoteArrayRef):
+        bufs.set_deleted_on_workers()
+    else:
+        for buf in bufs:
+            buf.set_deleted_on_workers()
+
+
 def get_execution_timer_name(exec_uuid: int):
     """Return the name of the timer used for recording pure execution time."""
     return f"{exec_uuid}-execution"
@@ -210,10 +298,16 @@ def get_sync_func_worker(worker):
 
 
 def get_uuid_np_array(array: Sequence[Sequence[int]]):
-    """Convert a 2d array of RemoteBufferRef to a np array of UUID (int64)."""
+    """Convert a 2d array of RemoteBufferRef to a np array of UUID (int64).
+
+    A row can also be a RemoteArrayRef.
+    """
     shape = (len(array), len(array[0]))
     ret = np.empty(shape, dtype=np.int64)
     for i in range(shape[0]):
+        if isinstance(array[i], RemoteArrayRef):
+            ret[i] = array[i].uuids
+            continue
         for j in range(shape[1]):
             ret[i, j] = array[i][j].uuid
     return ret
@@ -326,22 +420,13 @@ class NormalMeshDriverExecutable(MeshDriverExecutable):
             output_uuids = output_uuids.transpose([1, 0, 2])
 
             # Gather output buffers
-            # Shape: (num_outs, num_devices)
-            output_bufs = np.empty((num_outs, physical_mesh.num_devices),
-                                   dtype=object)
-            for i in range(len(output_bufs)):
-                for j in range(len(output_bufs[i])):
-                    host_id = j // num_devices_per_host
-                    device_id = j % num_devices_per_host
-                    output_bufs[i][j] = RemoteBufferRef(
-                        physical_mesh, host_id, device_id,
-                        output_uuids[i][host_id][device_id])
+            output_bufs = create_remote_array_refs(physical_mesh,
+                                                   output_uuids)
 
             # Mark donated input buffers as already deleted on workers.
             for bufs, is_donated in zip(input_bufs, self.donated_invars):
                 if is_donated:
-                    for buf in bufs:
-                        buf.set_deleted_on_workers()
+                    set_buffers_deleted_on_workers(bufs)
         else:
             assert isinstance(physical_mesh, LocalPhysicalDeviceMesh)
             sync_func = (self.sync_func
@@ -712,27 +797,17 @@ class GradAccMeshDriverExecutable(MeshDriverExecutable):
             output_uuids = output_uuids.transpose([1, 0, 2])
 
             # Gather output buffers
-            # Shape: (num_outs, num_devices)
-            output_bufs = np.empty((num_outs, physical_mesh.num_devices),
-                                   dtype=object)
-            for i in range(len(output_bufs)):
-                for j in range(len(output_bufs[i])):
-                    host_id = j // num_devices_per_host
-                    device_id = j % num_devices_per_host
-                    output_bufs[i][j] = RemoteBufferRef(
-                        physical_mesh, host_id, device_id,
-                        output_uuids[i][host_id][device_id])
+            output_bufs = create_remote_array_refs(physical_mesh,
+                                                   output_uuids)
 
             # Mark donated input buffers as already deleted on workers.
             for bufs, is_donated in zip(first_batch_bufs, self.donated_invars):
                 if is_donated:
-                    for buf in bufs:
-                        buf.set_deleted_on_workers()
+                    set_buffers_deleted_on_workers(bufs)
 
             # Mark micro batch buffers as already deleted on workers.
             for bufs in next_batches_bufs:
-                for buf in bufs:
-                    buf.set_deleted_on_workers()
+                set_buffers_deleted_on_workers(bufs)
         else:
             assert isinstance(physical_mesh, LocalPhysicalDeviceMesh)
             sync_func = (self.sync_func
@@ -1065,15 +1140,8 @@ class AllocZeroBufferDriverExecutable(MeshDriverExecutable):
             output_uuids = output_uuids.transpose([1, 0, 2])
 
             # Gather outputs
-            output_bufs = np.empty((num_outs, physical_mesh.num_devices),
-                                   dtype=object)
-            for i in range(len(output_bufs)):
-                for j in range(len(output_bufs[i])):
-                    host_id = j // num_devices_per_host
-                    device_id = j % num_devices_per_host
-                    output_bufs[i][j] = RemoteBufferRef(
-                        physical_mesh, host_id, device_id,
-                        output_uuids[i][host_id][device_id])
+            output_bufs = create_remote_array_refs(physical_mesh,
+                                                   output_uuids)
         else:
             assert isinstance(physical_mesh, LocalPhysicalDeviceMesh)
             timers(self.timer_name).start(self.sync_func)
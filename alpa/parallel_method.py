@@ -57,15 +57,28 @@ class ShardParallel(ParallelMethod):
           in the cluster.
         num_micro_batches: The number of micro batches for gradient accumulation.
         auto_sharding_option: The options of the auto-sharding solver.
+        logical_mesh_search_space: The search space of the logical mesh shapes.
+          Possible choices: {"single", "all"}.
+        profiling_database_filename: The filename of profiling result database.
+          If it is set, the logical mesh candidates are ranked by the HLO cost
+          model instead of the ILP objective.
+        measure_record_filename: The filename of the measurement records.
+          The chosen strategy is saved to and reused from this file.
     """
 
     def __init__(self,
                  devices: Optional[Union[LogicalDeviceMesh, PhysicalDeviceMesh]] = None,
                  num_micro_batches: Optional[int] = None,
-                 auto_sharding_option: Optional[AutoShardingOption] = None):
+                 auto_sharding_option: Optional[AutoShardingOption] = None,
+                 logical_mesh_search_space: str = "single",
+                 profiling_database_filename: Optional[str] = None,
+                 measure_record_filename: Optional[str] = None):
         self.devices = devices
         self.num_micro_batches = num_micro_batches
         self.as_option = auto_sharding_option or AutoShardingOption()
+        self.logical_mesh_search_space = logical_mesh_search_space
+        self.profiling_database_filename = profiling_database_filename
+        self.measure_record_filename = measure_record_filename
 
     def compile_executable(
         self,
@@ -87,10 +100,12 @@ class ShardParallel(ParallelMethod):
 
         assert isinstance(mesh, (PhysicalDeviceMesh, LogicalDeviceMesh))
 
-        return compile_shard_executable(fun, in_tree, out_tree_thunk,
-                                        static_argnums, donated_invars, batch_invars,
-                                        mesh, self.num_micro_batches,
-                                        self.as_option, *avals)
+        return compile_shard_executable(
+            fun, in_tree, out_tree_thunk, static_argnums, donated_invars,
+            batch_invars, mesh, self.num_micro_batches, self.as_option, *avals,
+            logical_mesh_search_space=self.logical_mesh_search_space,
+            profiling_database_filename=self.profiling_database_filename,
+            measure_record_filename=self.measure_record_filename)
 
 
 class PipeshardParallel(ParallelMethod):
@@ -102,7 +117,8 @@ class PipeshardParallel(ParallelMethod):
         num_micro_batches: The number of micro batches for gradient accumulation.
         default_auto_sharding_option: The default options of the auto-sharding solver.
         pipeline_schedule: The pipieline schedules.
-          Possible choices: {"1f1b", "gpipe", "inference"}
+          Possible choices: {"1f1b", "gpipe", "inference", "1f1b_interleaved",
+          "1f1b_memory_budgeted"}
         stage_mode: How to construct stages.
           Possible choices: {"uniform", "auto"}
         submesh_physical_shape_space: The search space of the physical submesh shapes. 
@@ -115,6 +131,16 @@ class PipeshardParallel(ParallelMethod):
           pipeline profiling.
         profiling_database_filename: The filename of profiling result database.
         cache_compute_cost: The file name of the cached compute cost.
+        compute_cost_database_filename: The file name of the persistent
+          database of profiled stage compute costs. Profiled costs are
+          appended to it and reused by later runs.
+        device_spec_filename: The json file of a device spec. If set, the
+          stage compute costs are estimated by the analytic cost model instead
+          of profiling. See `alpa.pipeline_parallel.analytic_cost_model`.
+        num_virtual_stages_per_mesh: The number of non-contiguous forward
+          stages hosted by each mesh in the "1f1b_interleaved" schedule.
+          The uniform stage mode then creates
+          num_layers / num_virtual_stages_per_mesh meshes.
     """
 
     def __init__(self,
@@ -128,11 +154,15 @@ class PipeshardParallel(ParallelMethod):
                  auto_stage_imbalance_tolerance: float = np.inf,
                  use_hlo_cost_model: bool = False,
                  profiling_database_filename: Optional[str] = None,
-                 cached_compute_cost: Optional[str] = None):
+                 cached_compute_cost: Optional[str] = None,
+                 compute_cost_database_filename: Optional[str] = None,
+                 device_spec_filename: Optional[str] = None,
+                 num_virtual_stages_per_mesh: int = 1):
         self.devices = devices
         self.num_micro_batches = num_micro_batches
         self.as_option = default_auto_sharding_option or AutoShardingOption()
         self.pipeline_schedule = pipeline_schedule
+        self.num_virtual_stages_per_mesh = num_virtual_stages_per_mesh
         if stage_mode == "auto":
             self.stage_option = AutoStageOption(
                 submesh_physical_shape_space,
@@ -140,7 +170,9 @@ class PipeshardParallel(ParallelMethod):
                 auto_stage_imbalance_tolerance,
                 use_hlo_cost_model,
                 profiling_database_filename,
-                cached_compute_cost)
+                cached_compute_cost,
+                compute_cost_database_filename,
+                device_spec_filename)
         elif stage_mode == "uniform":
             self.stage_option = UniformStageOption()
         else:
@@ -168,7 +200,8 @@ class PipeshardParallel(ParallelMethod):
         return compile_pipeshard_executable(
             fun, in_tree, out_tree_thunk, donated_invars, batch_invars,
             mesh, self.num_micro_batches, self.pipeline_schedule,
-            self.as_option, self.stage_option, *avals)
+            self.as_option, self.stage_option, *avals,
+            num_virtual_stages_per_mesh=self.num_virtual_stages_per_mesh)
 
 
 class ManualPipeshardParallel(PipeshardParallel):
@@ -179,6 +212,7 @@ class ManualPipeshardParallel(PipeshardParallel):
     Args:
         forward_stage_layer_ids: Layer IDs of each forward stage.
         submesh_physical_shapes: The physical shapes of submeshes of each stage.
+          With virtual stages, this is the shape of each mesh.
         submesh_logical_shapes: The logical shapes of submeshes of each stage.
         submesh_autosharding_option_dicts: The auto-sharding options of each stage.
         devices: Specify the devices to use. If it is None, use all the devices
@@ -186,7 +220,10 @@ class ManualPipeshardParallel(PipeshardParallel):
         num_micro_batches: The number of micro batches for gradient accumulation.
         default_auto_sharding_option: The default options of the auto-sharding solver.
         pipeline_schedule: The pipieline schedules.
-          Possible choices: {"1f1b", "gpipe", "inference"}
+          Possible choices: {"1f1b", "gpipe", "inference", "1f1b_interleaved",
+          "1f1b_memory_budgeted"}
+        num_virtual_stages_per_mesh: The number of forward stages hosted by
+          each mesh in the "1f1b_interleaved" schedule.
     """
 
     def __init__(self,
@@ -197,12 +234,14 @@ class ManualPipeshardParallel(PipeshardParallel):
                  devices: Optional[VirtualPhysicalMesh] = None,
                  num_micro_batches: int = 1,
                  default_auto_sharding_option: Optional[AutoShardingOption] = None,
-                 pipeline_schedule: str = "1f1b"):
+                 pipeline_schedule: str = "1f1b",
+                 num_virtual_stages_per_mesh: int = 1):
         # pylint: disable=super-init-not-called
         self.devices = devices
         self.num_micro_batches = num_micro_batches
         self.as_option = default_auto_sharding_option or AutoShardingOption()
         self.pipeline_schedule = pipeline_schedule
+        self.num_virtual_stages_per_mesh = num_virtual_stages_per_mesh
         self.stage_option = ManualStageOption(
             forward_stage_layer_ids,
             submesh_physical_shapes,
@@ -0,0 +1,312 @@
+"""An analytic roofline cost model of pipeline stages.
+
+Auto stage construction needs the compute cost of every (stage, submesh,
+auto-sharding config) cell. Profiling these cells requires the GPUs of the
+cluster. This cost model instead estimates them from the jaxprs of the layers
+and a declarative spec of the devices, so it runs on a CPU-only machine in
+seconds and can plan clusters that are not available yet.
+
+The estimates follow the units of the profiled costs: the time of one
+micro batch of a stage in seconds and the maximal number of succeeding
+stages allowed by the device memory.
+"""
+import dataclasses
+import json
+from typing import Dict, Sequence, Tuple
+
+from jax import lax
+from jax.core import ClosedJaxpr, Jaxpr, JaxprEqn, Literal, Var
+import numpy as np
+
+from alpa.pipeline_parallel.computation import JaxPipelineComputation
+from alpa.pipeline_parallel.stage_profiling import INFINITY_N_STAGES
+from alpa.util import OrderedSet
+
+
+@dataclasses.dataclass
+class DeviceSpec:
+    """A declarative spec of the devices in a cluster.
+
+    All bandwidths are in bytes per second per device. A spec can be loaded
+    from a json file such as::
+
+        {"peak_flops": 1.25e14, "hbm_bandwidth": 9.0e11,
+         "memory_per_device": 1.6e10, "intra_host_bandwidth": 1.5e11,
+         "inter_host_bandwidth": 3.0e9}
+    """
+    # The peak FLOP/s of a device
+    peak_flops: float
+    # The bandwidth of the device memory
+    hbm_bandwidth: float
+    # The memory of a device in bytes
+    memory_per_device: float
+    # The bandwidth of the links between devices in a host (e.g., NVLink)
+    intra_host_bandwidth: float
+    # The bandwidth of the links between hosts (e.g., the network)
+    inter_host_bandwidth: float
+
+    @classmethod
+    def load(cls, filename: str):
+        with open(filename, "r", encoding="utf-8") as fin:
+            return cls(**json.load(fin))
+
+
+def _get_bytes(atom) -> int:
+    if isinstance(atom, Literal):
+        return 0
+    return int(np.prod(atom.aval.shape)) * atom.aval.dtype.itemsize
+
+
+def _iter_sub_jaxprs(params: Dict):
+    for value in params.values():
+        values = value if isinstance(value, (tuple, list)) else (value,)
+        for x in values:
+            if isinstance(x, ClosedJaxpr):
+                yield x.jaxpr
+            elif isinstance(x, Jaxpr):
+                yield x
+
+
+def _dot_conv_flops(eqn: JaxprEqn) -> float:
+    """Count the FLOPs of a dot or convolution from the shapes.
+
+    This is the jaxpr counterpart of hlo_module_count_flop_dot_conv_only,
+    which does not require lowering the jaxpr with a GPU backend.
+    """
+    out_size = np.prod(eqn.outvars[0].aval.shape)
+    if eqn.primitive is lax.dot_general_p:
+        (lhs_contract, _), _ = eqn.params["dimension_numbers"]
+        lhs_shape = eqn.invars[0].aval.shape
+        return 2.0 * out_size * np.prod([lhs_shape[d] for d in lhs_contract])
+    if eqn.primitive is lax.conv_general_dilated_p:
+        rhs_spec = eqn.params["dimension_numbers"].rhs_spec
+        rhs_shape = eqn.invars[1].aval.shape
+        # rhs_spec[1] is the input feature dimension and rhs_spec[2:] are the
+        # spatial dimensions of the kernel
+        return 2.0 * out_size * np.prod([rhs_shape[d] for d in rhs_spec[1:]])
+    return 0.0
+
+
+@dataclasses.dataclass
+class LayerStats:
+    """The statistics of a layer used by the cost model."""
+    # The FLOPs of dots and convolutions
+    flops: float
+    # The bytes read and written by all equations, assuming no fusion
+    bytes_accessed: float
+    # The (output bytes, smaller operand bytes) of dots and convolutions.
+    # Shape: (#dots, 2)
+    dot_bytes: np.ndarray
+
+
+def get_layer_stats(eqns: Sequence[JaxprEqn]) -> LayerStats:
+    """Collect the statistics of equations, including the ones in sub-jaxprs
+    (e.g., remat and named calls). Loop bodies are counted once."""
+    flops = 0.0
+    bytes_accessed = 0.0
+    dot_bytes = []
+    stack = [eqns]
+    while stack:
+        for eqn in stack.pop():
+            sub_jaxprs = list(_iter_sub_jaxprs(eqn.params))
+            if sub_jaxprs:
+                stack.extend(jaxpr.eqns for jaxpr in sub_jaxprs)
+                continue
+            bytes_accessed += (sum(map(_get_bytes, eqn.invars)) +
+                               sum(map(_get_bytes, eqn.outvars)))
+            eqn_flops = _dot_conv_flops(eqn)
+            if eqn_flops:
+                flops += eqn_flops
+                dot_bytes.append(
+                    (_get_bytes(eqn.outvars[0]),
+                     min(_get_bytes(eqn.invars[0]),
+                         _get_bytes(eqn.invars[1]))))
+    return LayerStats(flops, bytes_accessed,
+                      np.array(dot_bytes, dtype=np.float64).reshape(-1, 2))
+
+
+def _vars_bytes(variables) -> float:
+    return float(sum(map(_get_bytes, variables)))
+
+
+class AnalyticStageCostModel:
+    """Estimate the costs of stages with a roofline model.
+
+    A stage with forward layers [start, end] and the corresponding backward
+    layers runs on a logical mesh of shape (dp, mp), where the batch is split
+    along the first dimension:
+
+    - Computation: each layer takes max(FLOPs / peak FLOP/s, bytes / HBM
+      bandwidth), divided evenly among the devices.
+    - Model parallel communication: each dot either all-reduces its output
+      or all-gathers its smaller operand (the weight) along the second mesh
+      dimension, whichever moves fewer bytes.
+    - Gradient synchronization: an all-reduce of the accumulated gradients
+      along the first mesh dimension, amortized over the micro batches.
+    - Memory: parameters and gradients are sharded along the second mesh
+      dimension. The intermediate variables kept for the backward pass are
+      sharded along both.
+
+    A collective along a mesh dimension uses the inter-host bandwidth if its
+    device groups span multiple hosts and the intra-host bandwidth
+    otherwise.
+
+    Args:
+        device_spec: The spec of the devices.
+        layers: The forward and backward layers.
+        apply_grad_layers: The apply gradient layers corresponding to each
+            forward layer. Can contain None.
+        global_outvars: The global output variables of all layers, which
+            include the accumulated gradients.
+        num_micro_batches: The number of micro batches.
+    """
+
+    def __init__(self, device_spec: DeviceSpec,
+                 layers: Sequence[JaxPipelineComputation],
+                 apply_grad_layers: Sequence[JaxPipelineComputation],
+                 global_outvars: Sequence[Var], num_micro_batches: int):
+        assert len(layers) % 2 == 0
+        self.device_spec = device_spec
+        self.layers = layers
+        self.apply_grad_layers = apply_grad_layers
+        self.global_outvars = OrderedSet(global_outvars)
+        self.num_micro_batches = num_micro_batches
+        self.num_layers = len(layers) // 2
+
+        self.layer_stats = [get_layer_stats(layer.eqns) for layer in layers]
+        self.layer_times = np.array([
+            max(x.flops / device_spec.peak_flops,
+                x.bytes_accessed / device_spec.hbm_bandwidth)
+            for x in self.layer_stats
+        ])
+
+        # Parameters are the global inputs that are updated by apply gradient
+        defined_vars = OrderedSet()
+        for layer in layers:
+            defined_vars.update(layer.outvars)
+        apply_grad_invars = OrderedSet()
+        for layer in apply_grad_layers:
+            if layer is not None:
+                apply_grad_invars.update(layer.invars)
+        self.param_vars = OrderedSet()
+        for layer in layers:
+            for var in layer.invars:
+                if (isinstance(var, Var) and var not in defined_vars and
+                        (not apply_grad_invars or var in apply_grad_invars)):
+                    self.param_vars.add(var)
+
+        self._stage_stats = {}
+
+    def get_layer_cost_prefix_sum(self) -> Sequence[float]:
+        """Return the prefix sum of the single device times of the layers.
+
+        It replaces the prefix sum of layer FLOPs to balance stages and
+        submeshes, because counting the FLOPs of all equations requires a
+        GPU backend.
+        """
+        return [0.0] + np.cumsum(self.layer_times).tolist()
+
+    def _get_stage_stats(self, start: int, end: int):
+        """Return the configuration independent statistics of a stage."""
+        key = (start, end)
+        if key in self._stage_stats:
+            return self._stage_stats[key]
+
+        num_layers = self.num_layers
+        forward_indices = list(range(start, end + 1))
+        backward_indices = list(
+            range(2 * num_layers - end - 1, 2 * num_layers - start))
+        indices = forward_indices + backward_indices
+
+        layer_time = self.layer_times[indices].sum()
+        dot_bytes = np.concatenate(
+            [self.layer_stats[i].dot_bytes for i in indices])
+
+        used_vars = OrderedSet()
+        defined_vars = OrderedSet()
+        for i in indices:
+            used_vars.update(self.layers[i].invars)
+            defined_vars.update(self.layers[i].outvars)
+        params = [var for var in used_vars if var in self.param_vars]
+        grads = [
+            var for i in backward_indices for var in self.layers[i].outvars
+            if var in self.global_outvars
+        ]
+        forward_outvars = OrderedSet()
+        for i in forward_indices:
+            forward_outvars.update(self.layers[i].outvars)
+        backward_invars = OrderedSet()
+        for i in backward_indices:
+            backward_invars.update(self.layers[i].invars)
+        intermediates = forward_outvars.intersection(backward_invars)
+        apply_only_vars = OrderedSet()
+        for i in forward_indices:
+            if self.apply_grad_layers[i] is None:
+                continue
+            for var in self.apply_grad_layers[i].invars:
+                if (isinstance(var, Var) and var not in used_vars and
+                        var not in defined_vars):
+                    apply_only_vars.add(var)
+
+        ret = (layer_time, dot_bytes, _vars_bytes(params), _vars_bytes(grads),
+               _vars_bytes(intermediates), _vars_bytes(apply_only_vars))
+        self._stage_stats[key] = ret
+        return ret
+
+    def _get_bandwidths(self, id_mesh: np.ndarray,
+                        num_devices_per_host: int) -> Tuple[float, float]:
+        host_ids = id_mesh // num_devices_per_host
+        ret = []
+        for axis in range(2):
+            span_hosts = (host_ids.max(axis=axis) !=
+                          host_ids.min(axis=axis)).any()
+            ret.append(self.device_spec.inter_host_bandwidth if span_hosts
+                       else self.device_spec.intra_host_bandwidth)
+        return tuple(ret)
+
+    def estimate(self, start: int, end: int, num_devices_per_host: int,
+                 logical_mesh_id: np.ndarray,
+                 is_full_mesh: bool) -> Tuple[float, int]:
+        """Estimate the cost of a stage.
+
+        Args:
+            start: The first forward layer of the stage.
+            end: The last forward layer of the stage.
+            num_devices_per_host: The number of devices per host of the
+                submesh.
+            logical_mesh_id: The device ids of the logical mesh.
+            is_full_mesh: Whether the stage runs on the whole cluster. Such a
+                stage does not keep intermediate variables for other stages.
+
+        Returns:
+            cost: The time of one micro batch in seconds.
+            max_n_succ_stages: The maximal number of succeeding stages.
+        """
+        (layer_time, dot_bytes, param_bytes, grad_bytes, intermediate_bytes,
+         apply_only_bytes) = self._get_stage_stats(start, end)
+        logical_mesh_id = np.asarray(logical_mesh_id)
+        logical_mesh_id = logical_mesh_id.reshape(logical_mesh_id.shape[0],
+                                                  -1)
+        dp, mp = logical_mesh_id.shape
+        num_devices = dp * mp
+        dp_bandwidth, mp_bandwidth = self._get_bandwidths(
+            logical_mesh_id, num_devices_per_host)
+
+        cost = layer_time / num_devices
+        if mp > 1 and len(dot_bytes):
+            comm_bytes = np.minimum(2 * dot_bytes[:, 0] / dp,
+                                    dot_bytes[:, 1]).sum()
+            cost += comm_bytes * (mp - 1) / mp / mp_bandwidth
+        if dp > 1:
+            cost += (2 * grad_bytes / mp * (dp - 1) / dp / dp_bandwidth /
+                     self.num_micro_batches)
+
+        intermediate_size = intermediate_bytes / num_devices
+        peak_memory = (param_bytes + grad_bytes) / mp + intermediate_size
+        initial_size = apply_only_bytes / mp
+        if is_full_mesh:
+            intermediate_size = 0
+        max_stage = int((self.device_spec.memory_per_device - peak_memory -
+                         initial_size) // max(intermediate_size, 1e-8) - 1)
+        max_stage = min(max(-1, max_stage), INFINITY_N_STAGES)
+        return cost, max_stage
@@ -5,17 +5,23 @@ import time
 from typing import Callable, Sequence
 
 from jax import linear_util as lu
+from jax._src.lib import xla_client as xc
 from jax.core import gensym, AbstractValue
 from jax.tree_util import PyTreeDef
 
 from alpa.device_mesh import VirtualPhysicalMesh
+from alpa.executable_cache import (compute_executable_key,
+                                   extend_executable_key,
+                                   get_executable_cache,
+                                   get_file_contents_key)
 from alpa.global_env import global_config
 from alpa.pipeline_parallel.pipeshard_executable import PipeshardDriverExecutable
 from alpa.pipeline_parallel.schedules import (GpipeSchedule, PipeDreamFlush,
+                                              InterleavedPipeDreamFlush,
+                                              MemoryBudgetedPipeDreamFlush,
                                               InferenceSchedule)
 from alpa.pipeline_parallel.computation import (
     create_donation_mapping, generate_computations_from_protos,
-    generate_sharded_xla_computations,
     generate_sharded_xla_computations_arguments, get_donatable_intermediate,
     mark_missing_vars_in_backward_computation_pipeline_marks, offload_remat,
     pipeline_dce, slice_closed_jaxpr_by_full_pipeline_marks,
@@ -25,9 +31,12 @@ from alpa.pipeline_parallel.apply_grad import (
     process_apply_gradient,
     split_compute_grad_and_apply_grad)
 from alpa.pipeline_parallel.stage_construction import (
-    cluster_layers_and_slice_mesh, StageOption)
+    cluster_layers_and_slice_mesh, get_last_dp_result, AutoStageOption,
+    ManualStageOption, StageOption)
+from alpa.pipeline_parallel.layer_stats import eqn_flops
 from alpa.pipeline_parallel.stage_profiling import CompileWorkerPool
-from alpa.shard_parallel.auto_sharding import AutoShardingOption
+from alpa.shard_parallel.auto_sharding import (AutoShardingOption,
+                                               run_auto_sharding_pass)
 from alpa.util import get_var_mapping, trace_jaxpr_with_micro_batch, OrderedSet
 
 logger = logging.getLogger(__name__)
@@ -44,11 +53,16 @@ def compile_pipeshard_executable(fun: lu.WrappedFun,
                                  pipeline_schedule: str,
                                  default_as_option: AutoShardingOption,
                                  stage_option: StageOption,
-                                 *avals: Sequence[AbstractValue]):
+                                 *avals: Sequence[AbstractValue],
+                                 num_virtual_stages_per_mesh: int = 1):
     """
     Compile a callable for pipeshard parallel which combines
     pipeline parallelism and 2d shard parallelsim.
     """
+    if (num_virtual_stages_per_mesh != 1 and
+            pipeline_schedule != "1f1b_interleaved"):
+        raise ValueError("Virtual stages are only supported by the "
+                         "1f1b_interleaved schedule.")
     debug_compilation_time(None)
 
     # Trace the function to get the jaxpr
@@ -57,6 +71,25 @@ def compile_pipeshard_executable(fun: lu.WrappedFun,
     gensym_func = gensym([closed_jaxpr.jaxpr])
     debug_compilation_time("trace")
 
+    # Reuse the stage construction and auto-sharding results of another
+    # process. The mesh signature contains the device type of each host.
+    # The files used by the auto stage construction (e.g., the profiling
+    # results) are only referred by names in the options, so their contents
+    # are also part of the key.
+    executable_cache = get_executable_cache()
+    cached = None
+    if executable_cache is not None:
+        base_key = compute_executable_key(
+            closed_jaxpr, avals, donated_invars, "pipeshard_parallel",
+            tuple(batch_invars), virtual_mesh.get_signature(), num_microbatch,
+            pipeline_schedule, default_as_option, stage_option,
+            num_virtual_stages_per_mesh)
+        cached = executable_cache.get(
+            extend_executable_key(base_key,
+                                  _get_stage_option_files_key(stage_option)))
+    if cached is not None and cached["stage_option"] is not None:
+        stage_option = cached["stage_option"]
+
     # Split the jaxpr into compute_grad and apply_grad
     (closed_jaxpr, compute_grad_jaxpr, apply_grad_jaxpr,
      microbatch_bound) = split_compute_grad_and_apply_grad(
@@ -112,9 +145,19 @@ def compile_pipeshard_executable(fun: lu.WrappedFun,
          jax_pipeline_layers, virtual_mesh, donation_mapping,
          acc_grad_outvars, num_microbatch, batch_size,
          jax_apply_layers, apply_grad_global_info, pipeline_schedule,
-         default_as_option, stage_option)
+         default_as_option, stage_option, num_virtual_stages_per_mesh)
     num_meshes = len(sliced_virtual_meshes)
     debug_compilation_time("stage construction")
+    if cached is None and isinstance(stage_option, AutoStageOption):
+        # Store the solution of the auto stage construction as a manual one
+        (_, forward_stage_layer_ids, submesh_shapes, _,
+         _) = get_last_dp_result()
+        cached_stage_option = ManualStageOption(forward_stage_layer_ids,
+                                                submesh_shapes,
+                                                logical_mesh_shapes,
+                                                autosharding_option_dicts)
+    else:
+        cached_stage_option = None
 
     # Process apply_gradient and donation
     (sliced_apply_grad_stages, n_stages, dependency, apply_grad_placement,
@@ -141,6 +184,29 @@ def compile_pipeshard_executable(fun: lu.WrappedFun,
                                   meshes=sliced_virtual_meshes,
                                   apply_grad_placement=apply_grad_placement,
                                   num_batch=num_microbatch)
+    elif pipeline_schedule == "1f1b_interleaved":
+        schedule = InterleavedPipeDreamFlush(
+            dependency=dependency,
+            meshes=sliced_virtual_meshes,
+            apply_grad_placement=apply_grad_placement,
+            num_batch=num_microbatch,
+            num_virtual_stages_per_mesh=num_virtual_stages_per_mesh)
+    elif pipeline_schedule == "1f1b_memory_budgeted":
+        activation_sizes, stage_costs = _get_stage_activation_sizes_and_costs(
+            jax_pipeline_stages, sliced_virtual_meshes)
+        memory_budgets = _get_activation_memory_budgets(
+            virtual_mesh, sliced_virtual_meshes, jax_all_stages, stage_to_mesh,
+            apply_grad_placement, global_invars)
+        schedule = MemoryBudgetedPipeDreamFlush(
+            dependency=dependency,
+            meshes=sliced_virtual_meshes,
+            apply_grad_placement=apply_grad_placement,
+            num_batch=num_microbatch,
+            activation_sizes=activation_sizes,
+            memory_budgets=memory_budgets,
+            stage_costs=stage_costs)
+        logger.debug(f"In-flight micro batches of each mesh: "
+                     f"{[x + 1 for x in schedule.num_warmup]}")
     elif pipeline_schedule == "inference":
         schedule = InferenceSchedule(dependency=dependency,
                                      meshes=sliced_virtual_meshes,
@@ -150,14 +216,26 @@ def compile_pipeshard_executable(fun: lu.WrappedFun,
         raise ValueError(f"Invalid schedule: {pipeline_schedule}")
 
     # Call auto-sharding pass to shard each stage
-    xla_stages, total_flops = shard_each_stage(
+    xla_stages, total_flops, mesh_sharding_results = shard_each_stage(
         jax_all_stages, sliced_virtual_meshes, schedule, n_stages, num_meshes,
         grad_in_to_out, global_invars, acc_grad_outvars, donate_invars_dict,
         num_microbatch, logical_mesh_shapes, autosharding_option_dicts,
-        default_as_option, gensym_func)
+        default_as_option, gensym_func,
+        cached["mesh_sharding_results"] if cached is not None else None)
     total_flops *= num_microbatch
     debug_compilation_time("shard stages")
 
+    if executable_cache is not None and cached is None:
+        # The stage construction can add profiling results to the files, so
+        # the key is computed again to match the files read by later runs
+        cache_key = extend_executable_key(
+            base_key, _get_stage_option_files_key(stage_option))
+        executable_cache.put(
+            cache_key, {
+                "stage_option": cached_stage_option,
+                "mesh_sharding_results": mesh_sharding_results,
+            })
+
     # Launch the physical mesh group
     if virtual_mesh.launched_physical_mesh_group is None:
         virtual_mesh.get_physical_mesh_group(sliced_virtual_meshes)
@@ -186,12 +264,29 @@ def compile_pipeshard_executable(fun: lu.WrappedFun,
     return executable
 
 
-def shard_each_stage(jax_all_stages, virtual_meshes, schedule, n_stages,
-                     num_meshes, grad_in_to_out, global_invars,
-                     acc_grad_outvars, donate_invars_dict, num_microbatch,
-                     logical_mesh_shapes, autosharding_option_dicts,
-                     default_as_option, gensym_func):
-    """Run intra-op parallelism compilation for a stage."""
+def shard_each_stage(jax_all_stages,
+                     virtual_meshes,
+                     schedule,
+                     n_stages,
+                     num_meshes,
+                     grad_in_to_out,
+                     global_invars,
+                     acc_grad_outvars,
+                     donate_invars_dict,
+                     num_microbatch,
+                     logical_mesh_shapes,
+                     autosharding_option_dicts,
+                     default_as_option,
+                     gensym_func,
+                     mesh_sharding_results=None):
+    """Run intra-op parallelism compilation for a stage.
+
+    The auto-sharding result of each mesh is a tuple of (computation names,
+    computation protos, strategy config, flops). If mesh_sharding_results is
+    given, the auto-sharding pass is skipped and these results are used.
+    Returns the sharded stages, the total flops and the results of all
+    meshes.
+    """
     # Initialize donation mapping
     stage_dict = [[] for _ in range(num_meshes)]
     stage_id_dict = [[] for _ in range(num_meshes)]
@@ -215,13 +310,16 @@ def shard_each_stage(jax_all_stages, virtual_meshes, schedule, n_stages,
         donatable_dict[mesh_idx].append(donatable_list[i])
 
     # Call auto-sharding pass on each stage
-    distributed_compile = global_config.pipeline_distributed_compile
+    use_cached_results = mesh_sharding_results is not None
+    distributed_compile = (global_config.pipeline_distributed_compile and
+                           not use_cached_results)
     xla_stages = [None] * n_stages
+    if not use_cached_results:
+        mesh_sharding_results = [None] * num_meshes
     if distributed_compile:
         compile_workers = CompileWorkerPool(num_meshes)
         compile_fn = lambda w, v: w.run_auto_sharding_pass.remote(*v)  # noqa
-        compile_intermediate = [None] * num_meshes
-    total_flops = 0
+        mesh_flops = [None] * num_meshes
     for mesh_idx in range(num_meshes):
         virtual_mesh = virtual_meshes[mesh_idx]
         logical_mesh = virtual_mesh.get_logical_mesh(
@@ -234,13 +332,16 @@ def shard_each_stage(jax_all_stages, virtual_meshes, schedule, n_stages,
             xla_stages[i] = XlaShardedPipelineComputation.dummy_computation(
                 jax_all_stages[i].name, logical_mesh.shape, gensym_func)
 
+        if use_cached_results:
+            continue
+
         stage_donate_invars = [
             donate_invars_dict[stage_idx]
             for stage_idx in stage_id_dict[mesh_idx]
         ]
+        proto, jaxpr_args, flops = generate_sharded_xla_computations_arguments(
+            str(mesh_idx), stage_dict[mesh_idx], stage_donate_invars)
         if distributed_compile:
-            proto, jaxpr_args, flops = generate_sharded_xla_computations_arguments(
-                str(mesh_idx), stage_dict[mesh_idx], stage_donate_invars)
             other_kwargs = {
                 "logical_mesh": logical_mesh,
                 "return_mode": "stage_protos",
@@ -249,35 +350,44 @@ def shard_each_stage(jax_all_stages, virtual_meshes, schedule, n_stages,
             }
             compile_workers.submit(compile_fn,
                                    (mesh_idx, proto, jaxpr_args, other_kwargs))
-            compile_intermediate[mesh_idx] = (stage_dict[mesh_idx],
-                                              stage_donate_invars)
-            total_flops += flops
+            mesh_flops[mesh_idx] = flops
         else:
-            sharded_xla_stages, flops = generate_sharded_xla_computations(
-                str(mesh_idx), stage_dict[mesh_idx], stage_donate_invars,
-                donatable_dict[mesh_idx], acc_grad_outvars, num_microbatch,
-                logical_mesh, autosharding_option)
-            total_flops += flops
-            for i, xla_stage in zip(stage_id_dict[mesh_idx],
-                                    sharded_xla_stages):
-                xla_stages[i] = xla_stage
+            #  pylint: disable=unbalanced-tuple-unpacking
+            (computation_names, computation_protos,
+             strategy_config) = run_auto_sharding_pass(
+                 xc.XlaComputation(proto), *jaxpr_args, logical_mesh,
+                 "stage_protos", num_microbatch, autosharding_option)
+            mesh_sharding_results[mesh_idx] = (computation_names,
+                                               computation_protos,
+                                               strategy_config, flops)
 
     if distributed_compile:
         for _ in range(num_meshes):
             mesh_idx, (computation_names, computation_protos,
                        strategy_config) = compile_workers.get_next_unordered()
-            jax_computations, computation_donate_invars = compile_intermediate[
-                mesh_idx]
-            sharded_xla_stages = generate_computations_from_protos(
-                jax_computations, computation_names, computation_protos,
-                computation_donate_invars, donatable_dict[mesh_idx],
-                acc_grad_outvars, strategy_config)
-            for i, xla_stage in zip(stage_id_dict[mesh_idx],
-                                    sharded_xla_stages):
-                xla_stages[i] = xla_stage
+            mesh_sharding_results[mesh_idx] = (computation_names,
+                                               computation_protos,
+                                               strategy_config,
+                                               mesh_flops[mesh_idx])
         compile_workers.shutdown()
 
-    return xla_stages, total_flops
+    total_flops = 0
+    for mesh_idx in range(num_meshes):
+        (computation_names, computation_protos, strategy_config,
+         flops) = mesh_sharding_results[mesh_idx]
+        stage_donate_invars = [
+            donate_invars_dict[stage_idx]
+            for stage_idx in stage_id_dict[mesh_idx]
+        ]
+        sharded_xla_stages = generate_computations_from_protos(
+            stage_dict[mesh_idx], computation_names, computation_protos,
+            stage_donate_invars, donatable_dict[mesh_idx], acc_grad_outvars,
+            strategy_config)
+        for i, xla_stage in zip(stage_id_dict[mesh_idx], sharded_xla_stages):
+            xla_stages[i] = xla_stage
+        total_flops += flops
+
+    return xla_stages, total_flops, mesh_sharding_results
 
 
 def _slice_apply_grad_for_stage_construction(pipeline_layers, apply_grad_jaxpr,
@@ -311,6 +421,69 @@ def _slice_apply_grad_for_stage_construction(pipeline_layers, apply_grad_jaxpr,
     return wrap_layers, apply_grad_global_info
 
 
+def _get_var_bytes(var):
+    return var.aval.size * var.aval.dtype.itemsize
+
+
+def _get_stage_activation_sizes_and_costs(jax_pipeline_stages, meshes):
+    """Estimate the per-device activation bytes of each forward stage and the
+    per-device FLOPs of all forward and backward stages.
+
+    The activations of a forward stage are its outputs used by its backward
+    stage. Both are assumed to be evenly sharded over the devices of a mesh.
+    """
+    num_meshes = len(meshes)
+    activation_sizes = []
+    for i in range(num_meshes):
+        backward_invars = OrderedSet(jax_pipeline_stages[2 * num_meshes - 1 -
+                                                         i].invars)
+        size = sum(
+            _get_var_bytes(var)
+            for var in jax_pipeline_stages[i].outvars
+            if var in backward_invars)
+        activation_sizes.append(size / meshes[i].num_devices)
+    stage_costs = []
+    for i, stage in enumerate(jax_pipeline_stages):
+        mesh = meshes[min(i, 2 * num_meshes - 1 - i)]
+        flops = sum(eqn_flops(eqn) for eqn in stage.eqns)
+        stage_costs.append(flops / mesh.num_devices)
+    return activation_sizes, stage_costs
+
+
+def _get_activation_memory_budgets(virtual_mesh, sliced_virtual_meshes,
+                                   jax_all_stages, stage_to_mesh,
+                                   apply_grad_placement, global_invars):
+    """Get the per-device bytes available for activations on each mesh.
+
+    If global_config.pipeline_activation_memory_budget is not set, launch the
+    meshes and subtract the global inputs (e.g., parameters and optimizer
+    states) used on each mesh and the same amount for their gradients or
+    updated copies from the available memory.
+    """
+    num_meshes = len(sliced_virtual_meshes)
+    if global_config.pipeline_activation_memory_budget is not None:
+        return [global_config.pipeline_activation_memory_budget] * num_meshes
+
+    if virtual_mesh.launched_physical_mesh_group is None:
+        virtual_mesh.get_physical_mesh_group(sliced_virtual_meshes)
+    stage_to_mesh = dict(enumerate(stage_to_mesh))
+    stage_to_mesh.update(apply_grad_placement)
+    global_invars = OrderedSet(global_invars)
+    mesh_global_invars = [OrderedSet() for _ in range(num_meshes)]
+    for stage_idx, stage in enumerate(jax_all_stages):
+        mesh_global_invars[stage_to_mesh[stage_idx]].update(
+            var for var in stage.invars if var in global_invars)
+
+    memory_budgets = []
+    for mesh_idx, physical_mesh in enumerate(
+            virtual_mesh.launched_physical_mesh_group):
+        reserved = 2 * sum(
+            _get_var_bytes(var) for var in mesh_global_invars[mesh_idx])
+        memory_budgets.append(physical_mesh.get_available_memory() -
+                              reserved / physical_mesh.num_devices)
+    return memory_budgets
+
+
 # TODO(yonghao): the reduction vector should be created by a more careful analysis.
 def _get_full_batch_apply_grad(fun: lu.WrappedFun, avals, batch_invars,
                                microbatch_bound, num_microbatch, batch_dim):
@@ -360,6 +533,17 @@ def _rewrite_global_outvars_post_concate(global_outvars, reduction_vector,
     return global_outvars, concat_vars_mapping
 
 
+def _get_stage_option_files_key(stage_option: StageOption):
+    """Compute a key of the contents of the files used by the auto stage
+    construction."""
+    if not isinstance(stage_option, AutoStageOption):
+        return None
+    return get_file_contents_key(stage_option.profiling_database_filename,
+                                 stage_option.cached_compute_cost,
+                                 stage_option.compute_cost_database_filename,
+                                 stage_option.device_spec_filename)
+
+
 _tic = None
 
 
@@ -0,0 +1,125 @@
+"""A persistent database of the profiled compute cost of pipeline stages.
+
+Auto stage construction profiles one cell (start layer, end layer, submesh,
+auto-sharding config) of the compute cost tensor at a time. Each cell is
+appended to the database file as soon as it is profiled, so a crashed run can
+resume from where it stopped and later runs only profile the missing cells.
+"""
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+from typing import Optional, Sequence, Tuple
+
+from alpa.jaxpr_fingerprint import get_jaxpr_fingerprint
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def get_layer_hashes(layers: Sequence) -> Sequence[Optional[str]]:
+    """Fingerprint the jaxpr of each layer. `None` layers are hashed as `None`."""
+    ret = []
+    for layer in layers:
+        if layer is None:
+            ret.append(None)
+        else:
+            ret.append(get_jaxpr_fingerprint(layer.closed_jaxpr()))
+    return ret
+
+
+def get_stage_key(layer_hashes: Sequence[str],
+                  layer_indices: Sequence[int],
+                  apply_grad_layer_hashes: Sequence[Optional[str]],
+                  submesh_shape: Tuple[int],
+                  autosharding_config: Tuple,
+                  default_as_option,
+                  num_micro_batches: int,
+                  is_full_mesh: bool) -> str:
+    """Get the key of a profiled stage in the database.
+
+    Args:
+        layer_hashes: The hashes of all forward and backward layers.
+        layer_indices: The indices of the layers in the stage.
+        apply_grad_layer_hashes: The hashes of the apply gradient layers
+          corresponding to the forward layers in the stage.
+        submesh_shape: The physical shape of the submesh.
+        autosharding_config: A tuple of (logical mesh, auto-sharding option
+          dict) for the stage.
+        default_as_option: The default auto-sharding options.
+        num_micro_batches: The number of micro batches.
+        is_full_mesh: Whether the stage runs on the whole cluster. Such a
+          stage does not keep intermediate variables for other stages.
+    """
+    logical_mesh, as_dict = autosharding_config
+    content = {
+        "layers": [layer_hashes[i] for i in layer_indices],
+        "apply_grad_layers": list(apply_grad_layer_hashes),
+        "submesh_shape": [int(x) for x in submesh_shape],
+        "logical_mesh_shape": [int(x) for x in logical_mesh.shape],
+        "as_dict": sorted((k, repr(v)) for k, v in as_dict.items()),
+        "default_as_option": sorted(
+            (k, repr(v))
+            for k, v in dataclasses.asdict(default_as_option).items()),
+        "num_micro_batches": int(num_micro_batches),
+        "is_full_mesh": bool(is_full_mesh),
+    }
+    return hashlib.sha1(
+        json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ComputeCostDatabase:
+    """An append-only database of profiled stage compute costs.
+
+    The file stores one json record per line. A partially written last line
+    (e.g., the process was killed while writing) is ignored when loading, and
+    the next record is written on a new line after it.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.data = {}
+        # Whether the file ends with a partially written line
+        self._partial_last_line = False
+        self.load()
+
+    def load(self):
+        """Load all records from the file."""
+        if not os.path.exists(self.filename):
+            return
+        with open(self.filename, "r") as fin:
+            for line in fin:
+                self._partial_last_line = not line.endswith("\n")
+                try:
+                    record = json.loads(line)
+                    self.data[record["key"]] = (record["cost"],
+                                                record["max_n_succ_stages"])
+                except (ValueError, KeyError):
+                    logger.warning(
+                        f"Skip a corrupted record in {self.filename}")
+
+    def query(self, key: str) -> Optional[Tuple[float, int]]:
+        """Return (compute_cost, max_n_succ_stages) or None if missing."""
+        return self.data.get(key, None)
+
+    def update(self, key: str, cost: float, max_n_succ_stages: int):
+        """Add a record and persist it to the file immediately."""
+        cost = float(cost)
+        max_n_succ_stages = int(max_n_succ_stages)
+        self.data[key] = (cost, max_n_succ_stages)
+        with open(self.filename, "a") as fout:
+            if self._partial_last_line:
+                fout.write("\n")
+                self._partial_last_line = False
+            fout.write(
+                json.dumps({
+                    "key": key,
+                    "cost": cost,
+                    "max_n_succ_stages": max_n_succ_stages
+                }) + "\n")
+            fout.flush()
+            os.fsync(fout.fileno())
+
+    def __len__(self):
+        return len(self.data)
@@ -14,9 +14,10 @@ from alpa.device_mesh import (DistributedArray, ReshardingAllGatherSpec,
 from alpa.mesh_executable import RemoteBufferRef
 from alpa.global_env import global_config
 from alpa.pipeline_parallel.computation import XlaShardedPipelineComputation
+from alpa.pipeline_parallel.resharding_plan_cache import (
+    compute_resharding_plan_key, get_resharding_plan_cache)
 from alpa.pipeline_parallel.resharding_tensor import (VirtualDistributedArray,
-                                                      TileSlice,
-                                                      unflatten_tile_index)
+                                                      TileIntersections)
 from alpa.util import OrderedSet
 
 logger = logging.getLogger(__name__)
@@ -247,6 +248,136 @@ class _AllgatherSpec:
         return ret
 
 
+def _unflatten_mesh_index(flatten_idx, mesh_shape):
+    mesh_idx = []
+    for mesh_dim in reversed(mesh_shape):
+        mesh_idx.append(flatten_idx % mesh_dim)
+        flatten_idx //= mesh_dim
+    return list(reversed(mesh_idx))
+
+
+def _indices_in_dst_post_allgather(task_spec,
+                                   indices,
+                                   mesh_idx,
+                                   dst_spec=None,
+                                   allgather_spec=None):
+    if not task_spec.allgather_spec:
+        return indices
+    dst_spec = dst_spec or task_spec.dst_sharding_spec
+    allgather_spec = allgather_spec or task_spec.allgather_spec
+
+    indices = list(indices)
+    shape = task_spec.aval.shape
+    for tensor_dim in allgather_spec.allgather_dims:
+        allgather_start_idx = allgather_spec.start_idx(tensor_dim, dst_spec)
+        mapped_chunks = dst_spec.sharding[tensor_dim].chunks[
+            allgather_start_idx:]
+        mapped_offset = [
+            mesh_idx[idx]
+            for idx in allgather_spec.mapped_mesh_dim(tensor_dim, dst_spec)
+        ]
+        dim_offset = _allgather_dim_offset(shape[tensor_dim], mapped_offset,
+                                           mapped_chunks, allgather_start_idx)
+        indices[tensor_dim] = slice(dim_offset + indices[tensor_dim].start,
+                                    dim_offset + indices[tensor_dim].stop,
+                                    None)
+
+    for idx, tensor_slice in enumerate(indices):
+        if tensor_slice.start is None:
+            assert tensor_slice.stop is None
+            indices[idx] = slice(0, shape[idx], None)
+    return indices
+
+
+def _compile_recv_indices(task_spec):
+    """
+    Compute the indices in the received buffer of each src tile slice for
+    each replica of each dst tile, after the local allgather.
+    """
+    logical_mesh_shape = _allgather_logical_mesh_from_spec(
+        task_spec.dst_sharding_spec)
+    recv_indices = []
+    for dst_tile, _, indices_in_dst_tiles in (
+            task_spec.dst_tile_to_src_tiles_map):
+        tile_recv_indices = []
+        for receiver_device_id in dst_tile.replica_device_ids:
+            mesh_idx = (_unflatten_mesh_index(receiver_device_id,
+                                              logical_mesh_shape)
+                        if task_spec.allgather_spec else -1)
+            tile_recv_indices.append([
+                _indices_in_dst_post_allgather(task_spec, indices, mesh_idx)
+                for indices in indices_in_dst_tiles
+            ])
+        recv_indices.append(tile_recv_indices)
+    return recv_indices
+
+
+def _compile_allgather_specs(task_spec):
+    """
+    Compile allgather specs on destination mesh. Allgather specs are
+    created with the order described below:
+
+    1. Iterate all tensor dimensions that has chunks inserted by
+    _rewrite_allgather_spec;
+    2. The rewritten sharding spec corresponds to a logical mesh shape, and
+    each receiver has its own index with respect to the mesh shape. Let the
+    index be (x_0,x_1,...,x_n) and the mesh shape is (l_0,l_1,...,l_n);
+    3. The iterated tensor dimension corresponds to some logical mesh
+    dimensions, assume these dimensions are D, a subset of [n]. The index is
+    categorized into two parts. The first is (x_{i_0},x_{i_1},...x_{i_m}),
+    where {i_0,i_1,...,i_m}=D while the second is the rest. The first part
+    is named group index while the second is allgather index.
+    4. Devices with the same group index forms an allgather group, and the
+    allgather index indicates their order inside the group.
+
+    Returns:
+        allgather_specs (List[Tuple[int, ReshardingAllGatherSpec]]): the
+            host index in the destination mesh and the spec of each task.
+    """
+    allgather_specs = []
+    if not task_spec.allgather_spec:
+        return allgather_specs
+    num_devices_per_host = task_spec.dst.device_mesh.num_devices_per_host
+    dst_spec = task_spec.dst_sharding_spec
+    tensor_shape = task_spec.dst.tensor_shape
+    allgather_spec = task_spec.allgather_spec
+    tmp_allgather_spec = task_spec.allgather_spec
+    # use reverse order to keep the result always continuous.
+    for tensor_dim in reversed(allgather_spec.allgather_dims):
+        indices = pxla.spec_to_indices(tensor_shape, dst_spec)[0]
+        # The mesh shape is changed as a tensor dim's sharding is changed
+        mesh_shape = _allgather_logical_mesh_from_spec(dst_spec)
+        mesh_dims = allgather_spec.mapped_mesh_dim(tensor_dim, dst_spec)
+        # Get allgather groups
+        allgather_groups = _signle_tensor_dim_allgather_groups(
+            mesh_shape, mesh_dims)
+        post_dst_spec = _reduce_chunk(dst_spec, tensor_dim, len(mesh_dims))
+        # For each group, get device ids, tensor slices and other allgather config
+        for group_ids in allgather_groups:
+            host_idx = group_ids[0] // num_devices_per_host
+            device_ids = [gid % num_devices_per_host for gid in group_ids]
+            tensor_slices = []
+            for receiver_idx in group_ids:
+                mesh_idx = _unflatten_mesh_index(receiver_idx, mesh_shape)
+                tensor_slices.append(
+                    _indices_in_dst_post_allgather(task_spec, indices,
+                                                   mesh_idx, dst_spec,
+                                                   tmp_allgather_spec))
+            # the tensor dim's sharding is changed, use it for output slice.
+            output_slice = list(tensor_slices[0])
+            output_slice[tensor_dim] = slice(
+                0, task_spec.aval.shape[tensor_dim] /
+                _get_chunk_value(post_dst_spec.sharding[tensor_dim]), None)
+            allgather_specs.append(
+                (host_idx,
+                 ReshardingAllGatherSpec(device_ids, tensor_slices,
+                                         output_slice)))
+        # change the tensor dim's sharding and the remained allgather spec.
+        dst_spec = _reduce_chunk(dst_spec, tensor_dim, len(mesh_dims))
+        tmp_allgather_spec = tmp_allgather_spec.post_allgather(tensor_dim)
+    return allgather_specs
+
+
 class ReshardingTask:
     """
     A task that addresses cross-mesh resharding between two meshes.
@@ -356,10 +487,12 @@ class EagerReshardingTask(ReshardingTask):
             indices_in_dst_tile = indices_in_dst_tiles[i]
             send_done_ref = sender_worker.send_tile.remote(
                 sender_buf.uuid, tile.offset, receiver_rank, receiver_gpu_idx,
-                self.collective_group.group_name)
+                self.collective_group.group_name,
+                global_config.resharding_chunk_size)
             recv_done_ref = receiver_worker.recv_tile.remote(
                 result_buf.uuid, result_buf.device_id, indices_in_dst_tile,
-                sender_rank, sender_gpu_idx, self.collective_group.group_name)
+                sender_rank, sender_gpu_idx, self.collective_group.group_name,
+                global_config.resharding_chunk_size)
             ray.get([send_done_ref, recv_done_ref])
         return result_buf
 
@@ -405,53 +538,6 @@ class SymbolicReshardingTask(ReshardingTask):
         """Return allgahter sub-tasks."""
         return self._allgather_tasks
 
-    def _allgather_receiver_offset(self, receiver, logical_mesh_shape):
-        if not self.task_spec.allgather_spec:
-            return -1
-        host_idx, device_idx = self.collective_group.device_str_to_rank_map[
-            receiver]
-        if host_idx >= self.collective_group.src_mesh.num_hosts:
-            host_idx = host_idx - self.collective_group.src_mesh.num_hosts
-        flatten_idx = host_idx * self.dst_mesh.num_devices_per_host + device_idx
-        offsets = []
-        for mesh_dim in reversed(logical_mesh_shape):
-            offsets.append(flatten_idx % mesh_dim)
-            flatten_idx //= mesh_dim
-        return list(reversed(offsets))
-
-    def _indices_in_dst_post_allgather(self,
-                                       indices,
-                                       mesh_idx,
-                                       dst_spec=None,
-                                       allgather_spec=None):
-        if not self.task_spec.allgather_spec:
-            return indices
-        dst_spec = dst_spec or self.task_spec.dst_sharding_spec
-        allgather_spec = allgather_spec or self.task_spec.allgather_spec
-
-        indices = list(indices)
-        shape = self.task_spec.aval.shape
-        for tensor_dim in allgather_spec.allgather_dims:
-            allgather_start_idx = allgather_spec.start_idx(tensor_dim, dst_spec)
-            mapped_chunks = dst_spec.sharding[tensor_dim].chunks[
-                allgather_start_idx:]
-            mapped_offset = [
-                mesh_idx[idx]
-                for idx in allgather_spec.mapped_mesh_dim(tensor_dim, dst_spec)
-            ]
-            dim_offset = _allgather_dim_offset(shape[tensor_dim], mapped_offset,
-                                               mapped_chunks,
-                                               allgather_start_idx)
-            indices[tensor_dim] = slice(dim_offset + indices[tensor_dim].start,
-                                        dim_offset + indices[tensor_dim].stop,
-                                        None)
-
-        for idx, tensor_slice in enumerate(indices):
-            if tensor_slice.start is None:
-                assert tensor_slice.stop is None
-                indices[idx] = slice(0, shape[idx], None)
-        return indices
-
     def _compile(self):
         """
         Generate all send, recv, and allgather tasks.
@@ -465,20 +551,22 @@ class SymbolicReshardingTask(ReshardingTask):
         if self.is_local_allgather_task:
             self._compile_allgather_tasks()
 
-        # put send and recv tasks
+        # put send and recv tasks. The chunk size is sent with the tasks,
+        # because the workers do not share the global_config of the driver.
+        chunk_size = global_config.resharding_chunk_size
         task_dones = []
         for worker, task in self.sender_tasks.items():
             uuid = next_resharding_task_uuid()
             self.send_worker_task_ids[worker] = uuid
             task_dones.append(
                 worker.put_resharding_send_task.remote(
-                    uuid, task, self.collective_group.group_name))
+                    uuid, task, self.collective_group.group_name, chunk_size))
         for worker, task in self.receiver_tasks.items():
             uuid = next_resharding_task_uuid()
             self.recv_worker_task_ids[worker] = uuid
             task_dones.append(
                 worker.put_resharding_recv_task.remote(
-                    uuid, task, self.collective_group.group_name))
+                    uuid, task, self.collective_group.group_name, chunk_size))
         ray.get(task_dones)
 
         # put allgather tasks
@@ -525,9 +613,8 @@ class SymbolicReshardingTask(ReshardingTask):
 
     def _compile_send_recv_tasks(self):
         """Generate all send/recv tasks."""
-        logical_mesh_shape = _allgather_logical_mesh_from_spec(
-            self.task_spec.dst_sharding_spec)
-        for i, (dst_tile, src_tiles, indices_in_dst_tiles) in enumerate(
+        recv_indices = self.task_spec.plan_template.recv_indices
+        for i, (dst_tile, src_tiles, _) in enumerate(
                 self.task_spec.dst_tile_to_src_tiles_map):
             spec_plan = self.task_spec.strategy.per_spec_plans[i]
             for replica_index, receiver in enumerate(
@@ -547,8 +634,6 @@ class SymbolicReshardingTask(ReshardingTask):
                 receiver_rank, receiver_gpu_idx = (
                     self.collective_group.device_str_to_rank_map[receiver])
                 recv_tile_specs = []
-                mesh_idx = self._allgather_receiver_offset(
-                    receiver, logical_mesh_shape)
                 for sender_idx, sender in enumerate(senders):
                     # Sender's task
                     sender_worker = self.collective_group.device_str_to_mesh_worker_map[
@@ -560,78 +645,24 @@ class SymbolicReshardingTask(ReshardingTask):
                     # Receiver's task
                     sender_rank, sender_gpu_idx = \
                         self.collective_group.device_str_to_rank_map[sender]
-                    indices_in_dst_tile = self._indices_in_dst_post_allgather(
-                        indices_in_dst_tiles[sender_idx], mesh_idx)
                     recv_tile_specs.append(
-                        ReshardingTileSpec(indices_in_dst_tile, sender_rank,
-                                           sender_gpu_idx))
+                        ReshardingTileSpec(
+                            recv_indices[i][replica_index][sender_idx],
+                            sender_rank, sender_gpu_idx))
                 receiver_task = ReshardingRecvSpec(receiver_device_id,
                                                    dst_tile.tile_shape, dtype,
                                                    recv_tile_specs)
                 self._receiver_tasks[receiver_worker].append(receiver_task)
 
     def _compile_allgather_tasks(self):
+        """Compile allgather tasks on destination mesh.
+
+        See _compile_allgather_specs for the order of the tasks.
         """
-        Compile allgather tasks on destination mesh. Allgather tasks are
-        created with the order described below:
-
-        1. Iterate all tensor dimensions that has chunks inserted by
-        _rewrite_allgather_spec;
-        2. The rewritten sharding spec corresponds to a logical mesh shape, and
-        each receiver has its own index with respect to the mesh shape. Let the
-        index be (x_0,x_1,...,x_n) and the mesh shape is (l_0,l_1,...,l_n);
-        3. The iterated tensor dimension corresponds to some logical mesh
-        dimensions, assume these dimensions are D, a subset of [n]. The index is
-        categorized into two parts. The first is (x_{i_0},x_{i_1},...x_{i_m}),
-        where {i_0,i_1,...,i_m}=D while the second is the rest. The first part
-        is named group index while the second is allgather index.
-        4. Devices with the same group index forms an allgather group, and the
-        allgather index indicates their order inside the group.
-        """
-        dst_spec = self.task_spec.dst_sharding_spec
-        tensor_shape = self.task_spec.dst.tensor_shape
-        allgather_spec = self.task_spec.allgather_spec
-        tmp_allgather_spec = self.task_spec.allgather_spec
-        # use reverse order to keep the result always continuous.
-        for tensor_dim in reversed(allgather_spec.allgather_dims):
-            indices = pxla.spec_to_indices(tensor_shape, dst_spec)[0]
-            # The mesh shape is changed as a tensor dim's sharding is changed
-            mesh_shape = _allgather_logical_mesh_from_spec(dst_spec)
-            mesh_dims = allgather_spec.mapped_mesh_dim(tensor_dim, dst_spec)
-            # Get allgather groups
-            allgather_groups = _signle_tensor_dim_allgather_groups(
-                mesh_shape, mesh_dims)
-            post_dst_spec = _reduce_chunk(dst_spec, tensor_dim, len(mesh_dims))
-            # For each group, get device ids, tensor slices and other allgather config
-            for group_ids in allgather_groups:
-                host_idx = group_ids[0] // self.dst_mesh.num_devices_per_host
-                host = self.dst_mesh.workers[host_idx]
-                device_ids = [
-                    gid % self.dst_mesh.num_devices_per_host
-                    for gid in group_ids
-                ]
-                tensor_slices = []
-                for receiver_idx in group_ids:
-                    flatten_idx = receiver_idx
-                    mesh_idx = []
-                    for mesh_dim in reversed(mesh_shape):
-                        mesh_idx.append(flatten_idx % mesh_dim)
-                        flatten_idx //= mesh_dim
-                    mesh_idx = list(reversed(mesh_idx))
-                    tensor_slices.append(
-                        self._indices_in_dst_post_allgather(
-                            indices, mesh_idx, dst_spec, tmp_allgather_spec))
-                # the tensor dim's sharding is changed, use it for output slice.
-                output_slice = list(tensor_slices[0])
-                output_slice[tensor_dim] = slice(
-                    0, self.task_spec.aval.shape[tensor_dim] /
-                    _get_chunk_value(post_dst_spec.sharding[tensor_dim]), None)
-                self._allgather_tasks[host].append(
-                    ReshardingAllGatherSpec(device_ids, tensor_slices,
-                                            output_slice))
-            # change the tensor dim's sharding and the remained allgather spec.
-            dst_spec = _reduce_chunk(dst_spec, tensor_dim, len(mesh_dims))
-            tmp_allgather_spec = tmp_allgather_spec.post_allgather(tensor_dim)
+        for host_idx, allgather_spec in (
+                self.task_spec.plan_template.allgather_specs):
+            self._allgather_tasks[self.dst_mesh.workers[host_idx]].append(
+                allgather_spec)
         return self._allgather_tasks
 
     # FIXME(Hao): test the function below; it might be buggy.
@@ -965,12 +996,19 @@ class ReshardingTaskSpec:
     Args:
         src_array (VirtualDistributedArray): the source VirtualDistributedArray.
         dst_array (VirtualDistributedArray): the destination VirtualDistributedArray.
+        local_chunks (Sequence[Tuple[int, int, int]]): the chunks added to the
+            dst sharding spec for the local allgather.
+        plan_template (Optional[ReshardingPlanTemplate]): a cached plan of
+            another spec with the same key (see compute_resharding_plan_key).
     """
 
-    def __init__(self, src_array, dst_array, local_chunks):
+    def __init__(self, src_array, dst_array, local_chunks, plan_template=None):
         self.src = src_array
         self.dst = dst_array
         self._dst_tile_to_src_tiles_map = None
+        self._plan_template = plan_template
+        self._tile_intersections = (plan_template.tile_intersections
+                                    if plan_template else None)
         self._strategy = None
         self._local_chunks = local_chunks
         self.allgather_spec = (_AllgatherSpec(local_chunks)
@@ -1017,6 +1055,23 @@ class ReshardingTaskSpec:
             self._dst_tile_to_src_tiles_map = self.generate_src_dst_map()
         return self._dst_tile_to_src_tiles_map
 
+    @property
+    def tile_intersections(self):
+        """Return the array-backed TileIntersections of src and dst tiles."""
+        if self._tile_intersections is None:
+            self._tile_intersections = TileIntersections(self.src, self.dst)
+        return self._tile_intersections
+
+    @property
+    def plan_template(self):
+        """Return the device-independent ReshardingPlanTemplate."""
+        if self._plan_template is None:
+            self._plan_template = ReshardingPlanTemplate(
+                self.dst_sharding_spec, self._local_chunks,
+                self.tile_intersections, _compile_recv_indices(self),
+                _compile_allgather_specs(self))
+        return self._plan_template
+
     def generate_src_dst_map(self):
         """
         Analyzes the src and dst array and generate the dst_tile_to_src_tiles_map.
@@ -1041,89 +1096,11 @@ class ReshardingTaskSpec:
         Look up all related tiles from the source array for a given destination tile.
 
         See the docstring in dst_tile_to_src_tiles_map() for more details.
+        The intersections of all tiles are computed at once by
+        TileIntersections; this only builds the TileSlice objects.
         """
-        # For each dim in the dst tile, find all the related tiles, and ragged values on that dim in src_tiles.
-        # To record that, for each dim, we make a tuple containing the first and last index of tiles in src array
-        # that intersects with the dst tile: Shards between [start, end) are involved; Left included, right not
-        # included.
-        related_tile_start_end = [tuple()] * self.src.tensor_rank
-
-        # Meanwhile, for each dim, for the first and end tile, we make a tuple recording the slicing offset:
-        # - start_shard_offset: [start_shard_offset: ] on that dim is activated.
-        # - end_shard_offset: [:end_sharding_offset] on that dim is activated.
-        related_tile_offset = [tuple()] * self.src.tensor_rank
-
-        for i, dim in enumerate(self.src.tensor_shape):
-            tile_length, ragged = divmod(dim, self.src.tile_shape[i])
-            assert not ragged
-            start_tile, start_tile_offset = divmod(tile.indices[i].start,
-                                                   tile_length)
-            end_tile, end_tile_offset = divmod(tile.indices[i].stop,
-                                               tile_length)
-            # if falling on the middle a src tile, increase the index of the final tile by 1.
-            if end_tile_offset:
-                end_tile = end_tile + 1
-            # if falling on the end of a src tile, the offset should be [0: tile_length]
-            if end_tile_offset == 0:
-                end_tile_offset = tile_length
-            related_tile_start_end[i] = (start_tile, end_tile)
-            related_tile_offset[i] = (start_tile_offset, end_tile_offset)
-
-        # count the number of tile slices
-        num_src_tileslices = 1
-        for start, end in related_tile_start_end:
-            num_src_tileslices = num_src_tileslices * (end - start)
-
-        src_tileslices = []
-        indices_in_dst_tile = []
-        for tileslice_index in range(num_src_tileslices):
-            tile_index_relative = unflatten_tile_index(
-                tileslice_index,
-                [end - start for start, end in related_tile_start_end])
-            tile_index_absolute = [
-                start + tile_index_relative[dim_index]
-                for dim_index, (start, end) in enumerate(related_tile_start_end)
-            ]
-            # depending on its index, calculate a slice for it
-            offsets = []
-            indices = []
-            # loop over each dimension
-            for i, r in enumerate(tile_index_absolute):
-                start, end = related_tile_start_end[i]
-                tile_length_on_this_dim = self.src.tiles[tuple(
-                    tile_index_absolute)].tile_shape[i]
-                if r == start and r == end - 1:
-                    # the dst tile is smaller or equal to the src tile
-                    left_offset = related_tile_offset[i][0]
-                    right_offset = related_tile_offset[i][1]
-                    offsets.append(slice(left_offset, right_offset))
-                    indices.append(slice(0, tile.tile_shape[i]))  # all included
-                elif r == start:
-                    # meaning it is the first involved tile, and not the last
-                    offset = related_tile_offset[i][0]
-                    offsets.append(slice(offset, tile_length_on_this_dim))
-                    indices.append(slice(0, tile_length_on_this_dim - offset))
-                elif r == end - 1:
-                    # meaning it is the last involved tile, and not the first
-                    offset = related_tile_offset[i][1]
-                    offsets.append(slice(0, offset))
-                    indices.append(
-                        slice(tile.tile_shape[i] - offset, tile.tile_shape[i]))
-                else:
-                    # meaning it is a fully involved tile
-                    offset = related_tile_offset[i][0]
-                    offsets.append(slice(0, tile_length_on_this_dim))
-                    left_in_dst_tile = (
-                        tile_length_on_this_dim - offset +
-                        (tile_index_relative[i] - 1) * tile_length_on_this_dim)
-                    right_in_dst_tile = left_in_dst_tile + tile_length_on_this_dim
-                    indices.append(slice(left_in_dst_tile, right_in_dst_tile))
-            # construct a new tile slice
-            this_tileslice = TileSlice(
-                self.src.tiles[tuple(tile_index_absolute)], offset=offsets)
-            src_tileslices.append(this_tileslice)
-            indices_in_dst_tile.append(indices)
-        return src_tileslices, indices_in_dst_tile
+        return self.tile_intersections.get_tile_slices(self.src.tiles,
+                                                       tile.index_flat)
 
     def set_resharding_strategy(self, strategy):
         """Now the strategy is np.array(dtype=str) to specify connections between src tiles and dst tile."""
@@ -1166,6 +1143,38 @@ class ReshardingTaskSpec:
         return ret_str
 
 
+class ReshardingPlanTemplate:
+    """
+    The part of a resharding plan that does not depend on devices.
+
+    It is determined by the aval, the src and dst sharding specs and the
+    shapes of the src and dst meshes, so the specs with the same key share a
+    template across executables (see ReshardingPlanCache). Compiling a
+    SymbolicReshardingTask from it only binds senders, ranks and workers.
+
+    Args:
+        dst_sharding_spec (ShardingSpec): the dst sharding spec rewritten for
+            the local allgather.
+        local_chunks (Sequence[Tuple[int, int, int]]): the chunks added by the
+            rewrite.
+        tile_intersections (TileIntersections): the intersections of the src
+            and dst tiles.
+        recv_indices (List[List[List[List[slice]]]]): recv_indices[i][j][k] is
+            the indices of the k-th src tile slice in the received buffer of
+            the j-th replica of the i-th dst tile.
+        allgather_specs (List[Tuple[int, ReshardingAllGatherSpec]]): the host
+            index in the dst mesh and the spec of each allgather task.
+    """
+
+    def __init__(self, dst_sharding_spec, local_chunks, tile_intersections,
+                 recv_indices, allgather_specs):
+        self.dst_sharding_spec = dst_sharding_spec
+        self.local_chunks = local_chunks
+        self.tile_intersections = tile_intersections
+        self.recv_indices = recv_indices
+        self.allgather_specs = allgather_specs
+
+
 class ReshardingStrategy:
     """A data class for storing resharding communication information.
 
@@ -1182,6 +1191,193 @@ class ReshardingStrategy:
         self.is_local_allgather = is_local_allgather
 
 
+def _device_str_to_host(device_str):
+    """Return the host of a device str created by device_id_to_str."""
+    return device_str.rsplit(":", 2)[0]
+
+
+class ReshardingBandwidthModel:
+    """
+    A host-aware bandwidth model for cross-mesh resharding.
+
+    A transfer occupies the send link of its sender and the receive link of
+    its receiver. It uses the intra-host bandwidth (e.g., NVLink) if the two
+    devices are on the same host, and the inter-host bandwidth otherwise.
+
+    Args:
+        intra_host_bandwidth (float): bytes/s between two devices on a host.
+        inter_host_bandwidth (float): bytes/s between two devices on
+            different hosts.
+    """
+
+    def __init__(self, intra_host_bandwidth=None, inter_host_bandwidth=None):
+        self.intra_host_bandwidth = (
+            intra_host_bandwidth or
+            global_config.resharding_intra_host_bandwidth)
+        self.inter_host_bandwidth = (
+            inter_host_bandwidth or
+            global_config.resharding_inter_host_bandwidth)
+
+    def get_link_costs(self, size, sender, receivers):
+        """
+        Return the time a transfer takes on each link it uses.
+
+        Args:
+            size (float): the bytes to transfer.
+            sender (str): the device str of the sender.
+            receivers (Sequence[str]): the device strs of the receivers. A
+                broadcast has multiple receivers.
+
+        Returns:
+            link_costs (List[Tuple[Tuple[str, str], float]]): a list of
+                (link, time). A link is ("send", device_str) or
+                ("recv", device_str).
+        """
+        src_host = _device_str_to_host(sender)
+        link_costs = []
+        send_time = 0
+        for receiver in receivers:
+            if _device_str_to_host(receiver) == src_host:
+                time = size / self.intra_host_bandwidth
+            else:
+                time = size / self.inter_host_bandwidth
+            send_time = max(send_time, time)
+            link_costs.append((("recv", receiver), time))
+        link_costs.append((("send", sender), send_time))
+        return link_costs
+
+
+def _assign_sender_lpt(size, senders, receivers, bandwidth_model, link_loads):
+    """Pick the sender that finishes a transfer earliest given the link
+    loads, and add the transfer to the link loads."""
+    best_key, best_sender, best_link_costs = None, None, None
+    for sender in senders:
+        link_costs = bandwidth_model.get_link_costs(size, sender, receivers)
+        finish_time = max(
+            link_loads.get(link, 0) + time for link, time in link_costs)
+        key = (finish_time, link_loads.get(("send", sender), 0))
+        if best_key is None or key < best_key:
+            best_key, best_sender, best_link_costs = key, sender, link_costs
+    for link, time in best_link_costs:
+        link_loads[link] = link_loads.get(link, 0) + time
+    return best_sender
+
+
+def plan_send_recv_senders(specs, bandwidth_model, link_loads=None):
+    """
+    Assign the senders of all send/recv transfers between a mesh pair.
+
+    Unlike the greedy min-load assignment that handles one spec at a time,
+    this collects the transfers of all specs and assigns them with the
+    longest-processing-time-first (LPT) rule: transfers are visited in
+    decreasing size order, and each goes to the source replica that
+    minimizes the max load of the links it uses.
+
+    Args:
+        specs (Sequence[ReshardingTaskSpec]): the specs between a mesh pair.
+        bandwidth_model (ReshardingBandwidthModel): the bandwidth model.
+        link_loads (Optional[Dict]): the transfer time already on each link.
+            It is updated in place.
+
+    Returns:
+        strategies (List[ReshardingStrategy]): the strategy of each spec.
+    """
+    link_loads = {} if link_loads is None else link_loads
+    per_spec_plans = []
+    transfers = []
+    for spec_idx, spec in enumerate(specs):
+        itemsize = spec.aval.dtype.itemsize
+        plans = []
+        for tile_idx, (dst_tile, src_tileslices,
+                       _) in enumerate(spec.dst_tile_to_src_tiles_map):
+            plans.append(
+                np.empty((len(dst_tile.replica_device_strs),
+                          len(src_tileslices)),
+                         dtype=object))
+            for receiver_idx, receiver in enumerate(
+                    dst_tile.replica_device_strs):
+                for src_tileslice_idx, src_tileslice in enumerate(
+                        src_tileslices):
+                    transfers.append(
+                        (src_tileslice.slice_size * itemsize, spec_idx,
+                         tile_idx, receiver_idx, src_tileslice_idx, receiver,
+                         src_tileslice.replica_device_strs))
+        per_spec_plans.append(plans)
+
+    transfers.sort(key=lambda x: -x[0])
+    for (size, spec_idx, tile_idx, receiver_idx, src_tileslice_idx, receiver,
+         senders) in transfers:
+        sender = _assign_sender_lpt(size, senders, [receiver],
+                                    bandwidth_model, link_loads)
+        per_spec_plans[spec_idx][tile_idx][receiver_idx][
+            src_tileslice_idx] = sender
+
+    return [
+        ReshardingStrategy(plans, spec.allgather_spec is not None)
+        for spec, plans in zip(specs, per_spec_plans)
+    ]
+
+
+def plan_broadcast_senders(specs, bandwidth_model, link_loads=None):
+    """
+    Assign the senders of all broadcasts between a mesh pair with LPT.
+
+    See plan_send_recv_senders. A broadcast sends a source tile slice to all
+    replicas of the destination tile.
+    """
+    link_loads = {} if link_loads is None else link_loads
+    per_spec_plans = []
+    transfers = []
+    for spec_idx, spec in enumerate(specs):
+        itemsize = spec.aval.dtype.itemsize
+        plans = []
+        for tile_idx, (dst_tile, src_tileslices,
+                       _) in enumerate(spec.dst_tile_to_src_tiles_map):
+            plans.append(np.empty((len(src_tileslices),), dtype=object))
+            for src_tileslice_idx, src_tileslice in enumerate(src_tileslices):
+                transfers.append(
+                    (src_tileslice.slice_size * itemsize, spec_idx, tile_idx,
+                     src_tileslice_idx, dst_tile.replica_device_strs,
+                     src_tileslice.replica_device_strs))
+        per_spec_plans.append(plans)
+
+    transfers.sort(key=lambda x: -x[0])
+    for (size, spec_idx, tile_idx, src_tileslice_idx, receivers,
+         senders) in transfers:
+        sender = _assign_sender_lpt(size, senders, receivers, bandwidth_model,
+                                    link_loads)
+        per_spec_plans[spec_idx][tile_idx][src_tileslice_idx] = sender
+
+    return [ReshardingStrategy(plans, None) for plans in per_spec_plans]
+
+
+def get_resharding_makespan(specs, bandwidth_model):
+    """Return the max transfer time over all links of the strategies of
+    specs under a bandwidth model."""
+    link_loads = {}
+    for spec in specs:
+        itemsize = spec.aval.dtype.itemsize
+        for (dst_tile, src_tileslices,
+             _), plan in zip(spec.dst_tile_to_src_tiles_map,
+                             spec.strategy.per_spec_plans):
+            for src_tileslice_idx, src_tileslice in enumerate(src_tileslices):
+                size = src_tileslice.slice_size * itemsize
+                if plan.ndim == 1:
+                    transfers = [(plan[src_tileslice_idx],
+                                  dst_tile.replica_device_strs)]
+                else:
+                    transfers = [
+                        (plan[receiver_idx][src_tileslice_idx], [receiver])
+                        for receiver_idx, receiver in enumerate(
+                            dst_tile.replica_device_strs)
+                    ]
+                for sender, receivers in transfers:
+                    for link, time in bandwidth_model.get_link_costs(
+                            size, sender, receivers):
+                        link_loads[link] = link_loads.get(link, 0) + time
+    return max(link_loads.values(), default=0)
+
+
 class CrossMeshCommunicator:
     """
     Communicator for cross-mesh resharding.
@@ -1223,6 +1419,18 @@ class CrossMeshCommunicator:
         self._create_resharding_specs()
         # Generate a send/recv strategies for all resharding tasks by looking at their load.
         for _, _, var_spec_map in self.task_spec_iter():
+            if global_config.resharding_sender_assignment == "lpt":
+                # Plan all specs between a mesh pair together
+                specs = list(var_spec_map.values())
+                if global_config.resharding_mode == "send_recv":
+                    strategies = plan_send_recv_senders(
+                        specs, ReshardingBandwidthModel())
+                else:
+                    strategies = plan_broadcast_senders(
+                        specs, ReshardingBandwidthModel())
+                for spec, strategy in zip(specs, strategies):
+                    spec.set_resharding_strategy(strategy)
+                continue
             for _, spec in var_spec_map.items():
                 if global_config.resharding_mode == "send_recv":
                     strategy = self._generate_send_recv_resharding_strategy_by_loads(spec,
@@ -1342,6 +1550,8 @@ class CrossMeshCommunicator:
             [{} for _ in range(self.num_mesh)] for _ in range(self.num_mesh)
         ]
 
+        plan_cache = get_resharding_plan_cache()
+
         # find stages that will communicate
         pairs = np.argwhere(deps > 0)
         for i in range(pairs.shape[0]):
@@ -1376,7 +1586,18 @@ class CrossMeshCommunicator:
                 # TODO(yonghao): to keep some consistency, record both
                 # dst sharding spec before and after allgather
 
-                if global_config.resharding_mode == "send_recv":
+                plan_template = None
+                if plan_cache is not None:
+                    plan_key = compute_resharding_plan_key(
+                        var.aval, src_sharding_spec, dst_sharding_spec,
+                        (src_mesh.num_hosts, src_mesh.num_devices_per_host),
+                        (dst_mesh.num_hosts, dst_mesh.num_devices_per_host))
+                    plan_template = plan_cache.get(plan_key)
+
+                if plan_template is not None:
+                    dst_sharding_spec = plan_template.dst_sharding_spec
+                    local_chunks = plan_template.local_chunks
+                elif global_config.resharding_mode == "send_recv":
                     dst_sharding_spec, local_chunks = self._rewrite_allgather_spec(
                         dst_sharding_spec, dst_mesh, var.aval.shape)
                 else:
@@ -1391,7 +1612,9 @@ class CrossMeshCommunicator:
                     aval=var.aval,
                     sharding_spec=dst_sharding_spec)
                 task_spec = ReshardingTaskSpec(src_array, dst_array,
-                                               local_chunks)
+                                               local_chunks, plan_template)
+                if plan_cache is not None and plan_template is None:
+                    plan_cache.put(plan_key, task_spec.plan_template)
                 self.resharding_specs[src_mesh_index][dst_mesh_index][repr(
                     var)] = task_spec
 
@@ -211,33 +211,200 @@ def insert_marker(origin_jaxpr, sliced_eqns):
     return clone_jaxpr(origin_jaxpr, eqns=new_eqns)
 
 
-def jaxpr_eqns_input_sizes(jaxpr) -> np.ndarray:
-    """Return a list of input sizes for each equation in the jaxpr.
+def jaxpr_eqns_input_sizes(jaxpr):
+    """Return the def-use events to compute the input sizes of eqn ranges.
+
+    The input size of the l-th to (r - 1)-th equation is the total size of
+    the variables defined by equations before l and used by equations in
+    [l, r). For each variable, every two consecutive equations of its
+    def-use chain form an event (k, u, size): the variable is defined or
+    used by the (k - 1)-th equation and then used by the u-th equation. The
+    input size of [l, r) is the total size of the events with
+    k <= l <= u < r.
 
     Args:
         jaxpr: Jaxpr to get input sizes for.
 
     Returns:
-        A #eqns * #eqns numpy array of input sizes. cost[l, r] represents the
-        input size of the l-th to (r - 1)-th equation in the jaxpr.
+        The (eqn, use, size) arrays of all events, sorted by eqn.
     """
-    length = len(jaxpr.eqns)
-    input_sizes = np.full((length + 1, length + 1), 0, dtype=np.float32)
-
-    outvars = OrderedSet()
-    for k in range(0, length + 1):
-        if k > 0:
-            outvars = outvars.union(jaxpr.eqns[k - 1].outvars)
-        invars = OrderedSet()
-        total_size = 0
-        for r in range(k + 1, length + 1):
-            for invar in jaxpr.eqns[r - 1].invars:
-                if (isinstance(invar, Var) and invar in outvars and
-                        invar not in invars):
-                    invars.add(invar)
-                    total_size += invar.aval.size * invar.aval.dtype.itemsize
-            input_sizes[k, r] = total_size
-    return input_sizes
+    last_seen = {}  # Dict[Var -> the last eqn defining or using it]
+    var_sizes = {}
+    event_eqns, event_uses, event_sizes = [], [], []
+    for i, eqn in enumerate(jaxpr.eqns):
+        for invar in eqn.invars:
+            if isinstance(invar, Var) and invar in last_seen:
+                if last_seen[invar] == i:
+                    continue
+                event_eqns.append(last_seen[invar] + 1)
+                event_uses.append(i)
+                event_sizes.append(var_sizes[invar])
+                last_seen[invar] = i
+        for outvar in eqn.outvars:
+            if not isinstance(outvar, DropVar):
+                last_seen[outvar] = i
+                var_sizes[outvar] = (outvar.aval.size *
+                                     outvar.aval.dtype.itemsize)
+
+    order = np.argsort(np.array(event_eqns, dtype=np.int64), kind="stable")
+    return (np.array(event_eqns, dtype=np.int64)[order],
+            np.array(event_uses, dtype=np.int64)[order],
+            np.array(event_sizes, dtype=np.float64)[order])
+
+
+@numba.jit(nopython=True)
+def get_layer_windows(non_trivial, compute_costs, compute_costs_bound,
+                      layer_heavy_op_lower_bound):
+    """Return the windows of feasible layers.
+
+    The l-th to (r - 1)-th equations can form a layer iff
+    window_starts[l] <= r < window_ends[l]. Both bounds are non-decreasing
+    in l.
+    """
+    length = len(non_trivial)
+    window_starts = np.full(length, length + 1, dtype=np.int64)
+    window_ends = np.full(length, length + 1, dtype=np.int64)
+    for left in range(1, length + 1):
+        cnt = 0
+        total_compute_cost = 0.0
+        start = length + 1
+        for r in range(left, length + 1):
+            if non_trivial[r - 1]:
+                cnt += 1
+                total_compute_cost += compute_costs[r - 1]
+            if cnt < layer_heavy_op_lower_bound:
+                if total_compute_cost >= compute_costs_bound:
+                    start = min(start, r)
+                continue
+            if (total_compute_cost >= compute_costs_bound and
+                    non_trivial[r - 1] and cnt > layer_heavy_op_lower_bound):
+                window_ends[left - 1] = r
+                break
+            start = min(start, r)
+        window_starts[left - 1] = start
+    return window_starts, window_ends
+
+
+@numba.jit(nopython=True)
+def cluster_dp(layer_num, window_starts, window_ends, event_eqns, event_uses,
+               event_sizes):
+    """Run the layer clustering DP over the windows of feasible layers.
+
+    The input sizes of a row of the window are accumulated on the fly from
+    the def-use events, so no (#eqns, #eqns) matrix is materialized.
+    """
+    length = len(window_starts)
+    max_cost = np.full((length + 1, layer_num + 1), np.inf, dtype=np.float32)
+    sum_cost_under_max = np.full((length + 1, layer_num + 1),
+                                 np.inf,
+                                 dtype=np.float32)
+    max_cost_argmin = np.full((length + 1, layer_num + 1), -1, dtype=np.int32)
+    solution_imbalance = np.full((length + 1, layer_num + 1),
+                                 np.inf,
+                                 dtype=np.float32)
+    max_cost[0, 0] = 0
+    sum_cost_under_max[0, 0] = 0
+    # Currently use variance to measure imbalance
+    for r in range(0, length + 1):
+        solution_imbalance[r, 0] = 0
+
+    # next_use_sizes[u] is the size of the variables defined or used
+    # before the current k and then used by the u-th equation
+    next_use_sizes = np.zeros(length + 1, dtype=np.float64)
+    for q in range(1, layer_num + 1):
+        next_use_sizes[:] = 0
+        e = 0
+        for k in range(0, length):
+            while e < len(event_eqns) and event_eqns[e] <= k:
+                next_use_sizes[event_uses[e]] += event_sizes[e]
+                e += 1
+            if max_cost[k, q - 1] == np.inf:
+                continue
+            start = window_starts[k]
+            if start >= window_ends[k]:
+                continue
+            input_size = 0.0
+            for u in range(k, start - 1):
+                input_size += next_use_sizes[u]
+            for r in range(start, window_ends[k]):
+                input_size += next_use_sizes[r - 1]
+                cost = np.float32(input_size)
+                new_value = max(max_cost[k, q - 1], cost)
+                new_sum = sum_cost_under_max[k, q - 1] + cost
+                new_imbalance = (solution_imbalance[k, q - 1] + k**2 / q -
+                                 r**2 / (q + 1) + (r - k)**2)
+                if (new_value < max_cost[r, q] or
+                    (new_value <= max_cost[r, q] * (1 + 1e-4) and
+                     (new_sum < sum_cost_under_max[r, q] or
+                      (new_sum <= sum_cost_under_max[r, q] * (1 + 1e-4) and
+                       new_imbalance < solution_imbalance[r, q])))):
+                    max_cost[r, q] = new_value
+                    sum_cost_under_max[r, q] = new_sum
+                    max_cost_argmin[r, q] = k
+                    solution_imbalance[r, q] = new_imbalance
+
+    if max_cost[length, layer_num] == np.inf:
+        # Without a feasible solution, fall back to the most balanced
+        # clustering that ignores the windows
+        for q in range(1, layer_num + 1):
+            for r in range(1, length + 1):
+                if max_cost[r, q] != np.inf:
+                    continue
+                for k in range(0, r):
+                    new_imbalance = (solution_imbalance[k, q - 1] + k**2 / q -
+                                     r**2 / (q + 1) + (r - k)**2)
+                    if new_imbalance < solution_imbalance[r, q]:
+                        max_cost_argmin[r, q] = k
+                        solution_imbalance[r, q] = new_imbalance
+    return max_cost_argmin, max_cost[length, layer_num]
+
+
+@numba.jit(nopython=True)
+def check_clustering_feasible(layer_num, window_starts, window_ends,
+                              event_eqns, event_uses, event_sizes,
+                              max_cost_bound):
+    """Check whether the equations can be clustered into layer_num layers
+    within the windows and with every layer cost at most max_cost_bound.
+
+    Since the input size is non-decreasing in r, the feasible right ends
+    of a left end form an interval. The reachable ends of q layers are then
+    propagated with prefix sums in O(#eqns) per layer instead of running
+    the O(#eqns * window) DP.
+    """
+    length = len(window_starts)
+    # Feasible right ends of the layer starting at k are [start, limits[k])
+    limits = np.zeros(length, dtype=np.int64)
+    next_use_sizes = np.zeros(length + 1, dtype=np.float64)
+    e = 0
+    for k in range(0, length):
+        while e < len(event_eqns) and event_eqns[e] <= k:
+            next_use_sizes[event_uses[e]] += event_sizes[e]
+            e += 1
+        start = window_starts[k]
+        limits[k] = start
+        input_size = 0.0
+        for u in range(k, start - 1):
+            input_size += next_use_sizes[u]
+        for r in range(start, window_ends[k]):
+            input_size += next_use_sizes[r - 1]
+            if np.float32(input_size) > max_cost_bound:
+                break
+            limits[k] = r + 1
+
+    reachable = np.zeros(length + 1, dtype=np.bool_)
+    reachable[0] = True
+    delta = np.zeros(length + 2, dtype=np.int64)
+    for _ in range(layer_num):
+        delta[:] = 0
+        for k in range(0, length):
+            if reachable[k] and window_starts[k] < limits[k]:
+                delta[window_starts[k]] += 1
+                delta[limits[k]] -= 1
+        cnt = 0
+        for r in range(0, length + 1):
+            cnt += delta[r]
+            reachable[r] = cnt > 0
+    return reachable[length]
 
 
 def get_layer_construction_costs(jaxpr, cost_criteria="flops"):
@@ -264,12 +431,10 @@ def get_layer_construction_costs(jaxpr, cost_criteria="flops"):
     return nontrivial, input_sizes, compute_costs
 
 
-def cluster_jaxpr_by_cost(jaxpr: Jaxpr, layer_num: int, eps: float, costs,
-                          cost_criteria):
-    """Clusters the jaxpr by cost."""
-    layer_num = int(layer_num)
-    length = len(jaxpr.eqns)
-    non_trivial, input_sizes, compute_costs = costs
+def get_clustering_windows(layer_num: int, eps: float, costs, cost_criteria):
+    """Return the windows of feasible layers when clustering into layer_num
+    layers."""
+    non_trivial, _, compute_costs = costs
     compute_costs_avg = compute_costs.sum() / layer_num
     if cost_criteria in ("flops", "input_memory"):
         compute_costs_bound = compute_costs_avg * (1 + eps)
@@ -285,75 +450,28 @@ def cluster_jaxpr_by_cost(jaxpr: Jaxpr, layer_num: int, eps: float, costs,
             "Too few non-trivial ops (dot, conv), which may influence"
             " auto-sharding performance")
 
-    @numba.jit(nopython=True)
-    def init():
-        blocked = np.full((length + 1, length + 1), np.inf, dtype=np.float32)
-        for left in range(1, length + 1):
-            cnt = 0
-            total_compute_cost = 0
-            for r in range(left, length + 1):
-                if non_trivial[r - 1]:
-                    cnt += 1
-                    total_compute_cost += compute_costs[r - 1]
-                if cnt < layer_heavy_op_lower_bound:
-                    if total_compute_cost >= compute_costs_bound:
-                        blocked[left, r] = 0
-                    continue
-                if (total_compute_cost >= compute_costs_bound and
-                        non_trivial[r - 1] and
-                        cnt > layer_heavy_op_lower_bound):
-                    break
-                blocked[left, r] = 0
-        return blocked
-
-    @numba.jit(nopython=True)
-    def dp(input_sizes, blocked):
-        max_cost = np.full((length + 1, layer_num + 1),
-                           np.inf,
-                           dtype=np.float32)
-        sum_cost_under_max = np.full((length + 1, layer_num + 1),
-                                     np.inf,
-                                     dtype=np.float32)
-        max_cost_argmin = np.full((length + 1, layer_num + 1),
-                                  -1,
-                                  dtype=np.int32)
-        solution_imbalance = np.full((length + 1, layer_num + 1),
-                                     np.inf,
-                                     dtype=np.float32)
-        max_cost[0, 0] = 0
-        sum_cost_under_max[0, 0] = 0
-        # Currently use variance to measure imbalance
-        for r in range(0, length + 1):
-            solution_imbalance[r, 0] = 0
+    return get_layer_windows(non_trivial, compute_costs, compute_costs_bound,
+                             layer_heavy_op_lower_bound)
 
-        for q in range(1, layer_num + 1):
-            for r in range(1, length + 1):
-                for k in range(0, r):
-                    new_value = max(max_cost[k, q - 1],
-                                    blocked[k + 1, r] + input_sizes[k, r])
-                    new_sum = (sum_cost_under_max[k, q - 1] +
-                               blocked[k + 1, r] + input_sizes[k, r])
-                    new_imbalance = (solution_imbalance[k, q - 1] + k**2 / q -
-                                     r**2 / (q + 1) + (r - k)**2)
-                    if (new_value < max_cost[r, q] or
-                        (new_value <= max_cost[r, q] * (1 + 1e-4) and
-                         (new_sum < sum_cost_under_max[r, q] or
-                          (new_sum <= sum_cost_under_max[r, q] * (1 + 1e-4) and
-                           new_imbalance < solution_imbalance[r, q])))):
-                        max_cost[r, q] = new_value
-                        sum_cost_under_max[r, q] = new_sum
-                        max_cost_argmin[r, q] = k
-                        solution_imbalance[r, q] = new_imbalance
-        return max_cost_argmin, max_cost[length, layer_num]
 
-    blocked = init()
-    a_argmin, value = dp(input_sizes, blocked)
+def cluster_jaxpr_by_cost(jaxpr: Jaxpr, layer_num: int, eps: float, costs,
+                          cost_criteria):
+    """Clusters the jaxpr by cost."""
+    layer_num = int(layer_num)
+    length = len(jaxpr.eqns)
+    window_starts, window_ends = get_clustering_windows(
+        layer_num, eps, costs, cost_criteria)
+    a_argmin, value = cluster_dp(layer_num, window_starts, window_ends,
+                                 *costs[1])
 
     reversed_sliced_eqns = []
 
     r = length
     for q in range(layer_num, 0, -1):
         k = a_argmin[r, q]
+        if k == -1:
+            r = -1
+            break
         reversed_sliced_eqns.append(jaxpr.eqns[k:r])
         r = k
     assert r == 0, ("no solution for layer clustering"
@@ -384,30 +502,37 @@ def cluster_jaxpr_by_cost(jaxpr: Jaxpr, layer_num: int, eps: float, costs,
 def search_layer_num(jaxpr,
                      eps,
                      layer_eps=0,
-                     cost_criteria=DEFAULT_COST_CRITERIA):
-    """TODO(zhuohan): docstring."""
-    non_trivial, input_sizes, compute_costs = get_layer_construction_costs(
-        jaxpr)
+                     cost_criteria=DEFAULT_COST_CRITERIA,
+                     costs=None):
+    """Binary search the largest layer number whose total cost is within
+    (1 + layer_eps) of the total cost of 2 layers.
+
+    The windows of feasible layers depend on the layer number, so the
+    costs are shared but each probe checks its own windows. A probe only
+    needs to know whether the bound is met, which is checked without
+    running the clustering DP.
+    """
+    if costs is None:
+        costs = get_layer_construction_costs(jaxpr)
+    non_trivial = costs[0]
     layer_num = 2
     r = int(non_trivial.sum() / 3) + 1
-    _, solution_info = cluster_jaxpr_by_cost(
-        jaxpr,
-        layer_num,
-        eps, (non_trivial, input_sizes, compute_costs),
-        cost_criteria=cost_criteria)
-    l_val = solution_info["total_cost"]
+    _, solution_info = cluster_jaxpr_by_cost(jaxpr,
+                                             layer_num,
+                                             eps,
+                                             costs,
+                                             cost_criteria=cost_criteria)
+    max_cost_bound = float(solution_info["total_cost"]) * (1 + layer_eps)
     while r - layer_num > 1:
         mid = int((layer_num + r) / 2)
-        _, solution_info = cluster_jaxpr_by_cost(
-            jaxpr,
-            mid,
-            eps, (non_trivial, input_sizes, compute_costs),
-            cost_criteria=cost_criteria)
-        mid_val = solution_info["total_cost"]
-        if mid_val > l_val * (1 + layer_eps):
-            r = mid
-        else:
+        window_starts, window_ends = get_clustering_windows(
+            mid, eps, costs, cost_criteria)
+        # An infinite total cost is not larger than an infinite bound
+        if max_cost_bound == np.inf or check_clustering_feasible(
+                mid, window_starts, window_ends, *costs[1], max_cost_bound):
             layer_num = mid
+        else:
+            r = mid
     return layer_num
 
 
@@ -432,10 +557,15 @@ def layer_level_jaxpr_transformation(fn: Callable,
                                            return_shape=True)(*args)
         if auto_layer_boundary:
             nonlocal layer_num
-            if layer_num == "auto":
-                layer_num = search_layer_num(jaxpr, eps, layer_eps)
             costs = get_layer_construction_costs(jaxpr,
                                                  cost_criteria=cost_criteria)
+            if layer_num == "auto":
+                # The search always uses the flops costs
+                layer_num = search_layer_num(
+                    jaxpr,
+                    eps,
+                    layer_eps,
+                    costs=costs if cost_criteria == "flops" else None)
             sliced_eqns, _ = cluster_jaxpr_by_cost(jaxpr,
                                                    layer_num,
                                                    eps,
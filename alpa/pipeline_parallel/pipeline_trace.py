@@ -0,0 +1,140 @@
+"""Timeline tracing of the pipeshard runtime.
+
+Each worker records the start and end time of every pipeline instruction in
+a preallocated ring buffer. The driver collects the records of all workers
+and merges them into a Chrome trace, which can be opened in
+chrome://tracing or https://ui.perfetto.dev.
+"""
+import json
+from typing import Sequence
+
+import numpy as np
+
+trace_record_dtype = np.dtype([
+    ("start", np.float64),
+    ("end", np.float64),
+    ("opcode", np.int8),
+    ("task_uuid", np.int64),
+    ("batch_idx", np.int32),
+    ("stage_idx", np.int32),
+])
+
+
+class InstructionTraceBuffer:
+    """A ring buffer of instruction trace records on a worker.
+
+    The static fields (opcode, task uuid, micro batch and stage index) of
+    all instructions are stored once. A record only writes the instruction
+    index and its start and end time. When the buffer is full, the oldest
+    records are overwritten.
+
+    Args:
+      capacity: The maximum number of records kept.
+      instructions: The instructions of the worker.
+    """
+
+    def __init__(self, capacity: int, instructions: Sequence):
+        assert capacity > 0
+        self.capacity = capacity
+        self.starts = np.zeros(capacity, dtype=np.float64)
+        self.ends = np.zeros(capacity, dtype=np.float64)
+        self.instruction_indices = np.zeros(capacity, dtype=np.int64)
+        self.num_records = 0
+
+        self.static_records = np.zeros(len(instructions),
+                                       dtype=trace_record_dtype)
+        for i, instruction in enumerate(instructions):
+            self.static_records[i]["opcode"] = int(instruction.opcode)
+            self.static_records[i]["task_uuid"] = (
+                -1 if instruction.task_uuid is None else instruction.task_uuid)
+            self.static_records[i]["batch_idx"] = instruction.batch_idx
+            self.static_records[i]["stage_idx"] = instruction.stage_idx
+
+    def record(self, instruction_idx: int, start: float, end: float):
+        """Record the execution of an instruction."""
+        pos = self.num_records % self.capacity
+        self.instruction_indices[pos] = instruction_idx
+        self.starts[pos] = start
+        self.ends[pos] = end
+        self.num_records += 1
+
+    def get_records(self) -> np.ndarray:
+        """Return the kept records in time order as a structured array."""
+        num = min(self.num_records, self.capacity)
+        order = (np.arange(num) + self.num_records - num) % self.capacity
+        records = self.static_records[self.instruction_indices[order]]
+        records["start"] = self.starts[order]
+        records["end"] = self.ends[order]
+        return records
+
+    def clear(self):
+        """Remove all records."""
+        self.num_records = 0
+
+
+def get_chrome_trace(records_per_mesh: Sequence[Sequence[np.ndarray]],
+                     opcode_names: Sequence[str] = None):
+    """Merge the trace records of all workers into a Chrome trace.
+
+    Each mesh is shown as a process and each host of a mesh as a thread.
+
+    Args:
+      records_per_mesh: records_per_mesh[i][j] is the records of the j-th
+        worker of the i-th mesh, as returned by
+        InstructionTraceBuffer.get_records.
+      opcode_names: The name of each opcode.
+
+    Returns:
+      The trace as a dict in the Chrome trace event format.
+    """
+    events = []
+    for mesh_idx, mesh_records in enumerate(records_per_mesh):
+        events.append({
+            "name": "process_name",
+            "ph": "M",
+            "pid": mesh_idx,
+            "args": {
+                "name": f"mesh {mesh_idx}"
+            }
+        })
+        for worker_idx, records in enumerate(mesh_records):
+            events.append({
+                "name": "thread_name",
+                "ph": "M",
+                "pid": mesh_idx,
+                "tid": worker_idx,
+                "args": {
+                    "name": f"host {worker_idx}"
+                }
+            })
+            for record in records:
+                opcode = int(record["opcode"])
+                name = (opcode_names[opcode]
+                        if opcode_names is not None else str(opcode))
+                batch_idx = int(record["batch_idx"])
+                stage_idx = int(record["stage_idx"])
+                if stage_idx >= 0:
+                    name += f" stage {stage_idx}"
+                events.append({
+                    "name": name,
+                    "cat": name.split()[0],
+                    "ph": "X",
+                    "ts": float(record["start"]) * 1e6,
+                    "dur": float(record["end"] - record["start"]) * 1e6,
+                    "pid": mesh_idx,
+                    "tid": worker_idx,
+                    "args": {
+                        "task_uuid": int(record["task_uuid"]),
+                        "batch_idx": batch_idx,
+                        "stage_idx": stage_idx,
+                    }
+                })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def dump_chrome_trace(records_per_mesh: Sequence[Sequence[np.ndarray]],
+                      filename: str,
+                      opcode_names: Sequence[str] = None):
+    """Merge the trace records of all workers and write them to a file."""
+    with open(filename, "w", encoding="utf-8") as fout:
+        json.dump(get_chrome_trace(records_per_mesh, opcode_names), fout)
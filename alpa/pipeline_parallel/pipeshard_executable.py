@@ -2,6 +2,8 @@
 from collections import namedtuple, defaultdict
 from dataclasses import dataclass
 import enum
+from functools import partial
+from itertools import chain
 import logging
 import time
 from typing import Any, Dict, Sequence, List, Callable, Optional, Union
@@ -20,11 +22,15 @@ from alpa.mesh_executable import (AllocZeroBufferWorkerExecutable, ConcatMeshWor
                                   MemzeroWorkerExecutable,
                                   PartialGradAccMeshWorkerExecutable,
                                   next_mesh_executable_uuid, get_uuid_np_array,
-                                  next_remote_buffer_uuid, RemoteBufferRef)
+                                  next_remote_buffer_uuid,
+                                  create_remote_array_refs,
+                                  set_buffers_deleted_on_workers)
 from alpa.pipeline_parallel.cross_mesh_resharding import (
     CrossMeshCommunicator, SymbolicReshardingTask, SymbolicBroadcastReshardingTask)
 from alpa.pipeline_parallel.schedules import cached_property, PipelineSchedule
 from alpa.pipeline_parallel.computation import XlaShardedPipelineComputation
+from alpa.pipeline_parallel.pipeline_trace import (InstructionTraceBuffer,
+                                                   dump_chrome_trace)
 from alpa.serialization import LoadInfo
 from alpa.timer import timers
 from alpa.util import (DisjointDict, OrderedSet, get_shard_shape, get_microbatch_sharding_spec,
@@ -56,6 +62,16 @@ class PipelineInstType(enum.IntEnum):
     BROADCAST = 4
 
 
+# The worker timer of each instruction type
+instruction_timer_names = {
+    PipelineInstType.RUN: "compute",
+    PipelineInstType.SEND: "resharding_send",
+    PipelineInstType.RECV: "resharding_recv",
+    PipelineInstType.BROADCAST: "resharding_broadcast",
+    PipelineInstType.FREE: "free",
+}
+
+
 @dataclass
 class PipelineInstruction:
     """Base class for pipeline instructions."""
@@ -67,6 +83,9 @@ class PipelineInstruction:
     opaques: Optional[Dict[str, Any]]
     info: str
     print_uuids: bool = False
+    # The micro batch and stage the instruction works for. -1 if unknown.
+    batch_idx: int = -1
+    stage_idx: int = -1
 
     @classmethod
     def Run(cls, task_uuid, input_uuids, output_uuids, kwargs, info=""):  # noqa
@@ -200,6 +219,9 @@ class PipeshardDriverExecutable:
         self.num_batch = num_batch
         self.flop_count = flop_count
         self.in_tree = in_tree
+        # The size of the instruction trace buffer of each worker. 0 disables
+        # tracing.
+        self.trace_buffer_size = global_config.pipeline_trace_buffer_size
 
         ##### Internal states #####
         self.uuid_counter = 0  # counter for local buffer uuid
@@ -267,7 +289,8 @@ class PipeshardDriverExecutable:
                         executable_config_lists[worker],
                         acc_grad_local_uuids,
                         reduced_var_uuid_lists[worker],
-                        self.donate_invars[mesh_idx])
+                        self.donate_invars[mesh_idx],
+                        self.trace_buffer_size)
                 uuid = next_mesh_executable_uuid()
                 worker.put_executable.remote(uuid, PipeshardMeshWorkerExecuable,
                                              *args)
@@ -423,12 +446,22 @@ class PipeshardDriverExecutable:
             physical_mesh = self.mesh_group[mesh_idx]
             num_devices_per_host = physical_mesh.num_devices_per_host
             batch_idx, stage_idx = task
+            num_instructions = {
+                worker: len(instructions)
+                for worker, instructions in instruction_lists.items()
+            }
             stage = self.stages[stage_idx]
             # shard_args for intermediates
             to_reshard_vars = []
             reshard_sharding_specs = []
             for invar, spec in zip(stage.invars, stage.input_sharding_specs):
                 _, key = get_invar_key(invar, batch_idx)
+                # The tasks of one clock are compiled in mesh order, so a
+                # task can only use the outputs of previous clocks.
+                if key not in var_at:
+                    raise RuntimeError(
+                        f"Task {task} on mesh {mesh_idx} uses {invar}, which "
+                        "is not produced by the previous clocks.")
                 if mesh_idx in var_at[key]:
                     # have a copy at the current mesh
                     continue
@@ -442,6 +475,11 @@ class PipeshardDriverExecutable:
                                              batch_idx, instruction_lists,
                                              executable_config_lists, var_at,
                                              get_invar_key)
+            # Tag the resharding instructions with the task receiving them
+            for worker, instructions in instruction_lists.items():
+                for instruction in instructions[num_instructions[worker]:]:
+                    instruction.batch_idx = batch_idx
+                    instruction.stage_idx = stage_idx
 
             # execute
             # allocate uuids for buffers created by RUN
@@ -476,12 +514,14 @@ class PipeshardDriverExecutable:
                     "sync_after": False,
                 }
 
-                worker_tmp_instructions[worker].append(
-                    PipelineInstruction.Run(exec_uuid,
-                                            input_uuids,
-                                            output_uuids,
-                                            kwargs,
-                                            info=f"stage {stage_idx}"))
+                instruction = PipelineInstruction.Run(exec_uuid,
+                                                      input_uuids,
+                                                      output_uuids,
+                                                      kwargs,
+                                                      info=f"stage {stage_idx}")
+                instruction.batch_idx = batch_idx
+                instruction.stage_idx = stage_idx
+                worker_tmp_instructions[worker].append(instruction)
 
         for worker, worker_instruction in worker_tmp_instructions.items():
             instruction_lists[worker].extend(worker_instruction)
@@ -918,8 +958,11 @@ class PipeshardDriverExecutable:
             if not instruction.opcode == PipelineInstType.FREE:
                 unused_uuids = input_uuids.difference(cannot_free_uuids)
                 if len(unused_uuids) > 0:
-                    new_list.append(
-                        PipelineInstruction.Free(np.array(list(unused_uuids))))
+                    free_instruction = PipelineInstruction.Free(
+                        np.array(list(unused_uuids)))
+                    free_instruction.batch_idx = instruction.batch_idx
+                    free_instruction.stage_idx = instruction.stage_idx
+                    new_list.append(free_instruction)
             cannot_free_uuids.update(input_uuids)
             new_list.append(instruction)
         return list(reversed(new_list))
@@ -1082,22 +1125,12 @@ class PipeshardDriverExecutable:
             inputs = input_bufs[mesh_idx]
             for bufs, donate in zip(inputs, self.donate_invars[mesh_idx]):
                 if donate:
-                    for buf in bufs:
-                        buf.set_deleted_on_workers()
+                    set_buffers_deleted_on_workers(bufs)
 
         # Construct output_bufs
         for mesh_idx, physical_mesh in enumerate(self.mesh_group):
-            num_devices_per_host = physical_mesh.num_devices_per_host
-            output_uuid_transposed = output_uuids[mesh_idx].transpose([1, 0, 2])
-            output_bufs[mesh_idx] = np.empty(
-                (num_outs[mesh_idx], physical_mesh.num_devices), dtype=object)
-            for i in range(num_outs[mesh_idx]):
-                for j in range(physical_mesh.num_devices):
-                    host_id = j // num_devices_per_host
-                    device_id = j % num_devices_per_host
-                    output_bufs[mesh_idx][i][j] = RemoteBufferRef(
-                        physical_mesh, host_id, device_id,
-                        output_uuid_transposed[i][host_id][device_id])
+            output_bufs[mesh_idx] = create_remote_array_refs(
+                physical_mesh, output_uuids[mesh_idx].transpose([1, 0, 2]))
 
         # Check if there is OOM
         if global_config.pipeline_check_alive:
@@ -1112,6 +1145,13 @@ class PipeshardDriverExecutable:
             bool(len(self.outvar_index_to_mesh_index_mapping[i]) > 1)
             for i, _ in enumerate(self.global_outvars)
         ]
+        # Dict[(outvar_index, mesh_idx) -> indices]
+        indices = {}
+        for i, aval in enumerate(avals):
+            for mesh_idx in self.outvar_index_to_mesh_index_mapping[i]:
+                outvar_index_on_mesh = self.mesh_output_indices[i][mesh_idx]
+                spec = self.output_spec_list[mesh_idx][outvar_index_on_mesh]
+                indices[(i, mesh_idx)] = pxla.spec_to_indices(aval.shape, spec)
 
         def outs_handler(bufs):
             ret = []
@@ -1128,7 +1168,7 @@ class PipeshardDriverExecutable:
                         aval=aval,
                         sharding_spec=spec,
                         remote_buffers=bufs[mesh_idx][outvar_index_on_mesh],
-                        indices=pxla.spec_to_indices(aval.shape, spec))
+                        indices=indices[(i, mesh_idx)])
                 else:
                     # otherwise, construct RepliatedDistributedArray
                     meshes = []
@@ -1147,7 +1187,7 @@ class PipeshardDriverExecutable:
                                 sharding_spec=spec,
                                 remote_buffers=bufs[mesh_idx]
                                 [outvar_index_on_mesh],
-                                indices=pxla.spec_to_indices(aval.shape, spec)))
+                                indices=indices[(i, mesh_idx)]))
                     arr = ReplicatedDistributedArray(meshes, distributed_arrays)
                 ret.append(arr)
             return ret
@@ -1206,6 +1246,45 @@ class PipeshardDriverExecutable:
             for mesh in self.mesh_group:
                 mesh.reset_remote_timer(name)
 
+    def get_pipeline_trace_records(self):
+        """
+        Get the instruction trace records of all workers.
+
+        Tracing is enabled by global_config.pipeline_trace_buffer_size when
+        the executable is compiled.
+
+        Returns:
+            records (List[List[np.ndarray]]): records[i][j] is the records of
+                the j-th worker of the i-th mesh in time order.
+        """
+        if not self.trace_buffer_size:
+            raise RuntimeError(
+                "Pipeline tracing is disabled for this executable. Set "
+                "global_config.pipeline_trace_buffer_size before compiling.")
+        all_handles = []
+        for physical_mesh in self.mesh_group:
+            all_handles.append([
+                worker.get_exec_trace_records.remote(
+                    self.worker_executable_uuid_mapping[worker])
+                for worker in physical_mesh.workers
+            ])
+        records = [ray.get(handles) for handles in all_handles]
+        for mesh_idx, mesh_records in enumerate(records):
+            for worker_idx, worker_records in enumerate(mesh_records):
+                if worker_records is None:
+                    raise RuntimeError(
+                        f"Worker {worker_idx} of mesh {mesh_idx} did not "
+                        f"record the pipeline trace.")
+        return records
+
+    def dump_pipeline_trace(self, filename: str):
+        """Dump the instruction timeline of all meshes as a Chrome trace."""
+        opcode_names = [None] * len(PipelineInstType)
+        for opcode in PipelineInstType:
+            opcode_names[opcode] = opcode.name
+        dump_chrome_trace(self.get_pipeline_trace_records(), filename,
+                          opcode_names)
+
     def get_hlo_text(self, after_spmd_partitioner=True):
         """Return the HLO text for all stages."""
         if after_spmd_partitioner:
@@ -1300,13 +1379,18 @@ class PipeshardMeshWorkerExecuable:
                  executable_configs: Sequence[ExecutableConfig],
                  acc_local_uuids: np.ndarray,
                  acc_out_uuids: Sequence[Sequence[int]],
-                 donate_invars: Sequence[bool]):
+                 donate_invars: Sequence[bool],
+                 trace_buffer_size: int = 0):
         # Instruction Lists
         self.my_uuid = uuid
         self.instructions = instructions
         self.input_local_uuids = input_local_uuids
         self.output_local_uuids = output_local_uuids
         self.donate_invars = donate_invars
+        self._input_local_uuids_flat = list(chain.from_iterable(
+            input_local_uuids))
+        self._output_local_uuids_flat = list(chain.from_iterable(
+            output_local_uuids))
 
         # Buffer management
         self.worker = worker
@@ -1361,16 +1445,68 @@ class PipeshardMeshWorkerExecuable:
                 raise ValueError(f"Invalid task config {task_config}")
         self.partial_grad_exec_uuids = list(self.partial_grad_exec_uuids)
 
+        self.instruction_segments = self._compile_instructions(instructions)
+        self.trace_buffer = (InstructionTraceBuffer(trace_buffer_size,
+                                                    instructions)
+                             if trace_buffer_size else None)
+
+    def _bind_instruction(self, instruction: PipelineInstruction):
+        """Bind the worker method of an instruction with all its args."""
+        opcode = instruction.opcode
+        if opcode == PipelineInstType.RUN:
+            return partial(self.worker.run_executable, instruction.task_uuid,
+                           instruction.input_uuids, instruction.output_uuids,
+                           **instruction.opaques["kwargs"])
+        if opcode == PipelineInstType.SEND:
+            return partial(self.worker.run_resharding_send_task,
+                           instruction.task_uuid, instruction.input_uuids)
+        if opcode == PipelineInstType.RECV:
+            return partial(self.worker.run_resharding_recv_task,
+                           instruction.task_uuid, instruction.output_uuids,
+                           instruction.opaques["set_empty_buffer"],
+                           instruction.opaques["allgather_uuid"])
+        if opcode == PipelineInstType.BROADCAST:
+            return partial(
+                self.worker.run_resharding_broadcast_task,
+                instruction.task_uuid, instruction.input_uuids
+                if instruction.input_uuids is not None else
+                instruction.output_uuids)
+        if opcode == PipelineInstType.FREE:
+            return partial(self.worker.delete_buffers, instruction.input_uuids)
+        raise ValueError(f"Invalid instruction opcode {opcode}")
+
+    def _compile_instructions(self, instructions):
+        """
+        Compile the instructions into segments of pre-bound calls.
+
+        Consecutive instructions of the same type form a segment, whose
+        timer is started and suspended once. The runtime loop then does no
+        opcode dispatch or opaque lookup per instruction.
+
+        Returns:
+            segments (List[Tuple[str, Tuple[Callable]]]): the timer name and
+                the calls of each segment.
+        """
+        segments = []
+        for instruction in instructions:
+            timer_name = instruction_timer_names[instruction.opcode]
+            call = self._bind_instruction(instruction)
+            if segments and segments[-1][0] == timer_name:
+                segments[-1][1].append(call)
+            else:
+                segments.append((timer_name, [call]))
+        return [(timer_name, tuple(calls)) for timer_name, calls in segments]
+
     def execute_on_worker(self, input_global_uuids, output_global_uuids,
                           sync_for_timer):
         """Execute on the mesh worker given input and output uuids."""
         # create a local buffer environment
         assert len(self.input_local_uuids) == len(input_global_uuids)
-        buffers = {}
-        for local_ids, global_ids in zip(self.input_local_uuids,
-                                         input_global_uuids):
-            for local_id, global_id in zip(local_ids, global_ids):
-                buffers[local_id] = self.global_buffers[global_id]
+        buffers = dict(
+            zip(
+                self._input_local_uuids_flat,
+                map(self.global_buffers.__getitem__,
+                    chain.from_iterable(input_global_uuids))))
         # add preallocated buffers for gradient accumulation
         buffers.update(self.acc_grad_buffers)
         # donate invars
@@ -1383,44 +1519,15 @@ class PipeshardMeshWorkerExecuable:
 
         # Execute
         timers("overall").start(sync_func=sync_func)
-        for instruction in self.instructions:
-            # print(f"memory_allocated: {self.worker.get_memory_allocated()/1024**3:.3f} GB  "
-            #       f"max_memory_allocated: {self.worker.get_max_memory_allocated()/1024**3:.3f} GB "
-            #       f"next instruction: {instruction}")
-            if instruction.opcode == PipelineInstType.RUN:
-                timers("compute").start()
-                self.worker.run_executable(instruction.task_uuid,
-                                           instruction.input_uuids,
-                                           instruction.output_uuids,
-                                           **instruction.opaques["kwargs"])
-                timers("compute").suspend()
-            elif instruction.opcode == PipelineInstType.SEND:
-                timers("resharding_send").start()
-                self.worker.run_resharding_send_task(instruction.task_uuid,
-                                                     instruction.input_uuids)
-                timers("resharding_send").suspend()
-            elif instruction.opcode == PipelineInstType.RECV:
-                timers("resharding_recv").start()
-                self.worker.run_resharding_recv_task(
-                    instruction.task_uuid, instruction.output_uuids,
-                    instruction.opaques["set_empty_buffer"])
-                # TODO(lmzheng): move this to run_resharding_recv_task
-                if instruction.opaques["allgather_uuid"] is not None:
-                    self.worker.run_allgather_task(
-                        instruction.opaques["allgather_uuid"],
-                        instruction.output_uuids)
-                timers("resharding_recv").suspend()
-            elif instruction.opcode == PipelineInstType.BROADCAST:
-                timers("resharding_broadcast").start()
-                self.worker.run_resharding_broadcast_task(
-                    instruction.task_uuid,
-                    instruction.input_uuids if instruction.input_uuids
-                    is not None else instruction.output_uuids)
-                timers("resharding_broadcast").suspend()
-            elif instruction.opcode == PipelineInstType.FREE:
-                timers("free").start()
-                self.worker.delete_buffers(instruction.input_uuids)
-                timers("free").suspend()
+        if self.trace_buffer is None:
+            for timer_name, calls in self.instruction_segments:
+                timer = timers(timer_name)
+                timer.start()
+                for call in calls:
+                    call()
+                timer.suspend()
+        else:
+            self._execute_with_trace(sync_func)
 
         for timer_name in [
                 "compute", "resharding_send", "resharding_recv",
@@ -1434,10 +1541,9 @@ class PipeshardMeshWorkerExecuable:
 
         # copy to global env
         assert len(self.output_local_uuids) == len(output_global_uuids)
-        for local_ids, global_ids in zip(self.output_local_uuids,
-                                         output_global_uuids):
-            for local_id, global_id in zip(local_ids, global_ids):
-                self.global_buffers[global_id] = buffers[local_id]
+        self.global_buffers.update(
+            zip(chain.from_iterable(output_global_uuids),
+                map(buffers.__getitem__, self._output_local_uuids_flat)))
         # now acc_grad_buffers are those after grad acc, before apply grad
         # with memzero. These buffers are reused in the next iteration.
         # TODO(yonghao): never donate them
@@ -1450,6 +1556,32 @@ class PipeshardMeshWorkerExecuable:
         self.worker.buffers = self.global_buffers
         buffers.clear()
 
+    def _execute_with_trace(self, sync_func):
+        """Execute the instructions and record the time of each one.
+
+        Without sync_func, the time of an instruction only covers its
+        launch if its device work is asynchronous.
+        """
+        trace_buffer = self.trace_buffer
+        instruction_idx = 0
+        for timer_name, calls in self.instruction_segments:
+            timer = timers(timer_name)
+            timer.start()
+            for call in calls:
+                start = time.time()
+                call()
+                if sync_func:
+                    sync_func()
+                trace_buffer.record(instruction_idx, start, time.time())
+                instruction_idx += 1
+            timer.suspend()
+
+    def get_trace_records(self):
+        """Return the instruction trace records in time order."""
+        if self.trace_buffer is None:
+            return None
+        return self.trace_buffer.get_records()
+
     def profile_with_dummy_inputs(self):
         """Profile the executable with dummy inputs."""
         self.worker.reset_memory_stats()
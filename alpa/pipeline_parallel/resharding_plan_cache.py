@@ -0,0 +1,89 @@
+"""A cache of cross-mesh resharding plans shared across executables."""
+from collections import OrderedDict
+import hashlib
+from typing import Any, Optional
+
+from alpa.disk_cache import DiskLRUCache, get_global_cache
+from alpa.global_env import global_config
+
+RESHARDING_PLAN_CACHE_VERSION = "v0.1"
+
+
+def compute_resharding_plan_key(aval, src_sharding_spec, dst_sharding_spec,
+                                src_mesh_shape, dst_mesh_shape) -> str:
+    """Compute the key of the resharding plan of an array.
+
+    The plan also depends on the resharding mode and on whether to use
+    scatter-gather, so they are part of the key as well.
+    """
+    h = hashlib.sha256()
+    for x in [
+            RESHARDING_PLAN_CACHE_VERSION,
+            tuple(aval.shape),
+            str(aval.dtype), src_sharding_spec, dst_sharding_spec,
+            tuple(src_mesh_shape),
+            tuple(dst_mesh_shape), global_config.resharding_mode,
+            global_config.use_scatter_gather
+    ]:
+        h.update(repr(x).encode())
+        h.update(b";")
+    return h.hexdigest()
+
+
+class ReshardingPlanCache(DiskLRUCache):
+    """A bounded LRU cache of resharding plans.
+
+    Plans are kept in memory. If cache_dir is set, each plan is also pickled
+    to a ``<key>.pkl`` file, so the plans can be reused by other processes.
+    On a memory miss, the plan is loaded from the directory.
+
+    Args:
+      cache_dir: The directory to persist the plans. None disables it.
+      max_entries: The maximum number of plans in memory and on disk.
+    """
+
+    def __init__(self, cache_dir: Optional[str], max_entries: int):
+        super().__init__(cache_dir, max_entries=max_entries)
+        self._plans = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the plan or None on a miss."""
+        if key in self._plans:
+            self._plans.move_to_end(key)
+            self.num_hits += 1
+            self.touch(key)
+            return self._plans[key]
+
+        plan = super().get(key)
+        if plan is not None:
+            self._put_memory(key, plan)
+        return plan
+
+    def put(self, key: str, plan: Any):
+        """Store a plan and evict old plans if the cache is full."""
+        self._put_memory(key, plan)
+        super().put(key, plan)
+
+    def _put_memory(self, key, plan):
+        self._plans[key] = plan
+        self._plans.move_to_end(key)
+        while len(self._plans) > self.max_entries:
+            self._plans.popitem(last=False)
+            # Evictions of the files are counted by `evict`
+            if not self.cache_dir:
+                self.num_evictions += 1
+
+    def clear(self):
+        """Remove all stored plans."""
+        self._plans.clear()
+        super().clear()
+
+
+def get_resharding_plan_cache() -> Optional[ReshardingPlanCache]:
+    """Get the global resharding plan cache. Return None if it is disabled."""
+    max_entries = global_config.resharding_plan_cache_size
+    if not max_entries:
+        return None
+    return get_global_cache(ReshardingPlanCache,
+                            global_config.resharding_plan_cache_dir,
+                            max_entries=max_entries)
@@ -249,3 +249,146 @@ class TileSlice(Tile):
         for o in self.offset:
             size = size * (o.stop - o.start)
         return size
+
+
+def _intersect_tile_intervals(dim, num_src_tiles, num_dst_tiles):
+    """
+    Intersect the src tiles and the dst tiles along one dim.
+
+    Both arrays evenly split this dim, so the dst tile j covers
+    [j * dst_len, (j + 1) * dst_len) and overlaps with the src tiles in
+    [j * dst_len // src_len, ceil((j + 1) * dst_len / src_len)).
+
+    Returns:
+        dst_idx, src_idx (np.ndarray): the dst and src tile index of each
+            intersection, sorted by (dst_idx, src_idx).
+        lo, hi (np.ndarray): the interval of each intersection in the
+            original array.
+        src_len, dst_len (int): the tile length of src and dst on this dim.
+    """
+    src_len, ragged = divmod(dim, num_src_tiles)
+    assert not ragged
+    dst_len, ragged = divmod(dim, num_dst_tiles)
+    assert not ragged
+    dst_starts = np.arange(num_dst_tiles) * dst_len
+    first_src = dst_starts // src_len
+    end_src = -(-(dst_starts + dst_len) // src_len)
+    counts = end_src - first_src
+    dst_idx = np.repeat(np.arange(num_dst_tiles), counts)
+    ptr = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    src_idx = (np.repeat(first_src, counts) + np.arange(counts.sum()) -
+               np.repeat(ptr, counts))
+    lo = np.maximum(dst_idx * dst_len, src_idx * src_len)
+    hi = np.minimum((dst_idx + 1) * dst_len, (src_idx + 1) * src_len)
+    return dst_idx, src_idx, lo, hi, src_len, dst_len
+
+
+class TileIntersections:
+    """
+    The intersections between the tiles of a src and a dst array.
+
+    All intersections are stored in flat arrays grouped by the flattened dst
+    tile index, instead of TileSlice objects. Intersections of the dst tile
+    i are in [dst_tile_ptr[i], dst_tile_ptr[i + 1]), ordered by the
+    flattened src tile index.
+
+    Args:
+        src (VirtualDistributedArray): the source array.
+        dst (VirtualDistributedArray): the destination array.
+
+    Attributes:
+        dst_tile_ptr (np.ndarray): int array of shape [num_dst_tiles + 1].
+        src_tile_flat (np.ndarray): int array of shape [N], the flattened
+            src tile index of each intersection.
+        src_offsets (np.ndarray): int array of shape [N, rank, 2], the
+            [start, stop) of each intersection inside its src tile.
+        dst_offsets (np.ndarray): int array of shape [N, rank, 2], the
+            [start, stop) of each intersection inside its dst tile.
+    """
+
+    def __init__(self, src: VirtualDistributedArray,
+                 dst: VirtualDistributedArray):
+        rank = src.tensor_rank
+        src_tile_shape = tuple(src.tile_shape)
+        dst_tile_shape = tuple(dst.tile_shape)
+        # The intersections are the cartesian product of the 1D
+        # intersections on all dims
+        pair_indices = [np.zeros(1, dtype=int)]
+        per_dim_intersections = []
+        for i, dim in enumerate(src.tensor_shape):
+            per_dim = _intersect_tile_intervals(dim, src_tile_shape[i],
+                                                dst_tile_shape[i])
+            per_dim_intersections.append(per_dim)
+            num_pairs = len(per_dim[0])
+            num_rows = len(pair_indices[0])
+            pair_indices = [np.repeat(x, num_pairs) for x in pair_indices]
+            pair_indices.append(np.tile(np.arange(num_pairs), num_rows))
+        pair_indices = pair_indices[1:]
+        num_intersections = (len(pair_indices[0]) if pair_indices else 1)
+
+        dst_index = np.empty((rank, num_intersections), dtype=int)
+        src_index = np.empty((rank, num_intersections), dtype=int)
+        self.src_offsets = np.empty((num_intersections, rank, 2), dtype=int)
+        self.dst_offsets = np.empty((num_intersections, rank, 2), dtype=int)
+        for i, (dst_idx, src_idx, lo, hi, src_len,
+                dst_len) in enumerate(per_dim_intersections):
+            p = pair_indices[i]
+            dst_index[i] = dst_idx[p]
+            src_index[i] = src_idx[p]
+            src_start = src_index[i] * src_len
+            dst_start = dst_index[i] * dst_len
+            self.src_offsets[:, i, 0] = lo[p] - src_start
+            self.src_offsets[:, i, 1] = hi[p] - src_start
+            self.dst_offsets[:, i, 0] = lo[p] - dst_start
+            self.dst_offsets[:, i, 1] = hi[p] - dst_start
+
+        if rank:
+            dst_tile_flat = np.ravel_multi_index(dst_index, dst_tile_shape)
+            src_tile_flat = np.ravel_multi_index(src_index, src_tile_shape)
+        else:
+            dst_tile_flat = np.zeros(num_intersections, dtype=int)
+            src_tile_flat = np.zeros(num_intersections, dtype=int)
+        order = np.lexsort((src_tile_flat, dst_tile_flat))
+        self.src_tile_flat = src_tile_flat[order]
+        self.src_offsets = self.src_offsets[order]
+        self.dst_offsets = self.dst_offsets[order]
+        num_dst_tiles = int(np.prod(dst_tile_shape))
+        self.dst_tile_ptr = np.zeros(num_dst_tiles + 1, dtype=int)
+        np.cumsum(np.bincount(dst_tile_flat, minlength=num_dst_tiles),
+                  out=self.dst_tile_ptr[1:])
+
+    @property
+    def slice_sizes(self):
+        """Return the number of elements of each intersection."""
+        return np.prod(self.src_offsets[:, :, 1] - self.src_offsets[:, :, 0],
+                       axis=1)
+
+    def num_slices(self, dst_tile_flat):
+        """Return the number of src tile slices of a dst tile."""
+        return int(self.dst_tile_ptr[dst_tile_flat + 1] -
+                   self.dst_tile_ptr[dst_tile_flat])
+
+    def get_tile_slices(self, src_tiles, dst_tile_flat):
+        """
+        Return the TileSlices of the src tiles for a dst tile and their
+        indices in the dst tile.
+
+        Args:
+            src_tiles (np.ndarray): the tiles of the src array.
+            dst_tile_flat (int): the flattened index of the dst tile.
+        """
+        start = self.dst_tile_ptr[dst_tile_flat]
+        end = self.dst_tile_ptr[dst_tile_flat + 1]
+        src_tiles_flat = src_tiles.reshape(-1)
+        tile_slices = []
+        indices_in_dst_tile = []
+        for src_flat, src_offset, dst_offset in zip(
+                self.src_tile_flat[start:end].tolist(),
+                self.src_offsets[start:end].tolist(),
+                self.dst_offsets[start:end].tolist()):
+            tile_slices.append(
+                TileSlice(src_tiles_flat[src_flat],
+                          offset=[slice(lo, hi) for lo, hi in src_offset]))
+            indices_in_dst_tile.append(
+                [slice(lo, hi) for lo, hi in dst_offset])
+        return tile_slices, indices_in_dst_tile
@@ -0,0 +1,150 @@
+"""Simulate pipeline schedules to predict the iteration time and memory.
+
+The simulator runs offline without any device. Each mesh executes its tasks
+one by one in the order given by the schedule (see run_task_order). This
+predicts the iteration latency, the pipeline bubble, and the peak activation
+memory on each mesh.
+"""
+from collections import namedtuple
+from typing import Optional, Sequence
+
+import numpy as np
+
+from alpa.pipeline_parallel.schedules import (PipelineSchedule,
+                                              InferenceSchedule,
+                                              run_task_order)
+
+ScheduleSimulationResult = namedtuple("ScheduleSimulationResult", [
+    "iteration_time", "bubble_fraction", "busy_time", "peak_memory",
+    "task_intervals"
+])
+
+
+def get_num_forward_stages(schedule: PipelineSchedule):
+    """Return the number of forward stages of a schedule."""
+    num_compute_stages = len(
+        set(schedule.stage_mesh_mapping) - set(schedule.apply_grad_placement))
+    if isinstance(schedule, InferenceSchedule):
+        return num_compute_stages
+    assert num_compute_stages % 2 == 0
+    return num_compute_stages // 2
+
+
+def get_stage_costs_from_compute_cost(compute_cost: np.ndarray,
+                                      forward_stage_layer_ids: Sequence[
+                                          Sequence[int]],
+                                      submesh_choice_indices: Sequence[int],
+                                      autosharding_config_indices: Sequence[
+                                          int],
+                                      forward_fraction: float = 1 / 3):
+    """Get the cost of forward and backward stages from the compute cost
+    tensor of auto stage construction.
+
+    Args:
+        compute_cost: The (L, L, S, C) compute cost tensor.
+        forward_stage_layer_ids: The forward layer ids of each stage.
+        submesh_choice_indices: The submesh choice index of each stage.
+        autosharding_config_indices: The auto-sharding config index of
+          each stage.
+        forward_fraction: The fraction of the forward pass in the compute
+          cost, which includes both forward and backward.
+
+    Returns:
+        The costs of all forward stages followed by all backward stages.
+    """
+    num_forward_stages = len(forward_stage_layer_ids)
+    stage_costs = [0.0] * (2 * num_forward_stages)
+    for i, layer_ids in enumerate(forward_stage_layer_ids):
+        cost = compute_cost[layer_ids[0], layer_ids[-1],
+                            submesh_choice_indices[i],
+                            autosharding_config_indices[i]]
+        stage_costs[i] = cost * forward_fraction
+        stage_costs[2 * num_forward_stages - 1 - i] = cost * (1 -
+                                                             forward_fraction)
+    return stage_costs
+
+
+def simulate_schedule(schedule: PipelineSchedule,
+                      stage_costs: Sequence[float],
+                      activation_sizes: Optional[Sequence[float]] = None,
+                      transfer_sizes: Optional[np.ndarray] = None,
+                      cross_mesh_bandwidth: float = 1e10):
+    """Simulate a pipeline schedule.
+
+    Args:
+        schedule: The pipeline schedule.
+        stage_costs: The execution time of each stage for one micro batch.
+          Stages beyond its length (e.g., apply_grad stages) cost zero.
+        activation_sizes: The activation bytes each forward stage keeps for
+          one micro batch until its backward stage finishes.
+        transfer_sizes: An array with the same shape as
+          schedule.dependency. transfer_sizes[i, j] is the bytes sent from
+          stage j to stage i for one micro batch.
+        cross_mesh_bandwidth: The bandwidth between meshes in bytes/s.
+
+    Returns:
+        A ScheduleSimulationResult. peak_memory is the peak activation
+        bytes of each mesh, and task_intervals maps each (batch_idx,
+        stage_idx) to its (mesh_idx, start, end).
+    """
+    num_mesh = schedule.num_mesh
+    mesh_tasks = [[] for _ in range(num_mesh)]
+    for sched in schedule.schedules:
+        for mesh_idx, task in enumerate(sched):
+            if task:
+                mesh_tasks[mesh_idx].append(task)
+    stage_deps = {
+        i: np.nonzero(schedule.dependency[i])[0]
+        for i in range(schedule.num_stage)
+    }
+
+    def get_cost(stage_idx):
+        return stage_costs[stage_idx] if stage_idx < len(stage_costs) else 0.0
+
+    def get_transfer_time(dst_stage_idx, src_stage_idx):
+        return (transfer_sizes[dst_stage_idx, src_stage_idx] /
+                cross_mesh_bandwidth)
+
+    intervals = run_task_order(
+        mesh_tasks, stage_deps, get_cost,
+        get_transfer_time if transfer_sizes is not None else None)
+
+    mesh_free_time = [0.0] * num_mesh
+    for mesh_idx, _, end in intervals.values():
+        mesh_free_time[mesh_idx] = max(mesh_free_time[mesh_idx], end)
+    iteration_time = max(mesh_free_time)
+    busy_time = [0.0] * num_mesh
+    for mesh_idx, start, end in intervals.values():
+        busy_time[mesh_idx] += end - start
+    if iteration_time > 0:
+        bubble_fraction = 1 - sum(busy_time) / (num_mesh * iteration_time)
+    else:
+        bubble_fraction = 0.0
+
+    # Activations live from the start of a forward task to the end of
+    # its backward task (or the forward task itself if there is none)
+    peak_memory = [0.0] * num_mesh
+    if activation_sizes is not None:
+        num_forward_stages = get_num_forward_stages(schedule)
+        events = [[] for _ in range(num_mesh)]
+        for (batch_idx, stage_idx), (mesh_idx, start,
+                                     end) in intervals.items():
+            if stage_idx >= num_forward_stages:
+                continue
+            bwd_task = (batch_idx, 2 * num_forward_stages - 1 - stage_idx)
+            if bwd_task in intervals:
+                end = intervals[bwd_task][2]
+            size = activation_sizes[stage_idx]
+            events[mesh_idx].append((start, size))
+            events[mesh_idx].append((end, -size))
+        for mesh_idx in range(num_mesh):
+            # A mesh runs one task at a time, so the activations freed by a
+            # backward task can be reused by a forward task starting then
+            events[mesh_idx].sort(key=lambda x: (x[0], x[1] > 0))
+            memory = 0.0
+            for _, delta in events[mesh_idx]:
+                memory += delta
+                peak_memory[mesh_idx] = max(peak_memory[mesh_idx], memory)
+
+    return ScheduleSimulationResult(iteration_time, bubble_fraction, busy_time,
+                                    peak_memory, intervals)
@@ -48,6 +48,139 @@ def gen_linear_pipeline_dependency(num_stage):
     return d
 
 
+def gen_1f1b_task_order(mesh_idx, num_mesh, num_batch, num_virtual_stages,
+                        num_warmup):
+    """
+    Generate the order of (batch_idx, stage_idx) executed by a mesh in an
+    (interleaved) 1F1B schedule.
+
+    The mesh first runs num_warmup forward tasks, then alternates between
+    one forward and one backward task, and finally runs the remaining
+    backward tasks. With virtual stages, micro batches are processed in
+    groups of num_mesh, and a mesh runs a group on all its forward stages
+    before moving to the next group.
+    """
+    n = num_mesh
+    v = num_virtual_stages
+    num_fwd_stage = n * v
+
+    def get_task(k, forward):
+        chunk = (k // n) % v
+        batch_idx = (k // (n * v)) * n + k % n
+        if forward:
+            return batch_idx, chunk * n + mesh_idx
+        return batch_idx, num_fwd_stage + (chunk * n + n - 1 - mesh_idx)
+
+    num_tasks = num_batch * v
+    assert 0 <= num_warmup <= num_tasks
+    order = [get_task(k, True) for k in range(num_warmup)]
+    for k in range(num_tasks - num_warmup):
+        order.append(get_task(num_warmup + k, True))
+        order.append(get_task(k, False))
+    for k in range(num_tasks - num_warmup, num_tasks):
+        order.append(get_task(k, False))
+    return order
+
+
+def assign_tasks_to_clocks(mesh_orders, dependency, num_compute_stage):
+    """
+    Convert the task order of each mesh into clocks.
+
+    Each task is assigned to the earliest clock after all its dependencies
+    finish. A task only depends on tasks of previous clocks, so the runtime
+    can compile the tasks of one clock in any mesh order.
+    """
+    num_mesh = len(mesh_orders)
+    stage_deps = [[
+        dep for dep in np.nonzero(dependency[stage_idx])[0]
+        if dep < num_compute_stage
+    ] for stage_idx in range(num_compute_stage)]
+    finished = set()
+    next_task = [0] * num_mesh
+    num_remaining = sum(len(order) for order in mesh_orders)
+    schedules = []
+    while num_remaining:
+        scheds = [None] * num_mesh
+        for mesh_idx, order in enumerate(mesh_orders):
+            if next_task[mesh_idx] == len(order):
+                continue
+            batch_idx, stage_idx = order[next_task[mesh_idx]]
+            if all((batch_idx, dep) in finished
+                   for dep in stage_deps[stage_idx]):
+                scheds[mesh_idx] = (batch_idx, stage_idx)
+                next_task[mesh_idx] += 1
+        if not any(scheds):
+            raise RuntimeError("The pipeline schedule has a deadlock.")
+        finished.update(task for task in scheds if task)
+        num_remaining -= sum(1 for task in scheds if task)
+        schedules.append(scheds)
+    return schedules
+
+
+def run_task_order(mesh_orders, stage_deps, get_cost, get_transfer_time=None):
+    """
+    Run the task order of each mesh with given task costs.
+
+    A task starts when its mesh is free and all the tasks it depends on have
+    finished and their outputs have arrived.
+
+    Args:
+        mesh_orders (List[List[Tuple[int]]]): the (batch_idx, stage_idx)
+            executed by each mesh in order.
+        stage_deps (Dict[int, Sequence[int]]): the stages each stage depends
+            on. Dependencies not in mesh_orders are ignored.
+        get_cost (Callable[[int], float]): the cost of a stage.
+        get_transfer_time (Callable[[int, int], float]): the time to send
+            the outputs of a stage (second argument) to another stage (first
+            argument) on a different mesh.
+
+    Returns:
+        intervals (Dict[Tuple[int], Tuple]): the (mesh_idx, start, end) of
+            each task.
+    """
+    num_mesh = len(mesh_orders)
+    task_mesh = {}
+    for mesh_idx, order in enumerate(mesh_orders):
+        for task in order:
+            task_mesh[task] = mesh_idx
+
+    # Run the tasks of each mesh in order until all tasks finish
+    intervals = {}
+    mesh_free_time = [0.0] * num_mesh
+    next_task = [0] * num_mesh
+    num_remaining = len(task_mesh)
+    while num_remaining:
+        progress = False
+        for mesh_idx in range(num_mesh):
+            while next_task[mesh_idx] < len(mesh_orders[mesh_idx]):
+                task = mesh_orders[mesh_idx][next_task[mesh_idx]]
+                batch_idx, stage_idx = task
+                ready_time = mesh_free_time[mesh_idx]
+                for dep_stage in stage_deps.get(stage_idx, ()):
+                    dep = (batch_idx, dep_stage)
+                    if dep not in task_mesh:
+                        continue
+                    if dep not in intervals:
+                        break
+                    arrival_time = intervals[dep][2]
+                    if (task_mesh[dep] != mesh_idx and
+                            get_transfer_time is not None):
+                        arrival_time += get_transfer_time(stage_idx, dep_stage)
+                    ready_time = max(ready_time, arrival_time)
+                else:
+                    end_time = ready_time + get_cost(stage_idx)
+                    intervals[task] = (mesh_idx, ready_time, end_time)
+                    mesh_free_time[mesh_idx] = end_time
+                    next_task[mesh_idx] += 1
+                    num_remaining -= 1
+                    progress = True
+                    continue
+                break
+        if not progress:
+            raise RuntimeError("The pipeline schedule has a deadlock.")
+    return intervals
+
+
 class PipelineSchedule(metaclass=ABCMeta):
     """
     A pipeline schedule used by the distributed runtime.
@@ -373,6 +506,212 @@ class PipeDreamFlush(PipelineSchedule):
         return batch_idx - 1
 
 
+class MemoryBudgetedPipeDreamFlush(PipeDreamFlush):
+    """
+    Generate a PipeDream-Flush (1F1B) schedule under activation memory budgets.
+
+    PipeDreamFlush always runs n - i - 1 warm-up forward micro batches on
+    mesh i. This schedule bounds the in-flight micro batches of each mesh by
+    its memory budget and the activation size of its stage. Under this bound,
+    it chooses how many forward micro batches each mesh runs ahead to
+    minimize the iteration time predicted from the stage costs.
+
+    Args:
+        activation_sizes (Sequence[float]): the activation bytes each forward
+            stage keeps for one micro batch until its backward stage runs.
+        memory_budgets (Sequence[float]): the bytes available for activations
+            on each mesh.
+        stage_costs (Optional[Sequence[float]]): the execution time of each
+            forward and backward stage. If None, all forward stages have the
+            same cost and a backward stage costs twice its forward stage.
+    """
+
+    def __init__(self,
+                 *,
+                 dependency,
+                 meshes,
+                 apply_grad_placement,
+                 num_batch=1,
+                 activation_sizes,
+                 memory_budgets,
+                 stage_costs=None):
+        self.activation_sizes = activation_sizes
+        self.memory_budgets = memory_budgets
+        self.stage_costs = stage_costs
+        # Set by _generate_schedule
+        self.max_in_flight = None
+        self.num_warmup = None
+        super().__init__(dependency=dependency,
+                         meshes=meshes,
+                         apply_grad_placement=apply_grad_placement,
+                         num_batch=num_batch)
+
+    def _get_max_in_flight(self):
+        """Return the max number of in-flight micro batches of each mesh."""
+        max_in_flight = []
+        for mesh_idx in range(self.num_mesh):
+            budget = self.memory_budgets[mesh_idx]
+            size = self.activation_sizes[mesh_idx]
+            num = int(budget // size) if size > 0 else self.num_batch
+            if num < 1:
+                logger.warning(
+                    f"The activations of one micro batch ({size} bytes) "
+                    f"exceed the memory budget of mesh {mesh_idx} "
+                    f"({budget} bytes).")
+                num = 1
+            max_in_flight.append(min(num, self.num_batch))
+        return max_in_flight
+
+    def _generate_schedule(self):
+        m = self.num_batch
+        n = self.num_mesh
+        stage_costs = self.stage_costs
+        if stage_costs is None:
+            stage_costs = [1.0] * n + [2.0] * n
+        stage_deps = {
+            i: [j for j in np.nonzero(self.dependency[i])[0] if j < 2 * n]
+            for i in range(2 * n)
+        }
+
+        def get_mesh_orders(num_warmup):
+            return [
+                gen_1f1b_task_order(i, n, m, 1, num_warmup[i])
+                for i in range(n)
+            ]
+
+        def get_iteration_time(num_warmup):
+            intervals = run_task_order(get_mesh_orders(num_warmup), stage_deps,
+                                       lambda stage_idx: stage_costs[stage_idx])
+            return max(end for _, _, end in intervals.values())
+
+        # A mesh must not run more micro batches ahead than its previous
+        # mesh. Otherwise it waits for a forward input that the previous
+        # mesh only produces after a backward that depends on this mesh.
+        # Start from 1F1B within the budgets. Then let meshes run more
+        # forward micro batches ahead if this reduces the iteration time.
+        max_in_flight = self._get_max_in_flight()
+        num_warmup = []
+        for i in range(n):
+            warmup = min(n - i - 1, max_in_flight[i] - 1)
+            if i > 0:
+                warmup = min(warmup, num_warmup[i - 1])
+            num_warmup.append(warmup)
+        best_time = get_iteration_time(num_warmup)
+        improved = True
+        while improved:
+            improved = False
+            for i in reversed(range(n)):
+                for warmup in range(num_warmup[i] + 1, max_in_flight[i]):
+                    candidate = [
+                        max(x, warmup) if j <= i else x
+                        for j, x in enumerate(num_warmup)
+                    ]
+                    if any(candidate[j] >= max_in_flight[j] for j in range(i)):
+                        break
+                    iteration_time = get_iteration_time(candidate)
+                    if iteration_time < best_time * (1 - 1e-9):
+                        best_time = iteration_time
+                        num_warmup = candidate
+                        improved = True
+        self.max_in_flight = max_in_flight
+        self.num_warmup = num_warmup
+
+        schedules = assign_tasks_to_clocks(get_mesh_orders(num_warmup),
+                                           self.dependency, 2 * n)
+
+        # append apply_grad schedules
+        scheds = [None] * n
+        for stage_idx, worker in self.apply_grad_placement.items():
+            scheds[worker] = (self.last_backward_batch_index, stage_idx)
+        schedules.append(scheds)
+        return schedules
+
+
+class InterleavedPipeDreamFlush(PipelineSchedule):
+    """
+    Generate an interleaved PipeDream-Flush schedule (a.k.a. interleaved 1F1B).
+
+    Each mesh hosts several non-contiguous forward stages (virtual stages).
+    With n meshes and v virtual stages per mesh, forward stage s is placed on
+    mesh s % n and its backward stage 2 * n * v - 1 - s is on the same mesh.
+    Compared to 1F1B, the pipeline bubble is reduced by a factor of v at the
+    cost of v times more cross-mesh communication.
+
+    Args:
+        num_virtual_stages_per_mesh (int): the number of forward stages
+            hosted by each mesh.
+    """
+
+    def __init__(self,
+                 *,
+                 dependency,
+                 meshes,
+                 apply_grad_placement,
+                 num_batch=1,
+                 num_virtual_stages_per_mesh=1):
+        self.num_virtual_stages_per_mesh = num_virtual_stages_per_mesh
+        super().__init__(dependency=dependency,
+                         meshes=meshes,
+                         apply_grad_placement=apply_grad_placement,
+                         num_batch=num_batch)
+
+    @property
+    def num_forward_stage(self):
+        """Return the number of forward stages."""
+        return self.num_mesh * self.num_virtual_stages_per_mesh
+
+    def _generate_schedule(self):
+        m = self.num_batch
+        n = self.num_mesh
+        v = self.num_virtual_stages_per_mesh
+        assert v >= 1
+        assert v == 1 or m % n == 0, (
+            "The number of micro batches must be a multiple of the number "
+            "of meshes for the interleaved schedule.")
+
+        mesh_orders = []
+        for i in range(n):
+            if v == 1:
+                num_warmup = n - i - 1
+            else:
+                num_warmup = (n - i - 1) * 2 + (v - 1) * n
+            mesh_orders.append(
+                gen_1f1b_task_order(i, n, m, v, min(num_warmup, m * v)))
+        schedules = assign_tasks_to_clocks(mesh_orders, self.dependency,
+                                           2 * self.num_forward_stage)
+
+        # append apply_grad schedules
+        scheds = [None] * n
+        for stage_idx, worker in self.apply_grad_placement.items():
+            scheds[worker] = (self.last_backward_batch_index, stage_idx)
+        schedules.append(scheds)
+        return schedules
+
+    def should_skip_grad_sync(self, task):
+        """If we should skip the grad synchronization for this task."""
+        batch_idx, stage_idx = task
+        do_grad_sync = False
+        if (self.num_forward_stage <= stage_idx < self.num_forward_stage * 2
+                and batch_idx == self.last_backward_batch_index):
+            do_grad_sync = True
+        return not do_grad_sync
+
+    @property
+    def first_backward_batch_index(self):
+        """Return the index of the first microbatch at backward pass."""
+        return 0
+
+    @property
+    def last_backward_batch_index(self):
+        """Return the index of the last microbatch at backward pass."""
+        return self.num_batch - 1
+
+    def previous_backward_batch_index(self, batch_idx):
+        """Return the index of the previous microbatch at backward pass."""
+        assert batch_idx > 0
+        return batch_idx - 1
+
+
 class InferenceSchedule(PipelineSchedule):
     """Construct a Gpipe-like schedule."""
 
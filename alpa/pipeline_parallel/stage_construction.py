@@ -13,8 +13,12 @@ import tqdm
 
 from alpa.device_mesh import DeviceCluster, VirtualPhysicalMesh
 from alpa.global_env import global_config
+from alpa.pipeline_parallel.analytic_cost_model import (
+    AnalyticStageCostModel, DeviceSpec)
 from alpa.pipeline_parallel.computation import (
     JaxPipelineComputation, merge_marked_jaxprs_with_named_call)
+from alpa.pipeline_parallel.compute_cost_database import (
+    ComputeCostDatabase, get_layer_hashes, get_stage_key)
 from alpa.pipeline_parallel.layer_stats import eqn_flops
 from alpa.pipeline_parallel.stage_profiling import (generate_stage_info,
                                                     compile_all, profile_all)
@@ -30,7 +34,9 @@ AutoStageOption = namedtuple(
     "AutoStageOption", 
     ["submesh_physical_shape_space", "submesh_logical_shape_space",
      "stage_imbalance_tolerance", "use_hlo_cost_model",
-     "profiling_database_filename", "cached_compute_cost"])
+     "profiling_database_filename", "cached_compute_cost",
+     "compute_cost_database_filename", "device_spec_filename"],
+    defaults=[None, None])
 ManualStageOption = namedtuple(
     "ManualStageOption",
     ["forward_stage_layer_ids", "submesh_physical_shapes", "submesh_logical_shapes",
@@ -132,16 +138,14 @@ def dp_impl(num_layers, num_devices, num_microbatches, submesh_choices,
     return total_cost, res
 
 
-def dp(num_layers, num_devices, num_microbatches, submesh_choices,
-       num_autosharding_configs, compute_cost, max_n_succ_stages):
-    """Auto stage dynamic programming."""
-    timers("stage-construction-dp").start()
-
+def dp_reference(num_layers, num_devices, num_microbatches, submesh_choices,
+                 num_autosharding_configs, compute_cost, max_n_succ_stages):
+    """Auto stage dynamic programming by running dp_impl for every candidate
+    max_stage_cost. This is slow and only kept as the reference of `dp`."""
     all_possible_stage_costs = np.sort(np.unique(compute_cost))
     best_cost = np.inf
     best_solution = None
     last_max_stage_cost = 0.0
-    # FIXME(zhuohan): Set this gap as a tunable parameter in global config
     gap = 1e-6
     assert len(
         all_possible_stage_costs), "no solution in auto stage construction."
@@ -159,6 +163,210 @@ def dp(num_layers, num_devices, num_microbatches, submesh_choices,
             best_solution = solution
         last_max_stage_cost = max_stage_cost
     assert best_solution is not None, "no solution in auto stage construction."
+    return best_cost, best_solution
+
+
+def get_min_config_stage_costs(compute_cost, max_n_succ_stages):
+    """Reduce the autosharding config dimension of the cost tensor.
+
+    For a stage (i, k, m) followed by s stages, the best autosharding config
+    is the cheapest one whose max_n_succ_stages >= s. If the cost of this
+    config exceeds max_stage_cost, no other config can be used either.
+
+    Returns:
+        stage_cost: np.ndarray of shape (L, L, S, L). stage_cost[i, k, m, s]
+            is the minimal cost of the stage with forward layers i, ..., k
+            on the m-th submesh followed by s stages.
+        stage_config: np.ndarray of shape (L, L, S, L). The argmin config.
+    """
+    num_layers = compute_cost.shape[0]
+    stage_cost = np.full(compute_cost.shape[:3] + (num_layers,),
+                         np.inf,
+                         dtype=np.float64)
+    stage_config = np.full(compute_cost.shape[:3] + (num_layers,),
+                           -1,
+                           dtype=np.int32)
+    for s in range(num_layers):
+        masked_cost = np.where(max_n_succ_stages >= s, compute_cost, np.inf)
+        stage_config[:, :, :, s] = np.argmin(masked_cost, axis=-1)
+        stage_cost[:, :, :, s] = np.min(masked_cost, axis=-1)
+    return stage_cost, stage_config
+
+
+@numba.jit(nopython=True)
+def dp_impl_incremental(num_layers, num_devices, submesh_n_devices,
+                        stage_cost, max_stage_cost, start_layer, f,
+                        f_stage_max, f_argmin):
+    """Update the DP tables in place for a new max_stage_cost.
+
+    f[s, i, j] only depends on the stages that start at a layer >= i. When
+    max_stage_cost increases, only the rows i <= start_layer, where
+    start_layer is the largest start layer of the newly feasible stages,
+    need to be recomputed. The other rows are reused.
+    """
+    for s in range(1, num_layers + 1):  # pylint: disable=too-many-nested-blocks
+        for i in range(start_layer, -1, -1):
+            for j in range(1, num_devices + 1):
+                best = np.inf
+                best_stage_max = 0.0
+                best_k, best_m = -1, -1
+                # f[s - 1, k, :] is infinite if k > num_layers - s + 1
+                for k in range(min(num_layers, num_layers - s + 1), i, -1):
+                    for m in range(len(submesh_n_devices)):
+                        n_submesh_devices = submesh_n_devices[m]
+                        if n_submesh_devices <= j:
+                            cost = stage_cost[i, k - 1, m, s - 1]
+                            if cost <= max_stage_cost:
+                                new_cost = f[s - 1, k,
+                                             j - n_submesh_devices] + cost
+                                if new_cost < best:
+                                    best = new_cost
+                                    best_stage_max = max(
+                                        f_stage_max[s - 1, k,
+                                                    j - n_submesh_devices],
+                                        cost)
+                                    best_k, best_m = k, m
+                f[s, i, j] = best
+                f_stage_max[s, i, j] = best_stage_max
+                f_argmin[s, i, j, 0] = best_k
+                f_argmin[s, i, j, 1] = best_m
+
+
+@numba.jit(nopython=True)
+def dp_is_feasible(num_layers, num_devices, submesh_n_devices, stage_cost,
+                   max_stage_cost):
+    """Check whether there is any solution under max_stage_cost."""
+    f = np.full((num_layers + 1, num_layers + 1, num_devices + 1),
+                np.inf,
+                dtype=np.float64)
+    f_stage_max = np.zeros_like(f)
+    f_argmin = np.full((num_layers + 1, num_layers + 1, num_devices + 1, 2),
+                       -1,
+                       dtype=np.int32)
+    f[0, num_layers, 0] = 0
+    dp_impl_incremental(num_layers, num_devices, submesh_n_devices, stage_cost,
+                        max_stage_cost, num_layers - 1, f, f_stage_max,
+                        f_argmin)
+    for s in range(1, num_layers + 1):
+        if f[s, 0, num_devices] < np.inf:
+            return True
+    return False
+
+
+def _dp_get_solution(num_layers, num_devices, num_microbatches,
+                     submesh_n_devices, stage_config, f, f_stage_max,
+                     f_argmin):
+    """Get the total cost and the stage assignment from the DP tables."""
+    best_s = -1
+    best_total_cost = np.inf
+    for s in range(1, num_layers + 1):
+        if f[s, 0, num_devices] < best_total_cost:
+            best_s = s
+            best_total_cost = f[s, 0, num_devices]
+
+    if np.isinf(best_total_cost):
+        return np.inf, None
+
+    total_cost = f[best_s, 0, num_devices] + (
+        num_microbatches - 1) * f_stage_max[best_s, 0, num_devices]
+    current_s = best_s
+    current_layer = 0
+    current_devices = num_devices
+
+    res = []
+    while current_s > 0 and current_layer < num_layers and current_devices > 0:
+        next_start_layer, submesh_choice = f_argmin[current_s, current_layer,
+                                                    current_devices]
+        assert next_start_layer != -1
+        autosharding_choice = stage_config[current_layer, next_start_layer - 1,
+                                           submesh_choice, current_s - 1]
+        res.append(((current_layer, int(next_start_layer)), int(submesh_choice),
+                    int(autosharding_choice)))
+        current_s -= 1
+        current_layer = int(next_start_layer)
+        current_devices -= submesh_n_devices[submesh_choice]
+    assert (current_s == 0 and current_layer == num_layers and
+            current_devices == 0)
+    return total_cost, res
+
+
+def dp(num_layers, num_devices, num_microbatches, submesh_choices,
+       num_autosharding_configs, compute_cost, max_n_succ_stages):
+    """Auto stage dynamic programming.
+
+    This gives the same solution as `dp_reference`, but
+    1. the autosharding config dimension is reduced before the DP;
+    2. the smallest feasible max_stage_cost is found by binary search, and
+       candidates that do not make any new stage feasible are skipped;
+    3. the DP tables are reused between consecutive max_stage_costs.
+    """
+    del num_autosharding_configs
+    timers("stage-construction-dp").start()
+
+    submesh_n_devices = np.array(
+        [np.prod(np.array(submesh)) for submesh in submesh_choices],
+        dtype=np.int64)
+    stage_cost, stage_config = get_min_config_stage_costs(
+        compute_cost, max_n_succ_stages)
+
+    # The candidates of max_stage_cost and the largest start layer of the
+    # stages that become feasible at each candidate.
+    finite_indices = np.nonzero(np.isfinite(stage_cost))
+    finite_costs = stage_cost[finite_indices]
+    assert len(finite_costs), "no solution in auto stage construction."
+    candidates, inverse = np.unique(finite_costs, return_inverse=True)
+    candidate_start_layers = np.full(len(candidates), -1, dtype=np.int64)
+    np.maximum.at(candidate_start_layers, inverse, finite_indices[0])
+
+    # Binary search the smallest feasible max_stage_cost
+    lo, hi = 0, len(candidates) - 1
+    assert dp_is_feasible(num_layers, num_devices, submesh_n_devices,
+                          stage_cost, candidates[hi]), (
+                              "no solution in auto stage construction.")
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if dp_is_feasible(num_layers, num_devices, submesh_n_devices,
+                          stage_cost, candidates[mid]):
+            hi = mid
+        else:
+            lo = mid + 1
+
+    f = np.full((num_layers + 1, num_layers + 1, num_devices + 1),
+                np.inf,
+                dtype=np.float64)
+    f_stage_max = np.zeros_like(f)
+    f_argmin = np.full((num_layers + 1, num_layers + 1, num_devices + 1, 2),
+                       -1,
+                       dtype=np.int32)
+    f[0, num_layers, 0] = 0
+
+    best_cost = np.inf
+    best_solution = None
+    last_max_stage_cost = 0.0
+    # FIXME(zhuohan): Set this gap as a tunable parameter in global config
+    gap = 1e-6
+    start_layer = num_layers - 1
+    for idx in range(lo, len(candidates)):
+        max_stage_cost = candidates[idx]
+        if idx > lo:
+            start_layer = max(start_layer, candidate_start_layers[idx])
+        if max_stage_cost * num_microbatches >= best_cost:
+            break
+        if max_stage_cost - last_max_stage_cost < gap:
+            continue
+        dp_impl_incremental(num_layers, num_devices, submesh_n_devices,
+                            stage_cost, max_stage_cost, start_layer, f,
+                            f_stage_max, f_argmin)
+        cost, solution = _dp_get_solution(num_layers, num_devices,
+                                          num_microbatches, submesh_n_devices,
+                                          stage_config, f, f_stage_max,
+                                          f_argmin)
+        if cost < best_cost:
+            best_cost = cost
+            best_solution = solution
+        last_max_stage_cost = max_stage_cost
+        start_layer = -1
+    assert best_solution is not None, "no solution in auto stage construction."
 
     timers("stage-construction-dp").suspend()
     return best_cost, best_solution
@@ -264,20 +472,39 @@ def get_all_submesh_autosharding_config_choices(virtual_mesh, submesh_choices,
     return autosharding_configs
 
 
+def _is_stage_balanced(start, end, num_layers, layer_flops_prefix_sum,
+                       computation_source_ratio, tolerance):
+    """Whether a stage with forward layers [start, end] is balanced with its
+    submesh, which has computation_source_ratio of all devices. Only balanced
+    stages are profiled."""
+    if computation_source_ratio == 1 and not (start == 0 and
+                                              end == num_layers - 1):
+        return False
+    tot_flops = layer_flops_prefix_sum[2 * num_layers]
+    flops_ratio = (
+        layer_flops_prefix_sum[end + 1] - layer_flops_prefix_sum[start] +
+        layer_flops_prefix_sum[2 * num_layers - start] -
+        layer_flops_prefix_sum[2 * num_layers - end - 1]) / tot_flops
+    return not (computation_source_ratio > flops_ratio * (1 + tolerance) or
+                computation_source_ratio < flops_ratio / (1 + tolerance))
+
+
 def distributed_profile_on_mesh(meshes: Sequence[VirtualPhysicalMesh], layers,
                                 donation_mapping, global_outvars,
                                 apply_grad_layers, apply_grad_global_info,
                                 autosharding_configs, cluster_size,
                                 layer_flops_prefix_sum, num_micro_batches,
                                 default_as_option, auto_stage_option,
-                                mesh_cached_result):
+                                mesh_cached_result,
+                                compute_cost_database=None,
+                                layer_hashes=None):
     timers("stage-construction-compilation").start()
     assert len(layers) % 2 == 0
     num_layers = len(layers) // 2
-    tot_flops = layer_flops_prefix_sum[2 * num_layers]
     num_autosharding_configs = len(autosharding_configs)
     indices = list(range(2 * num_layers))
     stages = []
+    stage_keys = []
     compute_cost, max_n_succ_stages, is_profiled = mesh_cached_result
 
     print("- Generate all stage infos (Jaxpr -> HLO)")
@@ -287,18 +514,38 @@ def distributed_profile_on_mesh(meshes: Sequence[VirtualPhysicalMesh], layers,
     tolerance = auto_stage_option.stage_imbalance_tolerance
     for start in tqdm.tqdm(range(0, num_layers)):
         for end in tqdm.tqdm(range(start, num_layers), leave=False):
-            if is_full_mesh and not (start == 0 and end == num_layers - 1):
-                continue
-            flops_ratio = (
-                layer_flops_prefix_sum[end + 1] - layer_flops_prefix_sum[start]
-                + layer_flops_prefix_sum[2 * num_layers - start] -
-                layer_flops_prefix_sum[2 * num_layers - end - 1]) / tot_flops
-            if (computation_source_ratio > flops_ratio * (1 + tolerance) or
-                    computation_source_ratio < flops_ratio / (1 + tolerance)):
+            if not _is_stage_balanced(start, end, num_layers,
+                                      layer_flops_prefix_sum,
+                                      computation_source_ratio, tolerance):
                 continue
             layer_indices = (
                 indices[start:end + 1] +
                 indices[2 * num_layers - end - 1:2 * num_layers - start])
+
+            # Fill the cells found in the database and collect missing ones
+            missing_configs = []
+            for config_idx, autosharding_config in enumerate(
+                    autosharding_configs):
+                if (autosharding_config is None or
+                        is_profiled[start, end, config_idx]):
+                    continue
+                key = None
+                if compute_cost_database is not None:
+                    key = get_stage_key(
+                        layer_hashes[0], layer_indices,
+                        layer_hashes[1][start:end + 1], meshes[0].shape,
+                        autosharding_config, default_as_option,
+                        num_micro_batches, is_full_mesh)
+                    record = compute_cost_database.query(key)
+                    if record is not None:
+                        (compute_cost[start, end, config_idx],
+                         max_n_succ_stages[start, end, config_idx]) = record
+                        is_profiled[start, end, config_idx] = 1
+                        continue
+                missing_configs.append((config_idx, autosharding_config, key))
+            if not missing_configs:
+                continue
+
             selected_apply_grad_layers = filter(
                 lambda x: x is not None,
                 [apply_grad_layers[idx] for idx in indices[start:end + 1]])
@@ -309,14 +556,11 @@ def distributed_profile_on_mesh(meshes: Sequence[VirtualPhysicalMesh], layers,
                 list(selected_apply_grad_layers), apply_grad_global_info)
             if is_full_mesh:
                 intermediate_vars = []
-            for config_idx, autosharding_config in enumerate(
-                    autosharding_configs):
-                if autosharding_config is not None:
-                    stage_indices = (start, end, config_idx)
-                    if is_profiled[start, end, config_idx]:
-                        continue
-                    stages.append((stage_indices, stage_config,
-                                   autosharding_config, intermediate_vars))
+            for config_idx, autosharding_config, key in missing_configs:
+                stage_indices = (start, end, config_idx)
+                stages.append((stage_indices, stage_config,
+                               autosharding_config, intermediate_vars))
+                stage_keys.append(key)
 
     if len(stages) == 0:
         # Suspend timers
@@ -342,11 +586,44 @@ def distributed_profile_on_mesh(meshes: Sequence[VirtualPhysicalMesh], layers,
     (compute_cost, max_n_succ_stages,
      is_profiled) = profile_all(stages, compiled_outputs, meshes, num_layers,
                                 num_autosharding_configs, num_micro_batches,
-                                auto_stage_option, mesh_cached_result)
+                                auto_stage_option, mesh_cached_result,
+                                compute_cost_database, stage_keys)
     timers("stage-construction-profiling").suspend()
     return compute_cost, max_n_succ_stages, is_profiled
 
 
+def analytic_profile_on_mesh(submesh, autosharding_configs, cluster_size,
+                             layer_flops_prefix_sum, auto_stage_option,
+                             mesh_cached_result,
+                             cost_model: AnalyticStageCostModel):
+    """Estimate the costs of all stages on a submesh with the analytic cost
+    model instead of profiling them."""
+    compute_cost, max_n_succ_stages, is_profiled = mesh_cached_result
+    num_layers = cost_model.num_layers
+    num_hosts, num_devices_per_host = submesh
+    computation_source_ratio = num_hosts * num_devices_per_host / cluster_size
+    is_full_mesh = computation_source_ratio == 1
+    tolerance = auto_stage_option.stage_imbalance_tolerance
+    for start in range(0, num_layers):
+        for end in range(start, num_layers):
+            if not _is_stage_balanced(start, end, num_layers,
+                                      layer_flops_prefix_sum,
+                                      computation_source_ratio, tolerance):
+                continue
+            for config_idx, autosharding_config in enumerate(
+                    autosharding_configs):
+                if (autosharding_config is None or
+                        is_profiled[start, end, config_idx]):
+                    continue
+                logical_mesh, _ = autosharding_config
+                (compute_cost[start, end, config_idx],
+                 max_n_succ_stages[start, end, config_idx]) = (
+                     cost_model.estimate(start, end, num_devices_per_host,
+                                         logical_mesh.id_mesh, is_full_mesh))
+                is_profiled[start, end, config_idx] = 1
+    return compute_cost, max_n_succ_stages, is_profiled
+
+
 def _get_layer_flops_prefix_sum(layers):
     layer_flops_prefix_sum = [0]
     for layer in layers:
@@ -388,6 +665,11 @@ def get_compute_cost(virtual_mesh: VirtualPhysicalMesh,
         apply_grad_global_info: Donation mapping and outvars for apply gradient
             stages.
         default_as_option: The default auto-sharding options.
+        auto_stage_option: The options of auto stage construction. If
+            compute_cost_database_filename is set, the costs already in the
+            database are reused and only the missing ones are profiled. If
+            device_spec_filename is set, the costs are estimated by the
+            analytic cost model with the device spec instead of profiling.
 
     Returns:
         Two np.ndarray, each with shape (L, L, S, C), where L is the number of
@@ -406,7 +688,14 @@ def get_compute_cost(virtual_mesh: VirtualPhysicalMesh,
     num_submesh_choices = len(submesh_choices)
     num_autosharding_configs = len(autosharding_configs[0])
     cluster_size = virtual_mesh.num_devices
-    layer_flops_prefix_sum = _get_layer_flops_prefix_sum(layers)
+    if auto_stage_option.device_spec_filename is not None:
+        cost_model = AnalyticStageCostModel(
+            DeviceSpec.load(auto_stage_option.device_spec_filename), layers,
+            apply_grad_layers, global_outvars, num_micro_batches)
+        layer_flops_prefix_sum = cost_model.get_layer_cost_prefix_sum()
+    else:
+        cost_model = None
+        layer_flops_prefix_sum = _get_layer_flops_prefix_sum(layers)
 
     if auto_stage_option.cached_compute_cost is not None:
         cached_result = np.load(auto_stage_option.cached_compute_cost,
@@ -424,6 +713,18 @@ def get_compute_cost(virtual_mesh: VirtualPhysicalMesh,
              num_autosharding_configs), -1)
         is_profiled = np.full((num_layers, num_layers, num_submesh_choices,
                                num_autosharding_configs), 0)
+
+    # The estimated costs are not stored in the database of profiled costs
+    if (auto_stage_option.compute_cost_database_filename is not None and
+            cost_model is None):
+        compute_cost_database = ComputeCostDatabase(
+            auto_stage_option.compute_cost_database_filename)
+        layer_hashes = (get_layer_hashes(layers),
+                        get_layer_hashes(apply_grad_layers))
+        print(f"Loaded {len(compute_cost_database)} profiled stages from "
+              f"{auto_stage_option.compute_cost_database_filename}")
+    else:
+        compute_cost_database = layer_hashes = None
     print("-" * 20 + " Automatic stage clustering " + "-" * 20)
     print(f"submesh_choices: {submesh_choices}")
 
@@ -432,27 +733,34 @@ def get_compute_cost(virtual_mesh: VirtualPhysicalMesh,
         print(f"- Profiling for submesh {mesh_id} {submesh}:")
         num_hosts, num_devices = submesh
         tic = time()
-        if global_config.profile_with_whole_ray_cluster:
-            whole_cluster_virtual_mesh = DeviceCluster(
-            ).get_virtual_physical_mesh()
-            sliced_virtual_meshes = (
-                whole_cluster_virtual_mesh.slice_profiling_submeshes(
-                    num_hosts, num_devices))
-        else:
-            sliced_virtual_meshes = virtual_mesh.slice_profiling_submeshes(
-                num_hosts, num_devices)
-
         mesh_cached_result = (compute_cost[:, :, mesh_id, :],
                               max_n_succ_stages[:, :, mesh_id, :],
                               is_profiled[:, :, mesh_id, :])
-        (mesh_compute_cost, mesh_max_n_succ_stages,
-         mesh_profiled) = distributed_profile_on_mesh(
-             sliced_virtual_meshes, layers, donation_mapping, global_outvars,
-             apply_grad_layers, apply_grad_global_info,
-             autosharding_configs[mesh_id], cluster_size,
-             layer_flops_prefix_sum, num_micro_batches,
-             default_as_option, auto_stage_option,
-             mesh_cached_result)
+        if cost_model is not None:
+            (mesh_compute_cost, mesh_max_n_succ_stages,
+             mesh_profiled) = analytic_profile_on_mesh(
+                 submesh, autosharding_configs[mesh_id], cluster_size,
+                 layer_flops_prefix_sum, auto_stage_option,
+                 mesh_cached_result, cost_model)
+        else:
+            if global_config.profile_with_whole_ray_cluster:
+                whole_cluster_virtual_mesh = DeviceCluster(
+                ).get_virtual_physical_mesh()
+                sliced_virtual_meshes = (
+                    whole_cluster_virtual_mesh.slice_profiling_submeshes(
+                        num_hosts, num_devices))
+            else:
+                sliced_virtual_meshes = virtual_mesh.slice_profiling_submeshes(
+                    num_hosts, num_devices)
+
+            (mesh_compute_cost, mesh_max_n_succ_stages,
+             mesh_profiled) = distributed_profile_on_mesh(
+                 sliced_virtual_meshes, layers, donation_mapping,
+                 global_outvars, apply_grad_layers, apply_grad_global_info,
+                 autosharding_configs[mesh_id], cluster_size,
+                 layer_flops_prefix_sum, num_micro_batches,
+                 default_as_option, auto_stage_option,
+                 mesh_cached_result, compute_cost_database, layer_hashes)
 
         compute_cost[:, :, mesh_id, :] = mesh_compute_cost
         max_n_succ_stages[:, :, mesh_id, :] = mesh_max_n_succ_stages
@@ -527,7 +835,8 @@ def cluster_layers_and_slice_mesh(
         apply_grad_global_info: Tuple,
         pipeline_schedule: str,
         default_as_option: AutoShardingOption,
-        stage_option: StageOption):
+        stage_option: StageOption,
+        num_virtual_stages_per_mesh: int = 1):
     """
     Stage-mesh assignment.
 
@@ -548,6 +857,8 @@ def cluster_layers_and_slice_mesh(
         pipeline_schedule: The pipeline schedule.
         default_as_option: The default auto-sharding option.
         stage_option: The options controling how to construct stages.
+        num_virtual_stages_per_mesh: The number of forward stages placed on
+          each mesh. Forward stage i is placed on mesh i % num_meshes.
     """
     inference_mode = (pipeline_schedule == "inference")
     timers("stage-construction").start()
@@ -573,6 +884,9 @@ def cluster_layers_and_slice_mesh(
             # TODO(zhuohan): Implement the auto slicing in inference mode.
             raise NotImplementedError("automatically slicing layers with "
                                       "inference mode is not supported yet.")
+        if num_virtual_stages_per_mesh != 1:
+            raise NotImplementedError("automatically slicing layers with "
+                                      "virtual stages is not supported yet.")
 
         submesh_choices = get_submesh_choices(
             virtual_mesh, stage_option.submesh_physical_shape_space)
@@ -635,18 +949,18 @@ def cluster_layers_and_slice_mesh(
             stage_option.submesh_logical_shapes or submesh_shapes)
         autosharding_option_dicts = stage_option.submesh_autosharding_option_dicts
     elif isinstance(stage_option, UniformStageOption):
+        assert num_layers % num_virtual_stages_per_mesh == 0
+        num_uniform_meshes = num_layers // num_virtual_stages_per_mesh
         if given_mesh:
-            num_stages = num_layers
             submesh_shapes = [x.shape for x in
                               virtual_mesh.launched_physical_mesh_group.meshes]
             logical_mesh_shapes = submesh_shapes
         else:
             num_devices = virtual_mesh.num_devices
-            num_stages = num_layers
 
-            assert num_devices >= num_stages, "No enough devices"
-            assert num_devices % num_stages == 0
-            num_devices_per_mesh = num_devices // num_stages
+            assert num_devices >= num_uniform_meshes, "No enough devices"
+            assert num_devices % num_uniform_meshes == 0
+            num_devices_per_mesh = num_devices // num_uniform_meshes
             if num_devices_per_mesh > virtual_mesh.num_devices_per_host:
                 assert num_devices_per_mesh % virtual_mesh.num_devices_per_host == 0
                 submesh_shape = (num_devices_per_mesh //
@@ -655,11 +969,11 @@ def cluster_layers_and_slice_mesh(
             else:
                 assert virtual_mesh.num_devices_per_host % num_devices_per_mesh == 0
                 submesh_shape = (1, num_devices_per_mesh)
-            submesh_shapes = [submesh_shape] * num_stages
-            logical_mesh_shapes = [submesh_shape] * num_stages
+            submesh_shapes = [submesh_shape] * num_uniform_meshes
+            logical_mesh_shapes = [submesh_shape] * num_uniform_meshes
 
         forward_stage_layer_ids = [[i] for i in range(num_layers)]
-        autosharding_option_dicts = [{}] * num_stages
+        autosharding_option_dicts = [{}] * num_uniform_meshes
     else:
         raise ValueError(f"Invalid pipeline stage option: {stage_option}")
 
@@ -670,17 +984,25 @@ def cluster_layers_and_slice_mesh(
         sliced_meshes = get_sliced_virtual_submeshes(virtual_mesh, submesh_shapes)
 
     num_forward_stages = len(forward_stage_layer_ids)
-
+    num_meshes = len(sliced_meshes)
+    assert num_forward_stages == num_meshes * num_virtual_stages_per_mesh, (
+        f"{num_forward_stages} forward stages cannot be placed on "
+        f"{num_meshes} meshes with {num_virtual_stages_per_mesh} virtual "
+        "stages per mesh.")
+
+    # Place forward stages on meshes round-robin. A backward stage is placed
+    # on the mesh of its forward stage.
+    forward_stage_to_mesh = [i % num_meshes for i in range(num_forward_stages)]
     if inference_mode:
         stage_layer_ids = forward_stage_layer_ids
-        stage_to_mesh = list(range(num_forward_stages))
+        stage_to_mesh = forward_stage_to_mesh
     else:
         backward_stage_layer_ids = [[
             2 * num_layers - 1 - i for i in reversed(layer_ids)
         ] for layer_ids in reversed(forward_stage_layer_ids)]
         stage_layer_ids = forward_stage_layer_ids + backward_stage_layer_ids
-        stage_to_mesh = list(range(num_forward_stages)) + list(
-            reversed(range(num_forward_stages)))
+        stage_to_mesh = forward_stage_to_mesh + list(
+            reversed(forward_stage_to_mesh))
 
     stage_outvars = get_stage_outvars(layers, stage_layer_ids, final_outvars)
     merged_stages = []
@@ -33,7 +33,8 @@ from alpa.pipeline_parallel.resharding_tensor import VirtualDistributedArray
 from alpa.shard_parallel.auto_sharding import (run_auto_sharding_pass,
                                                run_spmd_partitioner_pass,
                                                run_backend_compilation,
-                                               hlo_sharding_to_sharding_spec)
+                                               hlo_sharding_to_sharding_spec,
+                                               serialize_sharded_hlo_module)
 from alpa.util import (clone_jaxpr, get_shard_shape, jaxpr_to_hlo_computation,
                        OrderedSet)
 
@@ -218,6 +219,35 @@ class CompileWorker:
         return stage_id, run_auto_sharding_pass(computation, *jaxpr_args,
                                                 **other_kwargs)
 
+    @staticmethod
+    def run_auto_sharding_pass_for_search(candidate_id, proto, jaxpr_args,
+                                          other_kwargs):
+        """Run auto-sharding pass on a proto for a logical mesh candidate.
+
+        Compilation errors are caught and reported as None. In the "single"
+        return mode, the returned SPMD partitioned HLO module is serialized
+        together with its input/output shardings, so it can be sent back to
+        the driver.
+        """
+        computation = xla_client.XlaComputation(proto)
+        try:
+            ret = run_auto_sharding_pass(computation, *jaxpr_args,
+                                         **other_kwargs)
+        except RuntimeError as e:
+            logger.warning(f"Compilation error (auto-sharding pass) "
+                           f"for logical mesh candidate {candidate_id} : {e}")
+            return candidate_id, None
+
+        if other_kwargs["return_mode"] != "single":
+            return candidate_id, ret
+
+        hlo_module, strategy_config = ret
+        module_proto, input_sharding_protos, output_sharding_proto = (
+            serialize_sharded_hlo_module(
+                hlo_module, other_kwargs["logical_mesh"].num_devices))
+        return candidate_id, (module_proto, input_sharding_protos,
+                              output_sharding_proto, strategy_config)
+
 
 class CompileWorkerPool(BaseWorkerPoolWrapper):
     """A pool of CompileWorker for distributed compilation."""
@@ -460,10 +490,13 @@ def compile_all(stages, num_micro_batches, default_as_option):
 
 def profile_all(stages, compiled_outputs: Sequence[CompileOutput], meshes,
                 num_layers, num_auto_sharding_configs,
-                num_micro_batches, auto_stage_option, mesh_cached_result):
+                num_micro_batches, auto_stage_option, mesh_cached_result,
+                compute_cost_database=None, stage_keys=None):
     """Profile all compiled outputs on given meshes.
 
     This function launches a profile worker pool and submits given tasks.
+    If compute_cost_database is given, each result is written to it as soon
+    as it is profiled with the key in stage_keys.
     """
     compute_cost, max_n_succ_stages, is_profiled = mesh_cached_result
 
@@ -528,6 +561,10 @@ def profile_all(stages, compiled_outputs: Sequence[CompileOutput], meshes,
         compute_cost[start, end, config_idx] = np.mean(cost)
         max_n_succ_stages[start, end, config_idx] = max_stage
         is_profiled[start, end, config_idx] = 1
+        if compute_cost_database is not None:
+            compute_cost_database.update(stage_keys[stage_id],
+                                         compute_cost[start, end, config_idx],
+                                         max_stage)
         pbar.write(
             f"cost[{start}, {end}, {config_idx}]={compute_cost[start, end, config_idx]:.3f},"
             f" max_n_succ_stage={max_stage},"
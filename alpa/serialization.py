@@ -5,7 +5,9 @@ Add support for DistributedArray and ReplicatedDistributedArray serialization in
 
 import enum
 import os
-from typing import Union, Any, Sequence
+import threading
+import time
+from typing import Union, Any, Optional, Sequence
 import uuid
 
 from flax.serialization import to_state_dict, from_state_dict, _ndarray_from_bytes, _ndarray_to_bytes
@@ -15,8 +17,13 @@ from jax.core import ShapedArray
 from jax._src.tree_util import tree_flatten, tree_leaves, tree_unflatten
 import msgpack
 import numpy as np
+import ray
 
-from alpa.device_mesh import DistributedArray, ReplicatedDistributedArray, PhysicalDeviceMesh
+from alpa.device_mesh import (DistributedArray, ReplicatedDistributedArray,
+                              PhysicalDeviceMesh, save_distributed_arrays,
+                              async_save_distributed_arrays)
+from alpa.disk_cache import write_file_atomic
+from alpa.global_env import global_config
 
 PyTree = Any
 
@@ -30,7 +37,10 @@ class _MsgpackExtType(enum.IntEnum):
     replicated_distarray = 5
 
 
-def _msgpack_ext_pack_wrapper(ckpt_dir):
+def _msgpack_ext_pack_wrapper(ckpt_dir, arrays_to_save):
+    """Get the messagepack encoder. The distributed arrays and their save
+    directories are appended to `arrays_to_save` instead of being saved
+    one by one."""
 
     def _msgpack_ext_pack(x):
         """Messagepack encoders for custom types."""
@@ -46,12 +56,12 @@ def _msgpack_ext_pack_wrapper(ckpt_dir):
                                    msgpack.packb((x.real, x.imag)))
         elif isinstance(x, DistributedArray):
             save_dir = os.path.join(ckpt_dir, uuid.uuid4().hex)
-            x.save(save_dir)
+            arrays_to_save.append((x, save_dir))
             return msgpack.ExtType(_MsgpackExtType.distarray,
                                    msgpack.packb(save_dir))
         elif isinstance(x, ReplicatedDistributedArray):
             save_dir = os.path.join(ckpt_dir, uuid.uuid4().hex)
-            x.replica.save(save_dir)
+            arrays_to_save.append((x.replica, save_dir))
             return msgpack.ExtType(_MsgpackExtType.replicated_distarray,
                                    msgpack.packb(save_dir))
         return x
@@ -76,8 +86,67 @@ def _msgpack_ext_unpack(code, data):
     return msgpack.ExtType(code, data)
 
 
-def save_checkpoint(ckpt_dir: Union[str, os.PathLike], target: PyTree,
-                    step: int):
+class AsyncCheckpointHandle:
+    """The handle of a checkpoint being saved asynchronously.
+
+    A driver thread polls the workers until all distributed arrays are
+    written, then writes the state file. The state file is the commit
+    marker of the checkpoint: restore_checkpoint only reads the state file,
+    so a partially written checkpoint is never loaded.
+    """
+
+    poll_interval = 0.5
+
+    def __init__(self, ckpt_path: str, contents: bytes, save_uuid: str,
+                 workers: Sequence):
+        self.ckpt_path = ckpt_path
+        self.error = None
+        self.thread = threading.Thread(target=self._commit,
+                                       args=(contents, save_uuid, workers),
+                                       daemon=True)
+        self.thread.start()
+
+    def _commit(self, contents, save_uuid, workers):
+        try:
+            while workers:
+                done = ray.get([
+                    w.get_async_save_status.remote(save_uuid) for w in workers
+                ])
+                workers = [w for w, d in zip(workers, done) if not d]
+                if workers:
+                    time.sleep(self.poll_interval)
+            write_file_atomic(self.ckpt_path, lambda fout: fout.write(contents))
+        except Exception as e:  # pylint: disable=broad-except
+            self.error = e
+
+    def done(self):
+        """Return whether the checkpoint is committed or failed."""
+        return not self.thread.is_alive()
+
+    def wait(self):
+        """Wait until the checkpoint is committed. Raise the error if the
+        checkpoint failed."""
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+# The asynchronous checkpoints being saved
+_inflight_checkpoints = []
+
+
+def wait_all_checkpoints():
+    """Wait until all asynchronous checkpoints are committed."""
+    while _inflight_checkpoints:
+        _inflight_checkpoints.pop(0).wait()
+
+
+def save_checkpoint(ckpt_dir: Union[str, os.PathLike],
+                    target: PyTree,
+                    step: int,
+                    compressor: Optional[str] = "gzip",
+                    max_chunk_bytes: Optional[int] = None,
+                    async_save: bool = False):
     """Save a checkpoint of the `target` to `path`. 
 
         Similar to flax.training.checkpoints.save_checkpoint, but support DistributedArrays 
@@ -89,15 +158,48 @@ def save_checkpoint(ckpt_dir: Union[str, os.PathLike], target: PyTree,
            ckpt_dir: str or pathlib-like path to store checkpoint directories in.
            target: serializable flax object, usually a trainState
            step: training step number or other metric number
+           compressor: the compressor of distributed arrays. Possible
+             choices: {None, "gzip", "zstd", "blosc"}.
+           max_chunk_bytes: the maximal chunk size of distributed arrays.
+             Use the shard shape as the chunk shape if it is None.
+           async_save: whether to save the checkpoint asynchronously. If
+             true, return after workers copy the arrays to host memory, and
+             write them to disk in the background.
+
+        Returns:
+            An AsyncCheckpointHandle if async_save is true, otherwise None.
     """
     state_dict = to_state_dict(target)
     os.makedirs(ckpt_dir, exist_ok=True)
     ckpt_path = os.path.join(ckpt_dir, f"checkpoint_{step}")
-    with open(ckpt_path, 'wb') as fp:
-        fp.write(
-            msgpack.packb(state_dict,
-                          default=_msgpack_ext_pack_wrapper(ckpt_dir),
-                          strict_types=True))
+    arrays_to_save = []
+    contents = msgpack.packb(state_dict,
+                             default=_msgpack_ext_pack_wrapper(
+                                 ckpt_dir, arrays_to_save),
+                             strict_types=True)
+    arrays, paths = zip(*arrays_to_save) if arrays_to_save else ((), ())
+
+    if not async_save:
+        # Write all distributed arrays concurrently
+        ray.get(
+            save_distributed_arrays(arrays, paths, compressor,
+                                    max_chunk_bytes))
+        write_file_atomic(ckpt_path, lambda fout: fout.write(contents))
+        return None
+
+    # Limit the number of checkpoints in flight
+    while (_inflight_checkpoints and
+           (len(_inflight_checkpoints) >=
+            global_config.async_checkpoint_max_inflight or
+            _inflight_checkpoints[0].done())):
+        _inflight_checkpoints.pop(0).wait()
+
+    save_uuid = uuid.uuid4().hex
+    workers = async_save_distributed_arrays(save_uuid, arrays, paths,
+                                            compressor, max_chunk_bytes)
+    handle = AsyncCheckpointHandle(ckpt_path, contents, save_uuid, workers)
+    _inflight_checkpoints.append(handle)
+    return handle
 
 
 class LoadInfo:
@@ -34,6 +34,9 @@ from jax.interpreters import pxla
 
 from alpa.global_env import global_config
 from alpa.measure_record import (StrategyConfig)
+from alpa.shard_parallel.solution_cache import (compute_solver_args_key,
+                                                get_solution_cache)
+from alpa.shard_parallel.warm_start import get_warm_start_index
 from alpa.timer import timers
 from alpa.util import check_arithmetic_sequence, get_compile_options, XlaPassContext
 
@@ -411,6 +414,40 @@ def run_backend_compilation(backend: xe.Client,
     return compiled
 
 
+def serialize_sharded_hlo_module(hlo_module: xe.HloModule, num_devices: int):
+    """Serialize a SPMD partitioned HLO module with its input and output
+    shardings, which are not part of the module proto.
+
+    Returns:
+      The (module_proto, input_sharding_protos, output_sharding_proto). The
+      sharding protos are None on a single device.
+    """
+    if num_devices > 1:
+        input_sharding_protos = [
+            x.proto_tuple().SerializeToString()
+            for x in hlo_module.spmd_parameters_shardings()
+        ]
+        output_sharding_proto = (
+            hlo_module.spmd_output_sharding().proto_tuple().SerializeToString())
+    else:
+        input_sharding_protos = output_sharding_proto = None
+    return (hlo_module.as_serialized_hlo_module_proto(), input_sharding_protos,
+            output_sharding_proto)
+
+
+def deserialize_sharded_hlo_module(
+        module_proto: bytes, input_sharding_protos: Optional[Sequence[bytes]],
+        output_sharding_proto: Optional[bytes]) -> xe.HloModule:
+    """The inverse of serialize_sharded_hlo_module."""
+    hlo_module = xc.XlaComputation(module_proto).as_hlo_module()
+    if input_sharding_protos is not None:
+        hlo_module.set_spmd_parameters_shardings(
+            [xe.HloSharding(x) for x in input_sharding_protos])
+        hlo_module.set_spmd_output_sharding(
+            xe.HloSharding(output_sharding_proto))
+    return hlo_module
+
+
 def get_input_output_sharding_specs(
     hlo_module: xe.HloModule, avals: Sequence[ShapedArray],
     out_avals: Sequence[ShapedArray], num_devices: int,
@@ -606,7 +643,28 @@ def _call_solver_serialized_args(
     # pickle.dump([N, M, s_len_np, s_follow_np, E_np, A_np, L_np,
     #              c_np, d_np, m_np, r_np, v_np, s_init_np],
     #              open("args.pkl", "wb"))
-    # TODO(lmzheng): cache the ILP solution.
+
+    # Look up the ILP solution cache
+    solution_cache = get_solution_cache()
+    if solution_cache is not None:
+        cache_key = compute_solver_args_key(N, M, s_len_np, s_follow_np, E_np,
+                                            A_np, L_np, c_np, d_np, m_np, r_np,
+                                            v_np, s_init_np)
+        cached = solution_cache.get(cache_key)
+        if cached is not None:
+            s_val, e_val, objective, status = cached
+            last_s_val = s_val
+            last_objective = objective
+            logger.debug("Hit the ILP solution cache. (hits, misses, "
+                         "evictions): %s", solution_cache.stats())
+            return s_val, e_val, objective, status
+
+    # Warm-start from the nearest previously solved graph
+    warm_start_index = get_warm_start_index()
+    warm_start_record = None
+    if warm_start_index is not None and s_init_np is None:
+        s_init_np, warm_start_record = warm_start_index.query(
+            s_len_np, s_follow_np, E_np)
 
     def get_non_zero_index(binary_vector):
         """Get the index of non-zero item in a vector."""
@@ -798,9 +856,12 @@ def _call_solver_serialized_args(
         solver = pulp.COIN_CMD(mip=True,
                                msg=msg,
                                timeLimit=time_limit,
-                               threads=multiprocessing.cpu_count())
+                               threads=multiprocessing.cpu_count(),
+                               warmStart=s_init_np is not None)
         # solver = pulp.GLPK_CMD(mip=True, msg=msg, timeLimit=time_limit)
+        solve_tic = time.time()
         prob.solve(solver)
+        solve_time = time.time() - solve_tic
 
     status = prob.status
     objective = pulp.value(prob.objective)
@@ -833,6 +894,13 @@ def _call_solver_serialized_args(
     last_s_val = s_val
     last_objective = objective
 
+    if solution_cache is not None and status == pulp.LpStatusOptimal:
+        solution_cache.put(cache_key, (s_val, e_val, objective, status))
+
+    if warm_start_index is not None:
+        warm_start_index.add(s_len_np, s_follow_np, E_np, s_val, solve_time,
+                             warm_start_record)
+
     if objective > INFINITY_COST:
         warnings.warn("Detect unexpected behaviors in the auto-sharding pass.")
 
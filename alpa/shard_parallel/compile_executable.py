@@ -1,6 +1,7 @@
 """Compile executables for shard parallelism."""
 import hashlib
-import inspect
+import logging
+import time
 from typing import Callable, Sequence, Optional, Union
 
 import numpy as np
@@ -12,40 +13,87 @@ from jax.interpreters import partial_eval as pe
 from jax.lax import add_p, div_p
 from jax.lib import xla_client as xc, xla_extension
 from jax.tree_util import PyTreeDef
+import ray
 
 from alpa.device_mesh import LogicalDeviceMesh, PhysicalDeviceMesh
+from alpa.executable_cache import (compute_executable_key,
+                                   get_executable_cache,
+                                   get_profiling_result_key)
+from alpa.jaxpr_fingerprint import get_jaxpr_fingerprint
+from alpa.measure_record import (MeasureInput, MeasureResult, SearchTask,
+                                 load_best_record, save_to_file)
 from alpa.mesh_executable import (NormalMeshDriverExecutable,
                                   GradAccMeshDriverExecutable)
+from alpa.mesh_profiling import (ProfilingResultDatabase,
+                                  estimate_hlo_module_cost)
 from alpa.pipeline_parallel.apply_grad import APPLY_GRAD_MARKER_SUFFIX
-from alpa.shard_parallel.auto_sharding import (run_auto_sharding_pass,
-                                               run_spmd_partitioner_pass,
-                                               AutoShardingOption)
+from alpa.pipeline_parallel.stage_profiling import CompileWorkerPool
+from alpa.shard_parallel.auto_sharding import (
+    run_auto_sharding_pass, run_spmd_partitioner_pass,
+    deserialize_sharded_hlo_module, serialize_sharded_hlo_module,
+    AutoShardingOption)
 from alpa.util import (jaxpr_to_hlo_computation, trace_jaxpr_with_micro_batch,
                        setup_computation_alias, OrderedSet)
 
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
-def get_compute_key(fun: lu.WrappedFun, in_tree: PyTreeDef,
+
+def get_compute_key(closed_jaxpr: ClosedJaxpr,
                     donated_invars: Sequence[bool],
                     *aval: Sequence[AbstractValue]):
     """Return a unique string as the query key of a computation definition."""
 
     # Algorithm:
-    # Concatenate the definition location, source code,
+    # Concatenate the structural fingerprint of the traced jaxpr and the
     # input arguments specification to a string.
     # Then compute a hash value of this string.
-    #
-    # TODO(lmzheng): use jaxpr or hlo instead of source code?
+    # The fingerprint does not depend on the source location of the function
+    # or the process that traced it.
 
-    location = fun.f.__str__().split("at")[0]
-    source_code = inspect.getsource(fun.f)
+    fingerprint = get_jaxpr_fingerprint(closed_jaxpr)
     donated_invars = str(donated_invars)
     aval = "".join(x.str_short() for x in aval)
 
-    string = location + source_code + donated_invars + aval
+    string = fingerprint + donated_invars + aval
     hash_key = hashlib.md5(string.encode(encoding="utf-8")).hexdigest()
     return hash_key
 
 
+def get_logical_mesh_choices(physical_mesh: PhysicalDeviceMesh,
+                             search_space: str):
+    """Return the candidates of logical meshes of a physical mesh.
+
+    Args:
+      physical_mesh: The physical device mesh.
+      search_space: The search space of the logical mesh shapes.
+        Possible choices: {"single", "all"}. "single" only uses the default
+        logical mesh. "all" uses all 2d mesh shapes with the same number of
+        devices. The default logical mesh is always the first choice.
+    """
+    default_mesh = physical_mesh.get_logical_mesh()
+    if search_space == "single":
+        return [default_mesh]
+    elif search_space == "all":
+        num_devices = physical_mesh.num_devices
+        choices = [default_mesh]
+        for i in range(1, num_devices + 1):
+            shape = (i, num_devices // i)
+            if num_devices % i == 0 and shape != tuple(default_mesh.shape):
+                choices.append(physical_mesh.get_logical_mesh(shape))
+        return choices
+    else:
+        raise ValueError(f"Invalid logical mesh search space: {search_space}")
+
+
+def get_logical_mesh_signatures(
+        logical_mesh_choices: Sequence[LogicalDeviceMesh]):
+    """Return the shapes and communication coefficients of logical meshes,
+    which determine the auto-sharding result."""
+    return [(tuple(x.shape), x.mesh_alpha, x.mesh_beta)
+            for x in logical_mesh_choices]
+
+
 def compile_shard_executable(
     fun: lu.WrappedFun,
     in_tree: PyTreeDef,
@@ -57,33 +105,190 @@ def compile_shard_executable(
     num_micro_batches: Optional[int],
     as_option: AutoShardingOption,
     *avals: Sequence[AbstractValue],
+    logical_mesh_search_space: str = "single",
+    profiling_database_filename: Optional[str] = None,
+    measure_record_filename: Optional[str] = None,
 ):
     """Compile an executable with auto-sharding pass."""
     if isinstance(device_mesh, PhysicalDeviceMesh):
         physical_mesh = device_mesh
-        logical_mesh_choices = [physical_mesh.get_logical_mesh()]
+        logical_mesh_choices = get_logical_mesh_choices(
+            physical_mesh, logical_mesh_search_space)
     elif isinstance(device_mesh, LogicalDeviceMesh):
         physical_mesh = device_mesh.physical_mesh
         logical_mesh_choices = [device_mesh]
+        # The logical mesh is given, so there is nothing to record
+        measure_record_filename = None
     else:
         raise ValueError("Invalid value of devices")
 
+    prof_result = None
+    if profiling_database_filename is not None and len(
+            logical_mesh_choices) > 1:
+        prof_database = ProfilingResultDatabase()
+        prof_database.load(profiling_database_filename)
+        prof_result = prof_database.query("default", physical_mesh.shape)
+
+    search_args = (prof_result, measure_record_filename)
     if num_micro_batches is None:
-        return shard_parallel_internal(
-            fun, in_tree, out_tree_thunk, static_argnums, donated_invars,
-            physical_mesh, logical_mesh_choices, as_option, *avals)
+        return shard_parallel_internal(fun, in_tree, out_tree_thunk,
+                                       static_argnums, donated_invars,
+                                       physical_mesh, logical_mesh_choices,
+                                       as_option, search_args, *avals)
     else:
         return shard_parallel_internal_gradient_accumulation(
             fun, in_tree, out_tree_thunk, static_argnums, donated_invars,
             batch_invars, physical_mesh, logical_mesh_choices,
-            num_micro_batches, as_option, *avals)
+            num_micro_batches, as_option, search_args, *avals)
+
+
+def load_measure_record(closed_jaxpr: ClosedJaxpr,
+                        donated_invars: Sequence[bool],
+                        avals: Sequence[AbstractValue],
+                        physical_mesh: PhysicalDeviceMesh,
+                        logical_mesh_choices: Sequence[LogicalDeviceMesh],
+                        measure_record_filename: Optional[str]):
+    """Create the search task of a traced computation and reuse the best
+    logical mesh recorded by previous searches.
+
+    Returns:
+      search_task: The search task to record the chosen strategy. None if
+        measure_record_filename is None.
+      logical_mesh_choices: The candidates of logical mesh shape.
+    """
+    if measure_record_filename is None:
+        return None, logical_mesh_choices
+
+    search_task = SearchTask(
+        get_compute_key(closed_jaxpr, donated_invars, *avals),
+        physical_mesh.get_signature())
+    inp, _ = load_best_record(search_task, measure_record_filename)
+    if inp is not None:
+        logical_mesh_choices = [
+            physical_mesh.get_logical_mesh(tuple(
+                inp.config.logical_mesh_shape))
+        ]
+    return search_task, logical_mesh_choices
+
+
+def search_logical_mesh(built: xc.XlaComputation,
+                        avals: Sequence[AbstractValue],
+                        out_avals: Sequence[AbstractValue],
+                        donated_invars: Sequence[bool],
+                        logical_mesh_choices: Sequence[LogicalDeviceMesh],
+                        return_mode: str,
+                        num_micro_batches: int,
+                        as_option: AutoShardingOption,
+                        prof_result=None,
+                        search_task: Optional[SearchTask] = None,
+                        measure_record_filename: Optional[str] = None):
+    """Run the auto-sharding pass on all logical mesh candidates and pick the best.
+
+    The candidates are compiled in parallel by a pool of compile workers if ray
+    is initialized. They are ranked by the HLO cost model if `prof_result` is
+    provided and the return mode is "single", otherwise by the ILP objective.
+
+    Args:
+      built: The xla computation to run auto-sharding on.
+      logical_mesh_choices: The candidates of logical meshes.
+      return_mode: The return mode of `run_auto_sharding_pass`.
+        The choices are {"single", "stage_protos"}.
+      prof_result: The profiling result used by the HLO cost model.
+      search_task: The search task to record the chosen strategy.
+      measure_record_filename: The file to save the record of the chosen
+        strategy.
+
+    Returns:
+      The same outputs as `run_auto_sharding_pass` on the best logical mesh.
+    """
+    jaxpr_args = (avals, out_avals, donated_invars)
+    if len(logical_mesh_choices) == 1:
+        return run_auto_sharding_pass(built, *jaxpr_args,
+                                      logical_mesh_choices[0], return_mode,
+                                      num_micro_batches, as_option)
+
+    assert return_mode in ["single", "stage_protos"]
+    proto = built.as_serialized_hlo_module_proto()
+    num_choices = len(logical_mesh_choices)
+    results = [None] * num_choices
+
+    if ray.is_initialized():
+        num_cpus = int(
+            min(max(ray.available_resources().get("CPU", 1) // 2, 1),
+                num_choices))
+        compile_workers = CompileWorkerPool(num_cpus)
+        compile_fn = lambda w, v: w.run_auto_sharding_pass_for_search.remote(*v)  # noqa
+
+        for i, logical_mesh in enumerate(logical_mesh_choices):
+            # Drop the reference to the physical mesh, which cannot be
+            # sent to compile workers.
+            logical_mesh = LogicalDeviceMesh(None, logical_mesh.id_mesh,
+                                             logical_mesh.mesh_alpha,
+                                             logical_mesh.mesh_beta)
+            other_kwargs = {
+                "logical_mesh": logical_mesh,
+                "return_mode": return_mode,
+                "as_option": as_option,
+                "num_micro_batches": num_micro_batches,
+            }
+            compile_workers.submit(compile_fn,
+                                   (i, proto, jaxpr_args, other_kwargs))
+        for _ in range(num_choices):
+            # Use the ordered version to avoid the profiling timeout,
+            # because the ILP solver can take longer than that.
+            i, ret = compile_workers.get_next()
+            results[i] = ret
+        compile_workers.shutdown()
+
+        if return_mode == "single":
+            for i, ret in enumerate(results):
+                if ret is None:
+                    continue
+                results[i] = (deserialize_sharded_hlo_module(*ret[:3]),
+                              ret[3])
+    else:
+        for i, logical_mesh in enumerate(logical_mesh_choices):
+            try:
+                results[i] = run_auto_sharding_pass(built, *jaxpr_args,
+                                                    logical_mesh, return_mode,
+                                                    num_micro_batches,
+                                                    as_option)
+            except RuntimeError as e:
+                logger.warning(f"Compilation error (auto-sharding pass) for "
+                               f"logical mesh {logical_mesh.shape} : {e}")
+
+    # Rank all candidates
+    best_idx, best_cost = None, np.inf
+    for i, ret in enumerate(results):
+        if ret is None:
+            continue
+        strategy_config = ret[-1]
+        if prof_result is not None and return_mode == "single":
+            cost = estimate_hlo_module_cost(ret[0], prof_result)
+        else:
+            cost = strategy_config.auto_sharding_objective
+        logger.debug(f"Logical mesh {strategy_config.logical_mesh_shape}: "
+                     f"cost {cost}")
+        if cost < best_cost:
+            best_idx, best_cost = i, cost
+
+    if best_idx is None:
+        raise RuntimeError("Auto-sharding failed on all logical mesh choices.")
+
+    best_result = results[best_idx]
+    if search_task is not None and measure_record_filename is not None:
+        inp = MeasureInput(search_task, best_result[-1])
+        res = MeasureResult([best_cost], best_cost, 0, time.time())
+        save_to_file([inp], [res], measure_record_filename)
+    return best_result
 
 
 def shard_parallel_internal(
         fun: lu.WrappedFun, in_tree: PyTreeDef, out_tree_thunk: Callable,
         static_argnums: Sequence[int], donated_invars: Sequence[bool],
         physical_mesh: PhysicalDeviceMesh, logical_mesh_choices: Sequence[LogicalDeviceMesh],
-        as_option: AutoShardingOption, *avals: Sequence[AbstractValue]):
+        as_option: AutoShardingOption, search_args: Sequence,
+        *avals: Sequence[AbstractValue]):
     """
     Compile an executable with auto-sharding pass.
 
@@ -97,29 +302,69 @@ def shard_parallel_internal(
         If there is only one choice, use the given one. If there are multiple choices,
         we will try all of them and pick the best.
       as_option: The options of auto-sharding solver.
+      search_args: The (prof_result, measure_record_filename) arguments of
+        `search_logical_mesh`.
       avals: The input abstract values.
     """
     # Trace to get jaxpr
     jaxpr, out_avals, consts = pe.trace_to_jaxpr_final(fun, avals)
-
-    # Convert jaxpr to XLA HLO
-    name = f"{fun.__name__}_shard_parallel"
-    backend = xb.get_backend("gpu")
-    built = jaxpr_to_hlo_computation(name, ClosedJaxpr(jaxpr, consts),
-                                     donated_invars, backend)
-    flop_count = xla_extension.hlo_module_count_flop_dot_conv_only(
-        built.as_hlo_module())
-
-    # Compile a XLA executable
-    hlo_module, strategy_config = run_auto_sharding_pass(
-        built,
-        avals,
-        out_avals,
-        donated_invars,
-        logical_mesh_choices[0],
-        "single",
-        1,
-        as_option)
+    closed_jaxpr = ClosedJaxpr(jaxpr, consts)
+
+    prof_result, measure_record_filename = search_args
+    search_task, logical_mesh_choices = load_measure_record(
+        closed_jaxpr, donated_invars, avals, physical_mesh,
+        logical_mesh_choices, measure_record_filename)
+
+    # Reuse the auto-sharding result of another process
+    executable_cache = get_executable_cache()
+    cached = None
+    if executable_cache is not None:
+        # The mesh signature contains the device type
+        cache_key = compute_executable_key(
+            closed_jaxpr, avals, donated_invars, "shard_parallel",
+            physical_mesh.get_signature(),
+            get_logical_mesh_signatures(logical_mesh_choices),
+            get_profiling_result_key(prof_result), as_option)
+        cached = executable_cache.get(cache_key)
+
+    if cached is not None:
+        hlo_module = deserialize_sharded_hlo_module(*cached["hlo_module"])
+        strategy_config = cached["strategy_config"]
+        flop_count = cached["flop_count"]
+    else:
+        # Convert jaxpr to XLA HLO
+        name = f"{fun.__name__}_shard_parallel"
+        backend = xb.get_backend("gpu")
+        built = jaxpr_to_hlo_computation(name, closed_jaxpr, donated_invars,
+                                         backend)
+        flop_count = xla_extension.hlo_module_count_flop_dot_conv_only(
+            built.as_hlo_module())
+
+        # Compile a XLA executable
+        hlo_module, strategy_config = search_logical_mesh(
+            built,
+            avals,
+            out_avals,
+            donated_invars,
+            logical_mesh_choices,
+            "single",
+            1,
+            as_option,
+            prof_result,
+            search_task,
+            measure_record_filename)
+
+        if executable_cache is not None:
+            executable_cache.put(
+                cache_key, {
+                    "hlo_module":
+                        serialize_sharded_hlo_module(
+                            hlo_module, physical_mesh.num_devices),
+                    "strategy_config":
+                        strategy_config,
+                    "flop_count":
+                        flop_count,
+                })
 
     # Compile a mesh executable
     return NormalMeshDriverExecutable(physical_mesh,
@@ -139,7 +384,7 @@ def shard_parallel_internal_gradient_accumulation(
         batch_invars: Sequence[bool], physical_mesh: PhysicalDeviceMesh,
         logical_mesh_choices: Sequence[LogicalDeviceMesh],
         num_micro_batches: int, as_option: AutoShardingOption,
-        *raw_avals: Sequence[AbstractValue]):
+        search_args: Sequence, *raw_avals: Sequence[AbstractValue]):
     """Compile a gradient accumulation executable with auto-sharding pass."""
     # Split the batch dimension
     closed_jaxpr, avals, _ = trace_jaxpr_with_micro_batch(
@@ -152,25 +397,62 @@ def shard_parallel_internal_gradient_accumulation(
     grad_avals = [x.aval for x in closed_jaxpr.jaxpr.invars[-num_grads:]]
 
     # Run auto-sharding and slice the combined HLO into two HLO: accumulate_grad and apply_grad
-    backend = xb.get_backend("gpu")
     donated_invars = donated_invars + (False,) * num_grads
-    name = f"{fun.__name__}_shard_parallel"
-    built = jaxpr_to_hlo_computation(name, closed_jaxpr, donated_invars,
-                                     backend)
-    flop_count = xla_extension.hlo_module_count_flop_dot_conv_only(
-        built.as_hlo_module())
-    flop_count *= num_micro_batches
-
-    # pylint: disable=unbalanced-tuple-unpacking
-    hlo_proto_names, hlo_protos, strategy_config = run_auto_sharding_pass(
-        built,
-        avals,
-        out_avals,
-        donated_invars,
-        logical_mesh_choices[0],
-        "stage_protos",
-        num_micro_batches,
-        as_option)
+
+    prof_result, measure_record_filename = search_args
+    search_task, logical_mesh_choices = load_measure_record(
+        closed_jaxpr, donated_invars, avals, physical_mesh,
+        logical_mesh_choices, measure_record_filename)
+
+    # Reuse the auto-sharding result of another process
+    executable_cache = get_executable_cache()
+    cached = None
+    if executable_cache is not None:
+        cache_key = compute_executable_key(
+            closed_jaxpr, avals, donated_invars,
+            "shard_parallel_gradient_accumulation",
+            physical_mesh.get_signature(),
+            get_logical_mesh_signatures(logical_mesh_choices),
+            get_profiling_result_key(prof_result), num_micro_batches,
+            as_option)
+        cached = executable_cache.get(cache_key)
+
+    if cached is not None:
+        hlo_proto_names = list(cached["hlo_proto_names"])
+        hlo_protos = list(cached["hlo_protos"])
+        strategy_config = cached["strategy_config"]
+        flop_count = cached["flop_count"]
+    else:
+        backend = xb.get_backend("gpu")
+        name = f"{fun.__name__}_shard_parallel"
+        built = jaxpr_to_hlo_computation(name, closed_jaxpr, donated_invars,
+                                         backend)
+        flop_count = xla_extension.hlo_module_count_flop_dot_conv_only(
+            built.as_hlo_module())
+        flop_count *= num_micro_batches
+
+        # pylint: disable=unbalanced-tuple-unpacking
+        hlo_proto_names, hlo_protos, strategy_config = search_logical_mesh(
+            built,
+            avals,
+            out_avals,
+            donated_invars,
+            logical_mesh_choices,
+            "stage_protos",
+            num_micro_batches,
+            as_option,
+            prof_result,
+            search_task,
+            measure_record_filename)
+
+        if executable_cache is not None:
+            executable_cache.put(
+                cache_key, {
+                    "hlo_proto_names": list(hlo_proto_names),
+                    "hlo_protos": list(hlo_protos),
+                    "strategy_config": strategy_config,
+                    "flop_count": flop_count,
+                })
     assert len(hlo_protos) == 2
 
     if hlo_proto_names[0].endswith(APPLY_GRAD_MARKER_SUFFIX):
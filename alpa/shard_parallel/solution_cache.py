@@ -0,0 +1,72 @@
+"""A persistent on-disk cache for the solutions of the auto-sharding ILP."""
+import hashlib
+from typing import Optional, Tuple
+
+import numpy as np
+
+from alpa.disk_cache import DiskLRUCache, get_global_cache
+from alpa.global_env import global_config
+
+SOLUTION_CACHE_VERSION = "v0.1"
+
+
+def compute_solver_args_key(N, M, s_len_np, s_follow_np, E_np, A_np, L_np,
+                            c_np, d_np, m_np, r_np, v_np,
+                            s_init_np=None) -> str:  # noqa
+    """Compute a content-addressed key of the serialized solver inputs.
+
+    The warm-start part of ``s_init_np`` does not change the optimal solution,
+    so only the fixed entries are included in the key.
+    """
+    h = hashlib.sha256()
+    h.update(SOLUTION_CACHE_VERSION.encode())
+    h.update(np.array([N, M], dtype=np.int64).tobytes())
+    for x in [s_len_np, s_follow_np, E_np, A_np, L_np, c_np, d_np, m_np, r_np,
+              v_np]:
+        x = np.ascontiguousarray(x)
+        h.update(str((x.dtype.str, x.shape)).encode())
+        h.update(x.tobytes())
+    if s_init_np is not None:
+        s_init = np.asarray(s_init_np).reshape((-1, 3))
+        fixed = np.ascontiguousarray(s_init[s_init[:, 2] != 0])
+        h.update(fixed.astype(np.int64).tobytes())
+    return h.hexdigest()
+
+
+class ILPSolutionCache(DiskLRUCache):
+    """A size-bounded LRU cache of ILP solutions stored in a directory.
+
+    Each solution is a tuple of (s_val, e_val, objective, status) stored as a
+    ``<key>.npz`` file.
+
+    Args:
+      cache_dir: The directory to store the solutions.
+      max_size: The maximum total size of the cache directory in bytes.
+    """
+
+    suffix = ".npz"
+
+    def load_value(self,
+                   fin) -> Tuple[np.ndarray, np.ndarray, float, int]:
+        with np.load(fin) as data:
+            return (data["s_val"], data["e_val"], float(data["objective"]),
+                    int(data["status"]))
+
+    def dump_value(self, value, fout):
+        s_val, e_val, objective, status = value
+        np.savez(fout,
+                 s_val=s_val,
+                 e_val=e_val,
+                 objective=np.float64(objective),
+                 status=np.int64(status))
+
+
+def get_solution_cache() -> Optional[ILPSolutionCache]:
+    """Get the global ILP solution cache. Return None if it is disabled."""
+    cache_dir = global_config.auto_sharding_solution_cache_dir
+    if not cache_dir:
+        return None
+    return get_global_cache(
+        ILPSolutionCache,
+        cache_dir,
+        max_size=global_config.auto_sharding_solution_cache_size)
@@ -0,0 +1,233 @@
+"""Warm-start the auto-sharding ILP solver from previously solved graphs.
+
+When only the batch size or the number of layers changes, the new ILP problem
+has (almost) the same nodes and strategy vectors as a problem solved before.
+We align the nodes of the new problem with the nodes of a previous problem by
+their strategy vector lengths and use the previous solution as the initial
+value of the ILP variables.
+"""
+import difflib
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from alpa.disk_cache import DiskLRUCache
+from alpa.global_env import global_config
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def get_node_signatures(s_len_np: np.ndarray,
+                        s_follow_np: np.ndarray) -> np.ndarray:
+    """Get the signature of every node used to match nodes across graphs.
+
+    The signature is the length of its strategy vector. Nodes that follow
+    other nodes have no variables of their own and are marked as -1.
+    """
+    return np.where(
+        np.asarray(s_follow_np) < 0, np.asarray(s_len_np), -1).astype(np.int64)
+
+
+def get_structure_key(signatures: np.ndarray, E_np: np.ndarray) -> str:  # noqa
+    """Get a hash of the graph structure, which ignores all costs."""
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(signatures, dtype=np.int64).tobytes())
+    h.update(np.ascontiguousarray(E_np, dtype=np.int64).tobytes())
+    return h.hexdigest()
+
+
+class SolvedGraphRecord:
+    """A solved ILP problem stored in the warm-start index."""
+
+    def __init__(self, structure_key: str, signatures: np.ndarray,
+                 s_val: np.ndarray, solve_time: float, warm_started: bool):
+        self.structure_key = structure_key
+        self.signatures = signatures
+        self.s_val = s_val
+        self.solve_time = solve_time
+        self.warm_started = warm_started
+
+
+class SolvedGraphRecordCache(DiskLRUCache):
+    """A bounded LRU cache of solved graph records stored in a directory.
+
+    Each record is stored as a ``<structure_key>.npz`` file.
+    """
+
+    suffix = ".npz"
+
+    def load_value(self, fin) -> SolvedGraphRecord:
+        with np.load(fin) as data:
+            return SolvedGraphRecord(None, data["signatures"], data["s_val"],
+                                     float(data["solve_time"]),
+                                     bool(data["warm_started"]))
+
+    def dump_value(self, value: SolvedGraphRecord, fout):
+        np.savez(fout,
+                 signatures=value.signatures,
+                 s_val=value.s_val,
+                 solve_time=np.float64(value.solve_time),
+                 warm_started=np.bool_(value.warm_started))
+
+
+class WarmStartIndex:
+    """Keep past ILP solutions indexed by graph structure.
+
+    Args:
+      max_records: The maximum number of solutions to keep.
+      min_similarity: The minimal fraction of matched nodes required to use
+        a previous solution as the warm start.
+      num_candidates: The number of candidates (ranked by the difference of
+        the number of nodes) to run the node alignment on.
+      save_dir: If not None, records are also saved to and loaded from
+        this directory, which keeps at most `max_records` records as well.
+    """
+
+    def __init__(self,
+                 max_records: int = 64,
+                 min_similarity: float = 0.5,
+                 num_candidates: int = 4,
+                 save_dir: Optional[str] = None):
+        self.max_records = max_records
+        self.min_similarity = min_similarity
+        self.num_candidates = num_candidates
+        self.save_dir = save_dir
+        self.records = OrderedDict()
+
+        # Statistics
+        self.num_warm_starts = 0
+        self.saved_solve_time = 0.0
+
+        if self.save_dir is not None:
+            self.disk_cache = SolvedGraphRecordCache(self.save_dir,
+                                                     max_entries=max_records)
+            self._load_from_dir()
+        else:
+            self.disk_cache = None
+
+    def _load_from_dir(self):
+        # Remove the records beyond max_records left by previous runs
+        self.disk_cache.evict()
+        names = sorted(
+            (name for name in os.listdir(self.save_dir)
+             if name.endswith(".npz")),
+            key=lambda x: os.path.getmtime(os.path.join(self.save_dir, x)))
+        for name in names:
+            # Read the files directly, so that their mtimes keep the LRU order
+            try:
+                with open(os.path.join(self.save_dir, name), "rb") as fin:
+                    record = self.disk_cache.load_value(fin)
+            except self.disk_cache.load_errors:
+                continue
+            record.structure_key = name[:-len(".npz")]
+            self.records[record.structure_key] = record
+
+    def query(self, s_len_np: np.ndarray, s_follow_np: np.ndarray,
+              E_np: np.ndarray):  # noqa
+        """Find the nearest solved graph and build the warm-start values.
+
+        Returns:
+          s_init_np: The flattened (node_idx, strategy_idx, fix) triples, or
+            None if no similar graph is found.
+          record: The matched record.
+        """
+        signatures = get_node_signatures(s_len_np, s_follow_np)
+        structure_key = get_structure_key(signatures, E_np)
+
+        if structure_key in self.records:
+            # The same graph structure. Match all nodes one by one.
+            record = self.records[structure_key]
+            self.records.move_to_end(structure_key)
+            if self.disk_cache is not None:
+                self.disk_cache.touch(structure_key)
+            pairs = [(i, i) for i in range(len(signatures))]
+        else:
+            # Align the node sequences of the most similar records
+            candidates = sorted(
+                self.records.values(),
+                key=lambda r: abs(len(r.signatures) - len(signatures)))
+            candidates = candidates[:self.num_candidates]
+
+            record, pairs = None, []
+            new_seq = signatures.tolist()
+            for candidate in candidates:
+                matcher = difflib.SequenceMatcher(None,
+                                                  candidate.signatures.tolist(),
+                                                  new_seq,
+                                                  autojunk=False)
+                cand_pairs = []
+                for block in matcher.get_matching_blocks():
+                    cand_pairs.extend((block.a + k, block.b + k)
+                                      for k in range(block.size))
+                if len(cand_pairs) > len(pairs):
+                    record, pairs = candidate, cand_pairs
+
+            if (record is None or
+                    len(pairs) < self.min_similarity * len(signatures)):
+                return None, None
+
+        s_init = [(new_idx, int(record.s_val[old_idx]), 0)
+                  for old_idx, new_idx in pairs
+                  if signatures[new_idx] > 1 and
+                  0 <= record.s_val[old_idx] < signatures[new_idx]]
+        if not s_init:
+            return None, None
+
+        logger.debug("Warm-start the ILP from a solved graph. "
+                     "#matched nodes: %d / %d", len(s_init), len(signatures))
+        return np.array(s_init, dtype=np.int64).reshape(-1), record
+
+    def add(self, s_len_np: np.ndarray, s_follow_np: np.ndarray,
+            E_np: np.ndarray, s_val: np.ndarray, solve_time: float,
+            warm_start_record: Optional[SolvedGraphRecord] = None):  # noqa
+        """Add a solution to the index and update the statistics.
+
+        Args:
+          warm_start_record: The record used to warm-start this solve.
+        """
+        signatures = get_node_signatures(s_len_np, s_follow_np)
+        structure_key = get_structure_key(signatures, E_np)
+
+        if warm_start_record is not None:
+            # Use the time of the nearest cold solve as the estimation of
+            # the time without warm start.
+            self.num_warm_starts += 1
+            saved_time = max(warm_start_record.solve_time - solve_time, 0.0)
+            self.saved_solve_time += saved_time
+            solve_time = max(warm_start_record.solve_time, solve_time)
+            logger.info(
+                "ILP warm start saved %.2f s (total saved: %.2f s in %d "
+                "solves).", saved_time, self.saved_solve_time,
+                self.num_warm_starts)
+
+        record = SolvedGraphRecord(structure_key, signatures,
+                                   np.asarray(s_val, dtype=np.int64),
+                                   solve_time, warm_start_record is not None)
+        self.records[structure_key] = record
+        self.records.move_to_end(structure_key)
+        while len(self.records) > self.max_records:
+            self.records.popitem(last=False)
+
+        if self.disk_cache is not None:
+            self.disk_cache.put(structure_key, record)
+
+
+_warm_start_index = None
+
+
+def get_warm_start_index() -> Optional[WarmStartIndex]:
+    """Get the global warm-start index. Return None if it is disabled."""
+    global _warm_start_index
+    if not global_config.auto_sharding_warm_start:
+        return None
+    if _warm_start_index is None:
+        cache_dir = global_config.auto_sharding_solution_cache_dir
+        save_dir = (os.path.join(os.path.expanduser(cache_dir), "warm_start")
+                    if cache_dir else None)
+        _warm_start_index = WarmStartIndex(save_dir=save_dir)
+    return _warm_start_index
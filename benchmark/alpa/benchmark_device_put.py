@@ -0,0 +1,74 @@
+"""Benchmark the driver-to-mesh bandwidth of sharding numpy arrays.
+
+Compare the object store slab path (use_object_store_for_device_put=True)
+against sending the shards with put_buffers calls.
+
+Usage:
+python3 benchmark_device_put.py --sizes-mb 1 16 256 --num-micro-batches 1 4
+"""
+import argparse
+import time
+
+from jax.interpreters import pxla
+import numpy as np
+
+from alpa import init
+from alpa.device_mesh import get_global_physical_mesh, _shard_array
+from alpa.global_env import global_config
+
+
+def benchmark_one_case(physical_mesh, size_mb, num_micro_batches,
+                       use_object_store, niter):
+    num_devices = physical_mesh.num_devices
+    num_cols = 1024
+    num_rows = (size_mb * 1024**2 // 4 // num_cols //
+                (num_devices * num_micro_batches) * num_devices *
+                num_micro_batches)
+    array = np.ones((num_rows, num_cols), dtype=np.float32)
+
+    num_shards = num_devices * num_micro_batches
+    sharding_spec = pxla.ShardingSpec(
+        (pxla.Chunked((num_shards,)), pxla.NoSharding()),
+        (pxla.ShardedAxis(0),))
+    indices = pxla.spec_to_indices(array.shape, sharding_spec)
+    # Reorder the micro batch shards as (device, micro batch)
+    indices = [
+        indices[b * num_devices + d]
+        for d in range(num_devices)
+        for b in range(num_micro_batches)
+    ]
+
+    global_config.use_object_store_for_device_put = use_object_store
+    costs = []
+    for _ in range(niter + 1):
+        tic = time.time()
+        bufs = _shard_array(array, physical_mesh, indices, num_micro_batches)
+        physical_mesh.block_until_ready_remote_buffers(bufs)
+        costs.append(time.time() - tic)
+        del bufs
+    cost = np.mean(costs[1:])
+
+    path = "object store" if use_object_store else "put_buffers"
+    print(f"size: {array.nbytes / 1024**2:8.1f} MB, "
+          f"#micro batches: {num_micro_batches}, path: {path:12s}, "
+          f"time: {cost * 1e3:8.2f} ms, "
+          f"bandwidth: {array.nbytes / 1024**2 / cost:8.1f} MB/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes-mb", type=int, nargs="+",
+                        default=[1, 16, 128, 512])
+    parser.add_argument("--num-micro-batches", type=int, nargs="+",
+                        default=[1, 4])
+    parser.add_argument("--niter", type=int, default=5)
+    args = parser.parse_args()
+
+    init(cluster="ray")
+    physical_mesh = get_global_physical_mesh(create_if_not_exist=True)
+
+    for size_mb in args.sizes_mb:
+        for num_micro_batches in args.num_micro_batches:
+            for use_object_store in [False, True]:
+                benchmark_one_case(physical_mesh, size_mb, num_micro_batches,
+                                   use_object_store, args.niter)
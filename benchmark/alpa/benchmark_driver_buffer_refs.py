@@ -0,0 +1,140 @@
+"""Benchmark the driver CPU time to create and free the outputs of a step.
+
+Every step, the driver creates the DistributedArray outputs of an executable
+and frees the outputs of the previous step. The legacy path creates one
+RemoteBufferRef per output buffer, while the new path creates one
+RemoteArrayRef per output. The workers are fake, so only the driver
+bookkeeping is measured.
+
+Usage:
+python3 benchmark_driver_buffer_refs.py --num-outputs 1000 --num-hosts 4
+"""
+import argparse
+import time
+
+from jax.core import ShapedArray
+from jax.interpreters import pxla
+from jax.interpreters.pxla import Chunked, NoSharding, ShardedAxis, ShardingSpec
+import numpy as np
+import ray
+
+from alpa.device_mesh import DistributedArray, DistributedPhysicalDeviceMesh
+from alpa.mesh_executable import (RemoteBufferRef, create_remote_array_refs,
+                                  next_remote_buffer_uuid)
+
+
+class FakeRemoteMethod:
+
+    def remote(self, *args, **kwargs):
+        pass
+
+
+class FakeWorker:
+
+    def __init__(self):
+        self.delete_buffers = FakeRemoteMethod()
+
+
+class FakeMesh:
+    """A mesh with the buffer deletion code of DistributedPhysicalDeviceMesh
+    and fake workers."""
+    delete_remote_buffers = DistributedPhysicalDeviceMesh.delete_remote_buffers
+    delete_remote_buffer_uuids = (
+        DistributedPhysicalDeviceMesh.delete_remote_buffer_uuids)
+    _flush_delete_remote_buffers = (
+        DistributedPhysicalDeviceMesh._flush_delete_remote_buffers)  # pylint: disable=protected-access
+
+    def __init__(self, num_hosts, num_devices_per_host):
+        self.num_hosts = num_hosts
+        self.num_devices_per_host = num_devices_per_host
+        self.num_devices = num_hosts * num_devices_per_host
+        self.device_strs = []
+        self.workers = [FakeWorker() for _ in range(num_hosts)]
+        self.to_delete_remote_buffers = [[] for _ in range(num_hosts)]
+        self.to_delete_remote_buffers_ct = 0
+
+
+def legacy_create_outputs(mesh, output_uuids, avals, specs):
+    num_outs = len(avals)
+    num_devices_per_host = mesh.num_devices_per_host
+    output_bufs = np.empty((num_outs, mesh.num_devices), dtype=object)
+    for i in range(num_outs):
+        for j in range(mesh.num_devices):
+            host_id = j // num_devices_per_host
+            device_id = j % num_devices_per_host
+            output_bufs[i][j] = RemoteBufferRef(
+                mesh, host_id, device_id, output_uuids[i][host_id][device_id])
+    return [
+        DistributedArray(mesh, aval, spec, output_bufs[i],
+                         pxla.spec_to_indices(aval.shape, spec))
+        for i, (aval, spec) in enumerate(zip(avals, specs))
+    ]
+
+
+def create_outputs(mesh, output_uuids, avals, specs, indices):
+    output_bufs = create_remote_array_refs(mesh, output_uuids)
+    return [
+        DistributedArray(mesh, aval, spec, output_bufs[i], indices[i])
+        for i, (aval, spec) in enumerate(zip(avals, specs))
+    ]
+
+
+def benchmark_one_case(num_outputs, num_hosts, num_devices_per_host,
+                       num_steps):
+    mesh = FakeMesh(num_hosts, num_devices_per_host)
+    num_devices = mesh.num_devices
+    avals = [ShapedArray((num_devices * 4, 64), np.float32)] * num_outputs
+    specs = [
+        ShardingSpec((Chunked([num_devices]), NoSharding()),
+                     (ShardedAxis(0),))
+    ] * num_outputs
+    indices = [
+        pxla.spec_to_indices(aval.shape, spec)
+        for aval, spec in zip(avals, specs)
+    ]
+
+    def run(create_func):
+        outs = None
+        for _ in range(3):
+            outs = create_func()
+        tic = time.process_time()
+        for _ in range(num_steps):
+            # The outputs of the previous step are freed here
+            outs = create_func()
+        del outs
+        return (time.process_time() - tic) / num_steps
+
+    def new_uuids():
+        return next_remote_buffer_uuid(num_outputs * num_devices).reshape(
+            num_outputs, num_hosts, num_devices_per_host)
+
+    legacy_cost = run(lambda: legacy_create_outputs(mesh, new_uuids(), avals,
+                                                    specs))
+    new_cost = run(
+        lambda: create_outputs(mesh, new_uuids(), avals, specs, indices))
+
+    print(f"#outputs: {num_outputs:5d}, "
+          f"mesh: ({num_hosts}, {num_devices_per_host}), "
+          f"legacy: {legacy_cost * 1e3:.2f} ms/step, "
+          f"new: {new_cost * 1e3:.2f} ms/step, "
+          f"speedup: {legacy_cost / new_cost:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-outputs",
+                        type=int,
+                        nargs="+",
+                        default=[100, 1000])
+    parser.add_argument("--num-hosts", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--num-devices-per-host", type=int, default=8)
+    parser.add_argument("--num-steps", type=int, default=20)
+    args = parser.parse_args()
+
+    # The deletion code skips all requests if ray is not initialized
+    ray.init(num_cpus=1)
+
+    for num_outputs in args.num_outputs:
+        for num_hosts in args.num_hosts:
+            benchmark_one_case(num_outputs, num_hosts,
+                               args.num_devices_per_host, args.num_steps)
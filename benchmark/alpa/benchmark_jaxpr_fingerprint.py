@@ -0,0 +1,64 @@
+"""Benchmark the structural fingerprints of jaxprs on synthetic long jaxprs.
+
+The fingerprint is compared with hashing the printed jaxpr, which was used
+to key the compute cost database and the executable cache.
+
+Usage:
+python3 benchmark_jaxpr_fingerprint.py --num-layers 1000 4000 16000
+"""
+import argparse
+import hashlib
+import time
+
+import jax
+import jax.numpy as jnp
+
+from alpa.jaxpr_fingerprint import get_jaxpr_fingerprint
+
+
+def create_jaxpr(num_layers, hidden_size=64):
+    """Create the jaxpr of a chain of MLP layers with residual connections."""
+
+    def func(x, weights):
+        for w in weights:
+            x = x + jnp.tanh(x @ w) * 0.5
+        return x
+
+    x = jnp.ones((16, hidden_size))
+    weights = [jnp.ones((hidden_size, hidden_size))] * num_layers
+    return jax.make_jaxpr(func)(x, weights)
+
+
+def benchmark_one_case(num_layers, niter):
+    jaxpr = create_jaxpr(num_layers)
+    num_eqns = len(jaxpr.eqns)
+
+    tic = time.time()
+    for _ in range(niter):
+        get_jaxpr_fingerprint(jaxpr)
+    fingerprint_time = (time.time() - tic) / niter
+
+    tic = time.time()
+    for _ in range(niter):
+        hashlib.sha1(str(jaxpr).encode("utf-8")).hexdigest()
+    str_time = (time.time() - tic) / niter
+
+    # The fingerprint must not depend on the tracing process
+    assert get_jaxpr_fingerprint(create_jaxpr(num_layers)) == \
+        get_jaxpr_fingerprint(jaxpr)
+
+    print(f"#eqns: {num_eqns:6d}, fingerprint: {fingerprint_time * 1e3:.1f} ms, "
+          f"str hash: {str_time * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-layers",
+                        type=int,
+                        nargs="+",
+                        default=[1000, 4000, 16000])
+    parser.add_argument("--niter", type=int, default=3)
+    args = parser.parse_args()
+
+    for num_layers in args.num_layers:
+        benchmark_one_case(num_layers, args.niter)
@@ -0,0 +1,234 @@
+"""Benchmark automatic layer construction on synthetic long jaxprs.
+
+The legacy implementation below materializes the dense (#eqns, #eqns) input
+size matrix and blocked matrix. It is only run for jaxprs up to
+--max-legacy-eqns equations, and its solution is checked against the
+current implementation.
+
+Usage:
+python3 benchmark_layer_construction.py --num-layers 1000 4000 --layer-num 8
+python3 benchmark_layer_construction.py --num-layers 1000 4000 --search
+"""
+import argparse
+import time
+
+import jax
+from jax.core import Var
+import jax.numpy as jnp
+import numba
+import numpy as np
+
+from alpa.pipeline_parallel.layer_construction import (
+    LAYER_HEAVY_OP_LOWER_BOUND, cluster_jaxpr_by_cost,
+    get_layer_construction_costs, search_layer_num)
+from alpa.util import OrderedSet
+
+
+def legacy_jaxpr_eqns_input_sizes(jaxpr):
+    length = len(jaxpr.eqns)
+    input_sizes = np.full((length + 1, length + 1), 0, dtype=np.float32)
+
+    outvars = OrderedSet()
+    for k in range(0, length + 1):
+        if k > 0:
+            outvars = outvars.union(jaxpr.eqns[k - 1].outvars)
+        invars = OrderedSet()
+        total_size = 0
+        for r in range(k + 1, length + 1):
+            for invar in jaxpr.eqns[r - 1].invars:
+                if (isinstance(invar, Var) and invar in outvars and
+                        invar not in invars):
+                    invars.add(invar)
+                    total_size += invar.aval.size * invar.aval.dtype.itemsize
+            input_sizes[k, r] = total_size
+    return input_sizes
+
+
+def legacy_cluster_jaxpr_by_cost(jaxpr, layer_num, eps, costs):
+    length = len(jaxpr.eqns)
+    non_trivial, input_sizes, compute_costs = costs
+    compute_costs_bound = compute_costs.sum() / layer_num * (1 + eps)
+    layer_heavy_op_lower_bound = LAYER_HEAVY_OP_LOWER_BOUND
+    if sum(non_trivial) / layer_num < layer_heavy_op_lower_bound:
+        layer_heavy_op_lower_bound = int(sum(non_trivial) / layer_num)
+
+    @numba.jit(nopython=True)
+    def init():
+        blocked = np.full((length + 1, length + 1), np.inf, dtype=np.float32)
+        for left in range(1, length + 1):
+            cnt = 0
+            total_compute_cost = 0
+            for r in range(left, length + 1):
+                if non_trivial[r - 1]:
+                    cnt += 1
+                    total_compute_cost += compute_costs[r - 1]
+                if cnt < layer_heavy_op_lower_bound:
+                    if total_compute_cost >= compute_costs_bound:
+                        blocked[left, r] = 0
+                    continue
+                if (total_compute_cost >= compute_costs_bound and
+                        non_trivial[r - 1] and
+                        cnt > layer_heavy_op_lower_bound):
+                    break
+                blocked[left, r] = 0
+        return blocked
+
+    @numba.jit(nopython=True)
+    def dp(input_sizes, blocked):
+        max_cost = np.full((length + 1, layer_num + 1),
+                           np.inf,
+                           dtype=np.float32)
+        sum_cost_under_max = np.full((length + 1, layer_num + 1),
+                                     np.inf,
+                                     dtype=np.float32)
+        max_cost_argmin = np.full((length + 1, layer_num + 1),
+                                  -1,
+                                  dtype=np.int32)
+        solution_imbalance = np.full((length + 1, layer_num + 1),
+                                     np.inf,
+                                     dtype=np.float32)
+        max_cost[0, 0] = 0
+        sum_cost_under_max[0, 0] = 0
+        for r in range(0, length + 1):
+            solution_imbalance[r, 0] = 0
+
+        for q in range(1, layer_num + 1):
+            for r in range(1, length + 1):
+                for k in range(0, r):
+                    new_value = max(max_cost[k, q - 1],
+                                    blocked[k + 1, r] + input_sizes[k, r])
+                    new_sum = (sum_cost_under_max[k, q - 1] +
+                               blocked[k + 1, r] + input_sizes[k, r])
+                    new_imbalance = (solution_imbalance[k, q - 1] + k**2 / q -
+                                     r**2 / (q + 1) + (r - k)**2)
+                    if (new_value < max_cost[r, q] or
+                        (new_value <= max_cost[r, q] * (1 + 1e-4) and
+                         (new_sum < sum_cost_under_max[r, q] or
+                          (new_sum <= sum_cost_under_max[r, q] * (1 + 1e-4) and
+                           new_imbalance < solution_imbalance[r, q])))):
+                        max_cost[r, q] = new_value
+                        sum_cost_under_max[r, q] = new_sum
+                        max_cost_argmin[r, q] = k
+                        solution_imbalance[r, q] = new_imbalance
+        return max_cost_argmin, max_cost[length, layer_num]
+
+    blocked = init()
+    a_argmin, value = dp(input_sizes, blocked)
+    solution = []
+    r = length
+    for q in range(layer_num, 0, -1):
+        k = a_argmin[r, q]
+        solution.append(jaxpr.eqns[k:r])
+        r = k
+    return list(reversed(solution)), value
+
+
+def legacy_search_layer_num(jaxpr, eps, layer_eps, costs):
+    non_trivial = costs[0]
+    layer_num = 2
+    r = int(non_trivial.sum() / 3) + 1
+    _, l_val = legacy_cluster_jaxpr_by_cost(jaxpr, layer_num, eps, costs)
+    while r - layer_num > 1:
+        mid = int((layer_num + r) / 2)
+        _, mid_val = legacy_cluster_jaxpr_by_cost(jaxpr, mid, eps, costs)
+        if mid_val > l_val * (1 + layer_eps):
+            r = mid
+        else:
+            layer_num = mid
+    return layer_num
+
+
+def create_jaxpr(num_layers, hidden_size=64):
+    """Create the jaxpr of a chain of MLP layers with residual connections."""
+
+    def func(x, weights):
+        for w in weights:
+            x = x + jnp.tanh(x @ w) * 0.5
+        return x
+
+    x = jnp.ones((16, hidden_size))
+    weights = [jnp.ones((hidden_size, hidden_size))] * num_layers
+    return jax.make_jaxpr(func)(x, weights)
+
+
+def benchmark_one_case(num_layers, layer_num, eps, max_legacy_eqns):
+    jaxpr = create_jaxpr(num_layers)
+    num_eqns = len(jaxpr.eqns)
+
+    tic = time.time()
+    costs = get_layer_construction_costs(jaxpr)
+    solution, info = cluster_jaxpr_by_cost(jaxpr, layer_num, eps, costs,
+                                           "flops")
+    new_time = time.time() - tic
+
+    legacy_time = None
+    if num_eqns <= max_legacy_eqns:
+        tic = time.time()
+        legacy_costs = (costs[0], legacy_jaxpr_eqns_input_sizes(jaxpr),
+                        costs[2])
+        legacy_solution, legacy_value = legacy_cluster_jaxpr_by_cost(
+            jaxpr, layer_num, eps, legacy_costs)
+        legacy_time = time.time() - tic
+        assert [len(x) for x in solution] == [len(x) for x in legacy_solution]
+        assert info["total_cost"] == legacy_value
+
+    legacy_str = (f"{legacy_time:.2f} s (dense matrix "
+                  f"{2 * 4 * (num_eqns + 1)**2 / 1024**2:.0f} MB)"
+                  if legacy_time is not None else "skipped")
+    print(f"#eqns: {num_eqns:6d}, #layers: {layer_num}, "
+          f"new: {new_time:.2f} s, legacy: {legacy_str}")
+
+
+def benchmark_one_search_case(num_layers, eps, layer_eps, max_legacy_eqns):
+    jaxpr = create_jaxpr(num_layers)
+    num_eqns = len(jaxpr.eqns)
+
+    tic = time.time()
+    layer_num = search_layer_num(jaxpr, eps, layer_eps)
+    new_time = time.time() - tic
+
+    legacy_time = None
+    if num_eqns <= max_legacy_eqns:
+        tic = time.time()
+        costs = get_layer_construction_costs(jaxpr)
+        legacy_costs = (costs[0], legacy_jaxpr_eqns_input_sizes(jaxpr),
+                        costs[2])
+        legacy_layer_num = legacy_search_layer_num(jaxpr, eps, layer_eps,
+                                                   legacy_costs)
+        legacy_time = time.time() - tic
+        assert layer_num == legacy_layer_num
+
+    legacy_str = (f"{legacy_time:.2f} s"
+                  if legacy_time is not None else "skipped")
+    print(f"#eqns: {num_eqns:6d}, searched #layers: {layer_num}, "
+          f"new: {new_time:.2f} s, legacy: {legacy_str}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-layers",
+                        type=int,
+                        nargs="+",
+                        default=[300, 1000, 3000, 6000])
+    parser.add_argument("--layer-num", type=int, default=8)
+    parser.add_argument("--eps", type=float, default=0.6)
+    parser.add_argument("--max-legacy-eqns", type=int, default=5000)
+    parser.add_argument("--search",
+                        action="store_true",
+                        help="Benchmark search_layer_num instead.")
+    parser.add_argument("--layer-eps", type=float, default=0.0)
+    args = parser.parse_args()
+
+    # Compile the numba functions
+    jaxpr = create_jaxpr(8)
+    cluster_jaxpr_by_cost(jaxpr, 2, args.eps,
+                          get_layer_construction_costs(jaxpr), "flops")
+    search_layer_num(jaxpr, args.eps, args.layer_eps)
+
+    for num_layers in args.num_layers:
+        if args.search:
+            benchmark_one_search_case(num_layers, args.eps, args.layer_eps,
+                                      args.max_legacy_eqns)
+        else:
+            benchmark_one_case(num_layers, args.layer_num, args.eps,
+                               args.max_legacy_eqns)
@@ -0,0 +1,189 @@
+"""Benchmark the per-instruction overhead of the pipeshard worker runtime.
+
+The worker methods are no-ops, so the measured time is the pure interpreter
+overhead of a steady-state step: the opcode dispatch, the timers, and the
+setup of the local buffer environment. The legacy loop below is the
+interpreter before the instructions were compiled into pre-bound calls.
+
+Usage:
+python3 benchmark_pipeshard_instruction_dispatch.py --num-micro-batches 16 64
+"""
+import argparse
+import time
+
+import numpy as np
+
+from alpa.pipeline_parallel.pipeshard_executable import (
+    PipelineInstruction, PipelineInstType, PipeshardMeshWorkerExecuable)
+from alpa.timer import timers
+
+
+class NoOpWorker:
+    """A mesh worker whose tasks do nothing."""
+
+    def __init__(self):
+        self.buffers = {}
+
+    def run_executable(self, uuid, input_uuids, output_uuids, **kwargs):
+        pass
+
+    def run_resharding_send_task(self, uuid, buf_uuids):
+        pass
+
+    def run_resharding_recv_task(self,
+                                 uuid,
+                                 buf_uuids,
+                                 set_empty_buffer=True,
+                                 allgather_uuid=None):
+        pass
+
+    def run_resharding_broadcast_task(self, uuid, buf_uuids):
+        pass
+
+    def delete_buffers(self, uuids):
+        pass
+
+    def delete_executable(self, uuid):
+        pass
+
+    def sync(self):
+        pass
+
+
+def legacy_execute_on_worker(executable, input_global_uuids,
+                             output_global_uuids):
+    buffers = {}
+    for local_ids, global_ids in zip(executable.input_local_uuids,
+                                     input_global_uuids):
+        for local_id, global_id in zip(local_ids, global_ids):
+            buffers[local_id] = executable.global_buffers[global_id]
+    executable.worker.buffers = buffers
+
+    timers("overall").start()
+    for instruction in executable.instructions:
+        if instruction.opcode == PipelineInstType.RUN:
+            timers("compute").start()
+            executable.worker.run_executable(instruction.task_uuid,
+                                             instruction.input_uuids,
+                                             instruction.output_uuids,
+                                             **instruction.opaques["kwargs"])
+            timers("compute").suspend()
+        elif instruction.opcode == PipelineInstType.SEND:
+            timers("resharding_send").start()
+            executable.worker.run_resharding_send_task(
+                instruction.task_uuid, instruction.input_uuids)
+            timers("resharding_send").suspend()
+        elif instruction.opcode == PipelineInstType.RECV:
+            timers("resharding_recv").start()
+            executable.worker.run_resharding_recv_task(
+                instruction.task_uuid, instruction.output_uuids,
+                instruction.opaques["set_empty_buffer"],
+                instruction.opaques["allgather_uuid"])
+            timers("resharding_recv").suspend()
+        elif instruction.opcode == PipelineInstType.BROADCAST:
+            timers("resharding_broadcast").start()
+            executable.worker.run_resharding_broadcast_task(
+                instruction.task_uuid, instruction.input_uuids
+                if instruction.input_uuids is not None else
+                instruction.output_uuids)
+            timers("resharding_broadcast").suspend()
+        elif instruction.opcode == PipelineInstType.FREE:
+            timers("free").start()
+            executable.worker.delete_buffers(instruction.input_uuids)
+            timers("free").suspend()
+    for timer_name in [
+            "compute", "resharding_send", "resharding_recv",
+            "resharding_broadcast", "free"
+    ]:
+        if timer_name in timers:
+            timers(timer_name).stop()
+    timers("overall").stop()
+
+    for local_ids, global_ids in zip(executable.output_local_uuids,
+                                     output_global_uuids):
+        for local_id, global_id in zip(local_ids, global_ids):
+            executable.global_buffers[global_id] = buffers[local_id]
+    executable.worker.buffers = executable.global_buffers
+    buffers.clear()
+
+
+def create_instructions(num_micro_batches, num_vars):
+    """Create the instructions of a middle mesh of a 1F1B pipeline."""
+    instructions = []
+    uuid = 1000
+    for _ in range(2 * num_micro_batches):
+        in_uuids = np.arange(uuid, uuid + num_vars)
+        out_uuids = np.arange(uuid + num_vars, uuid + 2 * num_vars)
+        uuid += 2 * num_vars
+        instructions.append(
+            PipelineInstruction.Recv(0, in_uuids, True, info="recv"))
+        instructions.append(
+            PipelineInstruction.Run(0, in_uuids, out_uuids, {
+                "sync_before": False,
+                "sync_after": False
+            }))
+        instructions.append(PipelineInstruction.Send(0, out_uuids))
+        instructions.append(PipelineInstruction.Free(in_uuids))
+    return instructions
+
+
+def benchmark_one_case(num_micro_batches, num_vars, num_inputs, num_steps):
+    worker = NoOpWorker()
+    instructions = create_instructions(num_micro_batches, num_vars)
+    input_local_uuids = [[i] for i in range(num_inputs)]
+    # The no-op tasks create no buffer, so the outputs are the inputs
+    output_local_uuids = input_local_uuids
+    executable = PipeshardMeshWorkerExecuable(worker, 0, instructions,
+                                              input_local_uuids,
+                                              output_local_uuids, [], [], [],
+                                              [False] * num_inputs)
+    input_global_uuids = [[10**6 + i] for i in range(num_inputs)]
+    output_global_uuids = [[2 * 10**6 + i] for i in range(num_inputs)]
+    for i, uuids in enumerate(input_global_uuids):
+        worker.buffers[uuids[0]] = i
+
+    def run_legacy():
+        legacy_execute_on_worker(executable, input_global_uuids,
+                                 output_global_uuids)
+
+    def run_compiled():
+        executable.execute_on_worker(input_global_uuids, output_global_uuids,
+                                     False)
+
+    costs = []
+    for func in [run_legacy, run_compiled]:
+        for _ in range(3):
+            func()
+        tic = time.perf_counter()
+        for _ in range(num_steps):
+            func()
+        costs.append((time.perf_counter() - tic) / num_steps /
+                     len(instructions))
+
+    print(f"#micro batches: {num_micro_batches:3d}, "
+          f"#instructions: {len(instructions):4d}, "
+          f"legacy: {costs[0] * 1e6:.2f} us/inst, "
+          f"compiled: {costs[1] * 1e6:.2f} us/inst, "
+          f"speedup: {costs[0] / costs[1]:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-micro-batches",
+                        type=int,
+                        nargs="+",
+                        default=[4, 16, 64])
+    parser.add_argument("--num-vars",
+                        type=int,
+                        default=16,
+                        help="The number of arrays sent between two stages")
+    parser.add_argument("--num-inputs",
+                        type=int,
+                        default=256,
+                        help="The number of inputs of the executable")
+    parser.add_argument("--num-steps", type=int, default=200)
+    args = parser.parse_args()
+
+    for num_micro_batches in args.num_micro_batches:
+        benchmark_one_case(num_micro_batches, args.num_vars, args.num_inputs,
+                           args.num_steps)
@@ -0,0 +1,128 @@
+"""Compare the sender assignment of cross-mesh resharding on synthetic specs.
+
+The greedy plan picks the least loaded sender one transfer at a time. The LPT
+plan assigns all transfers between a mesh pair together with a host-aware
+bandwidth model. This benchmark runs on CPU and reports the makespan (the max
+transfer time over all links) of both plans.
+
+Usage:
+python3 benchmark_resharding_sender_assignment.py --num-hosts 2 --num-devices-per-host 8
+"""
+import argparse
+import time
+
+from jax.core import ShapedArray
+from jax.interpreters.pxla import (Chunked, NoSharding, Replicated,
+                                   ShardedAxis, ShardingSpec)
+import numpy as np
+
+from alpa.device_mesh import device_id_to_str
+from alpa.pipeline_parallel.cross_mesh_resharding import (
+    CrossMeshCommunicator, ReshardingBandwidthModel, ReshardingTaskSpec,
+    get_resharding_makespan, plan_send_recv_senders)
+from alpa.pipeline_parallel.resharding_tensor import VirtualDistributedArray
+
+
+class SyntheticMesh:
+    """A virtual mesh with only the attributes used to generate tiles."""
+
+    def __init__(self, host_ips, num_devices_per_host):
+        self.num_hosts = len(host_ips)
+        self.num_devices_per_host = num_devices_per_host
+        self.num_devices = self.num_hosts * num_devices_per_host
+        self.device_strs = [
+            device_id_to_str(ip, i)
+            for ip in host_ips
+            for i in range(num_devices_per_host)
+        ]
+
+
+def get_sharding_specs(num_hosts, num_devices_per_host):
+    h, d = num_hosts, num_devices_per_host
+    return [
+        ShardingSpec((NoSharding(), NoSharding()),
+                     (Replicated(h), Replicated(d))),
+        ShardingSpec((Chunked([h]), NoSharding()),
+                     (ShardedAxis(0), Replicated(d))),
+        ShardingSpec((NoSharding(), Chunked([d])),
+                     (Replicated(h), ShardedAxis(0))),
+        ShardingSpec((Chunked([h]), Chunked([d])),
+                     (ShardedAxis(0), ShardedAxis(1))),
+    ]
+
+
+def create_specs(src_mesh, dst_mesh, num_vars, rng):
+    src_sharding_specs = get_sharding_specs(src_mesh.num_hosts,
+                                            src_mesh.num_devices_per_host)
+    dst_sharding_specs = get_sharding_specs(dst_mesh.num_hosts,
+                                            dst_mesh.num_devices_per_host)
+    specs = []
+    for _ in range(num_vars):
+        shape = (dst_mesh.num_devices * int(rng.choice([16, 64, 256])),
+                 dst_mesh.num_devices * int(rng.choice([8, 32, 128])))
+        aval = ShapedArray(shape, np.float32)
+        # The source is (partially) replicated, so the sender choice matters
+        src_spec = src_sharding_specs[rng.integers(0, 3)]
+        dst_spec = dst_sharding_specs[rng.integers(1, 4)]
+        src_array = VirtualDistributedArray(device_mesh=src_mesh,
+                                            aval=aval,
+                                            sharding_spec=src_spec)
+        dst_array = VirtualDistributedArray(device_mesh=dst_mesh,
+                                            aval=aval,
+                                            sharding_spec=dst_spec)
+        specs.append(ReshardingTaskSpec(src_array, dst_array, None))
+    return specs
+
+
+def benchmark_one_case(num_hosts, num_devices_per_host, num_vars, seed):
+    rng = np.random.default_rng(seed)
+    src_mesh = SyntheticMesh([f"10.0.0.{i}" for i in range(num_hosts)],
+                             num_devices_per_host)
+    # A larger destination mesh makes the senders the bottleneck
+    dst_mesh = SyntheticMesh([f"10.0.1.{i}" for i in range(2 * num_hosts)],
+                             num_devices_per_host)
+    specs = create_specs(src_mesh, dst_mesh, num_vars, rng)
+    for spec in specs:
+        spec.generate_src_dst_map()
+    bandwidth_model = ReshardingBandwidthModel()
+
+    tic = time.time()
+    src_loads = {x: 0 for x in src_mesh.device_strs}
+    dst_loads = {x: 0 for x in dst_mesh.device_strs}
+    for spec in specs:
+        spec.set_resharding_strategy(
+            CrossMeshCommunicator.
+            _generate_send_recv_resharding_strategy_by_loads(
+                spec, src_loads, dst_loads))
+    greedy_time = time.time() - tic
+    greedy_makespan = get_resharding_makespan(specs, bandwidth_model)
+
+    tic = time.time()
+    for spec, strategy in zip(specs,
+                              plan_send_recv_senders(specs, bandwidth_model)):
+        spec.set_resharding_strategy(strategy)
+    lpt_time = time.time() - tic
+    lpt_makespan = get_resharding_makespan(specs, bandwidth_model)
+
+    print(f"src mesh: ({num_hosts}, {num_devices_per_host}), "
+          f"dst mesh: ({2 * num_hosts}, {num_devices_per_host}), "
+          f"#vars: {num_vars}, "
+          f"greedy makespan: {greedy_makespan * 1e3:.2f} ms "
+          f"(plan {greedy_time * 1e3:.1f} ms), "
+          f"lpt makespan: {lpt_makespan * 1e3:.2f} ms "
+          f"(plan {lpt_time * 1e3:.1f} ms), "
+          f"speedup: {greedy_makespan / lpt_makespan:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-hosts", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--num-devices-per-host", type=int, default=8)
+    parser.add_argument("--num-vars", type=int, nargs="+", default=[8, 64])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for num_hosts in args.num_hosts:
+        for num_vars in args.num_vars:
+            benchmark_one_case(num_hosts, args.num_devices_per_host, num_vars,
+                               args.seed)
@@ -0,0 +1,153 @@
+"""Benchmark the tile intersection of cross-mesh resharding on synthetic specs.
+
+Compare the time to generate dst_tile_to_src_tiles_map of all specs between
+a mesh pair with the array-backed TileIntersections against the previous
+per-tile python implementation. This benchmark runs on CPU.
+
+Usage:
+python3 benchmark_resharding_tile_intersection.py --num-hosts 1 8 --num-vars 64 512
+"""
+import argparse
+import time
+
+import numpy as np
+
+from alpa.pipeline_parallel.resharding_tensor import (TileSlice,
+                                                      unflatten_tile_index)
+
+from benchmark_resharding_sender_assignment import SyntheticMesh, create_specs
+
+
+def legacy_look_up_dst_tile_from_src(spec, tile):
+    """The per-tile python implementation before TileIntersections."""
+    # For each dim in the dst tile, find all the related tiles, and ragged values on that dim in src_tiles.
+    # To record that, for each dim, we make a tuple containing the first and last index of tiles in src array
+    # that intersects with the dst tile: Shards between [start, end) are involved; Left included, right not
+    # included.
+    related_tile_start_end = [tuple()] * spec.src.tensor_rank
+
+    # Meanwhile, for each dim, for the first and end tile, we make a tuple recording the slicing offset:
+    # - start_shard_offset: [start_shard_offset: ] on that dim is activated.
+    # - end_shard_offset: [:end_sharding_offset] on that dim is activated.
+    related_tile_offset = [tuple()] * spec.src.tensor_rank
+
+    for i, dim in enumerate(spec.src.tensor_shape):
+        tile_length, ragged = divmod(dim, spec.src.tile_shape[i])
+        assert not ragged
+        start_tile, start_tile_offset = divmod(tile.indices[i].start,
+                                               tile_length)
+        end_tile, end_tile_offset = divmod(tile.indices[i].stop,
+                                           tile_length)
+        # if falling on the middle a src tile, increase the index of the final tile by 1.
+        if end_tile_offset:
+            end_tile = end_tile + 1
+        # if falling on the end of a src tile, the offset should be [0: tile_length]
+        if end_tile_offset == 0:
+            end_tile_offset = tile_length
+        related_tile_start_end[i] = (start_tile, end_tile)
+        related_tile_offset[i] = (start_tile_offset, end_tile_offset)
+
+    # count the number of tile slices
+    num_src_tileslices = 1
+    for start, end in related_tile_start_end:
+        num_src_tileslices = num_src_tileslices * (end - start)
+
+    src_tileslices = []
+    indices_in_dst_tile = []
+    for tileslice_index in range(num_src_tileslices):
+        tile_index_relative = unflatten_tile_index(
+            tileslice_index,
+            [end - start for start, end in related_tile_start_end])
+        tile_index_absolute = [
+            start + tile_index_relative[dim_index]
+            for dim_index, (start, end) in enumerate(related_tile_start_end)
+        ]
+        # depending on its index, calculate a slice for it
+        offsets = []
+        indices = []
+        # loop over each dimension
+        for i, r in enumerate(tile_index_absolute):
+            start, end = related_tile_start_end[i]
+            tile_length_on_this_dim = spec.src.tiles[tuple(
+                tile_index_absolute)].tile_shape[i]
+            if r == start and r == end - 1:
+                # the dst tile is smaller or equal to the src tile
+                left_offset = related_tile_offset[i][0]
+                right_offset = related_tile_offset[i][1]
+                offsets.append(slice(left_offset, right_offset))
+                indices.append(slice(0, tile.tile_shape[i]))  # all included
+            elif r == start:
+                # meaning it is the first involved tile, and not the last
+                offset = related_tile_offset[i][0]
+                offsets.append(slice(offset, tile_length_on_this_dim))
+                indices.append(slice(0, tile_length_on_this_dim - offset))
+            elif r == end - 1:
+                # meaning it is the last involved tile, and not the first
+                offset = related_tile_offset[i][1]
+                offsets.append(slice(0, offset))
+                indices.append(
+                    slice(tile.tile_shape[i] - offset, tile.tile_shape[i]))
+            else:
+                # meaning it is a fully involved tile
+                offset = related_tile_offset[i][0]
+                offsets.append(slice(0, tile_length_on_this_dim))
+                left_in_dst_tile = (
+                    tile_length_on_this_dim - offset +
+                    (tile_index_relative[i] - 1) * tile_length_on_this_dim)
+                right_in_dst_tile = left_in_dst_tile + tile_length_on_this_dim
+                indices.append(slice(left_in_dst_tile, right_in_dst_tile))
+        # construct a new tile slice
+        this_tileslice = TileSlice(
+            spec.src.tiles[tuple(tile_index_absolute)], offset=offsets)
+        src_tileslices.append(this_tileslice)
+        indices_in_dst_tile.append(indices)
+    return src_tileslices, indices_in_dst_tile
+
+
+def legacy_generate_src_dst_map(spec):
+    return [(tile, *legacy_look_up_dst_tile_from_src(spec, tile))
+            for tile in spec.dst.tiles.flatten()]
+
+
+def benchmark_one_case(num_hosts, num_devices_per_host, num_vars, seed):
+    rng = np.random.default_rng(seed)
+    src_mesh = SyntheticMesh([f"10.0.0.{i}" for i in range(num_hosts)],
+                             num_devices_per_host)
+    dst_mesh = SyntheticMesh([f"10.0.1.{i}" for i in range(2 * num_hosts)],
+                             num_devices_per_host)
+    specs = create_specs(src_mesh, dst_mesh, num_vars, rng)
+    # Exclude the tile generation shared by both implementations
+    for spec in specs:
+        _ = spec.src.tiles, spec.dst.tiles
+
+    tic = time.time()
+    legacy_maps = [legacy_generate_src_dst_map(spec) for spec in specs]
+    legacy_time = time.time() - tic
+
+    tic = time.time()
+    maps = [spec.generate_src_dst_map() for spec in specs]
+    new_time = time.time() - tic
+
+    assert maps == legacy_maps
+    num_slices = sum(len(spec.tile_intersections.src_tile_flat)
+                     for spec in specs)
+    print(f"src mesh: ({num_hosts}, {num_devices_per_host}), "
+          f"dst mesh: ({2 * num_hosts}, {num_devices_per_host}), "
+          f"#vars: {num_vars}, #tile slices: {num_slices}, "
+          f"legacy: {legacy_time * 1e3:.1f} ms, "
+          f"vectorized: {new_time * 1e3:.1f} ms, "
+          f"speedup: {legacy_time / new_time:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-hosts", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--num-devices-per-host", type=int, default=8)
+    parser.add_argument("--num-vars", type=int, nargs="+", default=[64, 512])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for num_hosts in args.num_hosts:
+        for num_vars in args.num_vars:
+            benchmark_one_case(num_hosts, args.num_devices_per_host, num_vars,
+                               args.seed)
@@ -0,0 +1,109 @@
+"""Benchmark the stage construction DP on synthetic cost tensors.
+
+Compare `dp` against `dp_reference`, which runs `dp_impl` once for every
+unique value in compute_cost.
+
+Usage:
+python3 benchmark_stage_construction_dp.py --num-layers 16 32 64 --skip-reference-above 24
+"""
+import argparse
+import time
+
+import numpy as np
+
+from alpa.pipeline_parallel.stage_construction import dp, dp_reference
+
+
+def get_submesh_choices(num_hosts, num_devices_per_host):
+    submesh_choices = []
+    i = 1
+    while i <= num_devices_per_host:
+        submesh_choices.append((1, i))
+        i *= 2
+    i = 2
+    while i <= num_hosts:
+        submesh_choices.append((i, num_devices_per_host))
+        i *= 2
+    return submesh_choices
+
+
+def gen_synthetic_costs(num_layers, submesh_choices, num_autosharding_configs,
+                        seed=0):
+    """Generate (compute_cost, max_n_succ_stages) with shape (L, L, S, C).
+
+    The cost of a stage grows with the number of layers and shrinks
+    sub-linearly with the number of devices. Some configs are marked
+    infeasible and the memory constraint is random.
+    """
+    rng = np.random.default_rng(seed)
+    num_submeshes = len(submesh_choices)
+    shape = (num_layers, num_layers, num_submeshes, num_autosharding_configs)
+
+    layer_cost = rng.uniform(0.5, 1.5, num_layers)
+    prefix = np.concatenate([[0.0], np.cumsum(layer_cost)])
+    stage_cost = prefix[None, 1:] - prefix[:-1, None]
+    n_devices = np.array([np.prod(x) for x in submesh_choices])
+    speedup = n_devices**0.8
+
+    compute_cost = (stage_cost[:, :, None, None] / speedup[None, None, :, None]
+                    * rng.uniform(1.0, 1.3, shape))
+    compute_cost = np.round(compute_cost, 4)
+    lower = np.tril(np.ones((num_layers, num_layers), dtype=bool), -1)
+    compute_cost[lower] = np.inf
+    compute_cost[rng.random(shape) < 0.05] = np.inf
+
+    max_n_succ_stages = rng.integers(num_layers // 4, num_layers, shape)
+    return compute_cost, max_n_succ_stages
+
+
+def benchmark_one_case(num_layers, num_hosts, num_devices_per_host,
+                       num_autosharding_configs, num_micro_batches,
+                       run_reference):
+    submesh_choices = get_submesh_choices(num_hosts, num_devices_per_host)
+    num_devices = num_hosts * num_devices_per_host
+    compute_cost, max_n_succ_stages = gen_synthetic_costs(
+        num_layers, submesh_choices, num_autosharding_configs)
+    args = (num_layers, num_devices, num_micro_batches, submesh_choices,
+            num_autosharding_configs, compute_cost, max_n_succ_stages)
+
+    # Warm up numba
+    dp(*args)
+    tic = time.time()
+    cost, _ = dp(*args)
+    new_time = time.time() - tic
+
+    if run_reference:
+        dp_reference(*args)
+        tic = time.time()
+        ref_cost, _ = dp_reference(*args)
+        ref_time = time.time() - tic
+        assert abs(cost - ref_cost) <= 1e-4 * max(abs(ref_cost), 1), (
+            f"{cost} vs. {ref_cost}")
+    else:
+        ref_time = float("nan")
+
+    print(f"#layers: {num_layers:3d}, #devices: {num_devices:3d}, "
+          f"#submeshes: {len(submesh_choices)}, "
+          f"#configs: {num_autosharding_configs}, cost: {cost:.4f}, "
+          f"dp: {new_time:.3f} s, dp_reference: {ref_time:.3f} s, "
+          f"speedup: {ref_time / new_time:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-layers", type=int, nargs="+",
+                        default=[8, 16, 32, 64])
+    parser.add_argument("--num-hosts", type=int, default=2)
+    parser.add_argument("--num-devices-per-host", type=int, default=8)
+    parser.add_argument("--num-autosharding-configs", type=int, default=3)
+    parser.add_argument("--num-micro-batches", type=int, default=16)
+    parser.add_argument("--skip-reference-above", type=int, default=16,
+                        help="Do not run dp_reference for more layers than this")
+    args = parser.parse_args()
+
+    for num_layers in args.num_layers:
+        benchmark_one_case(num_layers, args.num_hosts,
+                           args.num_devices_per_host,
+                           args.num_autosharding_configs,
+                           args.num_micro_batches,
+                           num_layers <= args.skip_reference_above)
@@ -0,0 +1,89 @@
+"""Compare pipeline schedules offline with the schedule simulator.
+
+All stages have the same costs. Use get_stage_costs_from_compute_cost in
+alpa.pipeline_parallel.schedule_simulator for profiled costs.
+
+Usage:
+python3 simulate_pipeline_schedules.py --num-meshes 4 --num-micro-batches 8 16
+"""
+import argparse
+
+import numpy as np
+
+from alpa.pipeline_parallel.schedules import (gen_linear_pipeline_dependency,
+                                              GpipeSchedule, PipeDreamFlush,
+                                              InterleavedPipeDreamFlush,
+                                              InferenceSchedule)
+from alpa.pipeline_parallel.schedule_simulator import simulate_schedule
+
+
+def simulate_one_case(num_meshes, num_micro_batches, num_virtual_stages,
+                      fwd_cost, bwd_cost, activation_size, transfer_size,
+                      bandwidth):
+    training_dependency = gen_linear_pipeline_dependency(2 * num_meshes)
+    inference_dependency = np.zeros((num_meshes, num_meshes), dtype=int)
+    for i in range(num_meshes - 1):
+        inference_dependency[i + 1, i] = 1
+
+    cases = [
+        ("gpipe", GpipeSchedule, training_dependency, 1),
+        ("1f1b", PipeDreamFlush, training_dependency, 1),
+        ("inference", InferenceSchedule, inference_dependency, 1),
+    ]
+    if num_micro_batches % num_meshes == 0:
+        num_stages = num_meshes * num_virtual_stages
+        cases.append(
+            ("1f1b_interleaved", InterleavedPipeDreamFlush,
+             gen_linear_pipeline_dependency(2 * num_stages), num_virtual_stages))
+    for name, schedule_cls, dependency, num_virtual in cases:
+        kwargs = {}
+        if num_virtual != 1:
+            kwargs["num_virtual_stages_per_mesh"] = num_virtual
+        schedule = schedule_cls(dependency=dependency,
+                                meshes=[None] * num_meshes,
+                                apply_grad_placement={},
+                                num_batch=num_micro_batches,
+                                **kwargs)
+        # Each virtual stage holds 1 / num_virtual of the layers of a mesh
+        num_stages = num_meshes * num_virtual
+        stage_costs = [fwd_cost / num_virtual] * num_stages
+        if schedule_cls != InferenceSchedule:
+            stage_costs += [bwd_cost / num_virtual] * num_stages
+        transfer_sizes = np.full(dependency.shape, transfer_size)
+        result = simulate_schedule(schedule, stage_costs,
+                                   [activation_size / num_virtual] * num_stages,
+                                   transfer_sizes, bandwidth)
+        peak_memory = [f"{x / 1024**3:.2f}" for x in result.peak_memory]
+        print(f"schedule: {name:16s}, #meshes: {num_meshes}, "
+              f"#micro batches: {num_micro_batches:3d}, "
+              f"iteration time: {result.iteration_time:.3f} s, "
+              f"bubble: {result.bubble_fraction * 100:.1f}%, "
+              f"peak activation memory (GB): {peak_memory}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-meshes", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--num-micro-batches", type=int, nargs="+",
+                        default=[4, 16, 64])
+    parser.add_argument("--num-virtual-stages", type=int, default=2,
+                        help="The number of virtual stages per mesh of the "
+                        "interleaved 1F1B schedule")
+    parser.add_argument("--fwd-cost", type=float, default=0.01,
+                        help="The forward time of a stage in seconds")
+    parser.add_argument("--bwd-cost", type=float, default=0.02,
+                        help="The backward time of a stage in seconds")
+    parser.add_argument("--activation-size", type=float, default=256 * 1024**2,
+                        help="The activation bytes of a stage")
+    parser.add_argument("--transfer-size", type=float, default=16 * 1024**2,
+                        help="The bytes sent between two stages")
+    parser.add_argument("--bandwidth", type=float, default=10e9,
+                        help="The cross-mesh bandwidth in bytes/s")
+    args = parser.parse_args()
+
+    for num_meshes in args.num_meshes:
+        for num_micro_batches in args.num_micro_batches:
+            simulate_one_case(num_meshes, num_micro_batches,
+                              args.num_virtual_stages, args.fwd_cost,
+                              args.bwd_cost, args.activation_size,
+                              args.transfer_size, args.bandwidth)
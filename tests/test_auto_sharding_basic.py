@@ -1,15 +1,19 @@
 """Test auto sharding with simple computational graphs."""
 
+import os
+import tempfile
 import unittest
 
 import jax
 import jax.numpy as jnp
 from jax.interpreters import pxla
+import numpy as np
 from jax.interpreters.pxla import Chunked, ShardedAxis, NoSharding, Replicated
 from flax import linen as nn
 from flax import optim
 
 from alpa import parallelize, ShardParallel
+from alpa.measure_record import load_from_file
 from alpa.util import count_communication_primitives
 from alpa.testing import assert_allclose
 
@@ -210,6 +214,31 @@ class AutoShardingBasicTest(unittest.TestCase):
 
         assert isinstance(c, pxla.ShardedDeviceArray)
 
+    def test_logical_mesh_search(self):
+        record_file = os.path.join(tempfile.mkdtemp(), "records.json")
+        method = ShardParallel(devices=self.devices,
+                               logical_mesh_search_space="all",
+                               measure_record_filename=record_file)
+
+        def func(a, b):
+            return a @ b
+
+        a = jnp.ones((256, 128))
+        b = jnp.ones((128, 256))
+        p_func = parallelize(func, method=method)
+        assert_allclose(func(a, b), p_func(a, b))
+
+        # The chosen strategy is recorded once
+        records = list(load_from_file(record_file))
+        assert len(records) == 1
+        logical_mesh_shape = records[0][0].config.logical_mesh_shape
+        assert np.prod(logical_mesh_shape) == 4
+
+        # A new compilation reuses the record without searching again
+        p_func = parallelize(func, method=method)
+        assert_allclose(func(a, b), p_func(a, b))
+        assert len(list(load_from_file(record_file))) == 1
+
 
 def suite():
     suite = unittest.TestSuite()
@@ -222,6 +251,7 @@ def suite():
     suite.addTest(AutoShardingBasicTest("test_argmax"))
     suite.addTest(AutoShardingBasicTest("test_sort"))
     suite.addTest(AutoShardingBasicTest("test_fast_call"))
+    suite.addTest(AutoShardingBasicTest("test_logical_mesh_search"))
     return suite
 
 
@@ -0,0 +1,136 @@
+"""Test the on-disk cache and the warm start of auto-sharding ILP solutions."""
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from alpa.shard_parallel.solution_cache import (ILPSolutionCache,
+                                                compute_solver_args_key)
+from alpa.shard_parallel.warm_start import WarmStartIndex
+
+
+def get_dummy_solver_args():
+    N = 3
+    M = 0
+    s_len = np.array([2, 2, 1])
+    s_follow = np.array([-1, -1, -1])
+    E = np.array([0, 1])
+    A = np.array([], dtype=np.int64)
+    L = np.array([0, 0, 0])
+    c = np.ones(5)
+    d = np.ones(5)
+    m = np.ones(5)
+    r = np.array([0, 1, 1, 0])
+    v = np.array([])
+    return [N, M, s_len, s_follow, E, A, L, c, d, m, r, v]
+
+
+class AutoShardingSolutionCacheTest(unittest.TestCase):
+    """Test ILPSolutionCache."""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_key(self):
+        args = get_dummy_solver_args()
+        key = compute_solver_args_key(*args)
+
+        # Warm-start values do not change the key
+        s_init = np.array([0, 1, 0])
+        self.assertEqual(key, compute_solver_args_key(*args, s_init))
+
+        # Fixed values change the key
+        s_init = np.array([0, 1, 1])
+        self.assertNotEqual(key, compute_solver_args_key(*args, s_init))
+
+        # Different costs change the key
+        args[7] = args[7] * 2
+        self.assertNotEqual(key, compute_solver_args_key(*args))
+
+    def test_hit_and_miss(self):
+        cache = ILPSolutionCache(self.cache_dir, 1 << 20)
+        key = compute_solver_args_key(*get_dummy_solver_args())
+        self.assertIsNone(cache.get(key))
+
+        s_val = np.array([0, 1, 0], dtype=np.int32)
+        e_val = np.array([1], dtype=np.int32)
+        cache.put(key, (s_val, e_val, 4.0, 1))
+
+        # A new cache object reads the solution from the disk
+        cache = ILPSolutionCache(self.cache_dir, 1 << 20)
+        ret_s_val, ret_e_val, objective, status = cache.get(key)
+        np.testing.assert_array_equal(ret_s_val, s_val)
+        np.testing.assert_array_equal(ret_e_val, e_val)
+        self.assertEqual(objective, 4.0)
+        self.assertEqual(status, 1)
+        self.assertEqual(cache.stats(), (1, 0, 0))
+
+
+class AutoShardingWarmStartTest(unittest.TestCase):
+    """Test WarmStartIndex."""
+
+    def test_same_structure(self):
+        index = WarmStartIndex()
+        s_len = np.array([2, 3, 1, 4])
+        s_follow = np.array([-1, -1, -1, 1])
+        E = np.array([0, 1, 1, 2])
+        self.assertEqual(index.query(s_len, s_follow, E), (None, None))
+
+        index.add(s_len, s_follow, E, np.array([1, 2, 0, 2]), 10.0)
+        s_init, record = index.query(s_len, s_follow, E)
+        # Nodes with a single strategy and following nodes are skipped
+        np.testing.assert_array_equal(s_init, [0, 1, 0, 1, 2, 0])
+
+        index.add(s_len, s_follow, E, np.array([1, 2, 0, 2]), 4.0, record)
+        self.assertEqual(index.num_warm_starts, 1)
+        self.assertAlmostEqual(index.saved_solve_time, 6.0)
+
+    def test_more_layers(self):
+        index = WarmStartIndex()
+        layer = [2, 3, 4]
+        old_s_len = np.array(layer * 2)
+        old_s_val = np.array([0, 1, 2, 1, 2, 3])
+        index.add(old_s_len, -np.ones(6), np.array([]), old_s_val, 10.0)
+
+        new_s_len = np.array(layer * 3)
+        s_init, record = index.query(new_s_len, -np.ones(9), np.array([]))
+        self.assertIsNotNone(record)
+        s_init = s_init.reshape((-1, 3))
+        self.assertEqual(len(s_init), 6)
+        for idx, value, fix in s_init:
+            self.assertLess(value, new_s_len[idx])
+            self.assertEqual(fix, 0)
+
+    def test_bounded_save_dir(self):
+        save_dir = tempfile.mkdtemp()
+        try:
+            index = WarmStartIndex(max_records=2, save_dir=save_dir)
+            for n in range(1, 5):
+                s_len = np.array([2] * n)
+                index.add(s_len, -np.ones(n), np.array([]), np.zeros(n),
+                          1.0)
+                self.assertLessEqual(len(os.listdir(save_dir)), 2)
+
+            # Loading with a smaller limit removes the extra files
+            index = WarmStartIndex(max_records=1, save_dir=save_dir)
+            self.assertEqual(len(index.records), 1)
+            self.assertEqual(len(os.listdir(save_dir)), 1)
+        finally:
+            shutil.rmtree(save_dir)
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(AutoShardingSolutionCacheTest))
+    suite.addTest(unittest.makeSuite(AutoShardingWarmStartTest))
+    return suite
+
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
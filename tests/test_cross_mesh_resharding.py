@@ -9,8 +9,10 @@ from jax.interpreters.pxla import (Chunked, NoSharding, Replicated, ShardedAxis,
                                    ShardingSpec, spec_to_indices)
 import jax.numpy as jnp
 import numpy as np
+import ray
 
 from alpa import init
+import alpa.collective as col
 from alpa.device_mesh import (DeviceCluster, DistributedArray,
                               get_global_virtual_physical_mesh)
 from alpa.mesh_executable import (create_remote_buffer_refs, get_uuid_np_array,
@@ -18,7 +20,8 @@ from alpa.mesh_executable import (create_remote_buffer_refs, get_uuid_np_array,
 from alpa.global_env import global_config
 from alpa.pipeline_parallel.cross_mesh_resharding import (
     CollectiveGroup, ReshardingTaskSpec, CrossMeshCommunicator,
-    SymbolicReshardingTask, SymbolicBroadcastReshardingTask)
+    SymbolicReshardingTask, SymbolicBroadcastReshardingTask,
+    ReshardingBandwidthModel, get_resharding_makespan, plan_send_recv_senders)
 from alpa.pipeline_parallel.pipeshard_executable import (
     AllocateZeroWorkerExecutableConfig, PipeshardDriverExecutable,
     PipelineInstruction, PipeshardMeshWorkerExecuable)
@@ -208,8 +211,14 @@ class ReshardingTest(unittest.TestCase):
         var = Var(0, "", ShapedArray(tensor_shape, tensor_dtype))
         test_resharding(var, src_mesh, src_sharding_spec, dst_mesh,
                         dst_sharding_spec, use_scatter_gather, resharding_mode)
+        # The number of (sent, received) chunks of each worker
+        num_chunks = ray.get([
+            worker.get_num_chunks.remote()
+            for worker in src_mesh.workers + dst_mesh.workers
+        ])
         src_mesh.shutdown()
         dst_mesh.shutdown()
+        return num_chunks
 
     def test_4gpu_send_recv(self):
         src_shape = (1, 2)
@@ -238,6 +247,34 @@ class ReshardingTest(unittest.TestCase):
         self.run_resharding_task(src_shape, dst_shape, src_spec, dst_spec,
                                  tensor_shape, False)
 
+    def test_4gpu_chunked_send_recv(self):
+        src_shape = (1, 2)
+        dst_shape = (1, 2)
+        tensor_shape = (4, 8, 16)
+        src_spec = ShardingSpec(
+            [NoSharding(), NoSharding(),
+             NoSharding()], [Replicated(2)])
+        dst_spec = ShardingSpec([Chunked(
+            [2]), NoSharding(), NoSharding()], [ShardedAxis(0)])
+
+        # The chunk size set on the driver is used by the workers. Each
+        # tile of 2 * 8 * 16 int32 is sent as 4 chunks.
+        global_config.resharding_chunk_size = 256
+        try:
+            num_chunks = self.run_resharding_task(src_shape, dst_shape,
+                                                  src_spec, dst_spec,
+                                                  tensor_shape, False)
+        finally:
+            global_config.resharding_chunk_size = None
+        num_sent = sum(x[0] for x in num_chunks)
+        num_recv = sum(x[1] for x in num_chunks)
+        self.assertEqual(num_sent, 8)
+        self.assertEqual(num_recv, 8)
+
+        num_chunks = self.run_resharding_task(src_shape, dst_shape, src_spec,
+                                              dst_spec, tensor_shape, False)
+        self.assertEqual(sum(x[0] + x[1] for x in num_chunks), 0)
+
     def test_4gpu_allgather(self):
         src_shape = (1, 2)
         dst_shape = (1, 2)
@@ -311,13 +348,202 @@ class ReshardingTest(unittest.TestCase):
                                   tensor_shape, resharding_mode="broadcast")
 
 
+@ray.remote
+class GlooWorker:
+    """A CPU worker to test chunked send/recv with the GLOO backend."""
+
+    def __init__(self, world_size, rank, group_name):
+        col.init_collective_group(world_size, rank, "gloo", group_name)
+        self.group_name = group_name
+
+    def send(self, array, dst_rank, chunk_size):
+        col.send_chunked(np.ascontiguousarray(array).reshape(-1), dst_rank,
+                         self.group_name, chunk_size)
+
+    def recv(self, shape, dtype, src_rank, chunk_size):
+        array = np.zeros(shape, dtype)
+        col.recv_chunked(array.reshape(-1), src_rank, self.group_name,
+                         chunk_size)
+        return array
+
+
+class ChunkRangesTest(unittest.TestCase):
+    """Test the chunk ranges of chunked send/recv without a cluster."""
+
+    def test_chunk_ranges(self):
+        self.assertEqual(col.get_chunk_ranges(10, 4, None), [(0, 10)])
+        self.assertEqual(col.get_chunk_ranges(10, 4, 40), [(0, 10)])
+        self.assertEqual(col.get_chunk_ranges(10, 4, 16), [(0, 4), (4, 8),
+                                                           (8, 10)])
+
+
+class ChunkedSendRecvTest(unittest.TestCase):
+
+    def setUp(self):
+        init(cluster="ray")
+
+    def test_gloo_chunked_send_recv(self):
+        workers = [
+            GlooWorker.remote(2, rank, "chunked_send_recv") for rank in range(2)
+        ]
+        array = np.arange(1000, dtype=np.float32).reshape(10, 100)
+        # 1000 floats are sent as 4 chunks
+        send_done = workers[0].send.remote(array, 1, 1024)
+        received = workers[1].recv.remote(array.shape, array.dtype, 0, 1024)
+        ray.get(send_done)
+        np.testing.assert_array_equal(ray.get(received), array)
+        for worker in workers:
+            ray.kill(worker)
+
+
+class DummyVirtualMesh:
+
+    def __init__(self, device_strs):
+        self.device_strs = device_strs
+        self.num_devices = len(device_strs)
+
+
+class ReshardingPlanTest(unittest.TestCase):
+    """Test the sender assignment without devices."""
+
+    def create_spec(self,
+                    src_mesh,
+                    dst_mesh,
+                    src_spec,
+                    dst_spec,
+                    shape,
+                    plan_template=None):
+        aval = ShapedArray(shape, jnp.float32)
+        src_array = VirtualDistributedArray(device_mesh=src_mesh,
+                                            aval=aval,
+                                            sharding_spec=src_spec)
+        dst_array = VirtualDistributedArray(device_mesh=dst_mesh,
+                                            aval=aval,
+                                            sharding_spec=dst_spec)
+        return ReshardingTaskSpec(src_array, dst_array, None, plan_template)
+
+    def test_tile_intersections(self):
+        src_mesh = DummyVirtualMesh([f"10.0.0.1:gpu:{i}" for i in range(2)])
+        dst_mesh = DummyVirtualMesh([f"10.0.0.2:gpu:{i}" for i in range(3)])
+        spec = self.create_spec(
+            src_mesh, dst_mesh,
+            ShardingSpec([Chunked([2]), NoSharding()], [ShardedAxis(0)]),
+            ShardingSpec([Chunked([3]), NoSharding()], [ShardedAxis(0)]),
+            (12, 8))
+        expected = [
+            [(0, [slice(0, 4), slice(0, 8)], [slice(0, 4), slice(0, 8)])],
+            [(0, [slice(4, 6), slice(0, 8)], [slice(0, 2), slice(0, 8)]),
+             (1, [slice(0, 2), slice(0, 8)], [slice(2, 4), slice(0, 8)])],
+            [(1, [slice(2, 6), slice(0, 8)], [slice(0, 4), slice(0, 8)])],
+        ]
+        self.assertEqual(len(spec.dst_tile_to_src_tiles_map), len(expected))
+        for (_, src_tileslices, indices_in_dst_tile), tile_expected in zip(
+                spec.dst_tile_to_src_tiles_map, expected):
+            self.assertEqual(
+                [(x.index_flat, x.offset) for x in src_tileslices],
+                [(src_idx, offset) for src_idx, offset, _ in tile_expected])
+            self.assertEqual(indices_in_dst_tile,
+                             [indices for _, _, indices in tile_expected])
+        np.testing.assert_array_equal(spec.tile_intersections.dst_tile_ptr,
+                                      [0, 1, 3, 4])
+        np.testing.assert_array_equal(spec.tile_intersections.slice_sizes,
+                                      [32, 16, 16, 32])
+
+    def test_plan_template_reuse(self):
+        meshes = [
+            DummyVirtualMesh([f"10.0.0.{i}:gpu:{j}" for j in range(2)])
+            for i in range(4)
+        ]
+        src_spec = ShardingSpec([Chunked([2]), NoSharding()],
+                                [ShardedAxis(0)])
+        dst_spec = ShardingSpec([NoSharding(), Chunked([2])],
+                                [ShardedAxis(0)])
+        spec = self.create_spec(meshes[0], meshes[1], src_spec, dst_spec,
+                                (8, 8))
+        template = spec.plan_template
+        reused = self.create_spec(meshes[2], meshes[3], src_spec, dst_spec,
+                                  (8, 8), template)
+        self.assertIs(reused.plan_template, template)
+        self.assertIs(reused.tile_intersections, template.tile_intersections)
+        for (dst_tile, src_tileslices, indices), (
+                reused_dst_tile, reused_src_tileslices, reused_indices) in zip(
+                    spec.dst_tile_to_src_tiles_map,
+                    reused.dst_tile_to_src_tiles_map):
+            self.assertEqual(reused_indices, indices)
+            self.assertEqual([x.offset for x in reused_src_tileslices],
+                             [x.offset for x in src_tileslices])
+            self.assertEqual(
+                reused_dst_tile.replica_device_strs,
+                [x.replace("10.0.0.1", "10.0.0.3")
+                 for x in dst_tile.replica_device_strs])
+        # Without allgather, the received slices are the indices in dst tiles
+        self.assertEqual(template.recv_indices,
+                         [[indices] for _, _, indices in
+                          spec.dst_tile_to_src_tiles_map])
+        self.assertEqual(template.allgather_specs, [])
+
+    def test_prefer_intra_host_sender(self):
+        src_mesh = DummyVirtualMesh(["10.0.0.1:gpu:0", "10.0.0.2:gpu:0"])
+        dst_mesh = DummyVirtualMesh(["10.0.0.2:gpu:1"])
+        spec = self.create_spec(
+            src_mesh, dst_mesh,
+            ShardingSpec([NoSharding(), NoSharding()], [Replicated(2)]),
+            ShardingSpec([NoSharding(), NoSharding()], [Replicated(1)]),
+            (64, 64))
+        strategy, = plan_send_recv_senders([spec], ReshardingBandwidthModel())
+        self.assertEqual(strategy.per_spec_plans[0][0][0], "10.0.0.2:gpu:0")
+
+    def test_lpt_makespan(self):
+        src_mesh = DummyVirtualMesh([f"10.0.0.1:gpu:{i}" for i in range(4)])
+        dst_mesh = DummyVirtualMesh([f"10.0.0.2:gpu:{i}" for i in range(8)])
+        src_spec = ShardingSpec([Chunked([2]), NoSharding()],
+                                [ShardedAxis(0), Replicated(2)])
+        dst_spec = ShardingSpec([Chunked([8]), NoSharding()],
+                                [ShardedAxis(0)])
+        specs = [
+            self.create_spec(src_mesh, dst_mesh, src_spec, dst_spec,
+                             (64, hidden)) for hidden in [8, 8, 64, 8, 32]
+        ]
+        bandwidth_model = ReshardingBandwidthModel()
+
+        src_loads = {x: 0 for x in src_mesh.device_strs}
+        dst_loads = {x: 0 for x in dst_mesh.device_strs}
+        for spec in specs:
+            spec.set_resharding_strategy(
+                CrossMeshCommunicator.
+                _generate_send_recv_resharding_strategy_by_loads(
+                    spec, src_loads, dst_loads))
+        greedy_makespan = get_resharding_makespan(specs, bandwidth_model)
+
+        strategies = plan_send_recv_senders(specs, bandwidth_model)
+        for spec, strategy in zip(specs, strategies):
+            for (dst_tile, src_tileslices,
+                 _), plan in zip(spec.dst_tile_to_src_tiles_map,
+                                 strategy.per_spec_plans):
+                self.assertEqual(plan.shape, (len(
+                    dst_tile.replica_device_strs), len(src_tileslices)))
+                for idx, src_tileslice in enumerate(src_tileslices):
+                    self.assertIn(plan[0][idx],
+                                  src_tileslice.replica_device_strs)
+            spec.set_resharding_strategy(strategy)
+        lpt_makespan = get_resharding_makespan(specs, bandwidth_model)
+        self.assertLessEqual(lpt_makespan, greedy_makespan)
+
+
 def suite():
     suite = unittest.TestSuite()
     suite.addTest(ReshardingTest("test_4gpu_send_recv"))
+    suite.addTest(ReshardingTest("test_4gpu_chunked_send_recv"))
     suite.addTest(ReshardingTest("test_4gpu_allgather"))
     suite.addTest(ReshardingTest("test_8gpu_2_dim_allgather"))
     suite.addTest(ReshardingTest("test_4gpu_broadcast"))
     suite.addTest(ReshardingTest("test_8gpu_broadcast"))
+    suite.addTest(ChunkRangesTest("test_chunk_ranges"))
+    suite.addTest(ChunkedSendRecvTest("test_gloo_chunked_send_recv"))
+    suite.addTest(ReshardingPlanTest("test_tile_intersections"))
+    suite.addTest(ReshardingPlanTest("test_plan_template_reuse"))
+    suite.addTest(ReshardingPlanTest("test_prefer_intra_host_sender"))
+    suite.addTest(ReshardingPlanTest("test_lpt_makespan"))
     return suite
 
 
@@ -1,5 +1,6 @@
 """Test distributed mesh data loader."""
 import os
+import time
 import unittest
 
 from flax import linen as nn
@@ -9,6 +10,7 @@ import jax.numpy as jnp
 from jax.interpreters import pxla
 
 from alpa import init, MeshDriverDataLoader
+from alpa.data_loader import BackgroundPrefetcher
 from alpa.device_mesh import get_global_physical_mesh
 from alpa.testing import (assert_allclose,
                           data_loader_test_input_iter_func as input_iter_func)
@@ -40,6 +42,9 @@ class DataLoaderTest(unittest.TestCase):
                                                 expected_data_loader):
             assert_allclose(actual_batch, expected_batch)
 
+        for metrics in data_loader.get_metrics():
+            assert metrics.num_batches == num_samples // batch_size
+
     def test_data_parallel(self):
         num_devices = self.physical_mesh.num_devices
 
@@ -76,8 +81,43 @@ class DataLoaderTest(unittest.TestCase):
         self.run_test(sharding_specs)
 
 
+class BackgroundPrefetcherTest(unittest.TestCase):
+
+    def test_order_and_metrics(self):
+
+        def slow_iter():
+            for i in range(8):
+                time.sleep(0.01)
+                yield i
+
+        prefetcher = BackgroundPrefetcher(slow_iter(), 2, lambda x: x * 2)
+        assert list(prefetcher) == [i * 2 for i in range(8)]
+        metrics = prefetcher.get_metrics()
+        assert metrics.num_batches == 8
+        assert metrics.queue_depth == 0
+        assert metrics.stall_time > 0
+
+    def test_error(self):
+
+        def bad_iter():
+            yield 0
+            raise ValueError("bad input")
+
+        prefetcher = BackgroundPrefetcher(bad_iter(), 4)
+        assert next(prefetcher) == 0
+        self.assertRaises(ValueError, next, prefetcher)
+        self.assertRaises(StopIteration, next, prefetcher)
+
+    def test_bounded_queue(self):
+        prefetcher = BackgroundPrefetcher(iter(range(100)), 3)
+        time.sleep(0.1)
+        assert prefetcher.get_metrics().queue_depth == 3
+        prefetcher.close()
+
+
 def suite():
     suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(BackgroundPrefetcherTest))
     suite.addTest(DataLoaderTest("test_data_parallel"))
     suite.addTest(DataLoaderTest("test_model_parallel"))
     suite.addTest(DataLoaderTest("test_data_model_parallel"))
@@ -11,8 +11,9 @@ from jax.interpreters import pxla
 import numpy as np
 import ray
 
-from alpa import init, parallelize, DistributedArray
+from alpa import init, parallelize, fetch, DistributedArray
 from alpa.device_mesh import get_global_physical_mesh
+from alpa.global_env import global_config
 from alpa.testing import assert_allclose
 
 
@@ -51,6 +52,48 @@ class DeviceMeshTest(unittest.TestCase):
 
         assert_allclose(array, dis_a)
 
+    def test_device_put_paths(self):
+        physical_mesh = get_global_physical_mesh(create_if_not_exist=True)
+        logical_mesh = physical_mesh.get_logical_mesh()
+
+        array = np.arange(64, dtype=np.int64).reshape([8, 8])
+        sharding_spec = logical_mesh.make_tile_spec(array, [0, 1], [0, 1])
+        indices = sharding_spec.indices(array.shape).flatten()
+        aval = jax.core.ShapedArray(array.shape, jnp.int32)
+        for use_object_store in [True, False]:
+            global_config.use_object_store_for_device_put = use_object_store
+            dis_a = physical_mesh.shard_args_to_arrays([aval], [indices],
+                                                       [sharding_spec],
+                                                       [array])[0]
+            assert_allclose(array, dis_a)
+        global_config.use_object_store_for_device_put = True
+
+    def test_fetch(self):
+        physical_mesh = get_global_physical_mesh(create_if_not_exist=True)
+        logical_mesh = physical_mesh.get_logical_mesh()
+
+        arrays = [
+            jnp.arange(64).reshape([8, 8]),
+            jnp.ones((16, 16), dtype=jnp.bfloat16),
+            jnp.array(3.0)
+        ]
+        dis_arrays = []
+        for array in arrays:
+            sharding_spec = logical_mesh.make_tile_spec(
+                array, list(range(min(array.ndim, 2))),
+                list(range(min(array.ndim, 2))))
+            indices = sharding_spec.indices(array.shape).flatten()
+            dis_arrays.append(
+                physical_mesh.shard_args_to_arrays([array.aval], [indices],
+                                                   [sharding_spec],
+                                                   [array])[0])
+
+        fetch({"a": dis_arrays[0], "b": dis_arrays[1:]})
+        for array, dis_array in zip(arrays, dis_arrays):
+            assert dis_array._npy_value is not None
+            assert dis_array._npy_value.dtype == array.dtype
+            assert_allclose(array, dis_array)
+
     def test_preshard_args(self):
         @parallelize
         def add_one(x):
@@ -65,6 +108,8 @@ def suite():
     suite = unittest.TestSuite()
     suite.addTest(DeviceMeshTest("test_add_one"))
     suite.addTest(DeviceMeshTest("test_distributed_array"))
+    suite.addTest(DeviceMeshTest("test_device_put_paths"))
+    suite.addTest(DeviceMeshTest("test_fetch"))
     suite.addTest(DeviceMeshTest("test_preshard_args"))
 
     return suite
@@ -0,0 +1,103 @@
+"""Test the LRU cache of files in a directory."""
+import os
+import shutil
+import tempfile
+import unittest
+
+from alpa.disk_cache import DiskLRUCache, get_global_cache
+
+
+class DiskLRUCacheTest(unittest.TestCase):
+    """Test DiskLRUCache."""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def set_mtime(self, cache, key, mtime):
+        os.utime(cache._get_path(key), (mtime, mtime))  # pylint: disable=protected-access
+
+    def test_hit_and_miss(self):
+        cache = DiskLRUCache(self.cache_dir)
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", {"value": [1, 2]})
+
+        # A new cache object reads the value from the disk
+        cache = DiskLRUCache(self.cache_dir)
+        self.assertEqual(cache.get("a"), {"value": [1, 2]})
+        self.assertEqual(cache.stats(), (1, 0, 0))
+
+        # Corrupted files are misses
+        with open(cache._get_path("b"), "wb") as fout:  # pylint: disable=protected-access
+            fout.write(b"corrupted")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats(), (1, 1, 0))
+
+        # No temporary files are left
+        self.assertEqual(sorted(os.listdir(self.cache_dir)),
+                         ["a.pkl", "b.pkl"])
+
+    def test_disabled(self):
+        cache = DiskLRUCache(None)
+        cache.put("a", 1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats(), (0, 1, 0))
+
+    def test_lru_order(self):
+        cache = DiskLRUCache(self.cache_dir, max_entries=3)
+        for i in range(3):
+            cache.put(str(i), i)
+            self.set_mtime(cache, str(i), 1000 + i)
+
+        # A hit refreshes the mtime, so "1" becomes the LRU value
+        self.assertEqual(cache.get("0"), 0)
+        self.assertGreater(os.path.getmtime(cache._get_path("0")), 1002)  # pylint: disable=protected-access
+        cache.put("3", 3)
+        self.assertEqual(sorted(os.listdir(self.cache_dir)),
+                         ["0.pkl", "2.pkl", "3.pkl"])
+
+        # Touch also refreshes the mtime
+        self.set_mtime(cache, "0", 1000)
+        self.set_mtime(cache, "2", 1001)
+        self.set_mtime(cache, "3", 1002)
+        cache.touch("0")
+        cache.put("4", 4)
+        self.assertEqual(sorted(os.listdir(self.cache_dir)),
+                         ["0.pkl", "3.pkl", "4.pkl"])
+        self.assertEqual(cache.num_evictions, 2)
+
+    def test_max_size(self):
+        cache = DiskLRUCache(self.cache_dir)
+        cache.put("0", bytes(64))
+        entry_size = os.path.getsize(cache._get_path("0"))  # pylint: disable=protected-access
+        self.set_mtime(cache, "0", 1000)
+        cache.put("1", bytes(64))
+        self.set_mtime(cache, "1", 1001)
+
+        cache.max_size = entry_size * 2
+        cache.put("2", bytes(64))
+        self.assertEqual(sorted(os.listdir(self.cache_dir)),
+                         ["1.pkl", "2.pkl"])
+        self.assertEqual(cache.num_evictions, 1)
+
+    def test_global_cache(self):
+        cache = get_global_cache(DiskLRUCache, self.cache_dir, max_entries=2)
+        self.assertIs(get_global_cache(DiskLRUCache, self.cache_dir,
+                                       max_entries=4), cache)
+        self.assertEqual(cache.max_entries, 4)
+
+        other_dir = os.path.join(self.cache_dir, "other")
+        self.assertIsNot(get_global_cache(DiskLRUCache, other_dir), cache)
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(DiskLRUCacheTest))
+    return suite
+
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
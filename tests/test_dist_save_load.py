@@ -11,7 +11,7 @@ import optax
 
 from alpa import (init, shutdown, DistributedArray, PipeshardParallel,
                   save_checkpoint, restore_checkpoint)
-from alpa.device_mesh import get_global_cluster
+from alpa.device_mesh import get_global_cluster, get_ts_chunk_shape
 from alpa.model.bert_model import BertConfig
 from alpa.model.model_util import TrainState
 from alpa.testing import (MLPModel, BertLayerModel, create_train_state,
@@ -117,6 +117,32 @@ class DistSaveLoadTest(unittest.TestCase):
         # Cleanup
         physical_mesh.shutdown()
 
+    def test_save_options(self):
+        save_prefix = self._get_save_prefix()
+        physical_mesh = get_global_cluster().get_physical_mesh([0], 1)
+        logical_mesh = physical_mesh.get_logical_mesh()
+
+        data = jnp.arange(64).reshape((8, 8))
+        aval = jax.ShapedArray(data.shape, jnp.int32)
+        sharding_spec = logical_mesh.make_tile_spec(data, [0, 1], [0, 1])
+        indices = sharding_spec.indices(data.shape).flatten()
+        (dist_data,) = physical_mesh.shard_args_to_arrays(
+            (aval,), (indices,), (sharding_spec,), (data,))
+
+        for compressor in [None, "zstd", "blosc"]:
+            with tempfile.TemporaryDirectory(prefix=save_prefix) as tmpdir:
+                # Chunks of 2 x 4 int32 values
+                dist_data.save(tmpdir, compressor, max_chunk_bytes=32)
+                load_data = DistributedArray.load(tmpdir, aval, physical_mesh,
+                                                  sharding_spec)
+                assert_allclose(data, load_data)
+
+        assert get_ts_chunk_shape((8, 8), 4, 32) == [2, 4]
+        assert get_ts_chunk_shape((8, 6), 4, None) == [8, 6]
+        assert get_ts_chunk_shape((7, 6), 4, 4) == [1, 1]
+
+        physical_mesh.shutdown()
+
     def test_distributed_mlp_save_load(self):
         save_prefix = self._get_save_prefix()
 
@@ -163,6 +189,44 @@ class DistSaveLoadTest(unittest.TestCase):
         # Check results
         assert_allclose(serial_state.params, load_state.params, 1e-3, 1e-3)
 
+    def test_async_save_load(self):
+        save_prefix = self._get_save_prefix()
+
+        # Init model and optimizer
+        batch_size = 64
+        hidden_dim = 16
+        model = MLPModel(hidden_dim=hidden_dim,
+                         output_dim=hidden_dim,
+                         manual_pipeline_layer=True)
+        rngkey = jax.random.PRNGKey(0)
+        x = jax.random.normal(rngkey, (batch_size, hidden_dim), jnp.float32)
+        y = jax.random.normal(rngkey, (batch_size, hidden_dim), jnp.float32)
+        batch = {'x': x, 'y': y}
+        state = create_train_state(rngkey, model, [x])
+
+        method = PipeshardParallel(num_micro_batches=2)
+        serial_train_step = get_mlp_train_step(None, None, None, False)
+        parallel_train_step = get_mlp_train_step(method, True, False, False)
+        executable = parallel_train_step.get_executable(state, batch)
+
+        serial_state = serial_train_step(state, batch)[0]
+        parallel_state = parallel_train_step(state, batch)[0]
+
+        with tempfile.TemporaryDirectory(prefix=save_prefix) as ckpt_dir:
+            handle = save_checkpoint(ckpt_dir, parallel_state, 1,
+                                     async_save=True)
+            # Training continues while the checkpoint is being written
+            parallel_train_step(parallel_state, batch)
+            handle.wait()
+            assert handle.done()
+
+            state_ss, _ = executable.get_load_info()
+            load_state = restore_checkpoint(ckpt_dir, 1, state, state_ss)
+
+        serial_state = serial_train_step(serial_state, batch)[0]
+        load_state = parallel_train_step(load_state, batch)[0]
+        assert_allclose(serial_state.params, load_state.params, 1e-3, 1e-3)
+
     def test_distributed_bert_save_load(self):
         save_prefix = self._get_save_prefix()
 
@@ -231,7 +295,9 @@ class DistSaveLoadTest(unittest.TestCase):
 def suite():
     suite = unittest.TestSuite()
     suite.addTest(DistSaveLoadTest("test_distributed_array_save_load"))
+    suite.addTest(DistSaveLoadTest("test_save_options"))
     suite.addTest(DistSaveLoadTest("test_distributed_mlp_save_load"))
+    suite.addTest(DistSaveLoadTest("test_async_save_load"))
     suite.addTest(DistSaveLoadTest("test_distributed_bert_save_load"))
     return suite
 
@@ -0,0 +1,134 @@
+"""Test the on-disk cache of the compilation results of parallelized functions."""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import jax
+import jax.numpy as jnp
+
+from alpa.device_mesh import VirtualPhysicalMesh
+from alpa.executable_cache import (compute_executable_key,
+                                   get_executable_cache,
+                                   get_file_contents_key)
+from alpa.global_env import global_config
+from alpa.pipeline_parallel.stage_construction import (
+    AutoStageOption, ManualStageOption, cluster_layers_and_slice_mesh)
+from alpa.shard_parallel.auto_sharding import AutoShardingOption
+from alpa.testing import PipelineBasicTest
+
+
+def get_key(fun, *args, options=("shard_parallel", (1, 2))):
+    closed_jaxpr = jax.make_jaxpr(fun)(*args)
+    avals = [x.aval for x in closed_jaxpr.jaxpr.invars]
+    return compute_executable_key(closed_jaxpr, avals, (False,) * len(avals),
+                                  *options)
+
+
+class ExecutableCacheKeyTest(unittest.TestCase):
+    """Test the keys of the executable cache."""
+
+    def test_compile_options(self):
+        x = jnp.ones((4, 8))
+
+        def f(a, b):
+            return jnp.tanh(a @ b.T)
+
+        key = get_key(f, x, x, options=("shard_parallel", AutoShardingOption()))
+        self.assertEqual(
+            key, get_key(f, x, x,
+                         options=("shard_parallel", AutoShardingOption())))
+        self.assertNotEqual(
+            key,
+            get_key(f,
+                    x,
+                    x,
+                    options=("shard_parallel",
+                             AutoShardingOption(force_data_parallel=True))))
+        self.assertNotEqual(
+            key, get_key(f, x, x, options=("shard_parallel",
+                                           AutoShardingOption(),
+                                           "1,2,Tesla-V100")))
+
+    def test_mesh_signature(self):
+
+        def get_signature(gpu_names):
+            host_info = [{
+                "NodeManagerAddress": f"10.0.0.{i}",
+                "Resources": {
+                    "GPU": 2.0,
+                    f"accelerator_type:{name}": 1.0
+                }
+            } for i, name in enumerate(gpu_names)]
+            return VirtualPhysicalMesh(list(range(len(gpu_names))), host_info,
+                                       "10.0.0.0", 2).get_signature()
+
+        self.assertEqual(get_signature(["V100", "V100"]), "2,2,V100,V100")
+        self.assertNotEqual(get_signature(["V100", "V100"]),
+                            get_signature(["V100", "A100"]))
+
+    def test_file_contents(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmp_dir, "compute_cost.jsonl")
+            missing_key = get_file_contents_key(filename, None)
+            self.assertEqual(missing_key, get_file_contents_key(None, None))
+
+            with open(filename, "w", encoding="utf-8") as fout:
+                fout.write("{}\n")
+            key = get_file_contents_key(filename, None)
+            self.assertNotEqual(key, missing_key)
+            with open(filename, "a", encoding="utf-8") as fout:
+                fout.write("{}\n")
+            self.assertNotEqual(key, get_file_contents_key(filename, None))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+class PipeshardExecutableCacheTest(PipelineBasicTest):
+    """Test the executable cache with pipeshard parallelism."""
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.old_cache_dir = global_config.executable_cache_dir
+        global_config.executable_cache_dir = self.cache_dir
+
+    def tearDown(self):
+        global_config.executable_cache_dir = self.old_cache_dir
+        shutil.rmtree(self.cache_dir)
+        super().tearDown()
+
+    def test_reuse_stage_solution(self):
+        stage_option = AutoStageOption("small_power_of_two", "default",
+                                       float("inf"), False, None, None)
+        self.run_mlp(stage_option=stage_option, do_numerical_test=False)
+        cache = get_executable_cache()
+        self.assertEqual(cache.stats(), (0, 1, 0))
+
+        # The second compilation reads the stage construction result as a
+        # manual stage option, so the profiling is skipped
+        with patch("alpa.pipeline_parallel.compile_executable."
+                   "cluster_layers_and_slice_mesh",
+                   wraps=cluster_layers_and_slice_mesh) as cluster_layers, \
+                patch("alpa.pipeline_parallel.stage_construction."
+                      "get_compute_cost") as get_compute_cost:
+            self.run_mlp(stage_option=stage_option)
+        self.assertIsInstance(cluster_layers.call_args.args[10],
+                              ManualStageOption)
+        get_compute_cost.assert_not_called()
+        self.assertEqual(cache.stats(), (1, 1, 0))
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(ExecutableCacheKeyTest))
+    suite.addTest(
+        PipeshardExecutableCacheTest("test_reuse_stage_solution"))
+    return suite
+
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
@@ -0,0 +1,82 @@
+"""Test the structural fingerprints of jaxprs."""
+import unittest
+
+import jax
+import jax.numpy as jnp
+import numpy as np
+
+from alpa.jaxpr_fingerprint import get_jaxpr_fingerprint
+
+
+def fingerprint(fun, *args, **kwargs):
+    return get_jaxpr_fingerprint(jax.make_jaxpr(fun)(*args), **kwargs)
+
+
+class JaxprFingerprintTest(unittest.TestCase):
+    """Test get_jaxpr_fingerprint."""
+
+    def test_rename(self):
+        x = jnp.ones((4, 8))
+
+        def f(a, b):
+            return jnp.tanh(a @ b.T)
+
+        def g(x, y):
+            z = x @ y.T
+            return jnp.tanh(z)
+
+        # Different function names, variable names and tracing counters
+        jax.make_jaxpr(lambda a: a + 1)(x)
+        self.assertEqual(fingerprint(f, x, x), fingerprint(g, x, x))
+
+        # Shapes, dtypes, literals and params change the fingerprint
+        key = fingerprint(f, x, x)
+        self.assertNotEqual(key, fingerprint(f, x, jnp.ones((2, 8))))
+        self.assertNotEqual(key, fingerprint(f, x, x.astype(jnp.float16)))
+        self.assertNotEqual(key, fingerprint(lambda a, b: jnp.tanh(b @ a.T),
+                                             x, x))
+        self.assertNotEqual(fingerprint(lambda a: a + 1, x),
+                            fingerprint(lambda a: a + 2, x))
+        self.assertNotEqual(fingerprint(lambda a: a.sum(0), x),
+                            fingerprint(lambda a: a.sum(1), x))
+
+    def test_sub_jaxpr(self):
+        x = jnp.ones((4, 8))
+
+        def f(a):
+            return jax.lax.fori_loop(0, 3, lambda i, b: jnp.sin(b), a)
+
+        def g(a):
+            return jax.lax.fori_loop(0, 3, lambda i, b: jnp.cos(b), a)
+
+        self.assertEqual(fingerprint(f, x), fingerprint(f, x))
+        self.assertNotEqual(fingerprint(f, x), fingerprint(g, x))
+
+        h = jax.checkpoint(lambda a: jnp.tanh(a @ a.T))
+        self.assertEqual(fingerprint(h, x), fingerprint(h, x))
+
+    def test_consts(self):
+        x = jnp.ones((4, 4))
+        c1 = np.ones((4, 4), dtype=np.float32)
+        c2 = np.zeros((4, 4), dtype=np.float32)
+        c3 = np.ones((4, 4), dtype=np.float16)
+
+        # Constants are hashed by their shapes and dtypes by default
+        self.assertEqual(fingerprint(lambda a: a @ c1, x),
+                         fingerprint(lambda a: a @ c2, x))
+        self.assertNotEqual(fingerprint(lambda a: a @ c1, x),
+                            fingerprint(lambda a: a @ c3, x))
+        self.assertNotEqual(
+            fingerprint(lambda a: a @ c1, x, include_const_values=True),
+            fingerprint(lambda a: a @ c2, x, include_const_values=True))
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(JaxprFingerprintTest))
+    return suite
+
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
@@ -0,0 +1,126 @@
+"""Test the analytic cost model of pipeline stages."""
+import json
+import os
+import tempfile
+import unittest
+
+import jax
+from jax import lax
+import jax.numpy as jnp
+import numpy as np
+
+from alpa.pipeline_parallel.analytic_cost_model import (AnalyticStageCostModel,
+                                                        DeviceSpec,
+                                                        get_layer_stats)
+from alpa.pipeline_parallel.computation import JaxPipelineComputation
+
+GB = 1 << 30
+
+
+def create_layer(name, fun, *args):
+    return JaxPipelineComputation.from_closed_jaxpr(name,
+                                                    jax.make_jaxpr(fun)(*args))
+
+
+class AnalyticCostModelTest(unittest.TestCase):
+    """Test AnalyticStageCostModel."""
+
+    def setUp(self):
+        self.device_spec = DeviceSpec(peak_flops=1e12,
+                                      hbm_bandwidth=1e12,
+                                      memory_per_device=16 * GB,
+                                      intra_host_bandwidth=1e11,
+                                      inter_host_bandwidth=1e9)
+
+    def test_load_device_spec(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "spec.json")
+            with open(filename, "w", encoding="utf-8") as fout:
+                json.dump(self.device_spec.__dict__, fout)
+            self.assertEqual(DeviceSpec.load(filename), self.device_spec)
+
+    def test_layer_stats(self):
+        x = jnp.ones((16, 32))
+        w = jnp.ones((32, 64))
+        stats = get_layer_stats(
+            jax.make_jaxpr(lambda x, w: jnp.tanh(x @ w))(x, w).eqns)
+        self.assertEqual(stats.flops, 2 * 16 * 32 * 64)
+        # dot: x, w -> (16, 64); tanh: (16, 64) -> (16, 64)
+        self.assertEqual(stats.bytes_accessed,
+                         (16 * 32 + 32 * 64 + 3 * 16 * 64) * 4)
+        np.testing.assert_array_equal(stats.dot_bytes,
+                                      [[16 * 64 * 4, 16 * 32 * 4]])
+
+        # Equations in sub-jaxprs are counted
+        stats = get_layer_stats(
+            jax.make_jaxpr(jax.checkpoint(lambda x, w: x @ w))(x, w).eqns)
+        self.assertEqual(stats.flops, 2 * 16 * 32 * 64)
+
+        # Convolutions
+        img = jnp.ones((8, 3, 32, 32))
+        kernel = jnp.ones((16, 3, 5, 5))
+        stats = get_layer_stats(
+            jax.make_jaxpr(lambda a, b: lax.conv(a, b, (1, 1), "SAME"))(
+                img, kernel).eqns)
+        self.assertEqual(stats.flops, 2 * (8 * 16 * 32 * 32) * 3 * 5 * 5)
+
+    def test_estimate(self):
+        x = jnp.ones((64, 1024))
+        w = jnp.ones((1024, 1024))
+        layers = [
+            create_layer("forward", lambda x, w: jnp.tanh(x @ w), x, w),
+            create_layer("backward", lambda x, w: x @ w.T, x, w),
+        ]
+        model = AnalyticStageCostModel(self.device_spec, layers, [None], [],
+                                       num_micro_batches=1)
+        one_device, _ = model.estimate(0, 0, 1, np.arange(1).reshape(1, 1),
+                                       False)
+        data_parallel, _ = model.estimate(0, 0, 2,
+                                          np.arange(2).reshape(2, 1), False)
+        self.assertAlmostEqual(data_parallel, one_device / 2)
+
+        # Model parallelism communicates through the links
+        intra_host, _ = model.estimate(0, 0, 2, np.arange(2).reshape(1, 2),
+                                       False)
+        inter_host, _ = model.estimate(0, 0, 1, np.arange(2).reshape(1, 2),
+                                       False)
+        self.assertGreater(intra_host, data_parallel)
+        self.assertGreater(inter_host, intra_host)
+
+    def test_max_n_succ_stages(self):
+        x = jnp.ones((4096, 4096))
+        forward_layer = create_layer("forward", jnp.tanh, x)
+        backward_layer = create_layer("backward", lambda y: y * 2, x)
+        # Use the output of the forward layer in the backward layer
+        y = forward_layer.outvars[0]
+        backward_layer.invars = [y]
+        backward_layer.eqns[0].invars[0] = y
+
+        model = AnalyticStageCostModel(self.device_spec,
+                                       [forward_layer, backward_layer], [None],
+                                       [], 1)
+        # Both the parameter x and the intermediate y take `size` bytes
+        size = 4096 * 4096 * 4
+        _, max_stage = model.estimate(0, 0, 1, np.arange(1).reshape(1, 1),
+                                      False)
+        self.assertEqual(max_stage, (16 * GB - 2 * size) // size - 1)
+        # The intermediate is sharded by data parallelism
+        _, max_stage = model.estimate(0, 0, 2, np.arange(2).reshape(2, 1),
+                                      False)
+        self.assertEqual(max_stage,
+                         (16 * GB - size - size // 2) // (size // 2) - 1)
+        # A stage on the whole cluster does not keep intermediates
+        _, max_stage = model.estimate(0, 0, 1, np.arange(1).reshape(1, 1),
+                                      True)
+        self.assertEqual(max_stage, 4096)
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(AnalyticCostModelTest))
+    return suite
+
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
@@ -0,0 +1,93 @@
+"""Test the persistent database of profiled stage compute costs."""
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from alpa.pipeline_parallel.compute_cost_database import (ComputeCostDatabase,
+                                                          get_stage_key)
+from alpa.shard_parallel.auto_sharding import AutoShardingOption
+
+
+class DummyLogicalMesh:
+
+    def __init__(self, shape):
+        self.shape = shape
+
+
+class ComputeCostDatabaseTest(unittest.TestCase):
+    """Test ComputeCostDatabase and get_stage_key."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp_dir, "compute_cost.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_resume(self):
+        database = ComputeCostDatabase(self.filename)
+        self.assertIsNone(database.query("a"))
+        database.update("a", np.float64(1.5), np.int64(3))
+        database.update("b", np.inf, -1)
+
+        # Simulate a crash in the middle of writing a record
+        with open(self.filename, "a") as fout:
+            fout.write('{"key": "c", "cost"')
+
+        database = ComputeCostDatabase(self.filename)
+        self.assertEqual(len(database), 2)
+        self.assertEqual(database.query("a"), (1.5, 3))
+        self.assertEqual(database.query("b"), (np.inf, -1))
+        self.assertIsNone(database.query("c"))
+
+    def test_append_after_partial_line(self):
+        database = ComputeCostDatabase(self.filename)
+        database.update("a", 1.5, 3)
+        with open(self.filename, "a") as fout:
+            fout.write('{"key": "b", "cost"')
+
+        # The resumed run appends a record after the partial line
+        database = ComputeCostDatabase(self.filename)
+        database.update("c", 2.5, 4)
+        database.update("d", 3.5, 5)
+
+        database = ComputeCostDatabase(self.filename)
+        self.assertEqual(len(database), 3)
+        self.assertEqual(database.query("c"), (2.5, 4))
+        self.assertEqual(database.query("d"), (3.5, 5))
+
+    def test_stage_key(self):
+        layer_hashes = ["l0", "l1", "l2", "l3"]
+        as_option = AutoShardingOption()
+
+        def get_key(layer_indices=(0, 3),
+                    submesh=(1, 2),
+                    logical_shape=(1, 2),
+                    as_dict=None,
+                    num_micro_batches=4):
+            return get_stage_key(layer_hashes, layer_indices, ["g0"], submesh,
+                                 (DummyLogicalMesh(logical_shape), as_dict or
+                                  {}), as_option, num_micro_batches, False)
+
+        key = get_key()
+        self.assertEqual(key, get_key())
+        self.assertNotEqual(key, get_key(layer_indices=(0, 1, 2, 3)))
+        self.assertNotEqual(key, get_key(submesh=(1, 4)))
+        self.assertNotEqual(key, get_key(logical_shape=(2, 1)))
+        self.assertNotEqual(
+            key, get_key(as_dict={"force_batch_dim_to_mesh_dim": 0}))
+        self.assertNotEqual(key, get_key(num_micro_batches=8))
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(ComputeCostDatabaseTest))
+    return suite
+
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
@@ -65,11 +65,19 @@ class PipelineMLPTest(unittest.TestCase):
     def test_2_layer_mlp_pipeshard_parallel(self):
         self.train_2_layer_mlp(PipeshardParallel())
 
+    def test_2_layer_mlp_interleaved_pipeshard_parallel(self):
+        self.train_2_layer_mlp(
+            PipeshardParallel(num_micro_batches=2,
+                              pipeline_schedule="1f1b_interleaved",
+                              num_virtual_stages_per_mesh=2))
+
 
 def suite():
     suite = unittest.TestSuite()
     suite.addTest(PipelineMLPTest("test_2_layer_mlp_local_pipeline_parallel"))
     suite.addTest(PipelineMLPTest("test_2_layer_mlp_pipeshard_parallel"))
+    suite.addTest(
+        PipelineMLPTest("test_2_layer_mlp_interleaved_pipeshard_parallel"))
     return suite
 
 
@@ -1,7 +1,10 @@
 import unittest
 
 from alpa.pipeline_parallel.schedules import (gen_linear_pipeline_dependency,
-                                              GpipeSchedule, PipeDreamFlush)
+                                              GpipeSchedule, PipeDreamFlush,
+                                              InterleavedPipeDreamFlush,
+                                              MemoryBudgetedPipeDreamFlush)
+from alpa.pipeline_parallel.schedule_simulator import simulate_schedule
 
 
 class PipelineScheduleTest(unittest.TestCase):
@@ -92,10 +95,125 @@ class PipelineScheduleTest(unittest.TestCase):
                     if schedule_type == "1f1b":
                         self.run_1f1b(num_stage, num_mesh, num_batch)
 
+    def test_simulator(self):
+        fwd_cost, bwd_cost = 1.0, 2.0
+        for num_mesh in [1, 2, 4]:
+            for num_batch in [1, 4, 16]:
+                deps = gen_linear_pipeline_dependency(2 * num_mesh)
+                apply_grad_placement = {
+                    2 * num_mesh + i: i for i in range(num_mesh)
+                }
+                stage_costs = [fwd_cost] * num_mesh + [bwd_cost] * num_mesh
+                for schedule_cls in [GpipeSchedule, PipeDreamFlush]:
+                    s = schedule_cls(dependency=deps,
+                                     meshes=[None] * num_mesh,
+                                     apply_grad_placement=apply_grad_placement,
+                                     num_batch=num_batch)
+                    result = simulate_schedule(s,
+                                               stage_costs,
+                                               activation_sizes=[1] *
+                                               num_mesh)
+                    num_clock = num_batch + num_mesh - 1
+                    self.assertAlmostEqual(result.iteration_time,
+                                           num_clock * (fwd_cost + bwd_cost))
+                    self.assertAlmostEqual(result.bubble_fraction,
+                                           (num_mesh - 1) / num_clock)
+                    if schedule_cls == GpipeSchedule:
+                        expected_memory = [num_batch] * num_mesh
+                    else:
+                        expected_memory = [
+                            min(num_mesh - i, num_batch)
+                            for i in range(num_mesh)
+                        ]
+                    self.assertEqual(result.peak_memory, expected_memory)
+
+    def test_interleaved_1f1b(self):
+        fwd_cost, bwd_cost = 1.0, 2.0
+        for num_mesh, num_virtual_stage, num_batch in [(2, 1, 4), (2, 2, 4),
+                                                       (4, 2, 8), (4, 3, 4)]:
+            num_fwd_stage = num_mesh * num_virtual_stage
+            deps = gen_linear_pipeline_dependency(2 * num_fwd_stage)
+            s = InterleavedPipeDreamFlush(
+                dependency=deps,
+                meshes=[None] * num_mesh,
+                apply_grad_placement={},
+                num_batch=num_batch,
+                num_virtual_stages_per_mesh=num_virtual_stage)
+
+            # forward stage i and its backward stage are on mesh i % num_mesh
+            for i in range(num_fwd_stage):
+                self.assertEqual(list(s.stage_placement(i)), [i % num_mesh])
+                self.assertEqual(
+                    list(s.stage_placement(2 * num_fwd_stage - 1 - i)),
+                    [i % num_mesh])
+
+            # every task runs once after all its dependencies
+            finished_clock = {}
+            for clock, sched in enumerate(s.schedules):
+                for task in sched:
+                    if task:
+                        self.assertNotIn(task, finished_clock)
+                        finished_clock[task] = clock
+            self.assertEqual(len(finished_clock), num_batch * 2 * num_fwd_stage)
+            for (batch_idx, stage_idx), clock in finished_clock.items():
+                for dep in deps[stage_idx].nonzero()[0]:
+                    self.assertLess(finished_clock[(batch_idx, dep)], clock)
+
+            # the bubble shrinks by the number of virtual stages
+            stage_costs = ([fwd_cost / num_virtual_stage] * num_fwd_stage +
+                           [bwd_cost / num_virtual_stage] * num_fwd_stage)
+            result = simulate_schedule(s, stage_costs)
+            bubble = (num_mesh - 1) / num_virtual_stage
+            self.assertAlmostEqual(result.bubble_fraction,
+                                   bubble / (num_batch + bubble))
+
+    def test_memory_budgeted_1f1b(self):
+        num_mesh, num_batch = 4, 8
+        deps = gen_linear_pipeline_dependency(2 * num_mesh)
+        activation_sizes = [1, 2, 1, 1]
+
+        def get_schedule(memory_budgets, stage_costs=None):
+            return MemoryBudgetedPipeDreamFlush(
+                dependency=deps,
+                meshes=[None] * num_mesh,
+                apply_grad_placement={},
+                num_batch=num_batch,
+                activation_sizes=activation_sizes,
+                memory_budgets=memory_budgets,
+                stage_costs=stage_costs)
+
+        # With enough memory and equal stages, it is the same as 1F1B
+        s = get_schedule([100] * num_mesh)
+        s_1f1b = PipeDreamFlush(dependency=deps,
+                                meshes=[None] * num_mesh,
+                                apply_grad_placement={},
+                                num_batch=num_batch)
+        self.assertEqual(s.schedules, s_1f1b.schedules)
+
+        # The peak activation memory respects the budgets
+        memory_budgets = [2, 4, 8, 8]
+        s = get_schedule(memory_budgets)
+        result = simulate_schedule(s, [1] * num_mesh + [2] * num_mesh,
+                                   activation_sizes=activation_sizes)
+        for peak, budget in zip(result.peak_memory, memory_budgets):
+            self.assertLessEqual(peak, budget)
+
+        # Meshes with spare memory run more micro batches ahead when this
+        # hides the imbalance between stages
+        stage_costs = [1.5, 0.9, 0.6, 0.5, 1.7, 1.9, 1.4, 1.6]
+        s = get_schedule([100] * num_mesh, stage_costs)
+        result = simulate_schedule(s, stage_costs)
+        result_1f1b = simulate_schedule(s_1f1b, stage_costs)
+        self.assertGreater(s.num_warmup[0], num_mesh - 1)
+        self.assertLess(result.iteration_time, result_1f1b.iteration_time)
+
 
 def suite():
     suite = unittest.TestSuite()
     suite.addTest(PipelineScheduleTest("test_schedules"))
+    suite.addTest(PipelineScheduleTest("test_simulator"))
+    suite.addTest(PipelineScheduleTest("test_interleaved_1f1b"))
+    suite.addTest(PipelineScheduleTest("test_memory_budgeted_1f1b"))
     return suite
 
 
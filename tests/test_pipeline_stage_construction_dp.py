@@ -0,0 +1,73 @@
+"""Test the dynamic programming of auto stage construction."""
+import unittest
+
+import numpy as np
+
+from alpa.pipeline_parallel.stage_construction import dp, dp_reference
+
+
+class StageConstructionDPTest(unittest.TestCase):
+    """Test dp against dp_reference on random cost tensors."""
+
+    def _run_random_case(self, rng, num_layers, submesh_choices,
+                         num_autosharding_configs, num_micro_batches):
+        num_devices = max(np.prod(x) for x in submesh_choices) * 2
+        shape = (num_layers, num_layers, len(submesh_choices),
+                 num_autosharding_configs)
+        compute_cost = np.round(rng.uniform(1, 10, shape), 1)
+        lower = np.tril(np.ones((num_layers, num_layers), dtype=bool), -1)
+        compute_cost[lower] = np.inf
+        compute_cost[rng.random(shape) < 0.1] = np.inf
+        max_n_succ_stages = rng.integers(-1, num_layers, shape)
+
+        args = (num_layers, num_devices, num_micro_batches, submesh_choices,
+                num_autosharding_configs, compute_cost, max_n_succ_stages)
+        try:
+            expected_cost, _ = dp_reference(*args)
+        except AssertionError:
+            self.assertRaises(AssertionError, dp, *args)
+            return
+
+        cost, solution = dp(*args)
+        self.assertAlmostEqual(cost, expected_cost, places=3)
+
+        # Check the solution is valid and has the returned cost
+        stage_costs = []
+        layer_id, used_devices = 0, 0
+        for s, ((start, end), submesh_id, config_id) in enumerate(solution):
+            self.assertEqual(start, layer_id)
+            n_succ_stages = len(solution) - s - 1
+            self.assertLessEqual(
+                n_succ_stages,
+                max_n_succ_stages[start, end - 1, submesh_id, config_id])
+            stage_costs.append(compute_cost[start, end - 1, submesh_id,
+                                            config_id])
+            layer_id = end
+            used_devices += np.prod(submesh_choices[submesh_id])
+        self.assertEqual(layer_id, num_layers)
+        self.assertEqual(used_devices, num_devices)
+        self.assertAlmostEqual(
+            sum(stage_costs) + (num_micro_batches - 1) * max(stage_costs),
+            cost,
+            places=3)
+
+    def test_random_costs(self):
+        rng = np.random.default_rng(0)
+        submesh_choices = ((1, 1), (1, 2), (1, 4))
+        for _ in range(20):
+            num_layers = int(rng.integers(2, 8))
+            num_autosharding_configs = int(rng.integers(1, 4))
+            num_micro_batches = int(rng.integers(1, 16))
+            self._run_random_case(rng, num_layers, submesh_choices,
+                                  num_autosharding_configs, num_micro_batches)
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(StageConstructionDPTest("test_random_costs"))
+    return suite
+
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
@@ -0,0 +1,103 @@
+"""Test the timeline tracing of the pipeshard runtime."""
+from collections import namedtuple
+import json
+import os
+import tempfile
+import unittest
+
+import jax
+import jax.numpy as jnp
+
+from alpa.global_env import global_config
+from alpa.parallel_method import PipeshardParallel
+from alpa.pipeline_parallel.pipeline_trace import (InstructionTraceBuffer,
+                                                   dump_chrome_trace)
+from alpa.testing import (MLPModel, PipelineBasicTest, create_train_state,
+                          get_mlp_train_step)
+
+Instruction = namedtuple("Instruction",
+                         ["opcode", "task_uuid", "batch_idx", "stage_idx"])
+
+
+class PipelineTraceTest(unittest.TestCase):
+    """Test InstructionTraceBuffer and the Chrome trace export."""
+
+    def setUp(self):
+        self.instructions = [
+            Instruction(2, 10, 0, 1),
+            Instruction(0, 11, 0, 1),
+            Instruction(3, None, 0, 1),
+        ]
+
+    def test_ring_buffer(self):
+        trace_buffer = InstructionTraceBuffer(4, self.instructions)
+        for step in range(2):
+            for i in range(len(self.instructions)):
+                start = step * 10 + i
+                trace_buffer.record(i, start, start + 0.5)
+
+        # Only the last 4 records are kept
+        records = trace_buffer.get_records()
+        self.assertEqual(list(records["start"]), [2, 10, 11, 12])
+        self.assertEqual(list(records["end"]), [2.5, 10.5, 11.5, 12.5])
+        self.assertEqual(list(records["opcode"]), [3, 2, 0, 3])
+        self.assertEqual(list(records["task_uuid"]), [-1, 10, 11, -1])
+        self.assertEqual(list(records["stage_idx"]), [1, 1, 1, 1])
+
+        trace_buffer.clear()
+        self.assertEqual(len(trace_buffer.get_records()), 0)
+
+    def test_chrome_trace(self):
+        trace_buffer = InstructionTraceBuffer(8, self.instructions)
+        for i in range(len(self.instructions)):
+            trace_buffer.record(i, i, i + 0.5)
+        records = trace_buffer.get_records()
+
+        filename = os.path.join(tempfile.mkdtemp(), "trace.json")
+        dump_chrome_trace([[records], [records, records]], filename,
+                          ["RUN", "SEND", "RECV", "FREE"])
+        with open(filename, encoding="utf-8") as fin:
+            events = json.load(fin)["traceEvents"]
+
+        # 2 process names, 3 thread names and 9 instructions
+        self.assertEqual(len(events), 14)
+        durations = [e for e in events if e["ph"] == "X"]
+        self.assertEqual(len(durations), 9)
+        self.assertEqual(durations[0]["name"], "RECV stage 1")
+        self.assertEqual(durations[1]["ts"], 1e6)
+        self.assertEqual(durations[1]["dur"], 0.5e6)
+        self.assertEqual({(e["pid"], e["tid"]) for e in durations},
+                         {(0, 0), (1, 0), (1, 1)})
+
+
+class PipeshardTraceTest(PipelineBasicTest):
+    """Test the tracing of a pipeshard executable."""
+
+    def test_enable_after_compile(self):
+        model = MLPModel(hidden_dim=16, output_dim=16)
+        x = jax.random.normal(jax.random.PRNGKey(0), (64, 16), jnp.float32)
+        state = create_train_state(jax.random.PRNGKey(0), model, [x])
+        train_step = get_mlp_train_step(
+            PipeshardParallel(num_micro_batches=4), True, False, False)
+        executable = train_step.get_executable(state, {"x": x, "y": x})
+
+        # Setting the flag after compiling does not enable tracing
+        backup = global_config.pipeline_trace_buffer_size
+        global_config.pipeline_trace_buffer_size = 1024
+        try:
+            with self.assertRaisesRegex(RuntimeError, "tracing is disabled"):
+                executable.dump_pipeline_trace("trace.json")
+        finally:
+            global_config.pipeline_trace_buffer_size = backup
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(PipelineTraceTest))
+    suite.addTest(unittest.makeSuite(PipeshardTraceTest))
+    return suite
+
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
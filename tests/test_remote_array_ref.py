@@ -0,0 +1,64 @@
+"""Test the array-backed references of remote buffers."""
+import unittest
+
+import numpy as np
+
+from alpa.mesh_executable import (RemoteBufferRef, create_remote_array_refs,
+                                  get_uuid_np_array,
+                                  set_buffers_deleted_on_workers)
+
+
+class RecordingMesh:
+    """A mesh that records the deleted buffers."""
+
+    def __init__(self, num_hosts, num_devices_per_host):
+        self.num_hosts = num_hosts
+        self.num_devices_per_host = num_devices_per_host
+        self.device_strs = []
+        self.deleted = []
+
+    def delete_remote_buffers(self, buf_refs):
+        self.deleted.extend((x.host_id, x.uuid) for x in buf_refs)
+
+    def delete_remote_buffer_uuids(self, host_ids, uuids):
+        self.deleted.extend(zip(host_ids.tolist(), uuids.tolist()))
+
+
+class RemoteArrayRefTest(unittest.TestCase):
+    """Test RemoteArrayRef."""
+
+    def test_create_and_index(self):
+        mesh = RecordingMesh(2, 4)
+        uuids = np.arange(24).reshape(3, 2, 4)
+        refs = create_remote_array_refs(mesh, uuids)
+
+        self.assertEqual(len(refs), 3)
+        self.assertEqual(len(refs[1]), 8)
+        buf = refs[1][5]
+        self.assertEqual((buf.host_id, buf.device_id, buf.uuid), (1, 1, 13))
+        self.assertEqual([x.uuid for x in refs[2]], list(range(16, 24)))
+
+        # Rows of RemoteArrayRef and RemoteBufferRef can be mixed
+        buf_refs = [RemoteBufferRef(mesh, 0, i, 100 + i) for i in range(8)]
+        np.testing.assert_array_equal(
+            get_uuid_np_array([refs[0], buf_refs]),
+            [list(range(8)), list(range(100, 108))])
+        set_buffers_deleted_on_workers(buf_refs)
+
+    def test_batched_delete(self):
+        mesh = RecordingMesh(2, 2)
+        refs = create_remote_array_refs(mesh, np.arange(8).reshape(2, 2, 2))
+        set_buffers_deleted_on_workers(refs[0])
+        refs = None
+        self.assertEqual(mesh.deleted, [(0, 4), (0, 5), (1, 6), (1, 7)])
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(RemoteArrayRefTest))
+    return suite
+
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
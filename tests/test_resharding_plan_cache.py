@@ -0,0 +1,38 @@
+"""Test the cache of cross-mesh resharding plans."""
+import unittest
+
+from alpa.pipeline_parallel.resharding_plan_cache import (
+    get_resharding_plan_cache)
+from alpa.testing import PipelineBasicTest
+
+
+class ReshardingPlanCacheTest(PipelineBasicTest):
+    """Test the reuse of resharding plans across executables."""
+
+    def test_reuse_across_executables(self):
+        cache = get_resharding_plan_cache()
+        cache.clear()
+
+        # The two stages of the MLP run on two meshes, so the first
+        # executable computes the plans of the cross-mesh resharding
+        self.run_mlp(do_numerical_test=False)
+        hits, misses, _ = cache.stats()
+        self.assertGreater(misses, 0)
+
+        # The second executable has the same resharding and reuses every
+        # plan
+        self.run_mlp(do_numerical_test=False)
+        new_hits, new_misses, _ = cache.stats()
+        self.assertEqual(new_misses, misses)
+        self.assertEqual(new_hits - hits, hits + misses)
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(ReshardingPlanCacheTest("test_reuse_across_executables"))
+    return suite
+
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner()
+    runner.run(suite())